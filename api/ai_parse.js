@@ -0,0 +1,241 @@
+import { createLru, readThrough } from "../utils/cache.js";
+import { HOT_CACHE_LRU_TTL_MS, cacheStats, sha256Hex } from "./shared.js";
+
+// Workers AI product parsing behind a content-addressed parse cache
+// (/api/nova/ingest, /api/crawl)
+
+// Price-related HTML sections (AI prompt input and part of the parse cache key)
+function extractPriceSection(html) {
+  let priceSection = "";
+
+  // Try to find price-related content in HTML
+  const pricePatterns = [
+    /price[^>]*>[\s\S]{0,5000}/gi,
+    /sku[^>]*>[\s\S]{0,5000}/gi,
+    /variant[^>]*>[\s\S]{0,5000}/gi,
+    /\$\s*\d+\.?\d*/g
+  ];
+
+  for (const pattern of pricePatterns) {
+    const matches = html.match(pattern);
+    if (matches) {
+      priceSection += matches.slice(0, 5).join('\n');
+    }
+  }
+  return priceSection;
+}
+
+// runParams skuAttr -> SKU attribute names in skuAttr order, the text after each '#'
+// "14:200003699#30A;5:361386#Red" -> ["30A", "Red"]. Object.values() of the raw string would
+// split it into single characters, and an object keyed by property id would reorder the names
+// (integer keys sort numerically). A SKU without names is labelled "SKU-<id>" (a bare number
+// would read as a pack quantity; skuIdStr, as skuId can exceed 2^53); null without an id
+function skuAttributes(skuAttr, skuId) {
+  if (skuAttr && typeof skuAttr !== "string") return skuAttr;
+  const names = (skuAttr || "").split(";")
+    .map(part => part.includes("#") ? part.slice(part.indexOf("#") + 1).trim() : "")
+    .filter(Boolean);
+  if (names.length > 0) return names;
+  return skuId ? [`SKU-${skuId}`] : null;
+}
+
+// Page title (<title>, else the first <h1>)
+function htmlTitle(html) {
+  const titleMatch = html.match(/<title>([^<]+)<\/title>/i) ||
+    html.match(/<h1[^>]*>([^<]+)<\/h1>/i);
+  return titleMatch ? titleMatch[1].trim() : "Unknown Product";
+}
+
+// Unique USD prices in the HTML (e.g., $5.99, US $10.00), at most MAX_REGEX_VARIANTS
+const MAX_REGEX_VARIANTS = 10;
+function htmlPrices(html) {
+  const priceMatches = html.match(/(?:US\s*)?\$\s*(\d+\.?\d*)/gi) || [];
+  return [...new Set(priceMatches.map(p => {
+    const num = parseFloat(p.replace(/[^\d.]/g, ''));
+    return isNaN(num) ? null : num;
+  }).filter(p => p && p > 0 && p < 1000))].slice(0, MAX_REGEX_VARIANTS); // Filter reasonable prices
+}
+
+// What the AI fallback is shown of the page
+function aiPromptInputs(html) {
+  return { priceSection: extractPriceSection(html).slice(0, 10000), head: html.slice(0, 3000) };
+}
+
+/**
+ * Parse raw crawl data using Workers AI (LLaMA)
+ * Converts messy AliExpress data → clean variant JSON
+ */
+async function parseWithAI(raw, env) {
+  if (!raw || !env.AI) {
+    console.log("[Parse] Missing raw data or AI binding");
+    return null;
+  }
+
+  // Check if we got actual content
+  const htmlLength = (raw.html || "").length;
+  const hasJson = raw.json && Object.keys(raw.json).length > 0;
+  console.log(`[Parse] HTML length: ${htmlLength}, hasJson: ${hasJson}, trimmed: ${!!raw.trimmed}`);
+
+  // Try to extract data from embedded JSON first (faster, more reliable)
+  if (hasJson && raw.json.data?.productInfo?.title) {
+    console.log("[Parse] Found productInfo in JSON, extracting directly");
+    try {
+      const pi = raw.json.data.productInfo;
+      const skuInfo = raw.json.data.skuInfo || {};
+
+      return {
+        title: pi.title || "Unknown Product",
+        currency: "USD",
+        variants: (skuInfo.priceList || []).map(p => ({
+          attributes: skuAttributes(p.skuAttr, p.skuIdStr || p.skuId),
+          sku: p.skuId || null,
+          price: parseFloat(p.skuVal?.skuAmount?.value || p.skuVal?.actSkuCalPrice || 0),
+          stock: p.skuVal?.availQuantity || null
+        }))
+      };
+    } catch (e) {
+      console.log("[Parse] Direct JSON extraction failed:", e.message);
+    }
+  }
+
+  // If full-page HTML is too short, it's likely an error page
+  // (trimmed uploads only carry the title + price sections)
+  if (!raw.trimmed && htmlLength < 1000) {
+    console.log("[Parse] HTML too short - likely error/404 page");
+    return null;
+  }
+
+  // Try regex-based price extraction as fallback (faster than AI)
+  const html = raw.html || "";
+
+  // Extract title and all USD prices from HTML
+  const title = htmlTitle(html);
+  const prices = htmlPrices(html);
+
+  console.log(`[Parse] Found ${prices.length} prices via regex:`, prices.slice(0, 5));
+
+  if (prices.length > 0) {
+    // Create variants from unique prices found
+    const variants = prices.map((price, idx) => ({
+      attributes: { variant: `option-${idx + 1}` },
+      price: price,
+      stock: null
+    }));
+
+    return {
+      title: title,
+      currency: "USD",
+      variants: variants
+    };
+  }
+
+  // Fallback to AI parsing
+  // Extract price-related sections from HTML for better parsing
+  const { priceSection, head } = aiPromptInputs(html);
+
+  const prompt = `You are parsing an AliExpress product page HTML.
+
+TASK: Extract the product title and ALL prices/variants you can find.
+
+IMPORTANT RULES:
+- Look for price values like $5.99, $10.00, etc in the HTML
+- Look for variant selectors (color, size, etc)
+- Extract the lowest and highest prices if multiple exist
+- If you find a single price, create one variant with that price
+- Return ONLY valid JSON
+
+OUTPUT FORMAT:
+{
+  "title": "product title from page",
+  "currency": "USD",
+  "variants": [
+    { "attributes": {"type":"default"}, "price": 5.99, "stock": null }
+  ]
+}
+
+PRICE-RELATED HTML CONTENT:
+${priceSection}
+
+PAGE TITLE/META:
+${head}`;
+
+  try {
+    const aiResponse = await env.AI.run("@cf/meta/llama-3-8b-instruct", {
+      messages: [{ role: "user", content: prompt }],
+      max_tokens: 2000
+    });
+
+    const responseText = aiResponse.response || "";
+    console.log("[Parse] AI response preview:", responseText.slice(0, 200));
+
+    const jsonMatch = responseText.match(/\{[\s\S]*\}/);
+    if (jsonMatch) {
+      return JSON.parse(jsonMatch[0]);
+    }
+    console.log("[Parse] No JSON found in AI response");
+    return null;
+  } catch (e) {
+    console.error("[Parse] AI parsing error:", e.message);
+    return null;
+  }
+}
+
+// --- Parse Cache (content-addressed) ---
+// Same product content -> same parse result, so the key is a hash of exactly the
+// inputs parseWithAI() reads: the productInfo/priceList fields when present,
+// otherwise the page title + every regex-matched price, otherwise the AI prompt
+// inputs. Volatile markup outside those inputs stays out of the key.
+
+const PARSE_CACHE_KV_TTL_S = 24 * 60 * 60; // Parsed product content (keyed by content hash, never stale)
+const PARSE_CACHE_LRU_SIZE = 100;
+const parseLru = createLru(PARSE_CACHE_LRU_SIZE, HOT_CACHE_LRU_TTL_MS);
+
+function normalizeParseInput(raw) {
+  const data = raw.json?.data;
+  if (data?.productInfo?.title) {
+    return JSON.stringify({
+      title: data.productInfo.title,
+      prices: (data.skuInfo?.priceList || []).map(p => [
+        p.skuAttr || null,
+        p.skuIdStr || p.skuId || null,
+        p.skuVal?.skuAmount?.value ?? p.skuVal?.actSkuCalPrice ?? null,
+        p.skuVal?.availQuantity ?? null
+      ])
+    });
+  }
+
+  const html = raw.html || "";
+  if (!raw.trimmed && html.length < 1000) return JSON.stringify({ error_page: true });
+  const prices = htmlPrices(html);
+  if (prices.length > 0) return JSON.stringify({ title: htmlTitle(html), prices });
+  return JSON.stringify({ ai: aiPromptInputs(html) });
+}
+
+async function parseCacheKey(raw) {
+  return `parse:v3:${await sha256Hex(normalizeParseInput(raw))}`;
+}
+
+// parseWithAI() behind the isolate LRU + KV; failed parses are never cached
+// Returns { parsed, cache: "hit" | "miss" }
+export async function parseWithCache(raw, env, ctx) {
+  if (!raw) return { parsed: null, cache: "miss" };
+
+  const key = await parseCacheKey(raw);
+  let parsedHere = false;  // this request ran the parser (shared counters mix in concurrent requests)
+  const values = await readThrough(env, ctx, {
+    lru: parseLru,
+    stats: cacheStats.parse,
+    keys: [key],
+    ttlSeconds: PARSE_CACHE_KV_TTL_S,
+    load: async () => {
+      parsedHere = true;
+      const parsed = await parseWithAI(raw, env);
+      return parsed ? new Map([[key, parsed]]) : new Map();
+    }
+  });
+
+  return {
+    parsed: values.get(key) || null,
+    cache: parsedHere ? "miss" : "hit"
+  };
+}
@@ -0,0 +1,319 @@
+import { generateVariantId, extractSpecs } from "../utils/specs.js";
+import { toUsd, invalidateSpecKeys, storedSpecKey } from "./shared.js";
+import puppeteer from "@cloudflare/puppeteer";
+
+// Browser Rendering crawler (@cloudflare/puppeteer): auto-crawl of search results
+// for the cron, /admin/crawl-pending and /api/crawl. Imported only by those routes,
+// so isolates serving the UI or /api/price never load puppeteer.
+
+/**
+ * Crawl AliExpress product page using Browser Rendering
+ * Uses @cloudflare/puppeteer for real browser execution
+ */
+export async function crawlAliExpress(url, env) {
+  if (!env.BROWSER) {
+    console.error("[Crawl] Browser Rendering not available");
+    return null;
+  }
+
+  let browser = null;
+  try {
+    // Launch browser using Cloudflare Browser Rendering
+    browser = await puppeteer.launch(env.BROWSER);
+    const page = await browser.newPage();
+
+    // Set random user agent to avoid detection
+    await page.setUserAgent(
+      "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+    );
+
+    // Navigate to product page
+    await page.goto(url, { waitUntil: "networkidle0", timeout: 30000 });
+
+    // Wait for variant selectors to load
+    await page.waitForSelector("body", { timeout: 5000 });
+
+    // Scroll to trigger lazy loading
+    await page.evaluate(() => window.scrollBy(0, 2000));
+    await new Promise(r => setTimeout(r, 1500));
+
+    // Extract HTML and embedded JSON
+    const html = await page.content();
+    const runParams = await page.evaluate(() => {
+      return window.runParams || window.__INIT_DATA__ || null;
+    });
+
+    await browser.close();
+
+    return {
+      html: html,
+      json: runParams
+    };
+  } catch (e) {
+    console.error("[Crawl] Browser Rendering error:", e.message);
+    if (browser) {
+      try { await browser.close(); } catch (ce) { }
+    }
+    return null;
+  }
+}
+
+/**
+ * 🔹 Extract spec_key from variant label or title
+ * Parses amperage (e.g., "30A", "50A") from text and returns ESC:XXA format
+ * Falls back to provided default if no amperage found
+ */
+function extractSpecKeyFromLabel(text, defaultSpecKey) {
+  if (!text) return defaultSpecKey;
+
+  // Match patterns like "30A", "50 A", "30AMP", "100A"
+  const ampMatch = text.match(/(\d+)\s*A(?:MP)?/i);
+  if (ampMatch) {
+    const amps = parseInt(ampMatch[1], 10);
+    if (amps > 0 && amps <= 300) { // Reasonable ESC range
+      return `ESC:${amps}A`;
+    }
+  }
+
+  return defaultSpecKey;
+}
+
+/**
+ * 🔹 AUTO-CRAWL ON-DEMAND: Search AliExpress and crawl first 5 results
+ * This is the AI Agent functionality - automatically crawls when no D1 data exists
+ * 
+ * Flow:
+ * 1. Search AliExpress for keyword
+ * 2. Extract first 5 product URLs
+ * 3. Crawl each product page
+ * 4. Match variants with keyword
+ * 5. Store matching variants to D1
+ */
+export async function searchAndCrawlKeyword(keyword, specKey, env) {
+  console.log(`[AutoCrawl] Starting for keyword: "${keyword}"`);
+
+  if (!env.BROWSER) {
+    console.error("[AutoCrawl] Browser Rendering not available");
+    return [];
+  }
+
+  let browser = null;
+  const matchedVariants = [];
+  const touchedSpecKeys = new Set();
+
+  try {
+    browser = await puppeteer.launch(env.BROWSER);
+    const page = await browser.newPage();
+
+    await page.setUserAgent(
+      "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+    );
+
+    // 1️⃣ Navigate to AliExpress search
+    const searchUrl = `https://www.aliexpress.com/wholesale?SearchText=${encodeURIComponent(keyword)}`;
+    console.log(`[AutoCrawl] Searching: ${searchUrl}`);
+
+    await page.goto(searchUrl, { waitUntil: "networkidle0", timeout: 30000 });
+    await page.waitForSelector("body", { timeout: 5000 });
+    await new Promise(r => setTimeout(r, 2000)); // Wait for results to load
+
+    // 2️⃣ Extract first 5 product URLs
+    const productUrls = await page.evaluate(() => {
+      const links = [];
+      const productCards = document.querySelectorAll('a[href*="/item/"]');
+      for (const card of productCards) {
+        const href = card.getAttribute('href');
+        if (href && href.includes('/item/') && links.length < 5) {
+          // Normalize URL
+          let url = href;
+          if (url.startsWith('//')) url = 'https:' + url;
+          if (!url.startsWith('http')) url = 'https://www.aliexpress.com' + url;
+          // Clean URL
+          url = url.split('?')[0];
+          if (!links.includes(url)) links.push(url);
+        }
+      }
+      return links;
+    });
+
+    console.log(`[AutoCrawl] Found ${productUrls.length} product URLs:`, productUrls);
+
+    if (productUrls.length === 0) {
+      await browser.close();
+      return [];
+    }
+
+    // 3️⃣ Crawl each product page and extract variants
+    for (const productUrl of productUrls) {
+      console.log(`[AutoCrawl] Crawling product: ${productUrl}`);
+
+      try {
+        await page.goto(productUrl, { waitUntil: "networkidle0", timeout: 30000 });
+        await page.waitForSelector("body", { timeout: 5000 });
+        await page.evaluate(() => window.scrollBy(0, 1500));
+        await new Promise(r => setTimeout(r, 1500));
+
+        // Extract product data
+        const productData = await page.evaluate(() => {
+          const title = document.querySelector('h1')?.textContent?.trim() ||
+            document.title?.split('-')[0]?.trim() || 'Unknown';
+
+          // Try to get price from various selectors
+          const priceSelectors = [
+            '.product-price-value',
+            '[class*="Price"] span',
+            '[data-pl="product-price"]',
+            '.uniform-banner-box-price'
+          ];
+
+          let price = 0;
+          let currency = 'USD';
+          for (const sel of priceSelectors) {
+            const el = document.querySelector(sel);
+            if (el) {
+              const text = el.textContent || '';
+              if (text.includes('Rs.')) currency = 'LKR';
+              if (text.includes('LKR')) currency = 'LKR';
+              const match = text.match(/[\d,.]+/);
+              if (match) {
+                // Remove commas for parsing (e.g. 1,234.56 -> 1234.56)
+                price = parseFloat(match[0].replace(/,/g, ''));
+                break;
+              }
+            }
+          }
+
+          // Fallback: find any $ price on page
+          if (price === 0) {
+            const bodyText = document.body.innerText || '';
+            const priceMatches = bodyText.match(/\$\s*([\d.]+)/g) || [];
+            const prices = priceMatches.map(p => parseFloat(p.replace(/[^\d.]/g, ''))).filter(p => p > 1 && p < 500);
+            if (prices.length > 0) {
+              price = Math.min(...prices); // Get lowest price
+            }
+          }
+
+          // Extract variant options
+          const variants = [];
+          const variantElements = document.querySelectorAll('[class*="sku"] img, [class*="property"] img, [class*="sku"] span');
+          for (const el of variantElements) {
+            const text = el.getAttribute('title') || el.textContent?.trim() || '';
+            if (text && text.length > 1 && text.length < 100) {
+              variants.push(text);
+            }
+          }
+
+          return { title, price, currency, variants: [...new Set(variants)] };
+        });
+
+        console.log(`[AutoCrawl] Product: ${productData.title.slice(0, 50)}... Price: ${productData.currency} ${productData.price}`);
+
+        // 4️⃣ Match variants with keyword
+        const keywordLower = keyword.toLowerCase();
+        const keywordTokens = keywordLower.split(/[\s\-_]+/).filter(t => t.length > 1);
+
+        // Check if title or variants match keyword
+        const titleMatches = keywordTokens.some(token =>
+          productData.title.toLowerCase().includes(token)
+        );
+
+        console.log(`[AutoCrawl] Title match: ${titleMatches}, Price: ${productData.price}`);
+
+        // Store all products with valid price (search already filtered by keyword)
+        // Relaxed matching: price > 0 is sufficient since search results are keyword-filtered
+        if (productData.price > 0) {
+          // Extract product ID from URL
+          const productIdMatch = productUrl.match(/item\/(\d+)/);
+          const productId = productIdMatch ? productIdMatch[1] : 'UNKNOWN';
+
+          // Use extracted variants, or fallback to title if none found
+          const variantList = (productData.variants && productData.variants.length > 0)
+            ? productData.variants
+            : [productData.title];
+
+          for (const variantLabel of variantList) {
+            // Generate variant ID and store
+            const variantId = await generateVariantId(productUrl, variantLabel, 1, 'auto_crawl');
+
+            // 🔹 Extract correct spec_key for this specific variant
+            // e.g., if we crawled "30A ESC" but found a "50A" variant, store it as ESC:50A
+            const variantSpecKey = extractSpecKeyFromLabel(variantLabel, specKey);
+
+            const variant = {
+              variant_id: variantId,
+              product_id: productId,
+              spec_key: variantSpecKey,
+              title: productData.title,
+              variant_label: variantLabel,
+              price: productData.price,
+              product_url: productUrl,
+              variants: productData.variants
+            };
+
+            matchedVariants.push(variant);
+
+            // 5️⃣ Store to D1
+            try {
+              const now = Date.now();
+              const specs = extractSpecs(variantLabel);
+
+              const unitPriceUsd = toUsd(productData.price, productData.currency) || productData.price;
+              const prevSpecKey = await storedSpecKey(env.DB, variantId);
+
+              await env.DB.prepare(`
+                INSERT INTO product_variants (
+                  variant_id, product_id, canonical_item, spec_key,
+                  brand, model, variant_label,
+                  current_A, voltage_s, capacity_mah, kv,
+                  pack_qty, unit_price_usd, pack_price_usd, currency,
+                  stock, product_url,
+                  source, first_seen, last_seen, last_price_update,
+                  link_status
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(variant_id) DO UPDATE SET
+                  spec_key = excluded.spec_key,
+                  current_A = excluded.current_A,
+                  voltage_s = excluded.voltage_s,
+                  capacity_mah = excluded.capacity_mah,
+                  kv = excluded.kv,
+                  unit_price_usd = excluded.unit_price_usd,
+                  pack_price_usd = excluded.pack_price_usd,
+                  currency = excluded.currency,
+                  last_seen = excluded.last_seen,
+                  last_price_update = excluded.last_price_update,
+                  link_status = 'resolved'
+              `).bind(
+                variantId, productId, 'ESC', variantSpecKey,
+                '', productData.title, variantLabel.slice(0, 50),
+                specs.current_A, specs.voltage_s, specs.capacity_mah, specs.kv,
+                1, unitPriceUsd, unitPriceUsd, productData.currency,
+                null, productUrl,
+                'auto_crawl', now, now, now,
+                'resolved'
+              ).run();
+              touchedSpecKeys.add(variantSpecKey);
+              if (prevSpecKey) touchedSpecKeys.add(prevSpecKey);
+              console.log(`[AutoCrawl] Stored variant to D1: ${variantLabel} -> ${variantSpecKey}`);
+            } catch (dbErr) {
+              console.error('[AutoCrawl] D1 error:', dbErr.message);
+            }
+          }
+        }
+      } catch (productErr) {
+        console.error(`[AutoCrawl] Error crawling ${productUrl}:`, productErr.message);
+      }
+    }
+
+    await browser.close();
+    await invalidateSpecKeys(env, touchedSpecKeys);
+    console.log(`[AutoCrawl] Complete. Found ${matchedVariants.length} matching variants.`);
+    return matchedVariants;
+
+  } catch (e) {
+    console.error("[AutoCrawl] Error:", e.message);
+    if (browser) {
+      try { await browser.close(); } catch (ce) { }
+    }
+    return [];
+  }
+}
@@ -0,0 +1,481 @@
+import { generateSpecKey, generateVariantId, extractVariantSpecs } from "../../utils/specs.js";
+import { hitRatio } from "../../utils/cache.js";
+import { readCrawlHealth, STALE_VARIANT_MS } from "../../utils/crawl_health.js";
+import { runOrchestrator } from "../../crawler/orchestrator.js";
+import { fetchScoredKeywords } from "../../crawler/priority.js";
+import { cacheStats, toUsd, invalidateSpecKeys, storedSpecKey } from "../shared.js";
+import { searchAndCrawlKeyword } from "../browser_crawl.js";
+import puppeteer from "@cloudflare/puppeteer";
+
+// Admin routes: /admin/refresh, /admin/crawl-pending, /admin/debug-crawl,
+// /admin/crawl-health, /admin/crawl and /admin/ingest-test
+
+// Returns the route's Response, or null when no admin route matches
+export async function handle(req, env, ctx, url) {
+  // Admin refresh endpoint (protected) - Triggers crawler orchestrator
+  if (url.pathname === "/admin/refresh") {
+    const adminKey = req.headers.get("X-ADMIN-KEY");
+    if (!adminKey || adminKey !== env.ADMIN_KEY) {
+      return new Response("Unauthorized", { status: 401 });
+    }
+    // Actually trigger the orchestrator
+    try {
+      const result = await runOrchestrator(env);
+      return Response.json({
+        status: "crawl_executed",
+        timestamp: new Date().toISOString(),
+        orchestrator_result: result
+      });
+    } catch (e) {
+      return Response.json({
+        status: "error",
+        message: e.message
+      }, { status: 500 });
+    }
+  }
+
+  // 🔧 Manual trigger for pending keyword crawl (for testing)
+  if (url.pathname === "/admin/crawl-pending") {
+    console.log("[Admin] Manual crawl-pending triggered");
+
+    try {
+      // Get pending keywords
+      const pending = {
+        results: await fetchScoredKeywords(env.DB, { statuses: ["pending", "crawling"], limit: 3 })
+      };
+
+      const results = [];
+
+      if (pending.results && pending.results.length > 0) {
+        for (const row of pending.results) {
+          console.log(`[Admin] Processing: "${row.keyword}"`);
+
+          await env.DB.prepare(`
+              UPDATE crawl_keywords SET status = 'crawling', last_updated = ? WHERE keyword = ?
+            `).bind(Date.now(), row.keyword).run();
+
+          try {
+            const specKey = `ESC:${row.keyword.replace(/\s+/g, '')}`;
+            const crawled = await searchAndCrawlKeyword(row.keyword, specKey, env);
+
+            await env.DB.prepare(`
+                UPDATE crawl_keywords SET status = 'done', last_updated = ? WHERE keyword = ?
+              `).bind(Date.now(), row.keyword).run();
+
+            results.push({ keyword: row.keyword, status: 'done', variants: crawled.length });
+          } catch (err) {
+            await env.DB.prepare(`
+                UPDATE crawl_keywords SET status = 'failed', fail_count = fail_count + 1 WHERE keyword = ?
+              `).bind(row.keyword).run();
+            results.push({ keyword: row.keyword, status: 'failed', error: err.message });
+          }
+        }
+      }
+
+      return Response.json({
+        status: "crawl_pending_executed",
+        processed: results.length,
+        results: results
+      }, { headers: { "Access-Control-Allow-Origin": "*" } });
+
+    } catch (e) {
+      return Response.json({
+        status: "error",
+        message: e.message
+      }, { status: 500, headers: { "Access-Control-Allow-Origin": "*" } });
+    }
+  }
+
+  // 🔍 Debug crawl - show raw Browser Rendering output
+  if (url.pathname === "/admin/debug-crawl") {
+    const keyword = url.searchParams.get("keyword") || "30A ESC";
+    console.log(`[Debug] Crawling keyword: "${keyword}"`);
+
+    if (!env.BROWSER) {
+      return Response.json({ error: "Browser Rendering not available" }, { status: 503 });
+    }
+
+    let browser = null;
+    try {
+      browser = await puppeteer.launch(env.BROWSER);
+      const page = await browser.newPage();
+      await page.setUserAgent("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36");
+
+      const searchUrl = `https://www.aliexpress.com/wholesale?SearchText=${encodeURIComponent(keyword)}`;
+      await page.goto(searchUrl, { waitUntil: "networkidle0", timeout: 30000 });
+      await new Promise(r => setTimeout(r, 3000));
+
+      // Get page content
+      const html = await page.content();
+      const pageUrl = page.url();
+
+      // Try to find product links
+      const productUrls = await page.evaluate(() => {
+        const links = [];
+        const allLinks = document.querySelectorAll('a');
+        for (const a of allLinks) {
+          const href = a.href || '';
+          if (href.includes('/item/') && links.length < 10) {
+            links.push(href);
+          }
+        }
+        return links;
+      });
+
+      await browser.close();
+
+      return Response.json({
+        keyword: keyword,
+        searchUrl: searchUrl,
+        pageUrl: pageUrl,
+        htmlLength: html.length,
+        htmlSnippet: html.slice(0, 2000),
+        productUrlsFound: productUrls.length,
+        productUrls: productUrls
+      }, { headers: { "Access-Control-Allow-Origin": "*" } });
+
+    } catch (e) {
+      if (browser) { try { await browser.close(); } catch (ce) { } }
+      return Response.json({
+        error: e.message,
+        stack: e.stack
+      }, { status: 500, headers: { "Access-Control-Allow-Origin": "*" } });
+    }
+  }
+
+  // 🩺 CRAWL HEALTH DASHBOARD
+  if (url.pathname === "/admin/crawl-health") {
+    // Optional: Auth check
+    // const adminKey = req.headers.get("X-ADMIN-KEY");
+
+    const now = Date.now();
+
+    // 1-3. Keywords, crawl success (7d), freshness: materialized by the cron (utils/crawl_health.js)
+    let health;
+    try {
+      health = await readCrawlHealth(env.DB, now);
+    } catch (e) {
+      return new Response(`Crawl health unavailable: ${e.message}`, { status: 500 });
+    }
+    if (url.searchParams.get("format") === "json") {
+      return Response.json(health);
+    }
+    const latest = health.latest;
+    const kwStats = {
+      total: latest.total_keywords,
+      pending: latest.pending_keywords,
+      blocked: latest.blocked_keywords,
+      done: latest.done_keywords
+    };
+    const taskStats = health.tasks_7d;
+    const freshStats = { avg_hours: latest.avg_price_age_hours };
+    const staleStats = { count: latest.stale_variants };
+    const lastThroughput = health.series.length ? health.series[health.series.length - 1].daemon_crawls_per_hour : null;
+    const fmtTime = (ts) => ts ? new Date(ts).toISOString().replace("T", " ").slice(0, 16) + " UTC" : "never";
+    const seriesRows = health.series.slice(-12).reverse().map(r => `
+             <tr><td>${fmtTime(r.snapshot_time)}</td><td>${r.pending_keywords || 0}</td><td>${r.blocked_keywords || 0}</td>
+             <td>${r.tasks_completed || 0}/${r.tasks_finished || 0}</td><td>${(r.avg_price_age_hours || 0).toFixed(1)}h</td>
+             <td>${r.daemon_crawls_per_hour ?? "-"}</td></tr>`).join("");
+
+    // 4. Hot Cache (KV-shared counters + this isolate)
+    let globalCacheStats = {};
+    try {
+      if (env.CACHE) globalCacheStats = (await env.CACHE.get("stats:hot_cache", { type: "json" })) || {};
+    } catch (e) { }
+    const fmtRatio = (stats) => {
+      const ratio = stats ? hitRatio(stats) : null;
+      return ratio == null ? "n/a" : `${Math.round(ratio * 100)}%`;
+    };
+
+    const successRate = taskStats.total > 0 ? Math.round((taskStats.success / taskStats.total) * 100) : 100;
+
+    // Health Logic
+    let status = "🟢 HEALTHY";
+    let statusColor = "#4ade80"; // green
+    if (kwStats.blocked > 5 || successRate < 50) {
+      status = "🔴 RISK";
+      statusColor = "#f87171"; // red
+    } else if (staleStats.count > 10 || kwStats.blocked > 0) {
+      status = "🟡 WARNING";
+      statusColor = "#fbbf24"; // yellow
+    }
+
+    const html = `<!DOCTYPE html>
+       <html lang="en">
+       <head>
+         <meta charset="UTF-8"><title>Crawl Health</title>
+         <style>
+           body { background: #0f0f0f; color: #e0e0e0; font-family: sans-serif; padding: 40px; }
+           .card { background: #1a1a1a; padding: 20px; border-radius: 12px; border: 1px solid #333; max-width: 600px; margin: 0 auto; }
+           h1 { color: #fff; margin-top: 0; display: flex; justify-content: space-between; align-items: center; }
+           .status { padding: 4px 12px; border-radius: 6px; font-size: 16px; background: ${statusColor}22; color: ${statusColor}; border: 1px solid ${statusColor}; }
+           .section { margin-top: 24px; }
+           .section h3 { color: #888; border-bottom: 1px solid #333; padding-bottom: 8px; margin-bottom: 12px; font-size: 14px; text-transform: uppercase; }
+           .stat { display: flex; justify-content: space-between; padding: 6px 0; font-size: 15px; }
+           .stat label { color: #aaa; }
+           .stat val { font-weight: 600; color: #fff; }
+           table { width: 100%; border-collapse: collapse; font-size: 13px; }
+           th, td { text-align: right; padding: 4px 6px; border-bottom: 1px solid #262626; }
+           th:first-child, td:first-child { text-align: left; }
+           th { color: #888; font-weight: 500; }
+         </style>
+       </head>
+       <body>
+         <div class="card">
+           <h1><span>🩺 Crawl Health Dashboard</span> <span class="status">${status}</span></h1>
+           
+           <div class="section">
+             <h3>Keywords</h3>
+             <div class="stat"><label>Total</label><val>${kwStats.total || 0}</val></div>
+             <div class="stat"><label>Pending</label><val>${kwStats.pending || 0}</val></div>
+             <div class="stat"><label>Blocked</label><val style="color:${kwStats.blocked > 0 ? '#f87171' : ''}">${kwStats.blocked || 0}</val></div>
+             <div class="stat"><label>Done</label><val>${kwStats.done || 0}</val></div>
+           </div>
+
+           <div class="section">
+             <h3>Crawler Performance (7d)</h3>
+             <div class="stat"><label>Tasks</label><val>${taskStats.total || 0}</val></div>
+             <div class="stat"><label>Success Rate</label><val style="color:${successRate < 80 ? '#fbbf24' : '#4ade80'}">${successRate}%</val></div>
+           </div>
+
+           <div class="section">
+             <h3>Data Freshness</h3>
+             <div class="stat"><label>Avg Price Age</label><val>${(freshStats.avg_hours || 0).toFixed(1)} hours</val></div>
+             <div class="stat"><label>Stale Variants (>${STALE_VARIANT_MS / 3600000}h)</label><val style="color:${staleStats.count > 0 ? '#fbbf24' : ''}">${staleStats.count || 0}</val></div>
+             <div class="stat"><label>Last CAPTCHA</label><val>${fmtTime(latest.last_captcha_time)}</val></div>
+           </div>
+
+           <div class="section">
+             <h3>Nova Daemons</h3>
+             <div class="stat"><label>Running</label><val>${health.daemons.length}</val></div>
+             <div class="stat"><label>Crawled / Failed / CAPTCHA Handoffs (all time)</label><val>${latest.daemon_crawled || 0} / ${latest.daemon_failed || 0} / ${latest.daemon_handoffs || 0}</val></div>
+             <div class="stat"><label>Throughput (last interval)</label><val>${lastThroughput == null ? "n/a" : `${lastThroughput} crawls/h`}</val></div>
+           </div>
+
+           <div class="section">
+             <h3>Snapshots (snapshot ${Math.round(health.snapshot_age_ms / 60000)} min old)</h3>
+             <table>
+               <tr><th>Time</th><th>Pending</th><th>Blocked</th><th>Tasks OK</th><th>Price Age</th><th>Daemon/h</th></tr>
+               ${seriesRows}
+             </table>
+           </div>
+
+           <div class="section">
+             <h3>Pricing Hot Cache</h3>
+             <div class="stat"><label>Candidate Hit Ratio (all isolates)</label><val>${fmtRatio(globalCacheStats.candidates)}</val></div>
+             <div class="stat"><label>Price History Hit Ratio (all isolates)</label><val>${fmtRatio(globalCacheStats.price_history)}</val></div>
+             <div class="stat"><label>Candidate Hit Ratio (this isolate)</label><val>${fmtRatio(cacheStats.candidates)}</val></div>
+             <div class="stat"><label>Parse Cache Hit Ratio (all isolates)</label><val>${fmtRatio(globalCacheStats.parse)}</val></div>
+             <div class="stat"><label>Trust Memory Hit Ratio (all isolates)</label><val>${fmtRatio(globalCacheStats.trust)}</val></div>
+             <div class="stat"><label>Lookups (all isolates)</label><val>${(globalCacheStats.candidates?.lru_hits || 0) + (globalCacheStats.candidates?.kv_hits || 0) + (globalCacheStats.candidates?.misses || 0)}</val></div>
+           </div>
+         </div>
+       </body>
+       </html>`;
+
+    return new Response(html, { headers: { "Content-Type": "text/html" } });
+  }
+
+  // 🖥️ NOVA CRAWL ADMIN PANEL - For users with Nova Act to run crawls
+  if (url.pathname === "/admin/crawl" && req.method === "GET") {
+    // Fetch pending keywords
+    let pendingKeywords = [];
+    try {
+      const result = await env.DB.prepare(`
+          SELECT keyword, canonical_type, fail_count, last_updated 
+          FROM crawl_keywords 
+          WHERE status = 'pending' 
+          ORDER BY priority DESC, last_updated ASC
+          LIMIT 20
+        `).all();
+      pendingKeywords = result.results || [];
+    } catch (e) {
+      console.error("[Admin] Error fetching pending keywords:", e.message);
+    }
+
+    const keywordRows = pendingKeywords.map(kw => `
+        <tr>
+          <td>${kw.keyword}</td>
+          <td>${kw.canonical_type || 'UNKNOWN'}</td>
+          <td>${kw.fail_count || 0}</td>
+          <td>
+            <button class="copy-btn" data-cmd="export API_KEY='your_api_key_here' &amp;&amp; cd ~/bom-pricer &amp;&amp; source .venv/bin/activate &amp;&amp; python scripts/scrape_interactive.py &quot;${kw.keyword}&quot;">
+              📋 Copy Command
+            </button>
+          </td>
+        </tr>
+      `).join('');
+
+    const html = `<!DOCTYPE html>
+<html lang="en">
+<head>
+  <meta charset="UTF-8">
+  <title>Nova Crawl Panel</title>
+  <style>
+    * { box-sizing: border-box; }
+    body { background: #0f0f0f; color: #e0e0e0; font-family: -apple-system, sans-serif; padding: 40px; max-width: 900px; margin: 0 auto; }
+    h1 { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); -webkit-background-clip: text; -webkit-text-fill-color: transparent; }
+    .subtitle { color: #888; margin-bottom: 30px; }
+    .card { background: #1a1a1a; padding: 24px; border-radius: 12px; border: 1px solid #333; margin-bottom: 24px; }
+    .card h2 { margin-top: 0; color: #fff; font-size: 18px; }
+    table { width: 100%; border-collapse: collapse; }
+    th, td { padding: 12px; text-align: left; border-bottom: 1px solid #333; }
+    th { color: #888; font-weight: 500; text-transform: uppercase; font-size: 12px; }
+    .copy-btn { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; border: none; padding: 6px 12px; border-radius: 6px; cursor: pointer; font-size: 12px; }
+    .copy-btn:hover { transform: translateY(-1px); }
+    .copy-btn.copied { background: #10b981; }
+    .instructions { background: #1a1a2e; padding: 16px; border-radius: 8px; border: 1px solid #667eea33; margin-top: 16px; }
+    .instructions h3 { margin-top: 0; color: #667eea; font-size: 14px; }
+    .instructions pre { background: #0a0a0a; padding: 12px; border-radius: 6px; overflow-x: auto; font-size: 13px; color: #4ade80; }
+    .instructions code { color: #fbbf24; }
+    .empty { text-align: center; padding: 40px; color: #666; }
+    a { color: #818cf8; }
+    .refresh-btn { background: #2a2a2a; color: #e0e0e0; border: 1px solid #444; padding: 8px 16px; border-radius: 6px; cursor: pointer; }
+  </style>
+</head>
+<body>
+  <h1>🤖 Nova Crawl Panel</h1>
+  <p class="subtitle">Run these keywords with Nova Act to populate pricing data</p>
+  
+  <div class="card">
+    <h2>📋 Pending Keywords (${pendingKeywords.length})</h2>
+    ${pendingKeywords.length > 0 ? `
+    <table>
+      <thead>
+        <tr><th>Keyword</th><th>Type</th><th>Fails</th><th>Action</th></tr>
+      </thead>
+      <tbody>${keywordRows}</tbody>
+    </table>
+    ` : '<p class="empty">✅ No pending keywords - all data is up to date!</p>'}
+    <br>
+    <button class="refresh-btn" onclick="location.reload()">🔄 Refresh List</button>
+  </div>
+
+  <div class="card instructions">
+    <h3>📖 How to Run Nova Crawler</h3>
+    <p>Make sure you have Nova Act installed, then run:</p>
+    <pre>cd /path/to/bom-pricer
+source .venv/bin/activate
+python scripts/scrape_interactive.py "YOUR_KEYWORD"</pre>
+    <p>Or crawl all pending keywords at once:</p>
+    <pre>python scripts/scrape_batch.py</pre>
+    <p>For more info: <a href="https://github.com/randunun-eng/bom-pricer" target="_blank">GitHub Repository</a></p>
+  </div>
+
+  <p style="margin-top:24px;"><a href="/">← Back to BOM Builder</a> | <a href="/admin/crawl-health">Crawl Health Dashboard</a></p>
+
+  <script>
+    document.querySelectorAll('.copy-btn').forEach(btn => {
+      btn.addEventListener('click', () => {
+        const cmd = btn.dataset.cmd;
+        navigator.clipboard.writeText(cmd).then(() => {
+          btn.textContent = '✅ Copied!';
+          btn.classList.add('copied');
+          setTimeout(() => {
+            btn.textContent = '📋 Copy Command';
+            btn.classList.remove('copied');
+          }, 2000);
+        });
+      });
+    });
+  </script>
+</body>
+</html>`;
+    return new Response(html, { headers: { "Content-Type": "text/html" } });
+  }
+
+  // 🧪 TEST: Ingest crawl data without HMAC (for testing only)
+  if (url.pathname === "/admin/ingest-test" && req.method === "POST") {
+    try {
+      const payload = await req.json();
+      const { search_keyword, results } = payload;
+
+      if (!results || !Array.isArray(results)) {
+        return Response.json({ error: "Missing results array" }, { status: 400 });
+      }
+
+      let canonicalItem = "UNKNOWN";
+      const kw = (search_keyword || "").toUpperCase();
+      if (kw.includes("ESC")) canonicalItem = "ESC";
+      else if (kw.includes("MOTOR")) canonicalItem = "MOTOR";
+
+      let ingested = 0;
+      const touchedSpecKeys = new Set();
+
+      for (const product of results) {
+        if (!product.variants || !Array.isArray(product.variants)) continue;
+
+        for (const variant of product.variants) {
+          const specs = extractVariantSpecs(product.title, variant.variant_label);
+          const specKey = generateSpecKey(canonicalItem, specs);
+          if (!specKey) continue;
+
+          const variantId = await generateVariantId(product.product_url || "", variant.variant_label, specs.pack_qty, "test_ingest");
+          const unitPriceUsd = toUsd(variant.price, variant.currency) || variant.price || 0;
+          const now = Date.now();
+
+          // Safeguard: Prevent ingestion of known "fake" product ID
+          if (product.product_url && product.product_url.includes("1005005987654321")) {
+            console.log(`[Test Ingest] Blocked fake product ${variantId} `);
+            continue;
+          }
+
+          const prevSpecKey = await storedSpecKey(env.DB, variantId);
+          await env.DB.prepare(`
+              INSERT INTO product_variants(
+                    variant_id, product_id, canonical_item, spec_key,
+                    brand, model, variant_label,
+                    current_A, voltage_s, capacity_mah, kv,
+                    pack_qty, unit_price_usd, pack_price_usd, currency,
+                    stock, rating, review_count, seller,
+                    product_url,
+                    source, first_seen, last_seen, last_price_update, link_status
+                  ) VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+              ON CONFLICT(variant_id) DO UPDATE SET
+              spec_key = excluded.spec_key,
+                current_A = excluded.current_A,
+                voltage_s = excluded.voltage_s,
+                capacity_mah = excluded.capacity_mah,
+                kv = excluded.kv,
+                unit_price_usd = excluded.unit_price_usd,
+                pack_price_usd = excluded.pack_price_usd,
+                currency = excluded.currency,
+                last_seen = excluded.last_seen,
+                last_price_update = excluded.last_price_update
+                  `).bind(
+            variantId, "UNKNOWN", canonicalItem, specKey,
+            specs.brand || "", product.title || "", variant.variant_label || "",
+            specs.current_A, specs.voltage_s, specs.capacity_mah, specs.kv,
+            specs.pack_qty || 1, unitPriceUsd, unitPriceUsd * (specs.pack_qty || 1), variant.currency || "USD",
+            variant.stock_available ? 100 : 0, product.rating || 0, product.review_count || 0, product.store_name || "",
+            product.product_url || "",
+            "test_ingest", now, now, now, "resolved"
+          ).run();
+
+          ingested++;
+          touchedSpecKeys.add(specKey);
+          if (prevSpecKey) touchedSpecKeys.add(prevSpecKey);
+        }
+      }
+      await invalidateSpecKeys(env, touchedSpecKeys);
+
+      // Mark keyword as done if present
+      if (search_keyword) {
+        await env.DB.prepare(`
+            UPDATE crawl_keywords SET status = 'done', last_updated = ? WHERE keyword = ?
+                `).bind(Date.now(), search_keyword).run();
+      }
+
+      return Response.json({
+        status: "ok",
+        ingested: ingested,
+        keyword: search_keyword
+      }, { headers: { "Access-Control-Allow-Origin": "*" } });
+
+    } catch (e) {
+      return Response.json({ error: e.message, stack: e.stack }, { status: 500, headers: { "Access-Control-Allow-Origin": "*" } });
+    }
+  }
+
+  return null;
+}
@@ -0,0 +1,854 @@
+import { generateSpecKey, generateVariantId, extractVariantSpecs } from "../../utils/specs.js";
+import { verifySignature } from "../../utils/crypto.js";
+import { compactPriceHistory } from "../../utils/price_history.js";
+import { snapshotCrawlHealth } from "../../utils/crawl_health.js";
+import { runOrchestrator } from "../../crawler/orchestrator.js";
+import { fetchScoredKeywords } from "../../crawler/priority.js";
+import { enqueuePrefetch } from "../../crawler/prefetch.js";
+import { toUsd, parseBomLine, invalidateSpecKeys, invalidatePriceHistory, storedSpecKey, flushCacheStats } from "../shared.js";
+import { crawlAliExpress, searchAndCrawlKeyword } from "../browser_crawl.js";
+import { parseWithCache } from "../ai_parse.js";
+
+// Crawl routes: keyword queue for Nova (/api/crawl/pending, /prefetch, /request, /complete,
+// /harvest, /daemon-stats), the crawl service callback (/api/crawl/result, queued), /api/crawl/trigger and
+// buyer-mode /api/crawl; plus the cron handler
+
+// Retry delay for a keyword whose crawl task came back blocked/failed
+const CRAWL_RESULT_RETRY_MS = 6 * 60 * 60 * 1000;
+
+// Task result application (processCrawlResult)
+const RESULT_LOOKUP_CHUNK = 90;       // variant ids per previous-state lookup (D1: 100 bound parameters)
+const RESULT_BATCH_STATEMENTS = 100;  // history inserts + upserts per D1 batch
+
+// Crawl result inbox (db/schema_crawl_result_inbox.sql): /api/crawl/result queues, waitUntil/cron apply
+const INBOX_CLAIM_TIMEOUT_MS = 5 * 60 * 1000;          // a 'processing' row older than this was abandoned
+const INBOX_MAX_ATTEMPTS = 3;                          // then the row stays 'failed' (last_error kept)
+const INBOX_SWEEP_CRON = "*/5 * * * *";               // wrangler.toml trigger that only drains the inbox
+const INBOX_SWEEP_LIMIT = 100;                         // leftover results applied per sweep (~1200/h)
+const INBOX_RETENTION_MS = 7 * 24 * 60 * 60 * 1000;    // applied rows kept this long for idempotency
+
+// /api/crawl/harvest: waiting keywords a harvest crawl can satisfy (in_progress/crawling
+// keywords belong to a running crawl and report back themselves)
+const HARVEST_STATUSES = ["pending", "prefetch", "soft_fail", "failed"];
+const HARVEST_MAX_SPEC_KEYS = 2000;
+const HARVEST_KEYS_PER_STATEMENT = 90;  // D1 binds at most 100 parameters per statement
+
+/**
+ * Release a dispatched keyword (status 'in_progress', see crawler/orchestrator.js)
+ * once its task reports back: ok -> done, blocked/failed -> soft_fail with a retry delay
+ */
+function releaseCrawlKeyword(db, keyword, status, reason = null) {
+  if (!keyword) return [];
+  const now = Date.now();
+  if (status === "ok") {
+    return [db.prepare(
+      "UPDATE crawl_keywords SET status = 'done', fail_count = 0, last_crawled = ?, last_updated = ? WHERE keyword = ?"
+    ).bind(now, now, keyword)];
+  }
+  return [db.prepare(`
+    UPDATE crawl_keywords
+    SET status = 'soft_fail', fail_count = fail_count + 1, next_retry = ?, last_error = ?, error_type = ?, last_updated = ?
+    WHERE keyword = ?
+  `).bind(now + CRAWL_RESULT_RETRY_MS, reason, status, now, keyword)];
+}
+
+/**
+ * Apply one crawl task result (queued by /api/crawl/result, applied from the inbox)
+ * Returns { httpStatus, body } for the task
+ */
+async function processCrawlResult(env, payload, sourceHeader = null) {
+  const { task_id, status, results, reason, search_keyword } = payload || {};
+
+  // 1. Validate Payload
+  if (!task_id || !status) {
+    return { httpStatus: 400, body: { error: "Invalid crawl payload: missing task_id or status" } };
+  }
+
+  console.log(`[Webhook] Received result for task ${task_id}, status: ${status} `);
+
+  // 2a. Detect source (RC Test Mode Round-Trip)
+  // Check header first, otherwise look up from task
+  const taskRow = await env.DB.prepare(
+    "SELECT source, keyword FROM crawl_tasks WHERE task_id = ?"
+  ).bind(task_id).first();
+  const source = sourceHeader || taskRow?.source || "prod";
+  console.log(`[Webhook] Source: ${source} `);
+
+  // 2. Handle Blocked/Failed
+  if (status === "blocked") {
+    console.warn(`[Webhook] Task ${task_id} BLOCKED: ${reason} `);
+    // Mark task as blocked
+    await env.DB.batch([
+      env.DB.prepare("UPDATE crawl_tasks SET status = 'blocked', error_type = ?, completed_at = ? WHERE task_id = ?")
+        .bind(reason || "Unknown Block", Date.now(), task_id),
+      ...releaseCrawlKeyword(env.DB, taskRow?.keyword, "blocked", reason || "Unknown Block")
+    ]);
+    // TODO: Mark keyword blocked if persistent?
+    return { httpStatus: 200, body: { status: "processed", note: "blocked_recorded" } };
+
+  } else if (status === "failed") {
+    console.error(`[Webhook] Task ${task_id} FAILED: ${reason} `);
+    await env.DB.batch([
+      env.DB.prepare("UPDATE crawl_tasks SET status = 'failed', error_type = ?, completed_at = ? WHERE task_id = ?")
+        .bind(JSON.stringify(payload), Date.now(), task_id),
+      ...releaseCrawlKeyword(env.DB, taskRow?.keyword, "failed", reason || "Unknown Failure")
+    ]);
+    return { httpStatus: 200, body: { status: "processed", note: "failure_recorded" } };
+  }
+
+  // 3. Status OK -> Ingest Variants
+  if (status === "ok" && results && Array.isArray(results)) {
+    // Default canonical item from context or keyword
+    // Ideally payload tells us, or we infer from keyword.
+    // Simple inference:
+    let canonicalItem = "UNKNOWN";
+    const kw = (search_keyword || "").toUpperCase();
+    if (kw.includes("ESC")) canonicalItem = "ESC";
+    else if (kw.includes("MOTOR")) canonicalItem = "MOTOR";
+    else if (kw.includes("BATTERY") || kw.includes("LIPO")) canonicalItem = "BATTERY";
+    else if (kw.includes("SERVO")) canonicalItem = "SERVO";
+    else if (kw.includes("PROP")) canonicalItem = "PROP";
+
+    const touchedSpecKeys = new Set();
+    const touchedHistory = new Set();
+    const now = Date.now();
+
+    const rows = [];
+    for (const product of results) {
+      if (!product.variants || !Array.isArray(product.variants)) continue;
+
+      for (const variant of product.variants) {
+        // 4. Extract Specs (Deterministic)
+        // Combine title + variant label for context (the variant's own specs win)
+        const specs = extractVariantSpecs(product.title, variant.variant_label);
+
+        // 5. Compute Canonical Identity & Spec Key
+        const specKey = generateSpecKey(canonicalItem, specs);
+        if (!specKey) continue; // Skip if we can't key it
+
+        // 6. Stable Variant ID (includes source for uniqueness)
+        const variantId = await generateVariantId(product.product_url || product.url, variant.variant_label, specs.pack_qty, source);
+
+        // 7. Normalize Prices
+        const unitPriceUsd = toUsd(variant.price, variant.currency) || 0;
+        const packPriceUsd = unitPriceUsd;
+        const calculatedUnitPrice = specs.pack_qty > 1 ? (packPriceUsd / specs.pack_qty) : packPriceUsd;
+        const currentStock = product.stock || variant.stock || 0;
+
+        rows.push({ product, variant, specs, specKey, variantId, calculatedUnitPrice, packPriceUsd, currentStock });
+      }
+    }
+
+    // 7a. Previous price/stock/spec_key of every variant in a few IN (...) lookups
+    const prevStates = new Map();
+    const variantIds = [...new Set(rows.map(r => r.variantId))];
+    for (let i = 0; i < variantIds.length; i += RESULT_LOOKUP_CHUNK) {
+      const chunk = variantIds.slice(i, i + RESULT_LOOKUP_CHUNK);
+      const { results: prev } = await env.DB.prepare(`
+        SELECT variant_id, unit_price_usd, stock, spec_key FROM product_variants
+        WHERE variant_id IN (${chunk.map(() => "?").join(", ")})
+      `).bind(...chunk).all();
+      for (const p of prev || []) prevStates.set(p.variant_id, p);
+    }
+
+    const historyStmt = env.DB.prepare(`
+      INSERT INTO variant_price_history(variant_id, source, unit_price_usd, pack_price_usd, stock, recorded_at)
+      VALUES(?, ?, ?, ?, ?, ?)
+    `);
+    // 8. Upsert (Idempotent) - includes source column
+    const upsertStmt = env.DB.prepare(`
+      INSERT INTO product_variants(
+        variant_id, product_id, canonical_item, spec_key,
+        brand, model, variant_label,
+        current_A, kv, voltage_s, capacity_mah,
+        pack_qty, unit_price_usd, pack_price_usd, currency,
+        stock, rating, review_count, seller,
+        product_url, image_url,
+        source, first_seen, last_seen, last_price_update
+      ) VALUES(
+        ?, ?, ?, ?,
+        ?, ?, ?,
+        ?, ?, ?, ?,
+        ?, ?, ?, ?,
+        ?, ?, ?, ?,
+        ?, ?,
+        ?, ?, ?, ?
+      )
+      ON CONFLICT(variant_id) DO UPDATE SET
+        spec_key = excluded.spec_key,
+        current_A = excluded.current_A,
+        kv = excluded.kv,
+        voltage_s = excluded.voltage_s,
+        capacity_mah = excluded.capacity_mah,
+        unit_price_usd = excluded.unit_price_usd,
+        pack_price_usd = excluded.pack_price_usd,
+        currency = excluded.currency,
+        stock = excluded.stock,
+        rating = excluded.rating,
+        review_count = excluded.review_count,
+        seller = excluded.seller,
+        last_seen = excluded.last_seen,
+        last_price_update = excluded.last_price_update
+    `);
+
+    const stmts = [];
+    for (const { product, variant, specs, specKey, variantId, calculatedUnitPrice, packPriceUsd, currentStock } of rows) {
+      // Price History Tracking - only when price/stock changed (append-only)
+      const prevState = prevStates.get(variantId);
+      const priceChanged = !prevState || Math.abs((prevState.unit_price_usd || 0) - calculatedUnitPrice) > 0.001;
+      const stockChanged = !prevState || prevState.stock !== currentStock;
+      if (priceChanged || stockChanged) {
+        stmts.push(historyStmt.bind(variantId, source, calculatedUnitPrice, packPriceUsd, currentStock, now));
+        touchedHistory.add(variantId);
+      }
+
+      stmts.push(upsertStmt.bind(
+        variantId, product.product_id || "UNKNOWN", canonicalItem, specKey,
+        product.brand || "Unknown", product.title || "", variant.variant_label || "Default",
+        specs.current_A, specs.kv, specs.voltage_s, specs.capacity_mah,
+        specs.pack_qty, calculatedUnitPrice, packPriceUsd, variant.currency || "USD",
+        currentStock, product.rating || 0, product.reviews || 0, product.store_name || "Unknown",
+        product.product_url || product.url, variant.image_token || product.image_url || null,
+        source, now, now, now
+      ));
+      // A re-keyed variant leaves its old spec_key's candidate list too
+      if (prevState?.spec_key) touchedSpecKeys.add(prevState.spec_key);
+      // A later row for the same variant compares against this one
+      prevStates.set(variantId, { unit_price_usd: calculatedUnitPrice, stock: currentStock, spec_key: specKey });
+      touchedSpecKeys.add(specKey);
+    }
+    for (let i = 0; i < stmts.length; i += RESULT_BATCH_STATEMENTS) {
+      await env.DB.batch(stmts.slice(i, i + RESULT_BATCH_STATEMENTS));
+    }
+
+    await invalidateSpecKeys(env, touchedSpecKeys);
+    await invalidatePriceHistory(env, touchedHistory);
+
+    // 9. Update Crawl State
+    await env.DB.batch([
+      env.DB.prepare("UPDATE crawl_tasks SET status = 'completed', completed_at = ? WHERE task_id = ?")
+        .bind(Date.now(), task_id),
+      ...releaseCrawlKeyword(env.DB, taskRow?.keyword, "ok")
+    ]);
+
+    // 10. Queue sibling spec keys of the crawled keyword (crawler/prefetch.js)
+    if (taskRow?.keyword) {
+      try {
+        await enqueuePrefetch(env.DB, taskRow.keyword);
+      } catch (e) {
+        console.error("[Prefetch] Enqueue failed:", e.message);
+      }
+    }
+
+    return { httpStatus: 200, body: { status: "processed", items_ingested: results.length } }; // Approx count
+  } else {
+    // Status unknown?
+    return { httpStatus: 200, body: { status: "ignored", reason: "status not ok/blocked/failed" } };
+  }
+
+}
+
+/**
+ * Queue task results in the inbox (one D1 batch), idempotent on task_id:
+ * a result for a task already queued or applied is dropped, one that failed to apply is re-queued.
+ * Returns the task_ids that were queued
+ */
+async function enqueueCrawlResults(env, tasks, source) {
+  const now = Date.now();
+  const stmt = env.DB.prepare(`
+    INSERT INTO crawl_result_inbox(task_id, payload, source, status, attempts, received_at)
+    VALUES(?, ?, ?, 'queued', 0, ?)
+    ON CONFLICT(task_id) DO UPDATE SET
+      payload = excluded.payload,
+      source = excluded.source,
+      status = 'queued',
+      attempts = 0,
+      received_at = excluded.received_at,
+      last_error = NULL
+    WHERE crawl_result_inbox.status = 'failed'
+    RETURNING task_id
+  `);
+  const results = await env.DB.batch(tasks.map(t => stmt.bind(t.task_id, JSON.stringify(t), source, now)));
+  return new Set(results.flatMap(r => (r.results || []).map(row => row.task_id)));
+}
+
+/**
+ * Apply queued inbox rows: the given task_ids (callback waitUntil), or the oldest queued and
+ * abandoned ones (inbox sweep cron). Each row is claimed first, so a result is applied by one isolate only.
+ * Returns { applied, failed }
+ */
+async function drainCrawlResultInbox(env, taskIds = null) {
+  if (!taskIds) {
+    const { results } = await env.DB.prepare(`
+      SELECT task_id FROM crawl_result_inbox
+      WHERE status = 'queued' OR (status = 'processing' AND claimed_at < ?)
+      ORDER BY received_at
+      LIMIT ?
+    `).bind(Date.now() - INBOX_CLAIM_TIMEOUT_MS, INBOX_SWEEP_LIMIT).all();
+    taskIds = (results || []).map(r => r.task_id);
+  }
+
+  const summary = { applied: 0, failed: 0 };
+  for (const taskId of taskIds) {
+    const now = Date.now();
+    const claimed = await env.DB.prepare(`
+      UPDATE crawl_result_inbox SET status = 'processing', attempts = attempts + 1, claimed_at = ?
+      WHERE task_id = ? AND (status = 'queued' OR (status = 'processing' AND claimed_at < ?))
+      RETURNING payload, source, attempts
+    `).bind(now, taskId, now - INBOX_CLAIM_TIMEOUT_MS).first();
+    if (!claimed) continue;
+
+    try {
+      const { httpStatus, body } = await processCrawlResult(env, JSON.parse(claimed.payload), claimed.source);
+      await env.DB.prepare(
+        "UPDATE crawl_result_inbox SET status = 'done', processed_at = ?, last_error = ? WHERE task_id = ?"
+      ).bind(Date.now(), httpStatus >= 400 ? JSON.stringify(body) : null, taskId).run();
+      summary.applied++;
+    } catch (e) {
+      // Left 'queued' for the next inbox sweep until INBOX_MAX_ATTEMPTS
+      console.error(`[Webhook] Task ${taskId} failed to apply (attempt ${claimed.attempts}):`, e);
+      await env.DB.prepare(
+        "UPDATE crawl_result_inbox SET status = ?, last_error = ? WHERE task_id = ?"
+      ).bind(claimed.attempts >= INBOX_MAX_ATTEMPTS ? "failed" : "queued", e.message, taskId).run();
+      summary.failed++;
+    }
+  }
+  return summary;
+}
+
+/**
+ * Apply crawl results the callback's waitUntil did not finish, drop old applied ones.
+ * Runs every 5 minutes (INBOX_SWEEP_CRON) so a leftover result waits minutes, not a crawl cycle.
+ */
+async function sweepCrawlResultInbox(env) {
+  try {
+    const inbox = await drainCrawlResultInbox(env);
+    await env.DB.prepare(
+      "DELETE FROM crawl_result_inbox WHERE status = 'done' AND processed_at < ?"
+    ).bind(Date.now() - INBOX_RETENTION_MS).run();
+    console.log(`[Cron] Crawl result inbox: ${inbox.applied} applied, ${inbox.failed} failed`);
+  } catch (e) {
+    console.error("[Cron] Crawl result inbox failed:", e.message);
+  }
+}
+
+// Scheduled handler for cron triggers - processes pending crawl keywords
+export async function runCron(event, env, ctx) {
+  if (event?.cron === INBOX_SWEEP_CRON) {
+    await sweepCrawlResultInbox(env);
+    return;
+  }
+
+  console.log("[Cron] Scheduled crawl triggered at:", new Date().toISOString());
+
+  // 1. Get pending keywords from crawl_keywords table
+  const pending = {
+    results: await fetchScoredKeywords(env.DB, { statuses: ["pending", "crawling"], limit: 3 })
+  };
+
+  console.log(`[Cron] Found ${pending.results?.length || 0} pending keywords`);
+
+  if (pending.results && pending.results.length > 0) {
+    for (const row of pending.results) {
+      console.log(`[Cron] Processing keyword: "${row.keyword}" (score ${row.score})`);
+
+      // Mark as crawling
+      await env.DB.prepare(`
+          UPDATE crawl_keywords SET status = 'crawling', last_updated = ? WHERE keyword = ?
+        `).bind(Date.now(), row.keyword).run();
+
+      try {
+        // Run the auto-crawl - generate spec_key from keyword
+        const specKey = `ESC:${row.keyword.replace(/\s+/g, '')}`;
+        const results = await searchAndCrawlKeyword(row.keyword, specKey, env);
+
+        // Mark as done
+        await env.DB.prepare(`
+            UPDATE crawl_keywords SET status = 'done', last_updated = ? WHERE keyword = ?
+          `).bind(Date.now(), row.keyword).run();
+
+        console.log(`[Cron] Completed: "${row.keyword}" - found ${results.length} variants`);
+      } catch (e) {
+        console.error(`[Cron] Error crawling "${row.keyword}":`, e.message);
+        await env.DB.prepare(`
+            UPDATE crawl_keywords SET status = 'failed', fail_count = fail_count + 1 WHERE keyword = ?
+          `).bind(row.keyword).run();
+      }
+    }
+  }
+
+  // 2. Also run the legacy orchestrator
+  await runOrchestrator(env);
+
+  // 3. Roll old price history into daily/weekly buckets (bounded storage per variant)
+  try {
+    const compaction = await compactPriceHistory(env.DB);
+    console.log("[Cron] Price history compaction:", JSON.stringify(compaction));
+  } catch (e) {
+    console.error("[Cron] Price history compaction failed:", e.message);
+  }
+
+  // 4. Materialize the crawl health dashboard (read by /admin/crawl-health)
+  try {
+    const health = await snapshotCrawlHealth(env.DB);
+    console.log(`[Cron] Health snapshot: ${health.pending_keywords} pending, ${health.tasks_finished} tasks finished since last run`);
+  } catch (e) {
+    console.error("[Cron] Health snapshot failed:", e.message);
+  }
+
+  // 5. Inbox leftovers (also swept every 5 minutes by INBOX_SWEEP_CRON)
+  await sweepCrawlResultInbox(env);
+}
+
+// Returns the route's Response, or null when no crawl route matches
+export async function handle(req, env, ctx, url) {
+  // 📋 API: Get pending crawl keywords (for external tools)
+  if (url.pathname === "/api/crawl/pending" && req.method === "GET") {
+    try {
+      // Highest crawl value first (BOM demand x price staleness, see crawler/priority.js)
+      const scored = await fetchScoredKeywords(env.DB, { statuses: ["pending"], limit: 50 });
+      const keywords = scored.map(k => ({
+        keyword: k.keyword,
+        canonical_type: k.canonical_type,
+        spec_key: k.spec_key,
+        fail_count: k.fail_count,
+        last_updated: k.last_updated,
+        priority: k.priority,
+        score: k.score,
+        score_breakdown: k.score_breakdown
+      }));
+      return Response.json({
+        status: "ok",
+        count: keywords.length,
+        keywords
+      });
+    } catch (e) {
+      return Response.json({ status: "error", error: e.message }, { status: 500 });
+    }
+  }
+
+  // 🔭 API: Prefetch keywords (sibling spec keys, crawled by Nova only when nothing is pending)
+  if (url.pathname === "/api/crawl/prefetch" && req.method === "GET") {
+    try {
+      const limit = Math.min(50, Math.max(1, parseInt(url.searchParams.get("limit")) || 10));
+      const scored = await fetchScoredKeywords(env.DB, { statuses: ["prefetch"], limit });
+      const keywords = scored.map(k => ({
+        keyword: k.keyword,
+        canonical_type: k.canonical_type,
+        spec_key: k.spec_key,
+        fail_count: k.fail_count,
+        last_updated: k.last_updated,
+        priority: k.priority,
+        score: k.score
+      }));
+      return Response.json({
+        status: "ok",
+        count: keywords.length,
+        keywords
+      });
+    } catch (e) {
+      return Response.json({ status: "error", error: e.message }, { status: 500 });
+    }
+  }
+
+  // 🚀 API: Request crawl for keyword (called by UI button)
+  if (url.pathname === "/api/crawl/request" && req.method === "POST") {
+    try {
+      const body = await req.json();
+      const keyword = body.keyword?.trim();
+
+      if (!keyword || keyword.length < 3) {
+        return Response.json({ status: "error", error: "Invalid keyword" }, { status: 400 });
+      }
+
+      const now = Date.now();
+      const parsedLine = parseBomLine(keyword);
+      const specKey = parsedLine.canonical_type ? parsedLine.spec_key : null;
+
+      // Insert/update keyword with high priority (10 = urgent)
+      await env.DB.prepare(`
+          INSERT INTO crawl_keywords(keyword, canonical_type, spec_key, priority, status, fail_count, last_updated)
+          VALUES(?, 'UNKNOWN', ?, 10, 'pending', 0, ?)
+          ON CONFLICT(keyword) DO UPDATE SET
+            spec_key = COALESCE(spec_key, excluded.spec_key),
+            priority = 10,
+            status = CASE WHEN status = 'done' THEN 'pending' ELSE status END,
+            last_updated = ?
+        `).bind(keyword, specKey, now, now).run();
+
+      return Response.json({
+        status: "ok",
+        message: "Crawl requested",
+        keyword: keyword
+      });
+    } catch (e) {
+      return Response.json({ status: "error", error: e.message }, { status: 500 });
+    }
+  }
+
+  // 🔄 API: Mark keyword as done (called by Nova after crawling)
+  if (url.pathname === "/api/crawl/complete" && req.method === "POST") {
+    try {
+      const body = await req.json();
+      const keyword = body.keyword?.trim();
+
+      if (!keyword) {
+        return Response.json({ status: "error", error: "Missing keyword" }, { status: 400 });
+      }
+
+      await env.DB.prepare(`
+          UPDATE crawl_keywords SET status = 'done', last_updated = ? WHERE keyword = ?
+        `).bind(Date.now(), keyword).run();
+
+      // Queue the keyword's sibling spec keys for idle-time crawling
+      ctx.waitUntil(enqueuePrefetch(env.DB, keyword)
+        .catch(e => console.error("[Prefetch] Enqueue failed:", e.message)));
+
+      return Response.json({ status: "ok", message: "Marked as done" });
+    } catch (e) {
+      return Response.json({ status: "error", error: e.message }, { status: 500 });
+    }
+  }
+
+  // 🌾 API: Harvest crawl finished (scripts/harvest_crawl.py): every waiting keyword whose
+  // spec key the harvest priced is marked done in one batch
+  if (url.pathname === "/api/crawl/harvest" && req.method === "POST") {
+    try {
+      const auth = req.headers.get("Authorization");
+      if (!auth || auth !== `Bearer ${env.NOVA_INGEST_KEY}`) {
+        return Response.json({ error: "Unauthorized" }, { status: 401 });
+      }
+
+      const body = await req.json();
+      const specKeys = [...new Set((body.spec_keys || []).filter(k => typeof k === "string" && k))]
+        .slice(0, HARVEST_MAX_SPEC_KEYS);
+      if (specKeys.length === 0) {
+        return Response.json({ status: "error", error: "spec_keys required" }, { status: 400 });
+      }
+
+      // Only spec keys that now have a priced variant count as satisfied
+      const now = Date.now();
+      const statuses = HARVEST_STATUSES.map(s => `'${s}'`).join(", ");
+      const stmts = [];
+      for (let i = 0; i < specKeys.length; i += HARVEST_KEYS_PER_STATEMENT) {
+        const chunk = specKeys.slice(i, i + HARVEST_KEYS_PER_STATEMENT);
+        stmts.push(env.DB.prepare(`
+            UPDATE crawl_keywords
+            SET status = 'done', fail_count = 0, next_retry = NULL, last_crawled = ?, last_updated = ?
+            WHERE status IN (${statuses})
+              AND spec_key IN (
+                SELECT DISTINCT spec_key FROM product_variants
+                WHERE spec_key IN (${chunk.map(() => "?").join(", ")}) AND unit_price_usd > 0
+              )
+            RETURNING keyword, spec_key
+          `).bind(now, now, ...chunk));
+      }
+      const marked = (await env.DB.batch(stmts)).flatMap(r => r.results || []);
+
+      return Response.json({
+        status: "ok",
+        spec_keys: specKeys.length,
+        marked_done: marked.length,
+        keywords: marked
+      });
+    } catch (e) {
+      return Response.json({ status: "error", error: e.message }, { status: 500 });
+    }
+  }
+
+  // 📊 API: Nova daemon throughput (cumulative counters, folded into the next health snapshot)
+  if (url.pathname === "/api/crawl/daemon-stats" && req.method === "POST") {
+    try {
+      const body = await req.json();
+      const daemonId = body.daemon_id?.toString().slice(0, 100);
+      if (!daemonId) {
+        return Response.json({ status: "error", error: "daemon_id required" }, { status: 400 });
+      }
+      const count = (v) => Math.max(0, parseInt(v) || 0);
+
+      await env.DB.prepare(`
+          INSERT INTO crawl_daemons(daemon_id, started_at, reported_at, crawled, failed, handoffs, last_captcha_at)
+          VALUES(?, ?, ?, ?, ?, ?, ?)
+          ON CONFLICT(daemon_id) DO UPDATE SET
+            reported_at = excluded.reported_at,
+            crawled = excluded.crawled,
+            failed = excluded.failed,
+            handoffs = excluded.handoffs,
+            last_captcha_at = excluded.last_captcha_at
+        `).bind(
+        daemonId, count(body.started_at) || null, Date.now(),
+        count(body.crawled), count(body.failed), count(body.handoffs), count(body.last_captcha_at) || null
+      ).run();
+
+      return Response.json({ status: "ok" });
+    } catch (e) {
+      return Response.json({ status: "error", error: e.message }, { status: 500 });
+    }
+  }
+
+  // ═══════════════════════════════════════════════════════════════
+  // 🤖 AUTO-CRAWL TRIGGER (Nova ACT Integration)
+  // Called when user clicks "Crawl Now" on PENDING_CRAWL items
+  // ═══════════════════════════════════════════════════════════════
+  if (url.pathname === "/api/crawl/trigger" && req.method === "POST") {
+    try {
+      const body = await req.json();
+      const keyword = body.keyword;
+
+      if (!keyword || keyword.length < 3) {
+        return Response.json({ error: "Keyword too short" }, {
+          status: 400,
+          headers: { "Access-Control-Allow-Origin": "*" }
+        });
+      }
+
+      console.log(`[Crawl Trigger] Starting crawl for: "${keyword}"`);
+
+      // Use Browser Rendering to crawl AliExpress
+      // Use standardized BOM parser to generate spec_key from keyword
+      const bomInfo = parseBomLine(keyword);
+      const specKey = bomInfo.spec_key || `ESC:${keyword.replace(/\s+/g, '').toUpperCase()} `;
+
+      // Use existing searchAndCrawlKeyword function (Browser Rendering + AI)
+      const results = await searchAndCrawlKeyword(keyword, specKey, env);
+
+      // Mark keyword as done
+      const now = Date.now();
+      await env.DB.prepare(`
+          INSERT INTO crawl_keywords(keyword, canonical_type, status, last_updated)
+              VALUES(?, 'ESC', 'done', ?)
+          ON CONFLICT(keyword) DO UPDATE SET status = 'done', last_updated = ?
+                `).bind(keyword, now, now).run();
+
+      if (results.length === 0) {
+        return Response.json({
+          status: "error",
+          message: "AliExpress blocked the crawl or found no results. Try again or use manual search."
+        }, { status: 429, headers: { "Access-Control-Allow-Origin": "*" } });
+      }
+
+      return Response.json({
+        status: "ok",
+        source: "browser_rendering",
+        keyword: keyword,
+        variants_found: results.length,
+        message: `Found ${results.length} variants.Refresh to see results.`
+      }, { headers: { "Access-Control-Allow-Origin": "*" } });
+
+    } catch (e) {
+      console.error("[Crawl Trigger] Error:", e);
+      return Response.json({
+        error: e.message,
+        hint: "Crawl failed. You can try the manual search link."
+      }, {
+        status: 500,
+        headers: { "Access-Control-Allow-Origin": "*" }
+      });
+    }
+  }
+
+  // ═══════════════════════════════════════════════════════════════
+  // 🔹 BUYER-MODE CRAWL ENDPOINT (Browser Rendering + AI)
+  // ═══════════════════════════════════════════════════════════════
+  if (url.pathname === "/api/crawl" && req.method === "POST") {
+    try {
+      const body = await req.json();
+      const productUrl = body.url;
+
+      if (!productUrl || !productUrl.includes("aliexpress.com/item")) {
+        return Response.json({ error: "Invalid AliExpress URL" }, { status: 400 });
+      }
+
+      // Extract product ID
+      const productId = productUrl.match(/item\/(\d+)/)?.[1];
+      if (!productId) {
+        return Response.json({ error: "Product ID not found in URL" }, { status: 400 });
+      }
+
+      // 1️⃣ Check KV cache (6hr TTL)
+      const cacheKey = `product:${productId} `;
+      if (env.CACHE) {
+        const cached = await env.CACHE.get(cacheKey, { type: "json" });
+        if (cached) {
+          return Response.json({
+            source: "cache",
+            product_id: productId,
+            data: cached
+          }, { headers: { "Access-Control-Allow-Origin": "*" } });
+        }
+      }
+
+      // 2️⃣ Crawl via Browser Rendering
+      const raw = await crawlAliExpress(productUrl, env);
+      if (!raw) {
+        return Response.json({
+          error: "Browser Rendering failed",
+          fallback_url: productUrl,
+          message: "Please check the URL manually"
+        }, { status: 503, headers: { "Access-Control-Allow-Origin": "*" } });
+      }
+
+      // 3️⃣ Parse via AI (content-addressed cache first)
+      const { parsed } = await parseWithCache(raw, env, ctx);
+      flushCacheStats(env, ctx);
+      if (!parsed) {
+        return Response.json({
+          error: "AI parsing failed",
+          fallback_url: productUrl,
+          message: "Could not extract variant data"
+        }, { status: 500, headers: { "Access-Control-Allow-Origin": "*" } });
+      }
+
+      // 4️⃣ Store in KV cache (6 hours TTL)
+      if (env.CACHE) {
+        await env.CACHE.put(cacheKey, JSON.stringify(parsed), {
+          expirationTtl: 6 * 60 * 60
+        });
+      }
+
+      // 5️⃣ Store in D1 for BOM pricing queries
+      if (parsed.variants && parsed.variants.length > 0) {
+        const now = Date.now();
+        const pIdMatch = productUrl.match(/item\/(\d+)/);
+        const productId = pIdMatch ? pIdMatch[1] : "CRAWL-" + Date.now();
+        const touchedSpecKeys = new Set();
+
+        for (const v of parsed.variants) {
+          const attrs = v.attributes || {};
+          const variantLabel = Object.values(attrs).join(' ') || String(v.sku || 'default');
+
+          // Use standardized BOM parser to generate spec_key from title + label
+          const bomInfoForCrawl = parseBomLine(parsed.title + " " + variantLabel);
+          const specKey = bomInfoForCrawl.spec_key || `PRODUCT:${productId} `;
+
+          // Generate variant ID
+          const variantId = await generateVariantId(productUrl, variantLabel, 1, 'browser_crawl');
+
+          // Safeguard: Prevent ingestion of known "fake" product ID
+          if (productUrl && productUrl.includes("1005005987654321")) {
+            console.log(`[/api/crawl] Blocked fake product ${variantId} `);
+            continue;
+          }
+
+          // Normalize price
+          const unitPriceUsd = toUsd(v.price || 0, parsed.currency || "USD") || v.price || 0;
+          const packPriceUsd = unitPriceUsd; // browser_crawl usually crawls unit items
+
+          try {
+            const prevSpecKey = await storedSpecKey(env.DB, variantId);
+            await env.DB.prepare(`
+                INSERT INTO product_variants (
+                  variant_id, product_id, canonical_item, spec_key,
+                  brand, model, variant_label,
+                  current_A, voltage_s, capacity_mah, kv,
+                  pack_qty, unit_price_usd, pack_price_usd, currency,
+                  stock, product_url,
+                  source, first_seen, last_seen, last_price_update,
+                  link_status
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(variant_id) DO UPDATE SET
+                  spec_key = excluded.spec_key,
+                  current_A = excluded.current_A,
+                  voltage_s = excluded.voltage_s,
+                  capacity_mah = excluded.capacity_mah,
+                  kv = excluded.kv,
+                  unit_price_usd = excluded.unit_price_usd,
+                  pack_price_usd = excluded.pack_price_usd,
+                  currency = excluded.currency,
+                  stock = excluded.stock,
+                  last_seen = excluded.last_seen,
+                  last_price_update = excluded.last_price_update,
+                  link_status = 'resolved'
+              `).bind(
+              variantId, productId, bomInfoForCrawl.canonical_type || 'PRODUCT', specKey,
+              '', // brand
+              parsed.title || "",
+              variantLabel,
+              bomInfoForCrawl.current_A, bomInfoForCrawl.specs?.voltage_s, bomInfoForCrawl.specs?.capacity_mah, bomInfoForCrawl.specs?.kv,
+              1, unitPriceUsd, packPriceUsd, parsed.currency || "USD",
+              v.stock || null, productUrl,
+              'browser_crawl', now, now, now, 'resolved'
+            ).run();
+            touchedSpecKeys.add(specKey);
+            if (prevSpecKey) touchedSpecKeys.add(prevSpecKey);
+          } catch (dbErr) {
+            console.error('[/api/crawl] D1 upsert error:', dbErr.message);
+          }
+        }
+        await invalidateSpecKeys(env, touchedSpecKeys);
+        console.log(`[/api/crawl] Stored ${parsed.variants.length} variants to D1`);
+      }
+
+      return Response.json({
+        source: "live",
+        product_id: productId,
+        data: parsed
+      }, { headers: { "Access-Control-Allow-Origin": "*" } });
+
+    } catch (e) {
+      console.error("[/api/crawl] Error:", e);
+      return Response.json({ error: e.message }, { status: 500, headers: { "Access-Control-Allow-Origin": "*" } });
+    }
+  }
+
+  // Crawl Result Webhook (Callback)
+  if (url.pathname === "/api/crawl/result" && req.method === "POST") {
+    try {
+      const signature = req.headers.get("X-Crawler-Signature");
+      const keyId = req.headers.get("X-Crawler-Key"); // e.g. "default", "crawler-01"
+
+      // 0. Strict Authentication
+      if (!signature || !keyId) {
+        return Response.json({ status: "error", message: "Missing Signature or Key ID" }, { status: 401 });
+      }
+
+      const bodyText = await req.text(); // Need raw text for HMAC verify
+
+      // Verify HMAC with the secret corresponding to keyId (assuming env.CRAWLER_KEY is the secret for now)
+      // In future, a map of keys could be used.
+      const isValid = await verifySignature(bodyText, signature, env.CRAWLER_KEY);
+      if (!isValid) {
+        return Response.json({ status: "error", message: "Invalid Signature" }, { status: 401 });
+      }
+
+      let payload;
+      try {
+        payload = JSON.parse(bodyText);
+      } catch (e) {
+        return Response.json({ status: "error", message: "Invalid JSON" }, { status: 400 });
+      }
+
+      // Batched callback from the crawl service: { tasks: [result, ...] }
+      // Results are queued durably and applied after the response (202), so the callback
+      // returns in constant time whatever the payload size
+      const sourceHeader = req.headers.get("X-Source");
+      const batched = Array.isArray(payload.tasks);
+      const tasks = batched ? payload.tasks : [payload];
+      const valid = tasks.filter(t => t?.task_id && t?.status);
+      if (!batched && valid.length === 0) {
+        return Response.json({ error: "Invalid crawl payload: missing task_id or status" }, { status: 400 });
+      }
+
+      const queued = valid.length > 0 ? await enqueueCrawlResults(env, valid, sourceHeader) : new Set();
+      if (queued.size > 0) {
+        ctx.waitUntil(drainCrawlResultInbox(env, [...queued])
+          .catch(e => console.error("[Webhook] Inbox drain failed:", e)));
+      }
+
+      // The service re-sends only tasks answered with a 5xx; duplicates are already stored
+      const accepted = tasks.map(t => !t?.task_id || !t?.status
+        ? { task_id: t?.task_id || null, http_status: 400, error: "Invalid crawl payload: missing task_id or status" }
+        : { task_id: t.task_id, http_status: 202, status: queued.has(t.task_id) ? "queued" : "duplicate" });
+      if (!batched) {
+        return Response.json(accepted[0], { status: 202 });
+      }
+      return Response.json({ status: "accepted", tasks: accepted }, { status: 202 });
+
+    } catch (e) {
+      console.error("[Webhook] Error processing callback:", e);
+      return Response.json({ error: e.message }, { status: 500 });
+    }
+  }
+
+  return null;
+}
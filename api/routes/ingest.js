@@ -0,0 +1,316 @@
+import { generateSpecKey, generateVariantId, extractVariantSpecs } from "../../utils/specs.js";
+import { toUsd, parseBomLine, sha256Hex, snapshotCacheKey, invalidateSpecKeys, storedSpecKey, flushCacheStats } from "../shared.js";
+import { parseWithCache } from "../ai_parse.js";
+
+// Ingest routes: /api/nova/insert and /api/nova/ingest (Nova desktop and scrapers)
+
+// --- Product Snapshots (/product/:id, served by routes/pricing.js) ---
+
+async function gzipText(text) {
+  const stream = new Blob([text]).stream().pipeThrough(new CompressionStream("gzip"));
+  return new Uint8Array(await new Response(stream).arrayBuffer());
+}
+
+// Store the snapshot body compressed; the edge copy of this colo is dropped
+async function storeProductSnapshot(env, ctx, url, productId, parsed, now) {
+  const body = JSON.stringify({ product_id: productId, source: "snapshot", updated_at: now, ...parsed });
+  await env.DB.prepare(`
+    INSERT OR REPLACE INTO product_snapshots(product_id, title, data, data_gz, content_hash, updated_at)
+    VALUES(?, ?, NULL, ?, ?, ?)
+  `).bind(productId, parsed.title, await gzipText(body), await sha256Hex(body), now).run();
+  ctx.waitUntil(caches.default.delete(snapshotCacheKey(url, productId)));
+}
+
+// --- Request Body Helpers ---
+
+// Read a JSON body that may be gzip-compressed (Content-Encoding: gzip from the Nova exporter)
+// Detects the gzip magic bytes, so bodies already decoded upstream still parse.
+async function readJsonBody(req) {
+  const bytes = new Uint8Array(await req.arrayBuffer());
+  if (bytes.length > 2 && bytes[0] === 0x1f && bytes[1] === 0x8b) {
+    const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream("gzip"));
+    return await new Response(stream).json();
+  }
+  return JSON.parse(new TextDecoder().decode(bytes));
+}
+
+// Returns the route's Response, or null when no ingest route matches
+export async function handle(req, env, ctx, url) {
+  // ═══════════════════════════════════════════════════════════════
+  // 🖥️ NOVA DIRECT INSERT - Simple endpoint for scrapers
+  // Receives pre-parsed product data and stores directly to D1
+  // ═══════════════════════════════════════════════════════════════
+  if (url.pathname === "/api/nova/insert" && req.method === "POST") {
+    try {
+      const auth = req.headers.get("Authorization");
+      if (!auth || auth !== `Bearer ${env.NOVA_INGEST_KEY}`) {
+        return Response.json({ error: "Unauthorized" }, { status: 401 });
+      }
+
+      const body = await req.json();
+      const { title, product_url, variants, search_keyword, currency } = body;
+
+      if (!title || !variants || variants.length === 0) {
+        return Response.json({ error: "Missing title or variants" }, { status: 400 });
+      }
+
+      // Extract product ID from URL
+      let productId = "NOVA-" + Date.now();
+      if (product_url) {
+        const idMatch = product_url.match(/item\/(\d+)/);
+        if (idMatch) productId = idMatch[1];
+      }
+
+      // Parse BOM info from title
+      const bomInfo = parseBomLine(title);
+      const now = Date.now();
+      let storedCount = 0;
+      const errors = [];
+      const touchedSpecKeys = new Set();
+
+      for (const v of variants) {
+        const variantLabel = v.variant_label || v.label || `variant-${storedCount + 1}`;
+        const price = parseFloat(v.price) || 0;
+
+        // Skip zero-price variants
+        if (price <= 0) {
+          errors.push(`Skipped ${variantLabel}: price is 0`);
+          continue;
+        }
+
+        // Generate spec_key from title + variant (the variant's own specs win)
+        const specs = extractVariantSpecs(title, variantLabel);
+        const specKey = generateSpecKey(bomInfo.canonical_type || "PRODUCT", specs) || `PRODUCT:${productId}`;
+
+        const variantId = await generateVariantId(
+          product_url || `nova://${productId}`,
+          variantLabel,
+          specs.pack_qty || 1,
+          "nova_desktop"
+        );
+
+        try {
+          const prevSpecKey = await storedSpecKey(env.DB, variantId);
+          await env.DB.prepare(`
+              INSERT INTO product_variants (
+                variant_id, product_id, spec_key, variant_label, 
+                current_A, voltage_s, capacity_mah, kv,
+                unit_price_usd, currency, product_url, source, 
+                last_seen, last_price_update
+              ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'nova_desktop', ?, ?)
+              ON CONFLICT(variant_id) DO UPDATE SET
+                spec_key = excluded.spec_key,
+                current_A = excluded.current_A,
+                voltage_s = excluded.voltage_s,
+                capacity_mah = excluded.capacity_mah,
+                kv = excluded.kv,
+                unit_price_usd = excluded.unit_price_usd,
+                currency = excluded.currency,
+                last_seen = excluded.last_seen,
+                last_price_update = excluded.last_price_update
+            `).bind(
+            variantId,
+            productId,
+            specKey,
+            variantLabel,
+            specs.current_A, specs.voltage_s, specs.capacity_mah, specs.kv,
+            currency === "LKR" ? Math.round(price / 320 * 100) / 100 : price,
+            currency || "LKR",
+            product_url,
+            now,
+            now
+          ).run();
+          storedCount++;
+          touchedSpecKeys.add(specKey);
+          if (prevSpecKey) touchedSpecKeys.add(prevSpecKey);
+        } catch (e) {
+          console.error(`[Nova Insert] Failed to insert variant ${variantLabel}: ${e.message}`);
+          errors.push(`DB error for ${variantLabel}: ${e.message}`);
+        }
+      }
+
+      // Mark keyword as done if provided
+      if (search_keyword) {
+        await env.DB.prepare(`
+            UPDATE crawl_keywords SET status = 'done', last_updated = ? WHERE keyword = ?
+          `).bind(now, search_keyword).run().catch(() => { });
+      }
+
+      await invalidateSpecKeys(env, touchedSpecKeys);
+
+      return Response.json({
+        status: "ok",
+        title: title,
+        variants_stored: storedCount,
+        product_id: productId,
+        spec_keys: [...touchedSpecKeys],
+        errors: errors.length > 0 ? errors : undefined
+      });
+
+    } catch (e) {
+      console.error("[Nova Insert] Error:", e.message);
+      return Response.json({ error: e.message }, { status: 500 });
+    }
+  }
+
+  // ═══════════════════════════════════════════════════════════════
+  // 🖥️ NOVA DESKTOP HELPER - Ingest Endpoint
+  // Receives HTML + runParams from Nova desktop script
+  // ═══════════════════════════════════════════════════════════════
+  if (url.pathname === "/api/nova/ingest" && req.method === "POST") {
+    try {
+      // Auth check
+      const auth = req.headers.get("Authorization");
+      if (!auth || auth !== `Bearer ${env.NOVA_INGEST_KEY}`) {
+        return Response.json({ error: "Unauthorized" }, { status: 401 });
+      }
+
+      const body = await readJsonBody(req);
+      const { html, json, product_url, trimmed } = body;
+
+      if (!html && !json) {
+        return Response.json({ error: "Missing html or json payload" }, { status: 400 });
+      }
+
+      console.log(`[Nova Ingest] Received payload: html=${(html || "").length} bytes, hasJson=${!!json}, trimmed=${!!trimmed}, encoding=${req.headers.get("Content-Encoding") || "identity"}`);
+
+      // Parse using existing AI parser (skipped when this exact content was parsed before)
+      const { parsed, cache: parseCache } = await parseWithCache({ html, json, trimmed }, env, ctx);
+      console.log(`[Nova Ingest] Parse cache ${parseCache}`);
+      flushCacheStats(env, ctx);
+
+      if (!parsed) {
+        return Response.json({
+          error: "Failed to parse product data",
+          hint: "Ensure you're on a valid AliExpress product page"
+        }, { status: 422, headers: { "Access-Control-Allow-Origin": "*" } });
+      }
+
+      // Extract product ID from URL if provided
+      let productId = "NOVA-" + Date.now();
+      if (product_url) {
+        const idMatch = product_url.match(/item\/(\d+)/);
+        if (idMatch) productId = idMatch[1];
+      }
+
+      // Use standardized BOM parser to generate spec_key from title
+      const bomInfo = parseBomLine(parsed.title || "");
+      let canonicalItem = bomInfo.canonical_type || "PRODUCT";
+      let specKey = bomInfo.spec_key || `PRODUCT:${productId}`;
+
+      // Store variants to D1
+      const now = Date.now();
+      let storedCount = 0;
+      const touchedSpecKeys = new Set();
+
+      if (parsed.variants && parsed.variants.length > 0) {
+        for (const v of parsed.variants) {
+          const variantLabel = v.attributes
+            ? Object.values(v.attributes).join(" ")
+            : String(v.sku || `variant-${storedCount + 1}`);
+
+          // Extract specs from title + variant label (the variant's own specs win)
+          const specs = extractVariantSpecs(parsed.title, variantLabel);
+
+          // Generate variant-specific spec_key
+          const variantSpecKey = generateSpecKey(bomInfo.canonical_type || "PRODUCT", specs) || specKey;
+
+          const variantId = await generateVariantId(
+            product_url || `nova://${productId}`,
+            variantLabel,
+            specs.pack_qty || 1,
+            "nova_desktop"
+          );
+
+          // Safeguard: Prevent ingestion of known "fake" product ID
+          if (product_url && product_url.includes("1005005987654321")) {
+            console.log(`[Nova Ingest] Blocked fake product ${variantId}`);
+            continue;
+          }
+
+          try {
+            const unitPriceUsd = (toUsd(v.price || 0, parsed.currency || "USD") || v.price || 0);
+            const packPriceUsd = unitPriceUsd * (specs.pack_qty || 1);
+            const prevSpecKey = await storedSpecKey(env.DB, variantId);
+
+            await env.DB.prepare(`
+                INSERT INTO product_variants (
+                  variant_id, product_id, canonical_item, spec_key,
+                  brand, model, variant_label,
+                  current_A, voltage_s, capacity_mah, kv,
+                  pack_qty, unit_price_usd, pack_price_usd, currency,
+                  stock, product_url,
+                  source, first_seen, last_seen, last_price_update,
+                  link_status
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(variant_id) DO UPDATE SET
+                  spec_key = excluded.spec_key,
+                  current_A = excluded.current_A,
+                  voltage_s = excluded.voltage_s,
+                  capacity_mah = excluded.capacity_mah,
+                  kv = excluded.kv,
+                  unit_price_usd = excluded.unit_price_usd,
+                  pack_price_usd = excluded.pack_price_usd,
+                  currency = excluded.currency,
+                  stock = excluded.stock,
+                  last_seen = excluded.last_seen,
+                  last_price_update = excluded.last_price_update,
+                  link_status = 'resolved'
+              `).bind(
+              variantId, productId, bomInfo.canonical_type || "PRODUCT", variantSpecKey,
+              "", // brand
+              parsed.title || "Unknown",
+              variantLabel,
+              specs.current_A, specs.voltage_s, specs.capacity_mah, specs.kv,
+              specs.pack_qty || 1,
+              unitPriceUsd,
+              packPriceUsd,
+              parsed.currency || "USD",
+              v.stock || null,
+              product_url || null,
+              "nova_desktop",
+              now, now, now,
+              product_url ? "resolved" : "search_only"
+            ).run();
+            storedCount++;
+            touchedSpecKeys.add(variantSpecKey);
+            if (prevSpecKey) touchedSpecKeys.add(prevSpecKey);
+          } catch (dbErr) {
+            console.error("[Nova Ingest] D1 error:", dbErr.message);
+          }
+        }
+      }
+
+      // Also store full product snapshot for /product/:id endpoint
+      try {
+        await storeProductSnapshot(env, ctx, url, productId, parsed, now);
+      } catch (snapErr) {
+        // Table may not exist yet - that's okay
+        console.log("[Nova Ingest] Snapshot storage skipped:", snapErr.message);
+      }
+
+      await invalidateSpecKeys(env, touchedSpecKeys);
+
+      console.log(`[Nova Ingest]Stored ${storedCount} variants for product ${productId}`);
+
+      return Response.json({
+        status: "ok",
+        product_id: productId,
+        title: parsed.title,
+        variants_stored: storedCount,
+        spec_key: specKey,
+        parse_cache: parseCache,
+        share_url: `/ product / ${productId} `
+      }, { headers: { "Access-Control-Allow-Origin": "*" } });
+
+    } catch (e) {
+      console.error("[Nova Ingest] Error:", e);
+      return Response.json({ error: e.message }, {
+        status: 500,
+        headers: { "Access-Control-Allow-Origin": "*" }
+      });
+    }
+  }
+
+  return null;
+}
@@ -0,0 +1,1485 @@
+import { parseSpecKey } from "../../utils/specs.js";
+import { createLru, readThrough } from "../../utils/cache.js";
+import { isPreciseSpecKey, buildFtsQuery, trigramSimilarity, FUZZY_MIN_SIMILARITY, FUZZY_MAX_MATCHES } from "../../utils/fuzzy_match.js";
+import { recordSpecDemand } from "../../crawler/priority.js";
+import { recordSpecCooccurrence } from "../../crawler/prefetch.js";
+import { SOURCE_FILTERS, HOT_CACHE_KV_TTL_S, HOT_CACHE_LRU_TTL_MS, HOT_CACHE_LRU_SIZE, candidateLru, historyLru, cacheStats, FX_RATES, toUsd, parseBomLine, sha256Hex, snapshotCacheKey, notModified, candidateCacheKey, historyCacheKey, flushCacheStats } from "../shared.js";
+
+// Pricing routes: /api/price (and POST /), /api/price-history, /api/preference,
+// /api/resolve and shareable /product/:id links
+
+// --- Version & Limits ---
+const VERSION = "1.0";
+const MAX_AGENT_WAIT_MS = 8000;      // 8 second hard limit
+const MAX_PRODUCTS_PER_ITEM = 10;    // Max variants to return per BOM line
+const MAX_CANDIDATES = 20;           // Max candidates to process
+const MAX_BOM_LINES = 50;            // Max BOM lines per request
+
+// --- Trust Cache ---
+const TRUST_CACHE_KV_TTL_S = 24 * 60 * 60; // Trust memory is written through on every flush
+const TRUST_FLUSH_DELAY_MS = 2000;          // Coalesce preference clicks for this long before writing D1
+const trustLru = createLru(HOT_CACHE_LRU_SIZE, HOT_CACHE_LRU_TTL_MS);
+
+// --- Light Crawl Wait (NOT_FOUND recovery) ---
+const LIGHT_CRAWL_TIMEOUT_MS = 6000; // Max wait for light crawl results
+const LIGHT_CRAWL_POLL_MS = 500;     // Poll D1 every 500ms
+
+// --- Pack Quantity Extraction ---
+// Extracts pack quantity from variant labels like "4Pcs LITTLEBEE 30A" → 4
+function extractPackQty(label) {
+  if (!label) return 1;
+  const match = label.match(/(\d+)\s*(pcs|pc)/i);
+  return match ? parseInt(match[1], 10) : 1;
+}
+
+// Strips quantity words from label to avoid duplication like "4Pcs 1Pc LITTLEBEE"
+function stripQtyWords(label) {
+  if (!label) return "";
+  return label
+    .replace(/\b\d+\s*(pcs|pc)\b/ig, "")  // remove "1Pc", "4Pcs", etc
+    .replace(/\s{2,}/g, " ")              // normalize multiple spaces
+    .trim();
+}
+
+function parseBom(text) {
+  return text
+    .trim()
+    .split("\n")
+    .map((l) => l.trim())
+    .filter((l) => l.length > 0)
+    .map(parseBomLine);
+}
+
+// --- Nova ACT Stub (Mock for now) ---
+// Replace with real HTTP call when Nova is ready
+function novaRank(bomItem, candidates) {
+  // Mock logic: pick first candidate (cheapest should be sorted or just index 0)
+  if (!candidates || candidates.length === 0) {
+    return { selected_index: -1, match_score: 0, reasoning: "No candidates" };
+  }
+  return {
+    selected_index: 0,
+    match_score: 0.85,
+    reasoning: "Exact match in variant label and lowest price (mock)."
+  };
+}
+
+// --- CSV Escape Helper ---
+// Safely escapes values for CSV (handles commas, quotes, newlines)
+function csvEscape(val) {
+  if (val === null || val === undefined) return "";
+  val = String(val);
+  if (val.includes(",") || val.includes('"') || val.includes("\n")) {
+    return `"${val.replace(/"/g, '""')}"`;
+  }
+  return val;
+}
+
+// --- CSV Formatter ---
+// Uses normalized data + feedback signals + brand preferences
+function toCSV(items) {
+  const header = [
+    "Item",
+    "Qty",
+    "Display_Label",
+    "Variant_Label",
+    "Listing_Title",
+    "Brand",
+    "Pack_Qty",
+    "Unit_Price_USD",
+    "Pack_Price_USD",
+    "Currency",
+    "Supplier",
+    "Risk",
+    "Rating",
+    "Review_Count",
+    "Sold_Count",
+    "Store_Years",
+    "Feedback_Score",
+    "User_Trust_Score",
+    "Product_URL"
+  ];
+
+  const rows = items.map(i => {
+    if (i.status !== "MATCHED" && i.status !== "FUZZY_MATCH") {
+      return [
+        i.bom?.raw || "Unknown",
+        i.bom?.qty || 1,
+        "", "", "", "", "", "", "", "", "", "", "", "", "", "", "", "", ""
+      ];
+    }
+
+    // Use the selected candidate (first one marked as default, or first in list)
+    const sel = i.candidates?.find(c => c.default) || i.candidates?.[0];
+    if (!sel) {
+      return [
+        `${i.bom.current_A}A ESC`,
+        i.bom.qty,
+        "", "", "", "", "", "", "", "", "", "", "", "", "", "", "", "", ""
+      ];
+    }
+
+    return [
+      `${i.bom.current_A}A ESC`,
+      i.bom.qty,
+      sel.display_label || sel.model,
+      sel.variant_label || "",
+      sel.listing_title || "",
+      sel.brand,
+      sel.pack_qty || 1,
+      sel.unit_price_usd?.toFixed(2) || "",
+      sel.pack_price_usd?.toFixed(2) || "",
+      sel.local_currency || "USD",
+      sel.remark || "AliExpress Seller",
+      sel.risk || "",
+      sel.feedback?.rating || "",
+      sel.feedback?.reviews || "",
+      sel.feedback?.sold || "",
+      sel.feedback?.store_years || "",
+      sel.feedback?.score?.toFixed(2) || "",
+      sel.trust?.score?.toFixed(2) || "0.00",
+      sel.product_url || ""
+    ];
+  });
+
+  // UTF-8 BOM for LibreOffice Calc compatibility
+  const BOM = "\uFEFF";
+  return BOM + [header, ...rows]
+    .map(r => r.map(csvEscape).join(","))
+    .join("\r\n");
+}
+
+// --- Confidence Decay (based on price age) ---
+function calculateConfidenceDecay(baseScore, lastUpdated) {
+  if (!lastUpdated) return baseScore;
+  const now = new Date();
+  const updated = new Date(lastUpdated);
+  const daysOld = (now - updated) / (1000 * 60 * 60 * 24);
+  // Decay: confidence *= exp(-daysOld / 30)
+  const decayFactor = Math.exp(-daysOld / 30);
+  return Math.round(baseScore * decayFactor * 100) / 100;
+}
+
+// --- Feedback Scoring (Trust & Quality Layer) ---
+
+// Rating score (30% weight)
+function scoreRating(rating) {
+  if (!rating || rating <= 0) return 0.1;
+  if (rating >= 4.7) return 1.0;
+  if (rating >= 4.3) return 0.7;
+  if (rating >= 4.0) return 0.4;
+  return 0.1;
+}
+
+// Review count score (20% weight)
+function scoreReviews(count) {
+  if (!count || count <= 0) return 0.1;
+  if (count >= 500) return 1.0;
+  if (count >= 100) return 0.7;
+  if (count >= 20) return 0.4;
+  return 0.1;
+}
+
+// Sold count score (20% weight)
+function scoreSold(count) {
+  if (!count || count <= 0) return 0.1;
+  if (count >= 1000) return 1.0;
+  if (count >= 200) return 0.7;
+  if (count >= 50) return 0.4;
+  return 0.1;
+}
+
+// Store trust score (15% weight)
+function scoreStore(years) {
+  if (!years || years <= 0) return 0.4;
+  if (years >= 3) return 1.0;
+  if (years >= 1) return 0.7;
+  return 0.4;
+}
+
+// Calculate combined feedback score (deterministic, explainable)
+function calculateFeedbackScore(rating, reviews, sold, storeYears, hasChoice, hasPhotos) {
+  const ratingScore = scoreRating(rating);
+  const reviewScore = scoreReviews(reviews);
+  const soldScore = scoreSold(sold);
+  const storeScore = scoreStore(storeYears);
+  const choiceScore = hasChoice ? 1.0 : 0.0;
+  const photoScore = hasPhotos ? 1.0 : 0.0;
+
+  // Weighted combination (tuned for RC components)
+  const score =
+    ratingScore * 0.30 +
+    reviewScore * 0.20 +
+    soldScore * 0.20 +
+    storeScore * 0.15 +
+    choiceScore * 0.10 +
+    photoScore * 0.05;
+
+  return Math.round(score * 100) / 100;
+}
+
+// --- User Trust Memory (Human Preference Layer) ---
+
+// Trust memory is cached per user as { version, memory } (version = newest last_selected).
+// Preference clicks are buffered per isolate and flushed to D1 in one batch after
+// TRUST_FLUSH_DELAY_MS. Every recording request waits on its own timer-then-flush
+// (ctx.waitUntil of that request); the first flush to run takes the whole buffer and
+// later ones find it empty. The flush writes the fresh memory through to the LRU and KV
+// unless KV already holds a newer version (written by another isolate's flush).
+const pendingTrust = new Map(); // userKey -> Map "brand|seller" -> { brand, seller, count, last }
+
+function trustCacheKey(userKey) {
+  return `trust:v1:${userKey}`;
+}
+
+// Build lookup map: "brand|supplier" -> { score, select_count }
+function buildTrustMemory(rows) {
+  const memory = {};
+  let version = 0;
+  for (const r of rows) {
+    const key = `${r.brand}|${r.seller || ""}`;
+    memory[key] = { score: r.trust_score, select_count: r.select_count };
+    version = Math.max(version, r.last_selected || 0);
+  }
+  return { version, memory };
+}
+
+// Same update as the D1 upsert, applied to a cached memory map
+function applyTrustSelection(memory, key, count) {
+  const entry = memory[key] || { score: 0, select_count: 0 };
+  memory[key] = {
+    score: Math.min(entry.score + 0.05 * count, 0.3),
+    select_count: entry.select_count + count
+  };
+}
+
+// Record a variant selection (flushed in the background, visible to this isolate immediately)
+function recordTrustSelection(env, ctx, userKey, brand, supplier) {
+  if (!userKey || !brand) return;
+  const seller = supplier || "";
+  const key = `${brand}|${seller}`;
+
+  if (!pendingTrust.has(userKey)) pendingTrust.set(userKey, new Map());
+  const updates = pendingTrust.get(userKey);
+  const update = updates.get(key) || { brand, seller, count: 0, last: 0 };
+  update.count++;
+  update.last = Date.now();
+  updates.set(key, update);
+
+  const cached = trustLru.get(trustCacheKey(userKey));
+  if (cached) applyTrustSelection(cached.memory, key, 1);
+
+  ctx.waitUntil(new Promise(resolve => setTimeout(resolve, TRUST_FLUSH_DELAY_MS))
+    .then(() => flushTrustSelections(env)));
+}
+
+// Write all buffered selections in one D1 batch and refresh the cached memories
+async function flushTrustSelections(env) {
+  // Selections arriving from here on go to the next flush
+  const batch = new Map(pendingTrust);
+  pendingTrust.clear();
+  if (batch.size === 0) return;
+
+  const upsert = env.DB.prepare(`
+    INSERT INTO user_trust (user_key, brand, seller, trust_score, select_count, last_selected)
+    VALUES (?1, ?2, ?3, MIN(0.05 * ?4, 0.3), ?4, ?5)
+    ON CONFLICT(user_key, seller, brand)
+    DO UPDATE SET
+      select_count = select_count + excluded.select_count,
+      last_selected = excluded.last_selected,
+      trust_score = MIN(trust_score + 0.05 * excluded.select_count, 0.3)
+  `);
+  const select = env.DB.prepare(`
+    SELECT brand, seller, trust_score, select_count, last_selected
+    FROM user_trust
+    WHERE user_key = ?
+  `);
+  const users = [...batch.keys()];
+  const stmts = [];
+  for (const [userKey, updates] of batch) {
+    for (const u of updates.values()) stmts.push(upsert.bind(userKey, u.brand, u.seller, u.count, u.last));
+  }
+
+  let results;
+  try {
+    results = await env.DB.batch([...stmts, ...users.map(u => select.bind(u))]);
+  } catch (e) {
+    // Put the selections back for the next flush
+    console.error("[Trust] Flush failed:", e.message);
+    for (const [userKey, updates] of batch) {
+      if (!pendingTrust.has(userKey)) pendingTrust.set(userKey, new Map());
+      const pending = pendingTrust.get(userKey);
+      for (const [key, u] of updates) {
+        const p = pending.get(key);
+        pending.set(key, p ? { ...u, count: p.count + u.count, last: Math.max(p.last, u.last) } : u);
+      }
+    }
+    return;
+  }
+
+  await Promise.all(users.map(async (userKey, i) => {
+    const fresh = buildTrustMemory(results[stmts.length + i].results || []);
+    // Selections buffered since the flush started are not in D1 yet
+    for (const [key, u] of pendingTrust.get(userKey) || []) applyTrustSelection(fresh.memory, key, u.count);
+    trustLru.set(trustCacheKey(userKey), fresh);
+
+    if (!env.CACHE) return;
+    try {
+      const current = await env.CACHE.get(trustCacheKey(userKey), { type: "json" });
+      if (current && current.version > fresh.version) return;
+      await env.CACHE.put(trustCacheKey(userKey), JSON.stringify(fresh), { expirationTtl: TRUST_CACHE_KV_TTL_S });
+    } catch (e) {
+      console.error(`[Trust] KV write failed for ${userKey}:`, e.message);
+    }
+  }));
+}
+
+// Get trust scores for a user (hot cache, then D1)
+async function getTrustScores(env, ctx, userKey) {
+  if (!userKey) return {};
+
+  const cacheKey = trustCacheKey(userKey);
+  const values = await readThrough(env, ctx, {
+    lru: trustLru,
+    stats: cacheStats.trust,
+    keys: [cacheKey],
+    ttlSeconds: TRUST_CACHE_KV_TTL_S,
+    cacheEmpty: true,
+    load: async () => {
+      const { results } = await env.DB.prepare(`
+        SELECT brand, seller, trust_score, select_count, last_selected
+        FROM user_trust
+        WHERE user_key = ?
+      `).bind(userKey).all();
+      return new Map([[cacheKey, buildTrustMemory(results || [])]]);
+    }
+  });
+  return values.get(cacheKey)?.memory || {};
+}
+
+// Get score for specific item
+function getTrustScore(memory, brand, supplier) {
+  const key = `${brand}|${supplier || ""}`;
+  return memory[key] || { score: 0, select_count: 0 };
+}
+
+// --- Price History Helpers ---
+
+// Fetch recent price history for several variants (hot cache, then one D1 batch)
+// Older points only survive as daily/weekly rollups (see utils/price_history.js),
+// so rollup "last" prices fill in for variants that were not crawled recently.
+// filterName is a key of SOURCE_FILTERS
+// Returns Map: variant_id -> history rows (newest first)
+async function getRecentPriceHistories(env, ctx, variantIds, filterName = "prod") {
+  const ids = [...new Set(variantIds.filter(Boolean))];
+  const histories = new Map();
+  if (ids.length === 0) return histories;
+
+  const sourceFilter = SOURCE_FILTERS[filterName];
+  const cached = await readThrough(env, ctx, {
+    lru: historyLru,
+    stats: cacheStats.price_history,
+    keys: ids.map(id => historyCacheKey(filterName, id)),
+    ttlSeconds: HOT_CACHE_KV_TTL_S,
+    load: async (keys) => {
+      const missingIds = keys.map(k => k.slice(k.lastIndexOf(":") + 1));
+      const stmt = env.DB.prepare(`
+        SELECT unit_price_usd, stock, recorded_at FROM (
+          SELECT unit_price_usd, stock, recorded_at
+          FROM variant_price_history
+          WHERE variant_id = ?1
+            AND source IN ${sourceFilter}
+          UNION ALL
+          SELECT last_price, last_stock, last_recorded_at
+          FROM variant_price_rollup
+          WHERE variant_id = ?1
+            AND source IN ${sourceFilter}
+        )
+        ORDER BY recorded_at DESC
+        LIMIT 10
+      `);
+      const batchResults = await env.DB.batch(missingIds.map(id => stmt.bind(id)));
+      return new Map(keys.map((k, i) => [k, batchResults[i].results || []]));
+    }
+  });
+
+  for (const id of ids) histories.set(id, cached.get(historyCacheKey(filterName, id)) || []);
+  return histories;
+}
+
+// Compute RC-friendly price trend (deterministic)
+function computePriceTrend(history) {
+  if (!history || history.length < 2) {
+    return { trend: "stable", change_pct: 0, data_points: history?.length || 0 };
+  }
+
+  const latest = history[0].unit_price_usd;
+  const oldest = history[history.length - 1].unit_price_usd;
+
+  if (oldest === 0) return { trend: "stable", change_pct: 0, data_points: history.length };
+
+  const changePct = ((latest - oldest) / oldest) * 100;
+
+  // RC-specific thresholds: ±5% avoids noise
+  if (changePct > 5) return { trend: "up", change_pct: Math.round(changePct * 10) / 10, data_points: history.length };
+  if (changePct < -5) return { trend: "down", change_pct: Math.round(changePct * 10) / 10, data_points: history.length };
+  return { trend: "stable", change_pct: Math.round(changePct * 10) / 10, data_points: history.length };
+}
+
+// Full history of one variant for the trend API: raw points + daily/weekly rollups
+// Returns { raw, daily, weekly } (oldest first)
+async function getPriceSeries(db, variantId, filterName = "prod") {
+  const sourceFilter = SOURCE_FILTERS[filterName];
+  const [raw, rollups] = await db.batch([
+    db.prepare(`
+      SELECT unit_price_usd, stock, recorded_at
+      FROM variant_price_history
+      WHERE variant_id = ? AND source IN ${sourceFilter}
+      ORDER BY recorded_at ASC
+    `).bind(variantId),
+    db.prepare(`
+      SELECT bucket, bucket_start, min_price, max_price, last_price, last_stock, points
+      FROM variant_price_rollup
+      WHERE variant_id = ? AND source IN ${sourceFilter}
+      ORDER BY bucket_start ASC
+    `).bind(variantId)
+  ]);
+
+  const rollupRows = rollups.results || [];
+  return {
+    raw: raw.results || [],
+    daily: rollupRows.filter(r => r.bucket === "day"),
+    weekly: rollupRows.filter(r => r.bucket === "week")
+  };
+}
+
+// --- Product Snapshots (/product/:id) ---
+// Stored by /api/nova/ingest as the gzipped response body + SHA-256 (ETag); served from
+// the edge cache (Cache API) and answered with 304 when the client already has the body.
+
+const SNAPSHOT_CACHE_CONTROL = "public, max-age=300, stale-while-revalidate=3600";
+
+// D1 returns BLOB columns as number arrays
+async function gunzipText(bytes) {
+  const stream = new Blob([new Uint8Array(bytes)]).stream().pipeThrough(new DecompressionStream("gzip"));
+  return await new Response(stream).text();
+}
+
+function productResponseHeaders(etag, updatedAt) {
+  const headers = {
+    "Content-Type": "application/json",
+    "Access-Control-Allow-Origin": "*",
+    "Cache-Control": SNAPSHOT_CACHE_CONTROL,
+    "ETag": `"${etag}"`
+  };
+  if (updatedAt) headers["Last-Modified"] = new Date(updatedAt).toUTCString();
+  return headers;
+}
+
+// --- Delta Pricing (edited BOMs) ---
+// Every /api/price response carries a result_token: the priced lines keyed by line hash.
+// An edited BOM can send { token, lines: [{ hash } | { hash, text }] } (or { token, bom });
+// lines found in the token are reused unless their spec_key has newer variant data,
+// only new/changed lines go through the pricing pipeline.
+// Reused: INVALID_LINE and MATCHED lines. FUZZY_MATCH and PENDING_CRAWL lines are always
+// recomputed (their data is not tied to one spec_key / may have been crawled since).
+
+const PRICE_TOKEN_TTL_S = 60 * 60;
+const priceTokenLru = createLru(HOT_CACHE_LRU_SIZE, PRICE_TOKEN_TTL_S * 1000);
+
+function priceTokenKey(token) {
+  return `price:v1:${token}`;
+}
+
+// Same hash the UI computes: SHA-256 of the normalized (trimmed, uppercase) line, 16 hex chars
+async function lineHash(line) {
+  return (await sha256Hex(line.trim().toUpperCase())).slice(0, 16);
+}
+
+async function loadPriceToken(env, token) {
+  if (typeof token !== "string" || !/^[0-9a-f-]{36}$/.test(token)) return null;
+  const key = priceTokenKey(token);
+  const hit = priceTokenLru.get(key);
+  if (hit) return hit;
+  const stored = env.CACHE ? await env.CACHE.get(key, { type: "json" }).catch(() => null) : null;
+  if (stored) priceTokenLru.set(key, stored);
+  return stored;
+}
+
+function savePriceToken(env, ctx, entry) {
+  const token = crypto.randomUUID();
+  const key = priceTokenKey(token);
+  priceTokenLru.set(key, entry);
+  if (env.CACHE) {
+    ctx.waitUntil(env.CACHE.put(key, JSON.stringify(entry), { expirationTtl: PRICE_TOKEN_TTL_S })
+      .catch(e => console.error("[Delta] Token write failed:", e.message)));
+  }
+  return token;
+}
+
+function isReusableResult(result) {
+  return result.status === "INVALID_LINE" || result.status === "MATCHED";
+}
+
+// Newest variant write per spec_key (idx_variants_spec_updated)
+// Returns Map: spec_key -> last_price_update
+async function fetchSpecKeyUpdates(db, specKeys) {
+  const keys = [...new Set(specKeys.filter(Boolean))];
+  const updates = new Map();
+  if (keys.length === 0) return updates;
+  const { results } = await db.prepare(`
+    SELECT spec_key, MAX(last_price_update) AS updated
+    FROM product_variants
+    WHERE spec_key IN (${keys.map(() => "?").join(", ")})
+    GROUP BY spec_key
+  `).bind(...keys).all();
+  for (const r of results || []) updates.set(r.spec_key, r.updated);
+  return updates;
+}
+
+// --- Batched Pricing Lookups ---
+// /api/price collects the distinct spec_keys / keywords of a BOM and resolves
+// each of them once via D1 batch(), so a 50-line BOM costs a few round trips
+// instead of several sequential queries per line.
+
+// Variant catalog row -> pricing candidate
+function variantRowToCandidate(r) {
+  return {
+    title: r.model || r.variant_label, // Use model or label as title
+    variant: r.variant_label,
+    brand: r.brand,
+    current_A: r.current_A,
+    variant_id: r.variant_id, // For price history lookup
+
+    price_value: r.pack_price_usd || r.unit_price_usd,
+    price_currency: "USD", // For now, catalog is USD-centric
+
+    seller: { name: r.seller, rating: r.rating },
+    product_url: r.product_url,
+    last_updated: r.last_seen,
+    review_count: r.review_count || 0,
+    sold_count: r.stock || 0, // Using stock as proxy or 0 if not tracked
+    store_years: 0, // Not in new schema yet
+    has_choice: 1,
+    has_photos: 1,
+    pack_qty: r.pack_qty || 1
+  };
+}
+
+// Re-check row (keyword finished crawling) -> pricing candidate
+function recheckRowToCandidate(r) {
+  return {
+    title: r.model || r.variant_label,
+    variant: r.variant_label,
+    brand: r.brand,
+    variant_id: r.variant_id,
+    price_value: r.unit_price_usd,
+    price_currency: "USD",
+    seller: { name: '', rating: 0 },
+    product_url: r.product_url,
+    last_updated: r.last_seen,
+    pack_qty: r.pack_qty || 1
+  };
+}
+
+// Typed spec columns must agree with the spec key (e.g. ESC:30A only returns 30A variants).
+// NULL columns pass (specs not extracted at ingest). ?1 = spec_key, ?2-?5 from parseSpecKey()
+const TYPED_SPEC_FILTER = `
+  spec_key = ?1
+  AND (?2 IS NULL OR current_A IS NULL OR current_A = ?2)
+  AND (?3 IS NULL OR kv IS NULL OR kv = ?3)
+  AND (?4 IS NULL OR capacity_mah IS NULL OR capacity_mah = ?4)
+  AND (?5 IS NULL OR voltage_s IS NULL OR voltage_s = ?5)
+`;
+
+function bindTypedSpec(stmt, specKey) {
+  const typed = parseSpecKey(specKey);
+  return stmt.bind(specKey, typed.current_A, typed.kv, typed.capacity_mah, typed.voltage_s);
+}
+
+// Fetch catalog candidates for every distinct spec_key (hot cache, then one D1 batch)
+// filterName is a key of SOURCE_FILTERS
+// Returns Map: spec_key -> variant rows (cheapest first)
+async function fetchCandidateRows(env, ctx, specKeys, filterName) {
+  const keys = [...new Set(specKeys.filter(Boolean))];
+  const rowsBySpecKey = new Map();
+  if (keys.length === 0) return rowsBySpecKey;
+
+  const sourceFilter = SOURCE_FILTERS[filterName];
+  const cached = await readThrough(env, ctx, {
+    lru: candidateLru,
+    stats: cacheStats.candidates,
+    keys: keys.map(k => candidateCacheKey(filterName, k)),
+    ttlSeconds: HOT_CACHE_KV_TTL_S,
+    load: async (cacheKeys) => {
+      const missingSpecKeys = cacheKeys.map(ck => keys.find(k => candidateCacheKey(filterName, k) === ck));
+      const stmt = env.DB.prepare(`
+        SELECT * FROM product_variants
+        WHERE ${TYPED_SPEC_FILTER} AND source IN ${sourceFilter}
+        ORDER BY unit_price_usd ASC, rating DESC
+        LIMIT ${MAX_CANDIDATES}
+      `);
+      const batchResults = await env.DB.batch(missingSpecKeys.map(k => bindTypedSpec(stmt, k)));
+      return new Map(cacheKeys.map((ck, i) => [ck, batchResults[i].results || []]));
+    }
+  });
+
+  for (const k of keys) rowsBySpecKey.set(k, cached.get(candidateCacheKey(filterName, k)) || []);
+  return rowsBySpecKey;
+}
+
+// Enqueue crawl keywords for lines without catalog data and read back their status
+// entries: [{ keyword, canonical_type, spec_key }]. Returns Map: keyword -> status
+async function enqueueCrawlKeywords(db, entries) {
+  const byKeyword = new Map();
+  for (const e of entries) {
+    if (!byKeyword.has(e.keyword)) byKeyword.set(e.keyword, e);
+  }
+  const keywords = [...byKeyword.keys()];
+  const statuses = new Map();
+  if (keywords.length === 0) return statuses;
+
+  const now = Date.now();
+  const insertStmt = db.prepare(`
+    INSERT INTO crawl_keywords(keyword, canonical_type, spec_key, priority, status, fail_count, last_updated)
+    VALUES(?, ?, ?, 1, 'pending', 0, ?)
+    ON CONFLICT(keyword) DO UPDATE SET
+      spec_key = COALESCE(spec_key, excluded.spec_key),
+      priority = MAX(priority, excluded.priority),
+      status = CASE WHEN status = 'done' THEN 'done' ELSE 'pending' END
+  `);
+  const statusStmt = db.prepare(`SELECT keyword, status FROM crawl_keywords WHERE keyword = ?`);
+
+  // Enqueue only meaningful keywords, but report status for all of them
+  const inserts = keywords
+    .filter(k => k.length > 3)
+    .map(k => insertStmt.bind(k, byKeyword.get(k).canonical_type || "UNKNOWN", byKeyword.get(k).spec_key || null, now));
+  const batchResults = await db.batch([...inserts, ...keywords.map(k => statusStmt.bind(k))]);
+
+  keywords.forEach((k, i) => {
+    const row = batchResults[inserts.length + i].results?.[0];
+    if (row) statuses.set(k, row.status);
+  });
+  return statuses;
+}
+
+// Re-query D1 for keywords the cron has already crawled (any source)
+// Returns Map: spec_key -> variant rows
+async function fetchRecheckRows(db, specKeys) {
+  const keys = [...new Set(specKeys.filter(Boolean))];
+  const rowsBySpecKey = new Map();
+  if (keys.length === 0) return rowsBySpecKey;
+
+  const stmt = db.prepare(`
+    SELECT * FROM product_variants
+    WHERE ${TYPED_SPEC_FILTER}
+    ORDER BY unit_price_usd ASC, rating DESC
+    LIMIT 5
+  `);
+  const batchResults = await db.batch(keys.map(k => bindTypedSpec(stmt, k)));
+  keys.forEach((k, i) => rowsBySpecKey.set(k, batchResults[i].results || []));
+  return rowsBySpecKey;
+}
+
+// Fuzzy fallback for lines without a precise spec_key: trigram FTS over brand/model/label
+// (db/schema_variant_fts.sql) within the line's part type, re-scored by similarity.
+// The type is matched on the spec_key prefix ("SERVO:"): generateSpecKey normalizes it,
+// canonical_item is stored as each ingest path spells it ("Servo", "SERVO")
+// entries: [{ keyword, spec_key }]. Returns Map: keyword -> candidates (with similarity, best first)
+async function fetchFuzzyMatches(db, entries, filterName = "prod") {
+  const matches = new Map();
+  const byKeyword = new Map(entries.map(e => [e.keyword, e.spec_key]));
+  const queries = [...byKeyword]
+    .map(([keyword, specKey]) => ({ keyword, typePrefix: `${(specKey || "").split(":")[0]}:`, fts: buildFtsQuery(keyword) }))
+    .filter(q => q.fts && q.typePrefix.length > 1);
+  if (queries.length === 0) return matches;
+
+  const stmt = db.prepare(`
+    SELECT v.*
+    FROM variant_search s
+    JOIN product_variants v ON v.rowid = s.rowid
+    WHERE variant_search MATCH ? AND v.spec_key LIKE ? || '%' AND v.source IN ${SOURCE_FILTERS[filterName]}
+    ORDER BY bm25(variant_search)
+    LIMIT 50
+  `);
+  const batchResults = await db.batch(queries.map(q => stmt.bind(q.fts, q.typePrefix)));
+
+  queries.forEach((q, i) => {
+    const ranked = (batchResults[i].results || [])
+      .map(r => ({
+        ...variantRowToCandidate(r),
+        similarity: trigramSimilarity(q.keyword, `${r.brand || ""} ${r.model || ""} ${r.variant_label || ""}`)
+      }))
+      .filter(c => c.similarity >= FUZZY_MIN_SIMILARITY)
+      .sort((a, b) => b.similarity - a.similarity)
+      .slice(0, FUZZY_MAX_MATCHES);
+    if (ranked.length > 0) matches.set(q.keyword, ranked);
+  });
+  return matches;
+}
+
+// Brand/model parsing, pack normalization and scoring for one BOM line
+// Returns candidates sorted best-first with the first marked as default
+function rankCandidates(candidates, trustMemory) {
+  const allCandidates = candidates.map((c, idx) => {
+    let brand = c.brand;
+    if ((!brand || brand === "Unknown") && c.title) {
+      // Fallback: extract from title, ignoring quantity prefixes (e.g. 4PCS, 10X)
+      const cleanTitle = c.title.replace(/^(\d+\s*[xX]?\s*|(\d+\s*PCS\s*))/i, "").trim();
+      const brandMatch = cleanTitle.match(/^(\w+)/);
+      brand = brandMatch ? brandMatch[1] : "Unknown";
+    }
+    if (!brand) brand = "Unknown";
+
+    // variant_label: exact variant from AliExpress selector (immutable)
+    const variantLabel = c.variant || "";
+
+    // Extract pack quantity from variant label (e.g., "4Pcs LITTLEBEE 30A" → 4)
+    const packQty = extractPackQty(variantLabel);
+
+    // Clean variant name: strip quantity words, keep variant identity only
+    const cleanVariant = stripQtyWords(variantLabel) || variantLabel;
+
+    // display_label: pack + clean variant ONLY (never includes listing_title)
+    const displayLabel = packQty > 1
+      ? `${packQty}Pcs ${cleanVariant} `
+      : cleanVariant ? `1Pc ${cleanVariant} ` : variantLabel;
+
+    const packPriceUsd = toUsd(c.price_value, c.price_currency);
+    const packPriceLocal = c.price_value;
+
+    // Normalize to unit price (pack price / pack quantity)
+    const unitPriceUsd = packPriceUsd != null ? Math.round((packPriceUsd / packQty) * 10000) / 10000 : null;
+    const unitPriceLocal = packPriceLocal / packQty;
+
+    const priceConfidence = calculateConfidenceDecay(0.85, c.last_updated);
+
+    // Calculate feedback score from trust signals
+    const feedbackScore = calculateFeedbackScore(
+      c.seller?.rating,
+      c.review_count,
+      c.sold_count,
+      c.store_years,
+      c.has_choice,
+      c.has_photos
+    );
+
+    // Get brand preference from user memory (Trust)
+    const supplierName = c.seller?.name || "";
+    const trust = getTrustScore(trustMemory, brand, supplierName);
+    const trustScore = trust.score; // Max 0.3
+
+    // Final score formula:
+    // Price: 45%, Variant Match: 20%, Feedback: 20%, Trust: 15%
+    // Normalized roughly to 0-1
+    const priceScore = priceConfidence;
+    const matchScore = c.similarity ?? 0.85; // Variant match assumed high if in this list (fuzzy: trigram similarity)
+
+    const finalScore =
+      priceScore * 0.45 +
+      matchScore * 0.20 +
+      feedbackScore * 0.20 +
+      trustScore * 0.15 * (1 / 0.3); // Normalize trust (0.3 max) to scale influence?
+    // Wait, prompt says: trust_score * 0.15.
+    // If max trust_score is 0.3, then max boost is 0.3 * 0.15 = 0.045
+    // But prompt also says "Trust never exceeds 15%".
+    // If trust_score is literally 0.0 to 0.3, then sticking to additive 0.15 * (trust/0.3) makes sense if we want full 15% range.
+    // Or just trust * 0.15 if the score is already 0-1.
+    // The prompt says "trust_score += 0.05, max 0.3".
+    // And formula: `price_score * 0.45 + variant_match * 0.20 + feedback_score * 0.20 + trust_score * 0.15`.
+    // If trust_score is max 0.3, then max contribution is 0.045 (4.5%).
+    // User might mean trust itself is a component 0-1.
+    // "Trust never exceeds 15%" -> Usually means max *weight* is 15%.
+    // I'll leave it as `trustScore * 0.5` effectively to boost it?
+    // Let's normalize it: (trustScore / 0.3) * 0.15. That gives exactly 15% power when fully trusted.
+
+    const normalizedTrust = (trustScore / 0.3);
+    const calcScore =
+      priceConfidence * 0.45 +
+      matchScore * 0.20 +
+      feedbackScore * 0.20 +
+      normalizedTrust * 0.15;
+
+    // Re-assign for consistency
+    const finalScoreVal = calcScore;
+    const risk = finalScore >= 0.8 ? "LOW" : finalScore >= 0.6 ? "MEDIUM" : "HIGH";
+
+    return {
+      id: `cand_${idx}_${c.current_A} a`,
+      variant_id: c.variant_id, // For price history lookup
+      brand,
+      // Three separate label fields (IMPORTANT)
+      listing_title: c.title,          // Marketing title from listing
+      variant_label: variantLabel,     // Exact variant from selector
+      display_label: displayLabel,     // Pack + variant for UI/CSV
+      model: displayLabel,             // Backward compat
+      // Pack pricing (original)
+      pack_qty: packQty,
+      pack_price_usd: packPriceUsd,
+      pack_price_local: packPriceLocal,
+      // Normalized unit pricing
+      unit_price_usd: unitPriceUsd,
+      unit_price_local: unitPriceLocal,
+      local_currency: c.price_currency,
+      // Feedback signals for trust scoring
+      feedback: {
+        rating: c.seller?.rating || 0,
+        reviews: c.review_count,
+        sold: c.sold_count,
+        store_years: c.store_years,
+        choice: !!c.has_choice,
+        photos: !!c.has_photos,
+        score: feedbackScore
+      },
+      // Trust signals from user memory
+      trust: {
+        score: trustScore,
+        select_count: trust.select_count,
+        is_trusted: trust.select_count >= 3
+      },
+      confidence: priceConfidence,
+      final_score: Math.round(finalScoreVal * 100) / 100,
+      risk,
+      remark: c.seller?.name || "AliExpress Seller",
+      variant_verified: true,
+      stock_ok: true,
+      product_url: c.product_url,
+      last_updated: c.last_updated,
+      default: false,
+      is_estimate: !!c.is_estimate,
+      ...(c.similarity != null && { match_type: "fuzzy", similarity: c.similarity })
+    };
+  });
+
+  // Sort by final_score desc, then price asc
+  allCandidates.sort((a, b) => {
+    if (b.final_score !== a.final_score) return b.final_score - a.final_score;
+    return (a.unit_price_usd || 999) - (b.unit_price_usd || 999);
+  });
+
+  // Mark first as default
+  if (allCandidates.length > 0) {
+    allCandidates[0].default = true;
+  }
+
+  return allCandidates;
+}
+
+// --- Light Crawl Wait Helpers ---
+
+// Build AliExpress search URL for manual fallback
+function buildAliExpressSearchUrl(keyword) {
+  const encoded = encodeURIComponent(keyword);
+  return `https://www.aliexpress.com/wholesale?SearchText=${encoded}`;
+}
+
+// Poll D1 for ingested variants (max timeout)
+async function waitForIngestedVariants(db, specKey, sourceFilter, timeoutMs) {
+  const start = Date.now();
+
+  while (Date.now() - start < timeoutMs) {
+    const { results } = await bindTypedSpec(db.prepare(`
+      SELECT * FROM product_variants
+      WHERE ${TYPED_SPEC_FILTER} AND source IN ${sourceFilter}
+      ORDER BY unit_price_usd ASC
+      LIMIT 10
+    `), specKey).all();
+
+    if (results && results.length > 0) {
+      return results;
+    }
+
+    // Wait before next poll
+    await new Promise(r => setTimeout(r, LIGHT_CRAWL_POLL_MS));
+  }
+
+  return null; // Timeout - no data arrived
+}
+
+// --- Cloudflare AI Search (DISABLED - was generating fake prices) ---
+// Browser Rendering integration needed for real price extraction
+async function searchWithAI(env, keyword, canonicalType, specKey, source) {
+  // DISABLED: AI cannot access real AliExpress prices
+  // This was hallucinating prices based on training data
+  // TODO: Replace with Cloudflare Browser Rendering when available
+  console.log(`[AI Search] DISABLED - keyword: ${keyword}. Use Browser Rendering for real prices.`);
+  return []; // Return empty to trigger SEARCHING fallback with manual link
+}
+
+// 4️⃣ VARIANT RESOLUTION FUNCTION (ALIEXPRESS)
+async function resolveAliExpressVariant(productUrl, env) {
+  if (!env.ANTI_GRAVITY_ENDPOINT || !env.ANTI_GRAVITY_KEY) {
+    console.error("Missing ANTI_GRAVITY_ENDPOINT or ANTI_GRAVITY_KEY");
+    // Fail gracefully so we can fallback to product page
+    return null;
+  }
+
+  const isSearchUrl = productUrl.includes("/w/") || productUrl.includes("wholesale");
+
+  const prompt = `System: You are a fast browser agent.
+Task:
+Open the provided URL.
+${isSearchUrl ? "This is a search page. Locate the FIRST product in the results list. Get its link." : "This is a product page."}
+
+Action:
+${isSearchUrl ? "Extract the HREF of the first product card." : "Locate the variant selection section."}
+
+Extract:
+${isSearchUrl ? "- first_product_url (the href of the first result)" : "- sku_id\n- propertyIds"}
+
+Output JSON:
+{
+  "first_product_url": "...",
+  "sku_id": "...",
+  "propertyIds": "..."
+}`;
+
+  const agentPayload = {
+    task: "resolve_variant",
+    prompt: prompt, // Dynamic prompt override
+    url: productUrl,
+    rules: {
+      abort_on_captcha: true,
+      no_images: true,
+      extract: ["sku_id", "propertyIds"]
+    }
+  };
+
+  try {
+    const resp = await fetch(env.ANTI_GRAVITY_ENDPOINT, {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+        "Authorization": `Bearer ${env.ANTI_GRAVITY_KEY}`
+      },
+      body: JSON.stringify(agentPayload)
+    });
+
+    if (!resp.ok) {
+      console.error("Anti-Gravity API error:", resp.status, await resp.text());
+      return null;
+    }
+
+    const data = await resp.json();
+
+    if (data.first_product_url) {
+      // We extracted a specific product URL from the search page
+      // Append a ref to ensure we know it came from us
+      const cleanUrl = data.first_product_url.split('?')[0];
+      return { variant_url: cleanUrl };
+    }
+
+    if (data.current_url && data.current_url.includes("/item/")) {
+      // We navigated to a product page!
+      return { variant_url: data.current_url };
+    }
+
+    if (data.sku_id) {
+      return {
+        variant_url: `${productUrl}?sku_id=${data.sku_id}`
+      };
+    }
+
+    if (data.propertyIds) {
+      return {
+        variant_url: `${productUrl}?propertyIds=${data.propertyIds}`
+      };
+    }
+  } catch (e) {
+    console.error("Resolution exception:", e);
+    return null;
+  }
+
+  return null;
+}
+
+// Returns the route's Response, or null when no pricing route matches
+export async function handle(req, env, ctx, url) {
+  // 📈 API: Price trend for one variant (raw recent points + daily/weekly rollups)
+  if (url.pathname === "/api/price-history" && req.method === "GET") {
+    const variantId = url.searchParams.get("variant_id");
+    if (!variantId) {
+      return Response.json({ error: "variant_id required" }, { status: 400 });
+    }
+    const filterName = url.searchParams.get("source") === "rc_test" ? "rc_test" : "prod";
+
+    try {
+      const series = await getPriceSeries(env.DB, variantId, filterName);
+
+      // One point per bucket (weekly, then daily, then raw), newest first for computePriceTrend
+      const points = [
+        ...series.weekly.map(r => ({ unit_price_usd: r.last_price, stock: r.last_stock, recorded_at: r.bucket_start })),
+        ...series.daily.map(r => ({ unit_price_usd: r.last_price, stock: r.last_stock, recorded_at: r.bucket_start })),
+        ...series.raw
+      ].reverse();
+      const buckets = [...series.weekly, ...series.daily];
+      const lows = [...buckets.map(r => r.min_price), ...series.raw.map(r => r.unit_price_usd)];
+      const highs = [...buckets.map(r => r.max_price), ...series.raw.map(r => r.unit_price_usd)];
+
+      return Response.json({
+        variant_id: variantId,
+        trend: computePriceTrend(points),
+        min_price: lows.length ? Math.min(...lows) : null,
+        max_price: highs.length ? Math.max(...highs) : null,
+        ...series
+      }, {
+        headers: {
+          "Access-Control-Allow-Origin": "*",
+          "Cache-Control": "public, max-age=3600"
+        }
+      });
+    } catch (e) {
+      return Response.json({ error: e.message }, { status: 500 });
+    }
+  }
+
+  // ═══════════════════════════════════════════════════════════════
+  // 📖 SHAREABLE PRODUCT LINK (Read-only, no auth)
+  // ═══════════════════════════════════════════════════════════════
+  if (url.pathname.startsWith("/product/") && req.method === "GET") {
+    const productId = url.pathname.split("/").pop();
+
+    if (!productId) {
+      return Response.json({ error: "Product ID required" }, { status: 400 });
+    }
+
+    try {
+      // Edge copy first: repeated share-link hits skip D1 entirely
+      const cacheKey = snapshotCacheKey(url, productId);
+      const cached = await caches.default.match(cacheKey);
+      if (cached) {
+        return notModified(req, cached) || cached;
+      }
+
+      // Try snapshot next
+      const snapshot = await env.DB.prepare(
+        "SELECT data, data_gz, content_hash, updated_at FROM product_snapshots WHERE product_id = ?"
+      ).bind(productId).first();
+
+      if (snapshot) {
+        // Compressed rows hold the finished body; older rows are re-serialized once here
+        const body = snapshot.data_gz
+          ? await gunzipText(snapshot.data_gz)
+          : JSON.stringify({
+            product_id: productId,
+            source: "snapshot",
+            updated_at: snapshot.updated_at,
+            ...JSON.parse(snapshot.data)
+          });
+        const etag = snapshot.content_hash || await sha256Hex(body);
+        const res = new Response(body, { headers: productResponseHeaders(etag, snapshot.updated_at) });
+        ctx.waitUntil(caches.default.put(cacheKey, res.clone()));
+        return notModified(req, res) || res;
+      }
+
+      // Fallback: build from product_variants
+      const variants = await env.DB.prepare(`
+          SELECT variant_label, unit_price_usd as price, currency, stock, product_url
+          FROM product_variants 
+          WHERE product_id = ?
+                ORDER BY unit_price_usd ASC
+                  `).bind(productId).all();
+
+      if (!variants.results || variants.results.length === 0) {
+        return Response.json({
+          error: "Product not found",
+          hint: "This product hasn't been ingested yet. Use Nova desktop helper to add it."
+        }, { status: 404 });
+      }
+
+      const body = JSON.stringify({
+        product_id: productId,
+        source: "variants",
+        variants: variants.results,
+        product_url: variants.results[0]?.product_url || null
+      });
+      const res = new Response(body, { headers: productResponseHeaders(await sha256Hex(body), null) });
+      return notModified(req, res) || res;
+
+    } catch (e) {
+      return Response.json({ error: e.message }, {
+        status: 500,
+        headers: { "Access-Control-Allow-Origin": "*" }
+      });
+    }
+  }
+
+  // Preference recording endpoint (User Trust)
+  if (url.pathname === "/api/preference" && req.method === "POST") {
+    try {
+      const userKey = req.headers.get("X-BOM-User");
+      if (!userKey) {
+        return Response.json({ error: "Missing X-BOM-User header" }, { status: 400 });
+      }
+      const body = await req.json();
+      const { brand, supplier } = body;
+      if (!brand) {
+        return Response.json({ error: "Missing brand" }, { status: 400 });
+      }
+      recordTrustSelection(env, ctx, userKey, brand, supplier);
+      flushCacheStats(env, ctx);
+      return Response.json({
+        status: "ok",
+        message: "Trust preference recorded",
+        brand,
+        supplier
+      }, {
+        headers: { "Access-Control-Allow-Origin": "*" }
+      });
+    } catch (e) {
+      return Response.json({ error: e.message }, { status: 500 });
+    }
+  }
+
+  // 3️⃣ WORKER ENDPOINT — EXACT CODE
+  if (url.pathname === "/api/resolve" && req.method === "GET") {
+    try {
+      const variantId = url.searchParams.get("variant_id");
+
+      if (!variantId) {
+        return new Response("Missing variant_id", { status: 400 });
+      }
+
+      // 1️⃣ Fetch variant record
+      const row = await env.DB.prepare(`
+          SELECT variant_id, product_url, variant_url, link_status
+          FROM product_variants
+          WHERE variant_id = ?
+                LIMIT 1
+                  `).bind(variantId).first();
+
+      if (!row) {
+        return new Response("Variant not found", { status: 404 });
+      }
+
+      // 2️⃣ Already resolved → redirect
+      if (row.link_status === "resolved" && row.variant_url) {
+        return Response.redirect(row.variant_url, 302);
+      }
+
+      // 3️⃣ Resolve PDP + variant (ONE TIME)
+      const resolved = await resolveAliExpressVariant(row.product_url, env);
+
+      // Fallback to product page if resolution fails or returns null
+      const finalUrl = (resolved && resolved.variant_url) ? resolved.variant_url : row.product_url;
+
+      // 4️⃣ Persist resolution (only if actually resolved)
+      if (resolved && resolved.variant_url) {
+        await env.DB.prepare(`
+            UPDATE product_variants
+            SET variant_url = ?, link_status = 'resolved'
+            WHERE variant_id = ?
+                `).bind(resolved.variant_url, variantId).run();
+      }
+
+      // 5️⃣ Redirect
+      return Response.redirect(finalUrl, 302);
+
+    } catch (e) {
+      console.error("Endpoint /api/resolve error:", e);
+      return new Response("Internal Server Error: " + e.message, { status: 500 });
+    }
+  }
+
+  // 💰 BOM Pricing API
+  if ((url.pathname === "/api/price" || url.pathname === "/") && req.method === "POST") {
+    try {
+      let body;
+      try {
+        body = await req.json();
+      } catch {
+        return Response.json({ status: "error", message: "Invalid JSON" }, { status: 400 });
+      }
+
+      const startedAt = Date.now();
+      let bomText = body.bom;
+      const deltaLines = Array.isArray(body.lines) ? body.lines : null;
+      if ((!bomText || typeof bomText !== "string") && !deltaLines) {
+        return Response.json({ status: "error", message: "Missing 'bom' field" }, { status: 400 });
+      }
+
+      // RC Hobby Test Mode detection
+      const isRCTest = req.headers.get("X-Test-Mode") === "rc_hobby"
+        || url.searchParams.get("test") === "rc";
+      const sourceFilterName = isRCTest ? "rc_test" : "prod";
+
+      // Get user key for personalized brand preferences
+      const userKey = req.headers.get("X-BOM-User") || null;
+
+      // 0. Delta mode: previous result token (see loadPriceToken)
+      const previous = body.token ? await loadPriceToken(env, body.token) : null;
+      if (deltaLines) {
+        const unknown = deltaLines.filter(l => typeof l?.text !== "string" && !previous?.lines[l?.hash]);
+        if (unknown.length > 0) {
+          return Response.json({
+            status: "error",
+            code: "TOKEN_EXPIRED",
+            message: "Unknown result token or line hash - resend the full BOM",
+            missing: unknown.map(l => l?.hash ?? null)
+          }, { status: 409, headers: { "Access-Control-Allow-Origin": "*" } });
+        }
+        bomText = deltaLines.map(l => typeof l.text === "string" ? l.text : previous.lines[l.hash].raw).join("\n");
+      }
+
+      // 1. Parse BOM
+      let bomItems = parseBom(bomText);
+      let truncated = false;
+      if (bomItems.length > MAX_BOM_LINES) {
+        bomItems = bomItems.slice(0, MAX_BOM_LINES);
+        truncated = true;
+      }
+      const hashes = await Promise.all(bomItems.map(b => lineHash(b.raw)));
+
+      // 1a. Delta: reuse token lines unless the trust memory or their spec_key data changed since
+      const trustPromise = userKey ? getTrustScores(env, ctx, userKey) : Promise.resolve({});
+      const trustHashOf = async (memory) => userKey ? (await sha256Hex(JSON.stringify(memory))).slice(0, 16) : null;
+      const tokenEntries = previous && previous.filter === sourceFilterName && previous.user === userKey
+        ? hashes.map(h => previous.lines[h] || null)
+        : [];
+      let reused = bomItems.map(() => null);
+      if (tokenEntries.some(e => e && isReusableResult(e.result))) {
+        const [memory, specUpdates] = await Promise.all([
+          trustPromise,
+          fetchSpecKeyUpdates(env.DB, tokenEntries.filter(Boolean).map(e => e.spec_key))
+        ]);
+        if (previous.trust_hash === await trustHashOf(memory)) {
+          reused = tokenEntries.map(e => {
+            if (!e || !isReusableResult(e.result)) return null;
+            if (e.spec_key && (specUpdates.get(e.spec_key) || 0) > previous.created_at) return null;
+            return e.result;
+          });
+        }
+      }
+      const pricedItems = bomItems
+        .map((b, index) => ({ b, index }))
+        .filter(({ index }) => !reused[index]);
+
+      // Record BOM demand per spec_key for crawl scoring (off the response path, test traffic excluded)
+      // Lines reused from a result token were already counted
+      if (!isRCTest) {
+        const demand = new Map();
+        for (const { b } of pricedItems) {
+          if (b.canonical_type && b.spec_key) demand.set(b.spec_key, (demand.get(b.spec_key) || 0) + 1);
+        }
+        ctx.waitUntil(recordSpecDemand(env.DB, demand)
+          .catch(e => console.error("[Demand] Record failed:", e.message)));
+
+        // Spec keys priced together feed sibling prefetch (crawler/prefetch.js), whole BOMs only
+        if (pricedItems.length === bomItems.length) {
+          ctx.waitUntil(recordSpecCooccurrence(env.DB, bomItems.filter(b => b.canonical_type).map(b => b.spec_key))
+            .catch(e => console.error("[Prefetch] Co-occurrence record failed:", e.message)));
+        }
+      }
+
+      // 2. Query Variant Catalog (Primary Source) - one batch for all distinct spec_keys,
+      //    in parallel with the user's trust memory
+      const [trustMemory, candidateRows] = await Promise.all([
+        trustPromise,
+        fetchCandidateRows(
+          env,
+          ctx,
+          // "<TYPE>:UNKNOWN" lumps unrelated parts together, those lines go to the fuzzy lookup
+          pricedItems.filter(({ b }) => b.canonical_type && !b.spec_key?.endsWith(":UNKNOWN")).map(({ b }) => b.spec_key),
+          sourceFilterName
+        )
+      ]);
+
+      const lines = pricedItems.map(({ b, index }) => {
+        if (!b.canonical_type) return { bom: b, index, status: "INVALID_LINE" };
+        const rows = (b.spec_key && candidateRows.get(b.spec_key)) || [];
+        return {
+          bom: b,
+          index,
+          candidates: rows.map(variantRowToCandidate),
+          cleanKeyword: b.raw.replace(/x\d+$/i, "").trim()
+        };
+      });
+
+      // 3a. Lines without a precise spec_key: near-matches already in the catalog (trigram FTS)
+      const fuzzyLines = lines.filter(l => !l.status && l.candidates.length === 0 && !isPreciseSpecKey(l.bom.spec_key));
+      if (fuzzyLines.length > 0) {
+        try {
+          const fuzzy = await fetchFuzzyMatches(env.DB, fuzzyLines.map(l => ({
+            keyword: l.cleanKeyword,
+            spec_key: l.bom.spec_key
+          })), sourceFilterName);
+          for (const l of fuzzyLines) {
+            l.candidates = fuzzy.get(l.cleanKeyword) || [];
+            l.fuzzy = l.candidates.length > 0;
+          }
+        } catch (e) {
+          console.error("[BOM] Fuzzy lookup failed:", e.message);
+        }
+      }
+
+      // 3b. Lines without catalog data: enqueue crawl keywords for async processing via cron,
+      //    then re-query D1 for keywords a previous cron run already finished
+      const missing = lines.filter(l => !l.status && l.candidates.length === 0);
+      if (missing.length > 0) {
+        for (const l of missing) {
+          console.log(`[BOM] No D1 data for "${l.cleanKeyword}" - triggering auto - crawl`);
+        }
+        const keywordStatus = await enqueueCrawlKeywords(env.DB, missing.map(l => ({
+          keyword: l.cleanKeyword,
+          canonical_type: l.bom.canonical_type,
+          spec_key: l.bom.spec_key
+        })));
+        const doneLines = missing.filter(l => keywordStatus.get(l.cleanKeyword) === "done");
+        const recheckRows = await fetchRecheckRows(env.DB, doneLines.map(l => l.bom.spec_key));
+
+        for (const l of missing) {
+          if (keywordStatus.get(l.cleanKeyword) !== "done") {
+            // Keyword is pending - needs Nova crawl
+            l.status = "PENDING_CRAWL";
+            continue;
+          }
+          const rows = (l.bom.spec_key && recheckRows.get(l.bom.spec_key)) || [];
+          l.candidates = rows.map(recheckRowToCandidate);
+        }
+      }
+
+      // 4. Rank candidates per line (brand/model parsing, pack normalization, scoring)
+      for (const l of lines) {
+        if (l.status) continue;
+        l.ranked = rankCandidates(l.candidates, trustMemory);
+      }
+
+      // 5. Price trend computation (only for selected candidates - performance), one batch
+      const histories = await getRecentPriceHistories(
+        env,
+        ctx,
+        lines.filter(l => l.ranked?.length > 0).map(l => l.ranked[0].variant_id),
+        sourceFilterName
+      );
+      flushCacheStats(env, ctx);
+
+      // 6. Assemble results, merged with the reused lines in BOM order
+      const priced = lines.map(l => {
+        const b = l.bom;
+        if (l.status === "INVALID_LINE") return { bom: b, status: "INVALID_LINE" };
+
+        if (l.status === "PENDING_CRAWL") {
+          return {
+            bom: b,
+            status: "PENDING_CRAWL",
+            message: "No data yet. Run Nova crawler with this keyword to populate.",
+            manual_url: buildAliExpressSearchUrl(l.cleanKeyword),
+            crawl_keyword: l.cleanKeyword
+          };
+        }
+
+        // Nova ACT Ranking (for backward compatibility)
+        const nova = novaRank(b, l.candidates);
+        // If we have candidates, we prefer our own sorting.
+        // Nova logic was mock.
+        const selected = l.ranked[0]; // Pick best candidate
+
+        if (!selected) {
+          return {
+            bom: b,
+            status: "PENDING_CRAWL",
+            message: "Fetching from trusted source...",
+            crawl_keyword: l.cleanKeyword,
+            manual_url: buildAliExpressSearchUrl(l.cleanKeyword)
+          };
+        }
+
+        const priceTrend = selected.variant_id
+          ? computePriceTrend(histories.get(selected.variant_id))
+          : { trend: "stable", change_pct: 0, data_points: 0 };
+
+        // Currency Conversion
+        const unitPriceUsd = toUsd(selected.price_value, selected.price_currency);
+        const totalPriceUsd = unitPriceUsd != null ? unitPriceUsd * b.qty : null;
+
+        // Apply confidence decay based on price age (and match similarity for fuzzy lines)
+        const decayedScore = calculateConfidenceDecay(nova.match_score * (selected.similarity ?? 1), selected.last_updated);
+
+        return {
+          bom: b,
+          // Near-matches of an imprecise line are not the part the BOM asked for
+          status: l.fuzzy ? "FUZZY_MATCH" : "MATCHED",
+          match_type: l.fuzzy ? "fuzzy" : "exact",
+          selected,
+          unit_price_usd: unitPriceUsd,
+          total_price_usd: totalPriceUsd,
+          unit_price_local: selected.price_value,
+          local_currency: selected.price_currency,
+          fx_rate_used: FX_RATES[selected.price_currency] || null,
+          match_score: decayedScore,
+          reasoning: nova.reasoning,
+          price_age: selected.last_updated,
+          // Price trend info
+          price_trend: priceTrend.trend,
+          price_change_pct: priceTrend.change_pct,
+          price_history_points: priceTrend.data_points,
+          // Candidates array (limited for performance)
+          candidates: l.ranked.slice(0, MAX_PRODUCTS_PER_ITEM)
+        };
+      });
+
+      const results = [...reused];
+      lines.forEach((l, i) => { results[l.index] = priced[i]; });
+
+      // 6a. New result token: every line of this response by hash
+      const tokenLines = {};
+      bomItems.forEach((b, i) => {
+        tokenLines[hashes[i]] = { raw: b.raw, spec_key: b.spec_key || null, result: results[i] };
+      });
+      const resultToken = savePriceToken(env, ctx, {
+        created_at: startedAt,
+        filter: sourceFilterName,
+        user: userKey,
+        trust_hash: await trustHashOf(trustMemory),
+        lines: tokenLines
+      });
+
+      // 7. Return Response (JSON or CSV)
+      const format = url.searchParams.get("format");
+
+      if (format === "csv") {
+        const csv = toCSV(results);
+        return new Response(csv, {
+          headers: {
+            "Content-Type": "text/csv; charset=utf-8",
+            "Content-Disposition": 'attachment; filename="bom.csv"',
+            "Cache-Control": "no-store",
+            "Access-Control-Allow-Origin": "*"
+          }
+        });
+      }
+
+      return Response.json(
+        {
+          status: "ok",
+          version: VERSION,
+          test_mode: isRCTest,
+          truncated,
+          currency: "USD",
+          generated_at: new Date().toISOString(),
+          result_token: resultToken,
+          delta: previous ? { reused: reused.filter(Boolean).length, recomputed: lines.length } : null,
+          items: results.map((r, i) => ({ ...r, line_hash: hashes[i] }))
+        },
+        {
+          headers: {
+            "Access-Control-Allow-Origin": "*"
+          }
+        }
+      );
+    } catch (priceError) {
+      console.error("[API/price] Uncaught error:", priceError);
+      return Response.json({
+        status: "error",
+        message: "Internal server error in price handler",
+        error: priceError.message,
+        stack: priceError.stack?.split("\n").slice(0, 5).join("\n")
+      }, {
+        status: 500,
+        headers: { "Access-Control-Allow-Origin": "*" }
+      });
+    }
+  } // End pricing API
+
+  return null;
+}
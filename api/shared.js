@@ -0,0 +1,177 @@
+import { generateSpecKey, extractSpecs } from "../utils/specs.js";
+import { createLru, createCacheStats, invalidateKeys } from "../utils/cache.js";
+
+// Shared by the route modules (api/routes/*.js): source filters, hot cache state,
+// currency conversion, BOM line parsing and conditional responses
+
+// --- Source Filters (which ingestion sources /api/price may price from) ---
+export const SOURCE_FILTERS = {
+  prod: "('prod', 'auto_crawl', 'browser_crawl', 'nova_desktop', 'rc_test')",
+  rc_test: "('prod', 'rc_test', 'test_ingest')"
+};
+
+// --- Hot Cache (isolate LRU in front of KV) ---
+// Module state: one set of LRUs and hit counters per isolate, shared by all route modules
+export const HOT_CACHE_KV_TTL_S = 6 * 60 * 60;    // KV copy lives as long as a crawl cycle
+export const HOT_CACHE_LRU_TTL_MS = 60 * 1000;    // Other isolates may be stale this long after invalidation
+export const HOT_CACHE_LRU_SIZE = 500;            // Entries per isolate LRU
+const CACHE_STATS_FLUSH_MS = 60 * 1000;    // Push isolate hit counters to KV at most once a minute
+
+export const candidateLru = createLru(HOT_CACHE_LRU_SIZE, HOT_CACHE_LRU_TTL_MS);
+export const historyLru = createLru(HOT_CACHE_LRU_SIZE, HOT_CACHE_LRU_TTL_MS);
+export const cacheStats = {
+  candidates: createCacheStats(),
+  price_history: createCacheStats(),
+  parse: createCacheStats(),
+  trust: createCacheStats()
+};
+let cacheStatsFlushed = snapshotCacheStats(Date.now());
+
+// --- Currency Conversion ---
+export const FX_RATES = {
+  LKR: 1 / 320.0,  // 1 USD = 320 LKR
+  USD: 1.0
+};
+
+export function toUsd(value, currency) {
+  const rate = FX_RATES[currency];
+  if (rate == null) return null;
+  return Math.round(value * rate * 10000) / 10000;
+}
+
+// --- BOM Parser (Deterministic) ---
+export function parseBomLine(line) {
+  const upper = line.trim().toUpperCase();
+  // Use standardized spec extraction
+  const extracted = extractSpecs(upper);
+  const qty = extracted.pack_qty;
+  const currentA = extracted.current_A;
+  const kv = extracted.kv;
+  const cells = extracted.voltage_s ? parseInt(extracted.voltage_s) : null;
+  const capacity = extracted.capacity_mah;
+
+  let type = null;
+  if (upper.includes("ESC")) type = "ESC";
+  else if (upper.includes("MOTOR")) type = "Motor";
+  else if (upper.includes("LIPO") || upper.includes("BATTERY")) type = "Battery";
+  else if (upper.includes("PROP") || upper.match(/\d+X\d+/)) type = "Propeller";
+  else if (upper.includes("SERVO")) type = "Servo";
+
+  const specs = { kv, cells, capacity_mah: capacity, current_A: currentA, raw: upper };
+  const spec_key = generateSpecKey(type, specs);
+
+  return {
+    canonical_type: type,
+    current_A: currentA,
+    specs: specs,
+    spec_key: spec_key,
+    qty,
+    raw: upper
+  };
+}
+
+// --- Conditional Responses (product snapshots, UI) ---
+
+export async function sha256Hex(text) {
+  const digest = await crypto.subtle.digest("SHA-256", new TextEncoder().encode(text));
+  return [...new Uint8Array(digest)].map(b => b.toString(16).padStart(2, "0")).join("");
+}
+
+export function snapshotCacheKey(url, productId) {
+  return new Request(`${url.origin}/product/${encodeURIComponent(productId)}`);
+}
+
+// 304 when If-None-Match lists the ETag (or If-Modified-Since covers Last-Modified)
+export function notModified(req, res) {
+  const etag = res.headers.get("ETag");
+  const ifNoneMatch = req.headers.get("If-None-Match");
+  if (ifNoneMatch) {
+    const tags = ifNoneMatch.split(",").map(t => t.trim().replace(/^W\//, ""));
+    if (!(tags.includes("*") || tags.includes(etag))) return null;
+  } else {
+    const since = Date.parse(req.headers.get("If-Modified-Since") || "");
+    const modified = Date.parse(res.headers.get("Last-Modified") || "");
+    if (isNaN(since) || isNaN(modified) || modified > since) return null;
+  }
+  const headers = new Headers();
+  for (const name of ["ETag", "Last-Modified", "Cache-Control", "Access-Control-Allow-Origin"]) {
+    if (res.headers.has(name)) headers.set(name, res.headers.get(name));
+  }
+  return new Response(null, { status: 304, headers });
+}
+
+// --- Hot Cache Keys & Invalidation ---
+
+export function candidateCacheKey(filterName, specKey) {
+  return `cand:v1:${filterName}:${specKey}`;
+}
+
+export function historyCacheKey(filterName, variantId) {
+  return `hist:v1:${filterName}:${variantId}`;
+}
+
+// Called by every path that writes product_variants rows for these spec keys
+export async function invalidateSpecKeys(env, specKeys) {
+  const keys = [];
+  for (const specKey of specKeys) {
+    if (!specKey) continue;
+    for (const filterName of Object.keys(SOURCE_FILTERS)) keys.push(candidateCacheKey(filterName, specKey));
+  }
+  await invalidateKeys(env, candidateLru, keys);
+}
+
+// spec_key a variant is stored under before an upsert (null for a new variant); an upsert that
+// re-keys the variant invalidates it too, so the old key's candidate list drops the variant
+export async function storedSpecKey(db, variantId) {
+  const row = await db.prepare("SELECT spec_key FROM product_variants WHERE variant_id = ?").bind(variantId).first();
+  return row?.spec_key || null;
+}
+
+// Called by every path that appends variant_price_history rows
+export async function invalidatePriceHistory(env, variantIds) {
+  const keys = [];
+  for (const variantId of variantIds) {
+    if (!variantId) continue;
+    for (const filterName of Object.keys(SOURCE_FILTERS)) keys.push(historyCacheKey(filterName, variantId));
+  }
+  await invalidateKeys(env, historyLru, keys);
+}
+
+// Copy of the isolate counters at the last flush
+function snapshotCacheStats(at) {
+  const snapshot = { at };
+  for (const [name, stats] of Object.entries(cacheStats)) snapshot[name] = { ...stats };
+  return snapshot;
+}
+
+// Add this isolate's hit/miss deltas to the shared KV counters (at most once per CACHE_STATS_FLUSH_MS)
+export function flushCacheStats(env, ctx) {
+  if (!env.CACHE || !ctx?.waitUntil) return;
+  const now = Date.now();
+  if (now - cacheStatsFlushed.at < CACHE_STATS_FLUSH_MS) return;
+
+  const deltas = {};
+  for (const [name, stats] of Object.entries(cacheStats)) {
+    const prev = cacheStatsFlushed[name] || createCacheStats();
+    deltas[name] = {
+      lru_hits: stats.lru_hits - prev.lru_hits,
+      kv_hits: stats.kv_hits - prev.kv_hits,
+      misses: stats.misses - prev.misses
+    };
+  }
+  cacheStatsFlushed = snapshotCacheStats(now);
+
+  // Read-modify-write: concurrent isolates can lose a few increments, fine for a dashboard ratio
+  ctx.waitUntil((async () => {
+    const global = (await env.CACHE.get("stats:hot_cache", { type: "json" })) || {};
+    for (const [name, d] of Object.entries(deltas)) {
+      const g = global[name] || createCacheStats();
+      g.lru_hits += d.lru_hits;
+      g.kv_hits += d.kv_hits;
+      g.misses += d.misses;
+      global[name] = g;
+    }
+    global.updated_at = now;
+    await env.CACHE.put("stats:hot_cache", JSON.stringify(global));
+  })().catch(e => console.error("[Cache] Stats flush failed:", e.message)));
+}
@@ -0,0 +1,68 @@
+import indexHtml from "../ui/index.html";
+import appCss from "../ui/app.css";
+import appJs from "../ui/app.js";
+import { sha256Hex, notModified } from "./shared.js";
+
+// Buyer UI (ui/), bundled as text modules (wrangler.toml [[rules]])
+// The page shell revalidates on every view (ETag -> 304). The stylesheet and script are
+// referenced by content-hashed paths (/static/app.<hash>.css) cached for a year, so a
+// repeat view costs one 304 and a deploy that changes an asset changes its URL.
+
+const SHELL_CACHE_CONTROL = "public, max-age=0, must-revalidate";
+const ASSET_CACHE_CONTROL = "public, max-age=31536000, immutable";
+const STALE_ASSET_CACHE_CONTROL = "public, max-age=300"; // hash from an older deploy (or none): short-lived
+const ASSET_HASH_LENGTH = 12;
+
+const ASSETS = {
+  css: { body: appCss, type: "text/css; charset=utf-8" },
+  js: { body: appJs, type: "application/javascript; charset=utf-8" }
+};
+
+// Hashes are computed once per isolate
+let built = null;
+
+function buildUi() {
+  built ??= (async () => {
+    let html = indexHtml;
+    const hashes = {};
+    for (const [ext, asset] of Object.entries(ASSETS)) {
+      hashes[ext] = (await sha256Hex(asset.body)).slice(0, ASSET_HASH_LENGTH);
+      html = html.replace(`"/static/app.${ext}"`, `"/static/app.${hashes[ext]}.${ext}"`);
+    }
+    return { html, etag: `"${(await sha256Hex(html)).slice(0, ASSET_HASH_LENGTH)}"`, hashes };
+  })();
+  return built;
+}
+
+// GET / and /index.html
+export async function serveUi(req) {
+  const ui = await buildUi();
+  const res = new Response(ui.html, {
+    headers: {
+      "Content-Type": "text/html",
+      "Cache-Control": SHELL_CACHE_CONTROL,
+      "ETag": ui.etag,
+      "Access-Control-Allow-Origin": "*"
+    }
+  });
+  return notModified(req, res) || res;
+}
+
+// GET /static/app.<hash>.css|js (null for unknown assets)
+export async function serveAsset(req, url) {
+  const match = url.pathname.match(/^\/static\/app\.(?:([0-9a-f]+)\.)?(css|js)$/);
+  if (!match) return null;
+  const [, hash, ext] = match;
+
+  const ui = await buildUi();
+  const current = hash === ui.hashes[ext];
+  const res = new Response(ASSETS[ext].body, {
+    headers: {
+      "Content-Type": ASSETS[ext].type,
+      "Cache-Control": current ? ASSET_CACHE_CONTROL : STALE_ASSET_CACHE_CONTROL,
+      "ETag": `"${ui.hashes[ext]}"`,
+      "Access-Control-Allow-Origin": "*"
+    }
+  });
+  return notModified(req, res) || res;
+}
@@ -1,11 +1,13 @@
-import { createCrawlTask, dispatchTask } from "./tasks.js";
+import { createCrawlTask, dispatchTasks } from "./tasks.js";
+import { fetchScoredKeywords } from "./priority.js";
 
 // Crawler Orchestrator (Nova ACT / Anti-Gravity)
 // Production-Grade Multi-Keyword Orchestrator
 // Features: Batching, Priority, Failure Classification, Exponential Backoff, Global Circuit Breaker
 
 // Config
-const BATCH_SIZE = 2; // Crawl 2 keywords per run
+const BATCH_SIZE = 2; // Crawl 2 keywords per run (no crawl service: dispatch is only logged)
+const SERVICE_BATCH_SIZE = 10; // Keywords per run with env.CRAWLER_ENDPOINT (override: env.CRAWLER_BATCH_SIZE)
 const RETRY_SOFT_1_MS = 6 * 60 * 60 * 1000; // 6 hours
 const RETRY_SOFT_2_MS = 12 * 60 * 60 * 1000; // 12 hours
 const RETRY_HARD_MS = 24 * 60 * 60 * 1000; // 24 hours
@@ -37,75 +39,64 @@ export async function runOrchestrator(env) {
         }
     }
 
-    // 1. Fetch Batch of Pending Keywords
+    // 1. Fetch Batch of highest-value Keywords (BOM demand x price staleness, see priority.js)
+    // A deployed crawl service (env.CRAWLER_ENDPOINT) takes a larger batch in one request
     const now = Date.now();
-    const { results: keywords } = await env.DB.prepare(`
-      SELECT keyword, canonical_type, priority, fail_count, last_crawled, next_retry, status
-      FROM crawl_keywords
-      WHERE keyword != '__GLOBAL_PAUSE__'
-        AND status IN ('pending', 'done', 'soft_fail') 
-        AND enabled = 1
-        AND (next_retry IS NULL OR next_retry <= ?)
-      ORDER BY priority ASC, last_crawled ASC
-      LIMIT ?
-    `).bind(now, BATCH_SIZE).all();
+    const batchSize = env.CRAWLER_ENDPOINT
+        ? (parseInt(env.CRAWLER_BATCH_SIZE) || SERVICE_BATCH_SIZE)
+        : BATCH_SIZE;
+    const keywords = await fetchScoredKeywords(env.DB, {
+        statuses: ["pending", "done", "soft_fail"],
+        eligibleOnly: true,
+        limit: batchSize,
+        now
+    });
 
     if (!keywords || keywords.length === 0) {
         return { status: "idle", message: "No eligible keywords to crawl" };
     }
 
     const report = { dispatched: [], failures: [] };
-    let globalHardFailTriggered = false;
 
-    // 2. Process Batch
-    for (const task of keywords) {
-        if (globalHardFailTriggered) break;
-
-        console.log(`Preparing task for: ${task.keyword}`);
-
-        try {
-            // 2a. Create Task Payload
-            const crawlTask = createCrawlTask(task.keyword, task.priority);
-
-            // 2b. Insert into crawl_tasks (Pending)
-            await env.DB.prepare(`
-              INSERT INTO crawl_tasks (task_id, keyword, status, created_at)
-              VALUES (?, ?, 'pending', ?)
-            `).bind(crawlTask.task_id, task.keyword, Date.now()).run();
-
-            // 2c. Dispatch Task
-            // In a real scenario, we send this to the crawler service.
-            // For now, we simulate dispatch.
-            const dispatchResult = await dispatchTask(crawlTask, "http://mock-crawler", env.CRAWLER_KEY);
-
-            if (dispatchResult.status === "sent") {
-                // Update Status in crawl_keywords to 'in_progress' (or 'sent')
-                // We keep 'in_progress' to prevent re-selection by scheduler
-                await env.DB.prepare(
-                    "UPDATE crawl_keywords SET status = 'in_progress' WHERE keyword = ?"
-                ).bind(task.keyword).run();
-
-                await env.DB.prepare(
-                    "UPDATE crawl_tasks SET status = 'sent' WHERE task_id = ?"
-                ).bind(crawlTask.task_id).run();
-
-                report.dispatched.push(crawlTask.task_id);
-
-                // Real crawler expected to POST back to /api/crawl/result
-                // No mock simulation - data will remain PENDING until real crawl completes
-                console.log(`[Orchestrator] Task ${crawlTask.task_id} dispatched. Awaiting real crawler callback.`);
-
-            } else {
-                throw new Error("Dispatch failed");
-            }
+    // 2. Create Task Payloads + crawl_tasks rows (Pending)
+    const tasks = keywords.map(k => {
+        console.log(`Preparing task for: ${k.keyword} (score ${k.score})`);
+        return { keyword: k.keyword, payload: createCrawlTask(k.keyword, k.priority) };
+    });
+    await env.DB.batch(tasks.map(t => env.DB.prepare(`
+      INSERT INTO crawl_tasks (task_id, keyword, status, created_at)
+      VALUES (?, ?, 'pending', ?)
+    `).bind(t.payload.task_id, t.keyword, now)));
+
+    // 3. Dispatch all tasks in one request
+    try {
+        const dispatchResult = await dispatchTasks(tasks.map(t => t.payload), env.CRAWLER_ENDPOINT, env.CRAWLER_KEY);
+        if (dispatchResult.status !== "sent") {
+            throw new Error("Dispatch failed");
+        }
 
-        } catch (err) {
-            console.error(`Failed to dispatch task for ${task.keyword}:`, err);
-            await env.DB.prepare(
+        // 'in_progress' prevents re-selection by the scheduler until the crawler calls back
+        await env.DB.batch(tasks.flatMap(t => [
+            env.DB.prepare("UPDATE crawl_keywords SET status = 'in_progress' WHERE keyword = ?").bind(t.keyword),
+            env.DB.prepare("UPDATE crawl_tasks SET status = 'sent' WHERE task_id = ?").bind(t.payload.task_id)
+        ]));
+
+        // Real crawler expected to POST back to /api/crawl/result
+        // No mock simulation - data will remain PENDING until real crawl completes
+        report.dispatched = tasks.map(t => t.payload.task_id);
+        console.log(`[Orchestrator] ${tasks.length} task(s) dispatched. Awaiting crawler callback.`);
+
+    } catch (err) {
+        console.error(`Failed to dispatch ${tasks.length} task(s):`, err);
+        await env.DB.batch(tasks.flatMap(t => [
+            env.DB.prepare(
                 "UPDATE crawl_keywords SET status = 'soft_fail', fail_count = fail_count + 1, next_retry = ?, last_error = ?, error_type = 'dispatch_error' WHERE keyword = ?"
-            ).bind(now + RETRY_SOFT_1_MS, err.message, task.keyword).run();
-            report.failures.push({ keyword: task.keyword, error: err.message });
-        }
+            ).bind(now + RETRY_SOFT_1_MS, err.message, t.keyword),
+            env.DB.prepare(
+                "UPDATE crawl_tasks SET status = 'failed', error_type = 'dispatch_error', completed_at = ? WHERE task_id = ?"
+            ).bind(now, t.payload.task_id)
+        ]));
+        report.failures = tasks.map(t => ({ keyword: t.keyword, error: err.message }));
     }
 
     return report;
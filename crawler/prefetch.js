@@ -0,0 +1,151 @@
+import { DEMAND_DECAY_MS } from "./priority.js";
+import { isPreciseSpecKey } from "../utils/fuzzy_match.js";
+
+// Neighbor Spec Prefetch
+// Buyers price families of parts together (2207 2400KV + 2207 1750KV motors, 4S + 6S 1300mAh packs),
+// so when a keyword is crawled its sibling spec keys are queued as 'prefetch' keywords.
+// Prefetch keywords are never picked by the cron/orchestrator or /api/crawl/pending:
+// the Nova daemon crawls them (/api/crawl/prefetch) only when nothing urgent is waiting,
+// and the next BOM asking for a sibling prices from the catalog instead of PENDING_CRAWL.
+//
+// Siblings of a crawled spec key (see generateSpecKey in utils/specs.js):
+//   co-occurring  spec keys submitted in the same BOMs (spec_cooccurrence, decays like spec_demand)
+//   ladder        one step up/down each dimension: ESC amps, motor KV, battery cells and capacity
+// Spec keys that already have catalog rows or a crawl keyword are skipped.
+
+// Config
+export const PREFETCH_PRIORITY = 0;          // crawl_keywords.priority of a prefetch keyword (BOM lines queue at 1)
+const PREFETCH_PER_CRAWL = 6;                // sibling keywords queued per crawled keyword
+const COOCCURRING_PER_CRAWL = 4;             // ... of which at most this many from BOM co-occurrence
+const MAX_COOCCURRENCE_KEYS = 10;            // spec keys per BOM paired up (pairs grow quadratically)
+const COOCCURRENCE_SAMPLE = 8;               // 1 in N priced BOMs is recorded, counted N times
+
+// Common listing values per dimension, ascending
+const ESC_AMPS = [6, 10, 12, 15, 20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 80, 100, 120];
+const MOTOR_KV = [700, 900, 1000, 1100, 1300, 1400, 1500, 1600, 1700, 1750, 1800, 1900, 1950, 2000,
+    2200, 2300, 2400, 2450, 2550, 2600, 2750, 3000, 3600, 4500, 5000, 6000];
+const BATTERY_CELLS = [1, 2, 3, 4, 6, 8, 12];
+const BATTERY_MAH = [300, 450, 550, 650, 850, 1000, 1300, 1500, 1800, 2200, 3000, 4000, 5000];
+
+// Ladder values just below and above value (value itself need not be on the ladder)
+function ladderNeighbors(ladder, value) {
+    const below = ladder.filter(v => v < value);
+    const above = ladder.filter(v => v > value);
+    return [below[below.length - 1], above[0]].filter(v => v !== undefined);
+}
+
+/**
+ * Adjacent spec keys along each generateSpecKey dimension
+ * "ESC:30A" -> ["ESC:25A", "ESC:35A"], "BATTERY:4S:1300MAH" -> ["BATTERY:3S:1300MAH", "BATTERY:6S:1300MAH",
+ * "BATTERY:4S:1000MAH", "BATTERY:4S:1500MAH"]. Unknown/free-text keys have no neighbors.
+ */
+export function neighborSpecKeys(specKey) {
+    if (!isPreciseSpecKey(specKey)) return [];
+    const [type, ...parts] = specKey.split(":");
+
+    if (type === "ESC") {
+        const m = parts[0].match(/^(\d+)A$/);
+        return m ? ladderNeighbors(ESC_AMPS, parseInt(m[1])).map(a => `ESC:${a}A`) : [];
+    }
+
+    if (type === "MOTOR") {
+        // MOTOR:2400KV or MOTOR:2207:2400KV (size kept)
+        const kv = parseInt(parts[parts.length - 1]);
+        const prefix = ["MOTOR", ...parts.slice(0, -1)].join(":");
+        return ladderNeighbors(MOTOR_KV, kv).map(k => `${prefix}:${k}KV`);
+    }
+
+    if (type === "BATTERY") {
+        // BATTERY:4S:1300MAH, BATTERY:4S or BATTERY:ANY:1300MAH - one dimension changes at a time
+        const cells = parts[0].match(/^(\d+)S$/) ? parseInt(parts[0]) : null;
+        const mah = parts[1]?.match(/^(\d+)MAH$/) ? parseInt(parts[1]) : null;
+        const mahPart = mah ? `:${mah}MAH` : "";
+        return [
+            ...(cells ? ladderNeighbors(BATTERY_CELLS, cells).map(c => `BATTERY:${c}S${mahPart}`) : []),
+            ...(mah ? ladderNeighbors(BATTERY_MAH, mah).map(m => `BATTERY:${parts[0]}:${m}MAH`) : [])
+        ];
+    }
+
+    return [];
+}
+
+// Search keyword (and parseBomLine type) that crawls a spec key, null for types we cannot phrase
+// Uppercase like the BOM keywords /api/price queues
+export function prefetchKeyword(specKey) {
+    const [type, ...parts] = specKey.split(":");
+    if (type === "ESC") return { keyword: `${parts[0]} ESC`, canonical_type: "ESC" };
+    if (type === "MOTOR") return { keyword: `${parts.join(" ")} BRUSHLESS MOTOR`, canonical_type: "Motor" };
+    if (type === "BATTERY") {
+        const terms = parts.filter(p => p !== "ANY");
+        return { keyword: `${terms.join(" ")} LIPO BATTERY`, canonical_type: "Battery" };
+    }
+    return null;
+}
+
+// Record which spec keys were priced together (called from /api/price with one BOM's spec keys)
+// Both directions are stored so siblings are a primary-key prefix lookup. A BOM writes up to
+// 90 pairs, so only 1 in `sample` BOMs is recorded, weighted by `sample` (same expected weight)
+export function recordSpecCooccurrence(db, specKeys, now = Date.now(), sample = COOCCURRENCE_SAMPLE) {
+    if (Math.random() * sample >= 1) return Promise.resolve([]);
+    const keys = [...new Set(specKeys.filter(isPreciseSpecKey))].slice(0, MAX_COOCCURRENCE_KEYS);
+    if (keys.length < 2) return Promise.resolve([]);
+
+    const stmt = db.prepare(`
+        INSERT INTO spec_cooccurrence (spec_key, other_key, boms, weight, last_seen)
+        VALUES (?1, ?2, ?4, ?4, ?3)
+        ON CONFLICT(spec_key, other_key) DO UPDATE SET
+            boms = boms + excluded.boms,
+            weight = weight / (1.0 + (excluded.last_seen - last_seen) * 1.0 / ${DEMAND_DECAY_MS}) + excluded.weight,
+            last_seen = excluded.last_seen
+    `);
+    const stmts = keys.flatMap(a => keys.filter(b => b !== a).map(b => stmt.bind(a, b, now, sample)));
+    return db.batch(stmts);
+}
+
+/**
+ * Queue sibling spec keys of a just-crawled keyword as prefetch keywords
+ * Prefetch keywords do not seed further prefetches (no chains across a whole ladder).
+ * Returns the queued [{ keyword, canonical_type, spec_key }]
+ */
+export async function enqueuePrefetch(db, crawledKeyword, now = Date.now()) {
+    const crawled = await db.prepare(
+        "SELECT spec_key, priority FROM crawl_keywords WHERE keyword = ?"
+    ).bind(crawledKeyword).first();
+    if (!crawled || !isPreciseSpecKey(crawled.spec_key) || (crawled.priority || 0) <= PREFETCH_PRIORITY) return [];
+
+    const { results: cooccurring } = await db.prepare(`
+        SELECT other_key FROM spec_cooccurrence
+        WHERE spec_key = ?
+        ORDER BY weight / (1.0 + (? - last_seen) * 1.0 / ${DEMAND_DECAY_MS}) DESC
+        LIMIT ?
+    `).bind(crawled.spec_key, now, COOCCURRING_PER_CRAWL).all();
+
+    const siblings = [...new Set([
+        ...(cooccurring || []).map(r => r.other_key),
+        ...neighborSpecKeys(crawled.spec_key)
+    ])].filter(k => k !== crawled.spec_key && prefetchKeyword(k));
+    if (siblings.length === 0) return [];
+
+    // Already priced or already queued (under any keyword) -> nothing to prefetch
+    const placeholders = siblings.map(() => "?").join(", ");
+    const { results: known } = await db.prepare(`
+        SELECT spec_key FROM product_variants WHERE spec_key IN (${placeholders})
+        UNION
+        SELECT spec_key FROM crawl_keywords WHERE spec_key IN (${placeholders})
+    `).bind(...siblings, ...siblings).all();
+    const knownKeys = new Set((known || []).map(r => r.spec_key));
+
+    const queued = siblings
+        .filter(k => !knownKeys.has(k))
+        .slice(0, PREFETCH_PER_CRAWL)
+        .map(k => ({ ...prefetchKeyword(k), spec_key: k }));
+    if (queued.length === 0) return [];
+
+    const insertStmt = db.prepare(`
+        INSERT INTO crawl_keywords(keyword, canonical_type, spec_key, priority, status, fail_count, last_updated)
+        VALUES(?, ?, ?, ${PREFETCH_PRIORITY}, 'prefetch', 0, ?)
+        ON CONFLICT(keyword) DO NOTHING
+    `);
+    await db.batch(queued.map(q => insertStmt.bind(q.keyword, q.canonical_type, q.spec_key, now)));
+    return queued;
+}
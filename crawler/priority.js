@@ -0,0 +1,108 @@
+// Crawl Priority Scoring
+// One crawl value for every queue consumer (cron, orchestrator, Nova daemon via /api/crawl/pending):
+// parts that many BOMs are pricing, with the oldest prices, get the crawl budget first.
+//
+// score = (1 + demand) * freshness_need * reliability + manual_boost
+//   demand         log2(1 + decayed /api/price lookups of the keyword's spec_key)
+//   freshness_need 0.25 .. 1, grows with the age of the newest price for the spec_key
+//                  (1 when the spec_key has never been priced)
+//   reliability    1 / (1 + fail_count)
+//   manual_boost   MANUAL_BOOST for explicit crawl requests (priority >= 10)
+
+// Config
+export const DEMAND_DECAY_MS = 7 * 24 * 60 * 60 * 1000;  // demand halves after ~7 days without lookups
+export const STALE_HORIZON_MS = 72 * 60 * 60 * 1000;    // prices this old count as fully stale
+export const MANUAL_PRIORITY = 10;                       // crawl_keywords.priority of a user request
+export const MANUAL_BOOST = 100;                         // keeps user requests ahead of passive demand
+
+// Record BOM demand for spec keys (called from /api/price, counts = Map spec_key -> lookups)
+// Decay is hyperbolic: demand / (1 + elapsed / DEMAND_DECAY_MS)
+export function recordSpecDemand(db, counts, now = Date.now()) {
+    const stmt = db.prepare(`
+        INSERT INTO spec_demand (spec_key, lookups, demand, last_requested)
+        VALUES (?1, ?2, ?2, ?3)
+        ON CONFLICT(spec_key) DO UPDATE SET
+            lookups = lookups + excluded.lookups,
+            demand = demand / (1.0 + (excluded.last_requested - last_requested) * 1.0 / ${DEMAND_DECAY_MS}) + excluded.demand,
+            last_requested = excluded.last_requested
+    `);
+    const stmts = [...counts.entries()]
+        .filter(([specKey]) => specKey)
+        .map(([specKey, n]) => stmt.bind(specKey, n, now));
+    if (stmts.length === 0) return Promise.resolve([]);
+    return db.batch(stmts);
+}
+
+// Score one joined crawl_keywords row (see fetchScoredKeywords), returns { score, breakdown }
+// SCORE_SQL ranks with the same formula in D1; keep the two in step
+export function scoreKeyword(row, now = Date.now()) {
+    const elapsed = row.last_requested ? Math.max(0, now - row.last_requested) : 0;
+    const decayedDemand = (row.demand || 0) / (1 + elapsed / DEMAND_DECAY_MS);
+    const demand = Math.log2(1 + decayedDemand);
+
+    const priceAgeMs = row.last_price_update ? Math.max(0, now - row.last_price_update) : null;
+    const staleness = priceAgeMs == null ? 1 : Math.min(1, priceAgeMs / STALE_HORIZON_MS);
+    const freshnessNeed = 0.25 + 0.75 * staleness;
+
+    const reliability = 1 / (1 + (row.fail_count || 0));
+    const manualBoost = (row.priority || 0) >= MANUAL_PRIORITY ? MANUAL_BOOST : 0;
+
+    const score = (1 + demand) * freshnessNeed * reliability + manualBoost;
+
+    return {
+        score: Math.round(score * 1000) / 1000,
+        breakdown: {
+            demand: Math.round(demand * 1000) / 1000,
+            lookups: row.lookups || 0,
+            recent_demand: Math.round(decayedDemand * 100) / 100,
+            price_age_hours: priceAgeMs == null ? null : Math.round(priceAgeMs / 360000) / 10,
+            freshness_need: Math.round(freshnessNeed * 1000) / 1000,
+            reliability: Math.round(reliability * 1000) / 1000,
+            manual_boost: manualBoost
+        }
+    };
+}
+
+// scoreKeyword() as a SQL expression over the fetchScoredKeywords columns (?1 = now),
+// so the whole queue is ranked before LIMIT
+const SCORE_SQL = `
+    (1 + log2(1 + COALESCE(demand, 0) / (1.0 + MAX(0, ?1 - COALESCE(last_requested, ?1)) * 1.0 / ${DEMAND_DECAY_MS})))
+    * (0.25 + 0.75 * CASE WHEN last_price_update IS NULL THEN 1.0
+                          ELSE MIN(1.0, MAX(0, ?1 - last_price_update) * 1.0 / ${STALE_HORIZON_MS}) END)
+    / (1.0 + COALESCE(fail_count, 0))
+    + CASE WHEN COALESCE(priority, 0) >= ${MANUAL_PRIORITY} THEN ${MANUAL_BOOST} ELSE 0 END`;
+
+/**
+ * Highest-value crawl keywords first
+ * - statuses: crawl_keywords.status values to consider
+ * - eligibleOnly: also require enabled = 1 and an expired next_retry (orchestrator)
+ * Returns rows with score + score_breakdown, sorted by score DESC
+ */
+export async function fetchScoredKeywords(db, { statuses, eligibleOnly = false, limit = 10, now = Date.now() }) {
+    const placeholders = statuses.map((_, i) => `?${i + 3}`).join(", ");
+    const eligibility = eligibleOnly
+        ? "AND k.enabled = 1 AND (k.next_retry IS NULL OR k.next_retry <= ?1)"
+        : "";
+
+    const { results } = await db.prepare(`
+      WITH candidates AS (
+        SELECT k.keyword, k.canonical_type, k.spec_key, k.priority, k.status, k.fail_count,
+               k.last_crawled, k.last_updated, k.next_retry,
+               d.lookups, d.demand, d.last_requested,
+               (SELECT MAX(v.last_price_update) FROM product_variants v WHERE v.spec_key = k.spec_key) AS last_price_update
+        FROM crawl_keywords k
+        LEFT JOIN spec_demand d ON d.spec_key = k.spec_key
+        WHERE k.keyword != '__GLOBAL_PAUSE__'
+          AND k.status IN (${placeholders})
+          ${eligibility}
+      )
+      SELECT * FROM candidates
+      ORDER BY ${SCORE_SQL} DESC, priority DESC, last_updated ASC
+      LIMIT ?2
+    `).bind(now, limit, ...statuses).all();
+
+    return (results || []).map(row => {
+        const { score, breakdown } = scoreKeyword(row, now);
+        return { ...row, score, score_breakdown: breakdown };
+    });
+}
@@ -1,3 +1,5 @@
+import { signPayload } from "../utils/crypto.js";
+
 // Task Manager for Crawl Task Interface
 
 export function createCrawlTask(keyword, priority = 1, type = "aliexpress_search") {
@@ -39,13 +41,34 @@ export function createCrawlTask(keyword, priority = 1, type = "aliexpress_search
     };
 }
 
-export async function dispatchTask(taskPayload, crawlerUrl, apiKey) {
-    // In production, this would generic fetch() to external crawler service
-    // For now, we simulate dispatch by logging
-    console.log(`[DISPATCH] Sending Task ${taskPayload.task_id} to Crawler:`, JSON.stringify(taskPayload, null, 2));
+// Send tasks to the crawl service (scripts/crawl_service.py) in one request.
+// The body is HMAC-signed with the shared crawler key, same scheme as the result callback.
+// Without a crawlerUrl the dispatch is only logged (no crawl service deployed).
+export async function dispatchTasks(taskPayloads, crawlerUrl, apiKey) {
+    if (!crawlerUrl) {
+        for (const t of taskPayloads) {
+            console.log(`[DISPATCH] Sending Task ${t.task_id} to Crawler:`, JSON.stringify(t, null, 2));
+        }
+        return { status: "sent", dispatched_at: Date.now(), accepted: taskPayloads.length };
+    }
 
-    // Simulate API call success
-    // await fetch(crawlerUrl, { method: 'POST', body: JSON.stringify(taskPayload), headers: { 'X-API-KEY': apiKey } });
+    const body = JSON.stringify({ tasks: taskPayloads });
+    const res = await fetch(crawlerUrl, {
+        method: "POST",
+        headers: {
+            "Content-Type": "application/json",
+            "X-Crawler-Key": "orchestrator",
+            "X-Crawler-Signature": await signPayload(body, apiKey)
+        },
+        body
+    });
+    if (!res.ok) {
+        throw new Error(`Crawler service returned ${res.status}`);
+    }
+    const ack = await res.json().catch(() => ({}));
+    return { status: "sent", dispatched_at: Date.now(), accepted: ack.accepted ?? taskPayloads.length };
+}
 
-    return { status: "sent", dispatched_at: Date.now() };
+export async function dispatchTask(taskPayload, crawlerUrl, apiKey) {
+    return dispatchTasks([taskPayload], crawlerUrl, apiKey);
 }
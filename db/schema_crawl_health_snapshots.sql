@@ -0,0 +1,30 @@
+-- Migration: Materialized crawl health snapshots (written by the cron, read by /admin/crawl-health)
+
+-- Extra snapshot columns; task counts cover only the window since the previous snapshot,
+-- so the dashboard sums a few rows instead of scanning crawl_tasks
+ALTER TABLE crawl_health ADD COLUMN done_keywords INTEGER;
+ALTER TABLE crawl_health ADD COLUMN tasks_finished INTEGER;
+ALTER TABLE crawl_health ADD COLUMN tasks_completed INTEGER;
+ALTER TABLE crawl_health ADD COLUMN tasks_blocked INTEGER;
+ALTER TABLE crawl_health ADD COLUMN variant_count INTEGER;
+ALTER TABLE crawl_health ADD COLUMN stale_variants INTEGER;
+ALTER TABLE crawl_health ADD COLUMN daemons_active INTEGER;
+ALTER TABLE crawl_health ADD COLUMN daemon_crawled INTEGER;
+ALTER TABLE crawl_health ADD COLUMN daemon_failed INTEGER;
+ALTER TABLE crawl_health ADD COLUMN daemon_handoffs INTEGER;
+
+-- Nova daemon throughput, one row per daemon process (cumulative counters, POST /api/crawl/daemon-stats)
+CREATE TABLE IF NOT EXISTS crawl_daemons (
+  daemon_id TEXT PRIMARY KEY,
+  started_at INTEGER,
+  reported_at INTEGER,
+  crawled INTEGER DEFAULT 0,
+  failed INTEGER DEFAULT 0,
+  handoffs INTEGER DEFAULT 0,
+  last_captcha_at INTEGER
+);
+
+-- Tasks finished since the previous snapshot: WHERE completed_at > ? AND completed_at <= ?
+-- (completed_at is set for completed, blocked and failed tasks)
+CREATE INDEX IF NOT EXISTS idx_tasks_completed
+ON crawl_tasks(completed_at, status);
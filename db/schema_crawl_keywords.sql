@@ -0,0 +1,16 @@
+-- Crawl Keywords (crawl queue, one row per search keyword)
+
+CREATE TABLE IF NOT EXISTS crawl_keywords (
+  keyword TEXT PRIMARY KEY,
+  canonical_type TEXT,
+  current_A INTEGER,
+  last_crawled INTEGER,
+  enabled INTEGER DEFAULT 1,
+  priority INTEGER DEFAULT 5,
+  status TEXT DEFAULT 'pending',   -- pending, crawling, done, failed, blocked
+  fail_count INTEGER DEFAULT 0,
+  next_retry INTEGER,
+  last_error TEXT,
+  error_type TEXT,
+  last_updated INTEGER
+);
@@ -0,0 +1,17 @@
+-- Migration: Demand- and staleness-weighted crawl priority (crawler/priority.js)
+
+-- BOM demand per spec key, bumped by /api/price for every looked-up line.
+-- demand decays hyperbolically with time since last_requested; lookups is the raw total.
+CREATE TABLE IF NOT EXISTS spec_demand (
+  spec_key TEXT PRIMARY KEY,
+  lookups INTEGER DEFAULT 0,
+  demand REAL DEFAULT 0,
+  last_requested INTEGER
+);
+
+-- Spec key of the BOM line that queued the keyword (joins crawl_keywords to demand + prices)
+ALTER TABLE crawl_keywords ADD COLUMN spec_key TEXT;
+
+-- Price age per spec key: SELECT MAX(last_price_update) FROM product_variants WHERE spec_key = ?
+CREATE INDEX IF NOT EXISTS idx_variants_spec_updated
+ON product_variants(spec_key, last_price_update);
@@ -0,0 +1,21 @@
+-- Migration: Crawl result inbox (/api/crawl/result)
+
+-- The callback stores each task result here and answers 202; results are applied in the
+-- background (ctx.waitUntil), and a 5-minute sweep cron picks up any the isolate did not finish.
+-- task_id is the idempotency key: a re-sent result for a queued or applied task is dropped.
+CREATE TABLE IF NOT EXISTS crawl_result_inbox (
+  task_id TEXT PRIMARY KEY,
+  payload TEXT NOT NULL,                  -- task result JSON as posted
+  source TEXT,                            -- X-Source header
+  status TEXT NOT NULL DEFAULT 'queued',  -- queued, processing, done, failed
+  attempts INTEGER NOT NULL DEFAULT 0,
+  received_at INTEGER NOT NULL,
+  claimed_at INTEGER,
+  processed_at INTEGER,
+  last_error TEXT
+);
+
+-- Inbox sweep: SELECT task_id ... WHERE status = 'queued' OR (status = 'processing' AND claimed_at < ?)
+-- ORDER BY received_at; pruning: DELETE ... WHERE status = 'done' AND processed_at < ?
+CREATE INDEX IF NOT EXISTS idx_crawl_result_inbox_status
+ON crawl_result_inbox(status, received_at);
@@ -0,0 +1,12 @@
+-- Variant Price History
+-- One row per observed price/stock change, written by /api/crawl/result
+
+CREATE TABLE IF NOT EXISTS variant_price_history (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  variant_id TEXT,
+  source TEXT,
+  unit_price_usd REAL,
+  pack_price_usd REAL,
+  stock INTEGER,
+  recorded_at INTEGER
+);
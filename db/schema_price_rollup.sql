@@ -0,0 +1,17 @@
+-- Price History Rollups
+-- Daily/weekly aggregates of variant_price_history, written by the cron
+-- compaction (utils/price_history.js, scripts/compact_price_history.py)
+
+CREATE TABLE IF NOT EXISTS variant_price_rollup (
+  variant_id TEXT,
+  source TEXT,
+  bucket TEXT,              -- day, week
+  bucket_start INTEGER,     -- UTC day start / Monday week start (ms)
+  min_price REAL,
+  max_price REAL,
+  last_price REAL,          -- price of the newest point in the bucket
+  last_stock INTEGER,
+  last_recorded_at INTEGER,
+  points INTEGER,           -- raw points folded into this bucket
+  PRIMARY KEY (variant_id, source, bucket, bucket_start)
+);
@@ -0,0 +1,29 @@
+-- Migration: Composite indexes matching the Worker's hot access paths
+-- Verify plans with: python scripts/query_plan_audit.py
+
+-- /api/price candidates:
+--   WHERE spec_key = ? AND source IN (...) ORDER BY unit_price_usd ASC, rating DESC LIMIT 20
+-- Rows come out of the index already sorted; source is filtered from the index
+-- so only the rows that survive LIMIT are read from the table.
+CREATE INDEX IF NOT EXISTS idx_variants_spec_price
+ON product_variants(spec_key, unit_price_usd, rating DESC, source);
+
+-- Superseded by idx_variants_spec_price (same leading column)
+DROP INDEX IF EXISTS idx_spec_key;
+
+-- /product/:id fallback: WHERE product_id = ? ORDER BY unit_price_usd ASC
+CREATE INDEX IF NOT EXISTS idx_variants_product_price
+ON product_variants(product_id, unit_price_usd);
+
+-- Health dashboard stale count: WHERE last_seen < ?
+CREATE INDEX IF NOT EXISTS idx_variants_last_seen
+ON product_variants(last_seen);
+
+-- Price history: WHERE variant_id = ? AND source IN (...) ORDER BY recorded_at DESC LIMIT 10
+-- Covering: the selected columns are read from the index only.
+CREATE INDEX IF NOT EXISTS idx_price_history_variant
+ON variant_price_history(variant_id, recorded_at DESC, source, unit_price_usd, stock);
+
+-- Crawl queue: WHERE status = 'pending' ORDER BY priority DESC, last_updated ASC
+CREATE INDEX IF NOT EXISTS idx_keywords_queue
+ON crawl_keywords(status, priority DESC, last_updated);
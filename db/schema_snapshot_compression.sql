@@ -0,0 +1,7 @@
+-- Compressed Product Snapshots
+-- data_gz: gzip of the exact /product/:id response body (served without re-serializing)
+-- content_hash: SHA-256 of that body, used as the ETag
+-- Rows written before this migration keep plain-text data and are served from it until re-ingested
+
+ALTER TABLE product_snapshots ADD COLUMN data_gz BLOB;
+ALTER TABLE product_snapshots ADD COLUMN content_hash TEXT;
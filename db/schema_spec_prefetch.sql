@@ -0,0 +1,19 @@
+-- Migration: Neighbor spec prefetch (crawler/prefetch.js)
+
+-- Spec keys priced in the same BOM, bumped by /api/price (both directions stored) for a 1-in-N
+-- sample of BOMs, each counted N times (COOCCURRENCE_SAMPLE).
+-- weight decays hyperbolically with time since last_seen like spec_demand.demand; boms is the (estimated) total.
+CREATE TABLE IF NOT EXISTS spec_cooccurrence (
+  spec_key TEXT NOT NULL,
+  other_key TEXT NOT NULL,
+  boms INTEGER DEFAULT 0,
+  weight REAL DEFAULT 0,
+  last_seen INTEGER,
+  PRIMARY KEY (spec_key, other_key)
+);
+
+-- Prefetch dedup: is any keyword already queued for this spec key?
+-- SELECT spec_key FROM crawl_keywords WHERE spec_key IN (...)
+-- (crawl_keywords.status 'prefetch' = low-priority sibling crawl, served by /api/crawl/prefetch)
+CREATE INDEX IF NOT EXISTS idx_crawl_keywords_spec_key
+ON crawl_keywords(spec_key);
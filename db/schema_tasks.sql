@@ -4,6 +4,7 @@ CREATE TABLE IF NOT EXISTS crawl_tasks (
   status TEXT,          -- pending, sent, completed, failed
   created_at INTEGER,
   completed_at INTEGER,
-  error_type TEXT
+  error_type TEXT,
+  source TEXT           -- prod, rc_test (/api/crawl/result falls back to it without an X-Source header)
 );
 CREATE INDEX IF NOT EXISTS idx_task_status ON crawl_tasks(status);
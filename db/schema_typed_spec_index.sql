@@ -0,0 +1,11 @@
+-- Migration: Typed spec columns in the pricing candidate index
+-- /api/price candidates:
+--   WHERE spec_key = ? AND (typed column checks on current_A / kv / capacity_mah / voltage_s)
+--     AND source IN (...) ORDER BY unit_price_usd ASC, rating DESC LIMIT 20
+-- Rows stay index-ordered by price; source and the typed columns are checked from the
+-- index, so only the LIMIT rows that actually match are read from the table.
+CREATE INDEX IF NOT EXISTS idx_variants_spec_typed
+ON product_variants(spec_key, unit_price_usd, rating DESC, source, current_A, kv, capacity_mah, voltage_s);
+
+-- Superseded by idx_variants_spec_typed (same leading columns)
+DROP INDEX IF EXISTS idx_variants_spec_price;
@@ -0,0 +1,32 @@
+-- Migration: Trigram full-text index over variant listings (fuzzy BOM line fallback in /api/price)
+-- External-content FTS5 table: the text lives in product_variants, only the index is stored here.
+
+CREATE VIRTUAL TABLE IF NOT EXISTS variant_search USING fts5(
+  brand,
+  model,
+  variant_label,
+  content = 'product_variants',
+  content_rowid = 'rowid',
+  tokenize = 'trigram'
+);
+
+-- Keep the index in sync; price/stock updates do not touch it
+CREATE TRIGGER IF NOT EXISTS variant_search_ai AFTER INSERT ON product_variants BEGIN
+  INSERT INTO variant_search(rowid, brand, model, variant_label)
+  VALUES (new.rowid, new.brand, new.model, new.variant_label);
+END;
+
+CREATE TRIGGER IF NOT EXISTS variant_search_ad AFTER DELETE ON product_variants BEGIN
+  INSERT INTO variant_search(variant_search, rowid, brand, model, variant_label)
+  VALUES ('delete', old.rowid, old.brand, old.model, old.variant_label);
+END;
+
+CREATE TRIGGER IF NOT EXISTS variant_search_au AFTER UPDATE OF brand, model, variant_label ON product_variants BEGIN
+  INSERT INTO variant_search(variant_search, rowid, brand, model, variant_label)
+  VALUES ('delete', old.rowid, old.brand, old.model, old.variant_label);
+  INSERT INTO variant_search(rowid, brand, model, variant_label)
+  VALUES (new.rowid, new.brand, new.model, new.variant_label);
+END;
+
+-- Index rows that existed before the migration
+INSERT INTO variant_search(variant_search) VALUES ('rebuild');
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+BOM Builder Page View Benchmark
+
+Loads the UI (/) of one or more worker deployments the way a browser does -
+page, then its same-origin stylesheets and scripts - once with an empty cache
+and once more honoring Cache-Control / ETag, and reports requests, bytes and
+time per view.
+
+Usage:
+    python scripts/bench_page_view.py
+    python scripts/bench_page_view.py --api https://bom-pricer-api.randunun.workers.dev --api http://localhost:8787
+    python scripts/bench_page_view.py --runs 10
+"""
+
+import argparse
+import re
+import statistics
+import time
+import requests
+
+# Configuration
+CLOUDFLARE_API = "https://bom-pricer-api.randunun.workers.dev"
+DEFAULT_RUNS = 5
+
+ASSET_RE = re.compile(r'<(?:link[^>]+href|script[^>]+src)="(/[^"]+)"')
+MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+def fetch(session, url, cache):
+    """GET url through a browser-like cache; returns (requests made, body bytes)"""
+    entry = cache.get(url)
+    if entry and time.time() < entry["expires"]:
+        return 0, 0  # fresh in cache, no request
+
+    headers = {"If-None-Match": entry["etag"]} if entry and entry["etag"] else {}
+    r = session.get(url, headers=headers, timeout=30)
+    if r.status_code == 304:
+        entry["expires"] = time.time() + entry["max_age"]
+        return 1, 0
+    r.raise_for_status()
+
+    cache_control = r.headers.get("Cache-Control", "")
+    m = MAX_AGE_RE.search(cache_control)
+    max_age = int(m.group(1)) if m and "no-store" not in cache_control else 0
+    cache[url] = {"etag": r.headers.get("ETag"), "max_age": max_age,
+                  "expires": time.time() + max_age, "text": r.text}
+    return 1, len(r.content)
+
+
+def page_view(api, cache):
+    """Load / and its assets; returns (requests, bytes, ms)"""
+    session = requests.Session()
+    start = time.perf_counter()
+    count, size = fetch(session, f"{api}/", cache)
+    html = cache.get(f"{api}/", {}).get("text", "")
+    for path in ASSET_RE.findall(html):
+        n, b = fetch(session, f"{api}{path}", cache)
+        count += n
+        size += b
+    return count, size, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark first and repeat views of the BOM Builder UI")
+    parser.add_argument("--api", action="append", help="Worker base URL (repeat to compare deployments)")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="First/repeat view pairs per deployment")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"⏱️  Page view benchmark - {args.runs} first/repeat view pairs")
+    print("=" * 60)
+
+    for api in args.api or [CLOUDFLARE_API]:
+        print(f"\n🌐 {api}")
+        for label in ("first view", "repeat view"):
+            views = []
+            for _ in range(args.runs):
+                cache = {}
+                if label == "repeat view":
+                    page_view(api, cache)
+                views.append(page_view(api, cache))
+            count, size, _ = views[-1]
+            ms = statistics.median(v[2] for v in views)
+            print(f"   {label:<12} {count} request(s) | {size:,} bytes | p50 {ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+/api/price Latency Benchmark
+
+Sends a full-size BOM (MAX_BOM_LINES = 50 lines) to one or more worker
+deployments and reports per-request latency, so a release can be compared
+against the previous one (e.g. production vs `wrangler dev`).
+
+Usage:
+    python scripts/bench_price.py
+    python scripts/bench_price.py --api https://bom-pricer-api.randunun.workers.dev --api http://localhost:8787
+    python scripts/bench_price.py --runs 30 --user bench-user
+"""
+
+import argparse
+import statistics
+import time
+import requests
+
+# Configuration
+CLOUDFLARE_API = "https://bom-pricer-api.randunun.workers.dev"
+MAX_BOM_LINES = 50  # Must match MAX_BOM_LINES in api/routes/pricing.js
+DEFAULT_RUNS = 20
+
+# Realistic mix: repeated spec keys, unknown parts and free-text lines
+BOM_PARTS = [
+    "30A ESC",
+    "40A ESC",
+    "45A 4in1 ESC",
+    "20A ESC",
+    "60A ESC",
+    "1300mah 4s lipo",
+    "1500mah 6s lipo",
+    "2207 2400kv motor",
+    "2306 1750kv motor",
+    "5045 prop",
+    "9g servo",
+    "coreless motor 8520",
+]
+
+
+def build_bom(lines=MAX_BOM_LINES):
+    """Build a BOM text with `lines` lines cycling through BOM_PARTS"""
+    return "\n".join(
+        f"{BOM_PARTS[i % len(BOM_PARTS)]} x{(i % 4) + 1}" for i in range(lines)
+    )
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    idx = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[idx]
+
+
+def bench(api, bom, runs, user=None):
+    """Time `runs` sequential /api/price requests against one deployment"""
+    session = requests.Session()
+    headers = {"Content-Type": "application/json"}
+    if user:
+        headers["X-BOM-User"] = user
+
+    latencies = []
+    statuses = {}
+    for _ in range(runs):
+        start = time.perf_counter()
+        r = session.post(f"{api}/api/price", json={"bom": bom}, headers=headers, timeout=60)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if r.status_code == 200:
+            for item in r.json().get("items", []):
+                statuses[item.get("status")] = statuses.get(item.get("status"), 0) + 1
+        else:
+            statuses[f"HTTP {r.status_code}"] = statuses.get(f"HTTP {r.status_code}", 0) + 1
+
+    return {
+        "api": api,
+        "runs": runs,
+        "mean_ms": statistics.mean(latencies),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "min_ms": min(latencies),
+        "max_ms": max(latencies),
+        "statuses": statuses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /api/price with a 50-line BOM")
+    parser.add_argument("--api", action="append", help="Worker base URL (repeat to compare deployments)")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="Requests per deployment")
+    parser.add_argument("--lines", type=int, default=MAX_BOM_LINES, help="BOM lines per request")
+    parser.add_argument("--user", default=None, help="Send X-BOM-User to include trust memory lookups")
+    args = parser.parse_args()
+
+    apis = args.api or [CLOUDFLARE_API]
+    bom = build_bom(args.lines)
+
+    print("=" * 60)
+    print(f"⏱️  /api/price benchmark - {args.lines} BOM lines, {args.runs} runs")
+    print("=" * 60)
+
+    reports = []
+    for api in apis:
+        print(f"\n🌐 {api}")
+        # Warm up the isolate so cold start does not skew the numbers
+        bench(api, bom, 1, args.user)
+        report = bench(api, bom, args.runs, args.user)
+        reports.append(report)
+        print(f"   mean {report['mean_ms']:.0f} ms | p50 {report['p50_ms']:.0f} ms | "
+              f"p95 {report['p95_ms']:.0f} ms | min {report['min_ms']:.0f} ms | max {report['max_ms']:.0f} ms")
+        print(f"   line statuses: {report['statuses']}")
+
+    if len(reports) > 1:
+        base = reports[0]
+        print("\n📊 Relative to first deployment (p50):")
+        for r in reports[1:]:
+            print(f"   {r['api']}: {r['p50_ms'] / base['p50_ms']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Price History Compaction (local SQLite mirror)
+
+Same policy as the worker cron (utils/price_history.js):
+- raw variant_price_history points are kept for RAW_WINDOW_DAYS
+- older points are rolled into daily min/max/last buckets (variant_price_rollup)
+- daily buckets older than DAILY_WINDOW_DAYS are rolled into weekly buckets
+- weekly buckets older than WEEKLY_RETENTION_WEEKS are dropped
+
+Unlike the cron, this runs the whole backlog in one pass (no COMPACT_MAX_DAYS limit).
+
+Usage:
+    python scripts/compact_price_history.py --db .wrangler/state/v3/d1/miniflare-D1DatabaseObject/<id>.sqlite
+    python scripts/compact_price_history.py --db /tmp/catalog.sqlite --now 1790000000000
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+
+# Configuration (must match utils/price_history.js)
+DAY_MS = 86_400_000
+WEEK_MS = 7 * DAY_MS
+RAW_WINDOW_DAYS = 14
+DAILY_WINDOW_DAYS = 90
+WEEKLY_RETENTION_WEEKS = 104
+ROLLUP_SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "db", "schema_price_rollup.sql")
+
+# Shared merge clause: a bucket can be rolled into more than once (late points)
+_MERGE = """
+    ON CONFLICT(variant_id, source, bucket, bucket_start) DO UPDATE SET
+        min_price = MIN(min_price, excluded.min_price),
+        max_price = MAX(max_price, excluded.max_price),
+        last_price = CASE WHEN excluded.last_recorded_at >= last_recorded_at THEN excluded.last_price ELSE last_price END,
+        last_stock = CASE WHEN excluded.last_recorded_at >= last_recorded_at THEN excluded.last_stock ELSE last_stock END,
+        last_recorded_at = MAX(last_recorded_at, excluded.last_recorded_at),
+        points = points + excluded.points
+"""
+
+ROLLUP_DAYS_SQL = f"""
+    INSERT INTO variant_price_rollup(
+        variant_id, source, bucket, bucket_start,
+        min_price, max_price, last_price, last_stock, last_recorded_at, points
+    )
+    SELECT variant_id, source, 'day', bucket_start,
+        MIN(unit_price_usd), MAX(unit_price_usd), MAX(last_price), MAX(last_stock), MAX(recorded_at), COUNT(*)
+    FROM (
+        SELECT variant_id, source, unit_price_usd, recorded_at,
+            CAST(recorded_at / {DAY_MS} AS INTEGER) * {DAY_MS} AS bucket_start,
+            FIRST_VALUE(unit_price_usd) OVER w AS last_price,
+            FIRST_VALUE(stock) OVER w AS last_stock
+        FROM variant_price_history
+        WHERE recorded_at < ?1
+        WINDOW w AS (PARTITION BY variant_id, source, CAST(recorded_at / {DAY_MS} AS INTEGER) ORDER BY recorded_at DESC)
+    )
+    WHERE true
+    GROUP BY variant_id, source, bucket_start
+    {_MERGE}
+"""
+
+ROLLUP_WEEKS_SQL = f"""
+    INSERT INTO variant_price_rollup(
+        variant_id, source, bucket, bucket_start,
+        min_price, max_price, last_price, last_stock, last_recorded_at, points
+    )
+    SELECT variant_id, source, 'week', week_start,
+        MIN(min_price), MAX(max_price), MAX(week_last_price), MAX(week_last_stock), MAX(last_recorded_at), SUM(points)
+    FROM (
+        SELECT variant_id, source, min_price, max_price, last_recorded_at, points,
+            CAST((bucket_start + {3 * DAY_MS}) / {WEEK_MS} AS INTEGER) * {WEEK_MS} - {3 * DAY_MS} AS week_start,
+            FIRST_VALUE(last_price) OVER w AS week_last_price,
+            FIRST_VALUE(last_stock) OVER w AS week_last_stock
+        FROM variant_price_rollup
+        WHERE bucket = 'day' AND bucket_start < ?1
+        WINDOW w AS (
+            PARTITION BY variant_id, source, CAST((bucket_start + {3 * DAY_MS}) / {WEEK_MS} AS INTEGER)
+            ORDER BY last_recorded_at DESC
+        )
+    )
+    WHERE true
+    GROUP BY variant_id, source, week_start
+    {_MERGE}
+"""
+
+
+def day_start(ts):
+    """Start of the UTC day containing ts (ms)"""
+    return ts // DAY_MS * DAY_MS
+
+
+def week_start(ts):
+    """Start of the Monday-based week containing ts (ms)"""
+    return (ts + 3 * DAY_MS) // WEEK_MS * WEEK_MS - 3 * DAY_MS
+
+
+def table_counts(conn):
+    """Row counts for the history tables"""
+    return {
+        "raw": conn.execute("SELECT COUNT(*) FROM variant_price_history").fetchone()[0],
+        "daily": conn.execute("SELECT COUNT(*) FROM variant_price_rollup WHERE bucket = 'day'").fetchone()[0],
+        "weekly": conn.execute("SELECT COUNT(*) FROM variant_price_rollup WHERE bucket = 'week'").fetchone()[0],
+    }
+
+
+def compact(conn, now):
+    """Run all compaction steps, each rollup + delete in one transaction"""
+    raw_cutoff = day_start(now - RAW_WINDOW_DAYS * DAY_MS)
+    day_cutoff = week_start(now - DAILY_WINDOW_DAYS * DAY_MS)
+    week_cutoff = now - WEEKLY_RETENTION_WEEKS * WEEK_MS
+
+    with conn:
+        conn.execute(ROLLUP_DAYS_SQL, (raw_cutoff,))
+        raw_rolled = conn.execute("DELETE FROM variant_price_history WHERE recorded_at < ?", (raw_cutoff,)).rowcount
+    with conn:
+        conn.execute(ROLLUP_WEEKS_SQL, (day_cutoff,))
+        days_rolled = conn.execute(
+            "DELETE FROM variant_price_rollup WHERE bucket = 'day' AND bucket_start < ?", (day_cutoff,)
+        ).rowcount
+    with conn:
+        weeks_expired = conn.execute(
+            "DELETE FROM variant_price_rollup WHERE bucket = 'week' AND bucket_start < ?", (week_cutoff,)
+        ).rowcount
+
+    return {"raw_rolled": raw_rolled, "days_rolled": days_rolled, "weeks_expired": weeks_expired}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact variant_price_history into daily/weekly rollups")
+    parser.add_argument("--db", required=True, help="SQLite database file")
+    parser.add_argument("--now", type=int, default=None, help="Reference time in ms (default: current time)")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM afterwards to return freed pages")
+    args = parser.parse_args()
+
+    now = args.now or int(time.time() * 1000)
+    conn = sqlite3.connect(args.db)
+    with open(ROLLUP_SCHEMA) as f:
+        conn.executescript(f.read())
+
+    before = table_counts(conn)
+    print(f"📦 Before: {before['raw']:,} raw | {before['daily']:,} daily | {before['weekly']:,} weekly")
+
+    start = time.time()
+    result = compact(conn, now)
+    print(f"🗜️  Rolled {result['raw_rolled']:,} raw points and {result['days_rolled']:,} daily buckets, "
+          f"expired {result['weeks_expired']:,} weekly buckets ({time.time() - start:.1f}s)")
+
+    after = table_counts(conn)
+    print(f"✅ After:  {after['raw']:,} raw | {after['daily']:,} daily | {after['weekly']:,} weekly")
+
+    if args.vacuum:
+        conn.execute("VACUUM")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
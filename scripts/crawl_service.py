@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Crawl Service - executes the crawl tasks dispatched by the cron orchestrator
+
+crawler/orchestrator.js POSTs task payloads (createCrawlTask() in crawler/tasks.js)
+to this service, HMAC-signed with the shared CRAWLER_KEY. Tasks run on a pool of
+headless browser workers (scrape_auto.crawl) that honor the task constraints:
+- max_products      products opened per search
+- delay_seconds     [min, max] pause between product pages
+- stop_on_captcha   a CAPTCHA ends the task as "blocked" (no human in the loop here;
+                    use nova_daemon.py for CAPTCHA handoffs)
+
+Results are posted back to the task's callback (/api/crawl/result) signed exactly as
+utils/crypto.js verifySignature expects (hex HMAC-SHA256 of the raw body), several
+tasks per callback: {"tasks": [result, ...]}. The worker stores them and answers 202
+before applying them, so a callback takes the same time whatever its size.
+
+Usage:
+    export CRAWLER_KEY=...    # same secret as the worker's CRAWLER_KEY
+    python scripts/crawl_service.py --port 8788 --workers 3
+    python scripts/crawl_service.py --api http://localhost:8787 --batch-size 5
+
+Then point the worker at it (wrangler.toml [vars]):
+    CRAWLER_ENDPOINT = "https://<host>:8788/tasks"
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urljoin
+
+import requests
+
+from ingest_journal import journal_products
+
+# Configuration
+CLOUDFLARE_API = "https://bom-pricer-api.randunun.workers.dev"
+DEFAULT_PORT = 8788
+DEFAULT_WORKERS = 2
+DEFAULT_BATCH_SIZE = 5        # task results per callback
+BATCH_MAX_WAIT = 30           # seconds a finished result may wait for a fuller batch
+CALLBACK_RETRIES = 4
+CALLBACK_REQUEUES = 3         # whole-batch failures before a result is dropped
+BACKOFF_BASE_S = 2.0
+BACKOFF_MAX_S = 60.0
+REQUEST_TIMEOUT_S = 60
+MAX_BODY_BYTES = 1_000_000
+SEEN_TASKS = 5000             # task_ids remembered for dedupe (orchestrator retries)
+DEFAULT_CALLBACK = "/api/crawl/result"
+DEFAULT_KEY_ID = "crawler-01"
+IN_STOCK_QTY = 100            # stock sent for stock_available (the scraper sees no quantity), as /admin/ingest-test
+
+
+def sign(body, secret):
+    """Hex HMAC-SHA256 of the raw body (utils/crypto.js signPayload)"""
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def verify(body, signature, secret):
+    """Constant-time check of an X-Crawler-Signature header"""
+    if not signature or not secret:
+        return False
+    return hmac.compare_digest(sign(body, secret), signature.strip().lower())
+
+
+def product_id_from_url(url):
+    """AliExpress item id from a product URL"""
+    if url and "/item/" in url:
+        return url.split("/item/")[-1].split(".")[0]
+    return None
+
+
+def callback_variant(variant, fields):
+    """Scraped variant -> requested fields, with stock_available as the `stock` the worker reads"""
+    out = {k: v for k, v in variant.items() if fields is None or k in fields or k == "variant_label"}
+    if "stock_available" in out:
+        out["stock"] = IN_STOCK_QTY if out.pop("stock_available") else 0
+    return out
+
+
+def build_result(task, outcome, state=None, reason=None):
+    """Task outcome -> /api/crawl/result payload (ingest shape of the worker)"""
+    result = {
+        "task_id": task["task_id"],
+        "search_keyword": task["keyword"],
+        "status": {"done": "ok", "captcha": "blocked"}.get(outcome, "failed")
+    }
+    if result["status"] == "blocked":
+        result["reason"] = reason or "captcha"
+        return result
+    if result["status"] == "failed":
+        result["reason"] = reason or "no products extracted"
+        return result
+
+    variant_fields = set(task.get("requested_fields", {}).get("variant", [])) or None
+    products = []
+    for p in state["products"]:
+        variants = [callback_variant(variant, variant_fields) for variant in p.get("variants", [])]
+        products.append({
+            "title": p.get("title"),
+            "product_url": p.get("product_url"),
+            "product_id": product_id_from_url(p.get("product_url")),
+            "variants": variants
+        })
+    result["results"] = products
+    return result
+
+
+class ResultBatcher:
+    """Collects finished task results and posts them in signed batches per callback"""
+
+    def __init__(self, api, secret, batch_size, max_wait, stats, stats_lock):
+        self.api = api
+        self.secret = secret
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.stats = stats
+        self.stats_lock = stats_lock
+        self.pending = []    # (callback_url, key_id, result, attempts, added_at)
+        self.cond = threading.Condition()
+        self.stopping = False
+        self.session = requests.Session()
+
+    def add(self, task, result, attempts=0):
+        callback = task.get("callback") or {}
+        url = urljoin(self.api + "/", callback.get("url") or DEFAULT_CALLBACK)
+        key_id = (callback.get("auth") or {}).get("key_id") or DEFAULT_KEY_ID
+        with self.cond:
+            self.pending.append((url, key_id, task, result, attempts, time.time()))
+            self.cond.notify()
+
+    def _take_batch(self):
+        """Wait until a batch is full, the oldest result is due, or shutdown"""
+        with self.cond:
+            while True:
+                if self.pending:
+                    due = time.time() - self.pending[0][5] >= self.max_wait
+                    if len(self.pending) >= self.batch_size or due or self.stopping:
+                        url, key_id = self.pending[0][:2]
+                        batch = [e for e in self.pending if e[:2] == (url, key_id)][:self.batch_size]
+                        for e in batch:
+                            self.pending.remove(e)
+                        return batch
+                    self.cond.wait(timeout=max(0.1, self.max_wait - (time.time() - self.pending[0][5])))
+                elif self.stopping:
+                    return None
+                else:
+                    self.cond.wait()
+
+    def count(self, **deltas):
+        """Add to the shared service stats (workers and /status read them concurrently)"""
+        with self.stats_lock:
+            for key, n in deltas.items():
+                self.stats[key] += n
+
+    def post(self, url, key_id, results):
+        """POST one signed batch, retrying 5xx/connection errors; returns the parsed response"""
+        body = json.dumps({"tasks": results}).encode()
+        headers = {
+            "Content-Type": "application/json",
+            "X-Crawler-Key": key_id,
+            "X-Crawler-Signature": sign(body, self.secret)
+        }
+        for attempt in range(CALLBACK_RETRIES + 1):
+            try:
+                r = self.session.post(url, data=body, headers=headers, timeout=REQUEST_TIMEOUT_S)
+                if r.status_code < 500:
+                    r.raise_for_status()
+                    return r.json()
+                error = f"HTTP {r.status_code}"
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = str(e)
+            if attempt < CALLBACK_RETRIES:
+                delay = min(BACKOFF_MAX_S, BACKOFF_BASE_S * 2 ** attempt) * random.uniform(0.5, 1.0)
+                print(f"   ⚠️  Callback {error} - retry {attempt + 1}/{CALLBACK_RETRIES} in {delay:.1f}s")
+                time.sleep(delay)
+        raise RuntimeError(f"callback failed: {error}")
+
+    def run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            url, key_id = batch[0][:2]
+            try:
+                response = self.post(url, key_id, [e[3] for e in batch])
+            except requests.HTTPError as e:
+                # 4xx (bad signature / payload) will not get better on retry
+                print(f"   ❌ Callback rejected ({e}), dropped {len(batch)} results")
+                self.count(callback_dropped=len(batch))
+                continue
+            except Exception as e:
+                print(f"   ❌ {e}")
+                self._requeue(batch)
+                continue
+
+            # Re-send only the tasks the worker failed to queue
+            status_by_task = {t.get("task_id"): t.get("http_status", 200) for t in response.get("tasks", [])}
+            retry = [e for e in batch if status_by_task.get(e[2]["task_id"], 200) >= 500]
+            for e in batch:
+                if e not in retry and e[3]["status"] == "ok":
+                    journal_products(e[3]["results"], e[3]["search_keyword"], via="crawl")
+            self.count(callbacks=1, results_posted=len(batch) - len(retry))
+            print(f"📤 Posted {len(batch) - len(retry)} results in one callback")
+            self._requeue(retry)
+
+    def _requeue(self, entries):
+        for url, key_id, task, result, attempts, _ in entries:
+            if attempts + 1 >= CALLBACK_REQUEUES:
+                print(f"   ❌ Giving up on result for {task['task_id']}")
+                self.count(callback_dropped=1)
+            else:
+                self.add(task, result, attempts + 1)
+
+    def stop(self):
+        with self.cond:
+            self.stopping = True
+            self.cond.notify_all()
+
+
+class CrawlService:
+    """Task queue + browser worker pool + result batcher"""
+
+    def __init__(self, api, secret, workers, batch_size, max_wait):
+        self.secret = secret
+        self.tasks = queue.Queue()
+        self.seen = OrderedDict()
+        self.seen_lock = threading.Lock()
+        self.stats = {"accepted": 0, "duplicates": 0, "crawled": 0, "blocked": 0, "failed": 0,
+                      "callbacks": 0, "results_posted": 0, "callback_dropped": 0, "busy_workers": 0}
+        self.stats_lock = threading.Lock()
+        self.batcher = ResultBatcher(api, secret, batch_size, max_wait, self.stats, self.stats_lock)
+        self.threads = [threading.Thread(target=self.batcher.run, daemon=True)]
+        self.threads += [threading.Thread(target=self.worker, args=(i,), daemon=True) for i in range(workers)]
+
+    def start(self):
+        for t in self.threads:
+            t.start()
+
+    def submit(self, tasks):
+        """Enqueue new tasks, returns (accepted, duplicates)"""
+        accepted = duplicates = 0
+        for task in tasks:
+            with self.seen_lock:
+                if task["task_id"] in self.seen:
+                    duplicates += 1
+                    continue
+                self.seen[task["task_id"]] = time.time()
+                while len(self.seen) > SEEN_TASKS:
+                    self.seen.popitem(last=False)
+            self.tasks.put(task)
+            accepted += 1
+        with self.stats_lock:
+            self.stats["accepted"] += accepted
+            self.stats["duplicates"] += duplicates
+        return accepted, duplicates
+
+    def run_task(self, p, task):
+        """Crawl one task with its constraints, returns the callback result"""
+        from scrape_auto import MAX_PRODUCTS, crawl, new_crawl_state
+
+        constraints = task.get("constraints") or {}
+        delay = constraints.get("delay_seconds") or [1, 2]
+        state = new_crawl_state(task["keyword"], int(task.get("max_products") or MAX_PRODUCTS), delay)
+        try:
+            outcome = crawl(p, state, headless=True)
+        except Exception as e:
+            return build_result(task, "failed", reason=str(e))
+        if outcome == "done" and not state["products"]:
+            outcome = "failed"
+        return build_result(task, outcome, state)
+
+    def worker(self, index):
+        """One browser driver per thread (Playwright sync API is not thread-safe)"""
+        from playwright.sync_api import sync_playwright
+
+        with sync_playwright() as p:
+            while True:
+                task = self.tasks.get()
+                with self.stats_lock:
+                    self.stats["busy_workers"] += 1
+                print(f"🔍 [worker {index}] {task['task_id']} '{task['keyword']}'")
+                result = self.run_task(p, task)
+                key = {"ok": "crawled"}.get(result["status"], result["status"])
+                with self.stats_lock:
+                    self.stats[key] += 1
+                    self.stats["busy_workers"] -= 1
+                print(f"   [worker {index}] {task['task_id']} -> {result['status']}")
+                self.batcher.add(task, result)
+                self.tasks.task_done()
+
+    def health(self):
+        with self.stats_lock:
+            return {**self.stats, "queued": self.tasks.qsize(), "workers": len(self.threads) - 1}
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        def _json(self, code, body):
+            data = json.dumps(body).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/health":
+                return self._json(200, service.health())
+            self._json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/tasks":
+                return self._json(404, {"error": "not found"})
+            length = int(self.headers.get("Content-Length") or 0)
+            if length <= 0 or length > MAX_BODY_BYTES:
+                return self._json(413 if length else 400, {"error": "bad body size"})
+            body = self.rfile.read(length)
+            if not verify(body, self.headers.get("X-Crawler-Signature"), service.secret):
+                return self._json(401, {"error": "Invalid Signature"})
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                return self._json(400, {"error": "Invalid JSON"})
+
+            tasks = payload.get("tasks") if isinstance(payload, dict) and "tasks" in payload else [payload]
+            if not isinstance(tasks, list) or not all(
+                isinstance(t, dict) and t.get("task_id") and t.get("keyword") for t in tasks
+            ):
+                return self._json(400, {"error": "Invalid task payload: missing task_id or keyword"})
+
+            accepted, duplicates = service.submit(tasks)
+            self._json(202, {"accepted": accepted, "duplicates": duplicates, "queued": service.tasks.qsize()})
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run dispatched crawl tasks and post results back in batches")
+    parser.add_argument("--api", default=CLOUDFLARE_API, help="Worker base URL for relative callback URLs")
+    parser.add_argument("--host", default="0.0.0.0", help="Listen address")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Listen port")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Parallel browser workers")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Task results per callback")
+    parser.add_argument("--max-wait", type=float, default=BATCH_MAX_WAIT, help="Seconds before a partial batch is sent")
+    args = parser.parse_args()
+
+    secret = os.getenv("CRAWLER_KEY")
+    if not secret:
+        print("❌ Error: CRAWLER_KEY environment variable not set.")
+        sys.exit(1)
+
+    service = CrawlService(args.api.rstrip("/"), secret, args.workers, args.batch_size, args.max_wait)
+    service.start()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+
+    print("=" * 60)
+    print(f"🕷️  Crawl service on {args.host}:{args.port} ({args.workers} workers, "
+          f"{args.batch_size} results/callback)")
+    print(f"   Callbacks: {args.api}")
+    print("=" * 60)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Stopping - flushing finished results...")
+    finally:
+        server.server_close()
+        service.batcher.stop()
+        service.threads[0].join(timeout=REQUEST_TIMEOUT_S)
+
+
+if __name__ == "__main__":
+    main()
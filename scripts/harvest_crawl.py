@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+AliExpress Harvest Crawl - broad category searches, every variant keyed
+
+A keyword crawl (scrape_auto.py) searches one narrow keyword and keeps
+MAX_PRODUCTS listings for a single spec key. One broad search ("brushless ESC")
+lists many amperages, and each listing's SKUs span several spec keys, so the
+harvest walks a broad search page by page, opens every listing, reads all SKU
+prices from runParams (as nova_aliexpress_export.py trims them) and uploads each
+product to /api/nova/insert, where every variant gets its own spec key from its
+SKU names ("30A", "40A 2PCS").
+
+When the harvest ends (or stops on a CAPTCHA), the spec keys it priced go to
+/api/crawl/harvest in one request, which marks every waiting crawl_keywords row
+(pending, prefetch, soft_fail, failed) with one of those spec keys as done.
+Only SKUs whose own names carry a spec count (or the single SKU of a listing):
+a multi-rating title would key the rest by its first rating.
+
+With --pending the broad searches are picked from the item types of waiting
+keywords (/api/crawl/pending and /api/crawl/prefetch).
+
+Usage:
+    python scripts/harvest_crawl.py "brushless ESC" --pages 3
+    python scripts/harvest_crawl.py --pending --hybrid
+    python scripts/harvest_crawl.py "lipo battery" --pages 2 --max-listings 40 --api http://localhost:8787
+"""
+
+import argparse
+import os
+import sys
+import time
+import requests
+from playwright.sync_api import sync_playwright
+
+from ingest_journal import journal_products
+from nova_aliexpress_export import build_payload
+from parse_pages import BLOCKED_PRODUCT, normalize, parse_payload
+from scrape_auto import (MAX_HANDOFFS, MAX_PRODUCTS, PAGE_LOAD_WAIT, PRICE_SELECTORS, check_for_captcha,
+                         extract_products, launch, random_delay, save_session, solve_in_visible_browser)
+from selector_engine import probe, print_probe_report
+from specs import extract_specs, keyword_item_type
+
+# Configuration
+CLOUDFLARE_API = "https://bom-pricer-api.randunun.workers.dev"
+API_KEY = os.getenv("API_KEY")
+DEFAULT_PAGES = 3               # search result pages per broad search
+MAX_LISTINGS = 200              # listings opened per broad search
+MAX_SPEC_KEYS_PER_REQUEST = 2000  # Must match HARVEST_MAX_SPEC_KEYS in api/routes/crawl.js
+SPEC_FIELDS = ("current_A", "voltage_s", "capacity_mah", "kv")
+
+# Broad search per item type (keyword_item_type of the waiting keywords, --pending)
+HARVEST_QUERIES = {
+    "ESC": "brushless ESC",
+    "MOTOR": "brushless motor",
+    "BATTERY": "lipo battery",
+    "SERVO": "rc servo",
+    "PROP": "fpv propeller",
+}
+
+
+def search_url(query, page_no):
+    """Search results URL for one page of a broad search"""
+    url = f"https://www.aliexpress.com/wholesale?SearchText={query.replace(' ', '+')}"
+    return url if page_no == 1 else f"{url}&page={page_no}"
+
+
+def waiting_queries(api):
+    """Broad searches for the item types of pending and prefetch keywords, most keywords first"""
+    counts = {}
+    for path in ("/api/crawl/pending", "/api/crawl/prefetch?limit=50"):
+        try:
+            r = requests.get(f"{api}{path}", timeout=30)
+            keywords = r.json().get("keywords", []) if r.status_code == 200 else []
+        except (requests.RequestException, ValueError) as e:
+            print(f"⚠️ {path}: {e}")
+            keywords = []
+        for k in keywords:
+            query = HARVEST_QUERIES.get(keyword_item_type(k["keyword"]))
+            if query:
+                counts[query] = counts.get(query, 0) + 1
+    for query, n in sorted(counts.items(), key=lambda kv: kv[1], reverse=True):
+        print(f"   {query}: {n} waiting keyword(s)")
+    return sorted(counts, key=counts.get, reverse=True)
+
+
+def extract_listing(page, url):
+    """Open a listing and parse every SKU price like /api/nova/ingest; None if nothing parses"""
+    print(f"  📥 Loading: {url.split('/item/')[-1][:20]}...")
+    try:
+        page.goto(url, timeout=30000, wait_until="domcontentloaded")
+    except Exception as e:
+        print(f"  ❌ Failed: {e}")
+        return None
+
+    # runParams is set with the first render; the price showing up means the page is in
+    probe(page, "product_price", PRICE_SELECTORS, timeout_ms=PAGE_LOAD_WAIT * 1000)
+    parser, parsed = parse_payload(build_payload(page))
+    if not parsed:
+        print(f"  ⏭️ Not parsed ({parser})")
+        return None
+    return normalize(parsed, url)
+
+
+def harvested_keys(product):
+    """Spec keys the listing prices for sure: SKUs named with a spec, or the only SKU"""
+    variants = [v for v in product["variants"] if v["spec_key"] and v["price"] > 0]
+    if len(product["variants"]) > 1:
+        variants = [v for v in variants
+                    if any(extract_specs(v["variant_label"])[f] is not None for f in SPEC_FIELDS)]
+    return {v["spec_key"] for v in variants}
+
+
+def upload(api, product, query):
+    """Post one product to /api/nova/insert; returns its harvested spec keys the worker stored (None on failure)"""
+    payload = {
+        "title": product["title"],
+        "product_url": product["product_url"],
+        "variants": [{"variant_label": v["variant_label"], "price": v["price"]} for v in product["variants"]],
+        "currency": product["currency"],
+    }
+    try:
+        r = requests.post(f"{api}/api/nova/insert", headers={"Authorization": f"Bearer {API_KEY}"},
+                          json=payload, timeout=30)
+    except requests.RequestException as e:
+        print(f"  ❌ Upload error: {e}")
+        return None
+    if r.status_code != 200:
+        print(f"  ❌ Upload failed: {r.status_code}")
+        return None
+    journal_products([product], query, via="insert")
+    result = r.json()
+    # Older workers do not echo spec keys; the local port computes the same ones
+    keys = harvested_keys(product)
+    if result.get("spec_keys"):
+        keys &= set(result["spec_keys"])
+    print(f"  ✅ {product['title'][:35]}... ({result.get('variants_stored', 0)} variants, {len(keys)} spec keys)")
+    return keys
+
+
+def mark_harvested(api, spec_keys):
+    """Mark every waiting keyword satisfied by the harvested spec keys as done (one request per 2000 keys)"""
+    keys = sorted(k for k in spec_keys if not k.startswith("PRODUCT:"))
+    marked = []
+    for i in range(0, len(keys), MAX_SPEC_KEYS_PER_REQUEST):
+        try:
+            r = requests.post(f"{api}/api/crawl/harvest", headers={"Authorization": f"Bearer {API_KEY}"},
+                              json={"spec_keys": keys[i:i + MAX_SPEC_KEYS_PER_REQUEST]}, timeout=30)
+            if r.status_code == 200:
+                marked += r.json().get("keywords", [])
+            else:
+                print(f"❌ /api/crawl/harvest failed: {r.status_code}")
+        except requests.RequestException as e:
+            print(f"❌ /api/crawl/harvest error: {e}")
+    return marked
+
+
+def harvest(p, query, stats, pages, max_listings, hybrid, api):
+    """Crawl one broad search; returns "done" or "captcha" (blocked and not cleared)"""
+    browser, context, page = launch(p, headless=hybrid)
+    seen = set()
+    try:
+        for page_no in range(1, pages + 1):
+            url = search_url(query, page_no)
+            print(f"\n🌐 [{query}] page {page_no}/{pages}: {url}")
+            try:
+                page.goto(url, timeout=30000)
+            except Exception as e:
+                print(f"❌ Failed to load search page: {e}")
+                break
+            stats["page_loads"] += 1
+            time.sleep(PAGE_LOAD_WAIT)
+
+            if check_for_captcha(page):
+                print("🚫 CAPTCHA detected on search page")
+                stats["captchas"] += 1
+                if not hybrid or stats["handoffs"] >= MAX_HANDOFFS:
+                    return "captcha"
+                browser.close()
+                stats["handoffs"] += 1
+                if not solve_in_visible_browser(p, url):
+                    return "captcha"
+                browser, context, page = launch(p, headless=True)
+                page.goto(url, timeout=30000)
+                stats["page_loads"] += 1
+                time.sleep(PAGE_LOAD_WAIT)
+
+            urls = [u for u in extract_products(page, query, None) if u not in seen]
+            urls = urls[:max(0, max_listings - len(seen))]
+            if not urls:
+                print("   No new listings, search exhausted")
+                break
+            seen.update(urls)
+
+            for i, product_url in enumerate(urls):
+                if BLOCKED_PRODUCT in product_url:
+                    continue
+                print(f"\n[{i + 1}/{len(urls)}] Harvesting...")
+                product = extract_listing(page, product_url)
+                stats["page_loads"] += 1
+                if not product and check_for_captcha(page):
+                    print("🚫 CAPTCHA detected on product page")
+                    stats["captchas"] += 1
+                    if not hybrid or stats["handoffs"] >= MAX_HANDOFFS:
+                        return "captcha"
+                    browser.close()
+                    stats["handoffs"] += 1
+                    if not solve_in_visible_browser(p, product_url):
+                        return "captcha"
+                    browser, context, page = launch(p, headless=True)
+                    product = extract_listing(page, product_url)
+                    stats["page_loads"] += 1
+
+                if product:
+                    stats["listings"] += 1
+                    stats["variants"] += len(product["variants"])
+                    keys = upload(api, product, query)
+                    if keys is not None:
+                        stats["spec_keys"].update(keys)
+                random_delay()
+
+            if len(seen) >= max_listings:
+                break
+
+        save_session(context)
+        return "done"
+    finally:
+        browser.close()
+
+
+def main(queries, pages=DEFAULT_PAGES, max_listings=MAX_LISTINGS, hybrid=False, api=CLOUDFLARE_API):
+    stats = {"page_loads": 0, "captchas": 0, "handoffs": 0, "listings": 0, "variants": 0, "spec_keys": set()}
+    started = time.time()
+
+    print("=" * 60)
+    print(f"🌾 AliExpress Harvest Crawl - {len(queries)} broad search(es), {pages} page(s) each "
+          f"({'hybrid' if hybrid else 'visible'})")
+    print("=" * 60)
+
+    try:
+        with sync_playwright() as p:
+            for query in queries:
+                if harvest(p, query, stats, pages, max_listings, hybrid, api) == "captcha":
+                    print("🚫 CAPTCHA not cleared - stopping the harvest")
+                    break
+    finally:
+        # Keywords satisfied so far are marked even when the harvest stops early
+        marked = mark_harvested(api, stats["spec_keys"]) if stats["spec_keys"] else []
+
+    print_probe_report()
+    loads = max(stats["page_loads"], 1)
+    print("\n" + "=" * 60)
+    print(f"📊 Harvest: {stats['listings']} listings, {stats['variants']} variants, "
+          f"{len(stats['spec_keys'])} spec keys in {time.time() - started:.0f}s")
+    print(f"   {stats['page_loads']} page loads -> {len(stats['spec_keys']) / loads:.2f} spec keys per page load "
+          f"(keyword crawl: at most 1 per {1 + MAX_PRODUCTS})")
+    print(f"   {stats['captchas']} CAPTCHA(s) -> {len(stats['spec_keys']) / max(stats['captchas'], 1):.1f} spec keys per CAPTCHA")
+    print(f"   ✅ {len(marked)} waiting keyword(s) marked done")
+    for k in marked[:20]:
+        print(f"      {k['keyword']} ({k['spec_key']})")
+    print("=" * 60)
+    return 0 if stats["spec_keys"] else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Harvest every variant of broad AliExpress category searches")
+    parser.add_argument("query", nargs="*", help="Broad search, e.g. 'brushless ESC' (repeatable)")
+    parser.add_argument("--pending", action="store_true", help="Pick broad searches from waiting keywords")
+    parser.add_argument("--pages", type=int, default=DEFAULT_PAGES, help="Search result pages per query")
+    parser.add_argument("--max-listings", type=int, default=MAX_LISTINGS, help="Listings opened per query")
+    parser.add_argument("--hybrid", action="store_true", help="Headless; hand off to a visible browser on CAPTCHA")
+    parser.add_argument("--api", default=CLOUDFLARE_API, help="Worker base URL")
+    args = parser.parse_args()
+
+    if not API_KEY:
+        print("❌ Error: API_KEY environment variable not set.")
+        sys.exit(1)
+    api = args.api.rstrip("/")
+    queries = list(args.query) + (waiting_queries(api) if args.pending else [])
+    if not queries:
+        print("Usage: python harvest_crawl.py '<broad search>' [--pages N] | --pending")
+        sys.exit(1)
+
+    sys.exit(main(list(dict.fromkeys(queries)), args.pages, args.max_listings, args.hybrid, api))
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Ingest Journal - append-only record of every product the uploaders send to D1
+
+Each uploaded product is appended as one compact JSON line to
+scripts/.journal/ingest.jsonl, tagged with the endpoint that stored it ("via"):
+
+    ingest  /api/nova/ingest   (scrape_auto.py, scrape_aliexpress.py)
+    insert  /api/nova/insert   (scrape_interactive.py)
+    crawl   /api/crawl/result  (crawl_service.py)
+
+Once the active file passes JOURNAL_MAX_BYTES it is rotated to
+ingest-<utc time>.jsonl.gz. Writers in several processes share the directory
+(lock file), and a journal error never fails an upload.
+
+replay_journal.py rebuilds product_variants / variant_price_history from the journal.
+
+Usage (from an uploader):
+    from ingest_journal import journal_products
+
+    journal_products([product], keyword, via="ingest")
+"""
+
+import fcntl
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+
+# Configuration
+JOURNAL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".journal")
+ACTIVE_FILE = "ingest.jsonl"
+JOURNAL_MAX_BYTES = 64 * 1024 * 1024  # rotate (and gzip) past this size
+
+# Source column each endpoint writes (the crawl callback carries no X-Source, so "prod")
+DEFAULT_SOURCES = {"ingest": "nova_desktop", "insert": "nova_desktop", "crawl": "prod"}
+
+# Product fields /api/crawl/result reads besides title/url/variants
+CRAWL_PRODUCT_FIELDS = ("product_id", "brand", "stock", "rating", "reviews", "store_name", "image_url")
+CRAWL_VARIANT_FIELDS = ("stock", "image_token")
+
+_write_lock = threading.Lock()
+
+
+def _record(product, keyword, via, source, ts):
+    """Compact journal line for one uploaded product (None values dropped)"""
+    record = {
+        "ts": ts,
+        "via": via,
+        "src": source,
+        "kw": keyword,
+        "title": product.get("title"),
+        "url": product.get("product_url") or product.get("url"),
+        "cur": product.get("currency"),
+    }
+    if via == "crawl":
+        record.update({k: product.get(k) for k in CRAWL_PRODUCT_FIELDS})
+    variants = []
+    for v in product.get("variants") or []:
+        entry = {"label": v.get("variant_label"), "price": v.get("price"), "cur": v.get("currency")}
+        if via == "crawl":
+            entry.update({k: v.get(k) for k in CRAWL_VARIANT_FIELDS})
+        elif via == "ingest":
+            entry["stock"] = v.get("stock")  # /api/nova/ingest stores it (replay_journal.py reads it)
+        variants.append({k: val for k, val in entry.items() if val is not None})
+    record["variants"] = variants
+    return {k: v for k, v in record.items() if v is not None}
+
+
+def _rotate(journal_dir, active):
+    """Move the active file aside and gzip it (caller holds the lock)"""
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+    rotated = os.path.join(journal_dir, f"ingest-{stamp}-{os.getpid()}.jsonl")
+    os.replace(active, rotated)
+    with open(rotated, "rb") as src, gzip.open(rotated + ".gz", "wb", compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(rotated)
+
+
+def journal_products(products, keyword, via, source=None, journal_dir=JOURNAL_DIR):
+    """Append uploaded products to the journal; returns the number of lines written"""
+    source = source or DEFAULT_SOURCES.get(via, "prod")
+    ts = int(time.time() * 1000)
+    lines = [
+        json.dumps(_record(p, keyword, via, source, ts), separators=(",", ":"), ensure_ascii=False)
+        for p in products if p
+    ]
+    if not lines:
+        return 0
+
+    try:
+        os.makedirs(journal_dir, exist_ok=True)
+        active = os.path.join(journal_dir, ACTIVE_FILE)
+        with _write_lock, open(os.path.join(journal_dir, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            with open(active, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            if os.path.getsize(active) >= JOURNAL_MAX_BYTES:
+                _rotate(journal_dir, active)
+    except OSError as e:
+        print(f"   ⚠️  Journal write failed: {e}")
+        return 0
+    return len(lines)
+
+
+def journal_files(journal_dir=JOURNAL_DIR):
+    """Journal files oldest first: rotated segments, then the active file"""
+    if not os.path.isdir(journal_dir):
+        return []
+    rotated = sorted(n for n in os.listdir(journal_dir) if n.startswith("ingest-") and n.endswith(".jsonl.gz"))
+    paths = [os.path.join(journal_dir, n) for n in rotated]
+    active = os.path.join(journal_dir, ACTIVE_FILE)
+    if os.path.exists(active):
+        paths.append(active)
+    return paths
+
+
+def read_journal(paths):
+    """Yield records from journal files in order (.gz or plain), skipping torn lines"""
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+/api/price Load Test against a local worker
+
+Seeds a local D1 database with a synthetic catalog (scripts/synthetic_catalog.py,
+schemas from db/), starts the worker locally with `wrangler dev --persist-to`
+on that state and drives concurrent BOM traffic from an asyncio load generator.
+Reports requests/sec and p50/p95/p99 latency overall and per traffic class.
+
+Traffic mix (deterministic for a given --seed):
+- hot   BOMs from a small fixed pool built from the most popular spec keys,
+        repeated all run long (worker LRU / KV candidate cache stays warm)
+- cold  BOMs with random ESC/LiPo/motor specs from a wide range, almost
+        never repeated (cache miss, D1 lookup, crawl demand write)
+- a share of requests carries X-BOM-User (trust memory lookups), the rest is anonymous
+
+Seeding resets the D1 tables and the KV cache of the state directory, so
+consecutive runs with the same arguments are comparable; --json keeps a run,
+--compare diffs against a kept run (e.g. the previous release). The state lives
+in a temporary directory by default; the repo's own .wrangler/state (the
+`wrangler dev` data, tracked in git) is only seeded with --reset-dev-state.
+
+Usage:
+    python scripts/load_test.py
+    python scripts/load_test.py --variants 500000 --concurrency 32 --duration 120 --json runs/v1.json
+    python scripts/load_test.py --skip-seed --compare runs/v1.json
+    python scripts/load_test.py --url http://localhost:8787   # worker already running, no seeding
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+from bench_price import BOM_PARTS, percentile
+from query_plan_audit import INDEX_MIGRATIONS
+from synthetic_catalog import DB_DIR, create_schema, load_catalog, spec_catalog, zipf_weights
+
+# Configuration
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+DEV_STATE_DIR = os.path.join(REPO_DIR, ".wrangler", "state")   # wrangler dev default, tracked in git
+STATE_DIR = os.path.join(tempfile.gettempdir(), "bom_pricer_load_test")
+D1_DATABASE = "bom_pricer"   # database_name in wrangler.toml
+DEFAULT_PORT = 8787
+DEFAULT_VARIANTS = 100_000
+DEFAULT_HISTORY = 1
+DEFAULT_SEED = 42
+DEFAULT_CONCURRENCY = 16
+DEFAULT_DURATION_S = 60
+DEFAULT_WARMUP_S = 5
+DEFAULT_HOT_RATIO = 0.8
+DEFAULT_USER_RATIO = 0.3
+HOT_BOMS = 20
+USERS = 50
+BOM_LINES = (3, 15)          # lines per generated BOM (min, max)
+STARTUP_TIMEOUT_S = 90
+REQUEST_TIMEOUT_S = 60
+
+# Loaded after the synthetic catalog (FTS rebuild and index builds run once over the full table)
+LOCAL_MIGRATIONS = ["schema_price_rollup.sql", "schema_variant_fts.sql"] + INDEX_MIGRATIONS
+MARKER_TABLE = "_load_test_marker"
+
+
+# ─────────────────────────────────────────────
+# Local D1 seeding
+# ─────────────────────────────────────────────
+
+def wrangler(*args):
+    """Run a wrangler command from the repo root"""
+    return subprocess.run(["npx", "wrangler", *args], cwd=REPO_DIR, check=True,
+                          stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+
+
+def local_d1_path(state_dir):
+    """
+    SQLite file backing the local D1 database.
+    Miniflare names it by a hash of the binding, so a marker table is created
+    through wrangler and the file containing it is picked.
+    """
+    wrangler("d1", "execute", D1_DATABASE, "--local", "--persist-to", state_dir,
+             "--command", f"CREATE TABLE IF NOT EXISTS {MARKER_TABLE} (id INTEGER)")
+    for path in glob.glob(os.path.join(state_dir, "v3", "d1", "*", "*.sqlite")):
+        conn = sqlite3.connect(path)
+        try:
+            found = conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (MARKER_TABLE,)).fetchone()
+        finally:
+            conn.close()
+        if found:
+            return path
+    raise RuntimeError(f"local D1 file for {D1_DATABASE} not found under {state_dir}")
+
+
+def reset_database(conn):
+    """Drop every app table, view and trigger (miniflare's _cf_* tables stay)"""
+    user_objects = "name NOT LIKE 'sqlite_%' AND name NOT LIKE '\\_cf\\_%' ESCAPE '\\'"
+    for kind in ("trigger", "view"):
+        for (name,) in conn.execute(f"SELECT name FROM sqlite_master WHERE type = ? AND {user_objects}", (kind,)).fetchall():
+            conn.execute(f'DROP {kind.upper()} IF EXISTS "{name}"')
+    # Virtual tables first, they drop their own shadow tables
+    for (name,) in conn.execute(
+        f"SELECT name FROM sqlite_master WHERE type = 'table' AND sql LIKE 'CREATE VIRTUAL%' AND {user_objects}"
+    ).fetchall():
+        conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+    for (name,) in conn.execute(f"SELECT name FROM sqlite_master WHERE type = 'table' AND {user_objects}").fetchall():
+        conn.execute(f'DROP TABLE IF EXISTS "{name}"')
+    conn.commit()
+
+
+def seed_local(path, variants, history, seed):
+    """Replace the local D1 contents with a synthetic catalog, returns row counts"""
+    conn = sqlite3.connect(path)
+    reset_database(conn)
+    create_schema(conn)
+    counts = load_catalog(conn, variants, history, seed)
+    for name in LOCAL_MIGRATIONS:
+        with open(os.path.join(DB_DIR, name)) as f:
+            conn.executescript(f.read())
+    conn.commit()
+    # load_catalog turned the journal off; hand the file back to workerd in WAL mode
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.close()
+    return counts
+
+
+def is_dev_state(state_dir):
+    """True if state_dir is (or is inside) the repo's own wrangler state"""
+    dev = os.path.realpath(DEV_STATE_DIR)
+    path = os.path.realpath(state_dir)
+    return path == dev or path.startswith(dev + os.sep)
+
+
+def reset_local_kv(state_dir):
+    """Forget cached candidate rows / trust memory from earlier runs"""
+    shutil.rmtree(os.path.join(state_dir, "v3", "kv"), ignore_errors=True)
+
+
+def start_worker(port, state_dir):
+    """Start `wrangler dev` on the local state, returns (process, log path)"""
+    log = tempfile.NamedTemporaryFile(prefix="wrangler-dev-", suffix=".log", delete=False)
+    proc = subprocess.Popen(
+        ["npx", "wrangler", "dev", "--local", "--port", str(port), "--persist-to", state_dir],
+        cwd=REPO_DIR, stdout=log, stderr=subprocess.STDOUT
+    )
+    return proc, log.name
+
+
+async def wait_ready(url, proc=None):
+    """Poll the worker until it serves the UI"""
+    deadline = time.time() + STARTUP_TIMEOUT_S
+    async with aiohttp.ClientSession() as session:
+        while time.time() < deadline:
+            if proc is not None and proc.poll() is not None:
+                raise RuntimeError(f"wrangler dev exited with code {proc.returncode}")
+            try:
+                async with session.get(url + "/", timeout=aiohttp.ClientTimeout(total=5)) as r:
+                    if r.status == 200:
+                        return
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                pass
+            await asyncio.sleep(1)
+    raise RuntimeError(f"worker at {url} not ready after {STARTUP_TIMEOUT_S}s")
+
+
+# ─────────────────────────────────────────────
+# Traffic
+# ─────────────────────────────────────────────
+
+# parseBomLine() reproduces these catalog keys from BOM text; motor lines never carry the
+# stator size of the synthetic MOTOR:<size>:<kv> keys and props key as PROP:UNKNOWN
+HOT_ITEMS = ("ESC", "BATTERY")
+
+
+def spec_line(canonical, spec_key):
+    """BOM line text that parseBomLine() maps back onto a catalog spec key"""
+    parts = spec_key.split(":")
+    if canonical == "ESC":
+        return f"{parts[1]} ESC"
+    return f"{parts[2].lower()} {parts[1].lower()} lipo"
+
+
+def cold_line(rng):
+    """Random spec from a wide range - practically never cached"""
+    kind = rng.randrange(3)
+    if kind == 0:
+        return f"{rng.randint(5, 200)}A ESC"
+    if kind == 1:
+        return f"{rng.randrange(100, 10000, 10)}mah {rng.randint(1, 12)}s lipo"
+    return f"{rng.choice(['1404', '2207', '2306', '2810'])} {rng.randrange(300, 5000, 10)}kv motor"
+
+
+class Traffic:
+    """Deterministic request mix (one instance per load worker)"""
+
+    def __init__(self, seed, hot_boms, hot_ratio, user_ratio):
+        self.rng = random.Random(seed)
+        self.hot_boms = hot_boms
+        self.hot_ratio = hot_ratio
+        self.user_ratio = user_ratio
+
+    def next(self):
+        """(class name, BOM text, headers)"""
+        rng = self.rng
+        headers = {"Content-Type": "application/json"}
+        user = rng.random() < self.user_ratio
+        if user:
+            headers["X-BOM-User"] = f"load-user-{rng.randrange(USERS)}"
+        if rng.random() < self.hot_ratio:
+            kind, bom = "hot", rng.choice(self.hot_boms)
+        else:
+            lines = [f"{cold_line(rng)} x{rng.randint(1, 4)}" for _ in range(rng.randint(*BOM_LINES))]
+            kind, bom = "cold", "\n".join(lines)
+        return f"{kind}/{'user' if user else 'anon'}", bom, headers
+
+
+def build_hot_boms(seed, count=HOT_BOMS):
+    """Fixed BOM pool weighted towards popular spec keys, plus free-text parts (fuzzy matching)"""
+    rng = random.Random(seed)
+    specs = spec_catalog()
+    rng.shuffle(specs)  # same popularity order as synthetic_catalog.generate_variants
+    weights = zipf_weights(len(specs))
+    specs, weights = zip(*[(s, w) for s, w in zip(specs, weights) if s[0] in HOT_ITEMS])
+    boms = []
+    for _ in range(count):
+        lines = [spec_line(c, k) for c, k, _ in rng.choices(specs, weights, k=rng.randint(*BOM_LINES))]
+        lines += rng.sample(BOM_PARTS, 2)
+        boms.append("\n".join(f"{line} x{rng.randint(1, 4)}" for line in lines))
+    return boms
+
+
+async def load_worker(session, url, traffic, until, samples):
+    """Closed loop: one request at a time until the deadline"""
+    while time.time() < until:
+        kind, bom, headers = traffic.next()
+        start = time.perf_counter()
+        try:
+            async with session.post(url + "/api/price", json={"bom": bom}, headers=headers) as r:
+                await r.read()
+                status = r.status
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            status = type(e).__name__
+        samples.append((time.time(), kind, status, (time.perf_counter() - start) * 1000))
+
+
+async def run_load(url, concurrency, duration, warmup, seed, hot_ratio, user_ratio):
+    """Drive the worker for warmup + duration seconds, returns samples after warm-up"""
+    hot_boms = build_hot_boms(seed)
+    samples = []
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT_S)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        # Every hot BOM once, so "hot" really is cached when measuring starts
+        for bom in hot_boms:
+            async with session.post(url + "/api/price", json={"bom": bom}) as r:
+                await r.read()
+        measure_from = time.time() + warmup
+        until = measure_from + duration
+        await asyncio.gather(*(
+            load_worker(session, url, Traffic(seed * 1000 + i, hot_boms, hot_ratio, user_ratio), until, samples)
+            for i in range(concurrency)
+        ))
+    return [s for s in samples if s[0] >= measure_from]
+
+
+# ─────────────────────────────────────────────
+# Report
+# ─────────────────────────────────────────────
+
+def summarize(samples, duration):
+    """Per traffic class and overall: requests, rps, errors, latency percentiles"""
+    groups = {"all": samples}
+    for s in samples:
+        groups.setdefault(s[1], []).append(s)
+        groups.setdefault(s[1].split("/")[0], []).append(s)
+    report = {}
+    for name, rows in sorted(groups.items()):
+        ok = [ms for _, _, status, ms in rows if status == 200]
+        report[name] = {
+            "requests": len(rows),
+            "rps": round(len(rows) / duration, 1),
+            "errors": len(rows) - len(ok),
+            "p50_ms": round(percentile(ok, 50), 1) if ok else None,
+            "p95_ms": round(percentile(ok, 95), 1) if ok else None,
+            "p99_ms": round(percentile(ok, 99), 1) if ok else None,
+            "max_ms": round(max(ok), 1) if ok else None,
+        }
+    return report
+
+
+def print_report(report, baseline=None):
+    print("\n" + "=" * 78)
+    print(f"{'class':<12}{'requests':>10}{'rps':>9}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    print("=" * 78)
+    for name, r in report.items():
+        cells = [f"{r[k]:>10.1f}" if r[k] is not None else f"{'-':>10}" for k in ("p50_ms", "p95_ms", "p99_ms", "max_ms")]
+        print(f"{name:<12}{r['requests']:>10}{r['rps']:>9.1f}{r['errors']:>8}{''.join(cells)}")
+        base = (baseline or {}).get(name)
+        if base and base.get("p50_ms") and r["p50_ms"]:
+            print(f"{'  vs base':<12}{'':>10}{r['rps'] / base['rps'] if base['rps'] else 0:>8.2f}x{'':>8}"
+                  + "".join(f"{r[k] / base[k] if base.get(k) else 0:>9.2f}x" for k in ("p50_ms", "p95_ms", "p99_ms", "max_ms")))
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, check=True,
+                              stdout=subprocess.PIPE, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /api/price on a local worker with a synthetic catalog")
+    parser.add_argument("--url", help="Use an already running worker (no seeding, no wrangler dev)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="wrangler dev port")
+    parser.add_argument("--state-dir", default=STATE_DIR, help="wrangler --persist-to directory")
+    parser.add_argument("--reset-dev-state", action="store_true",
+                        help="Allow seeding the repo's .wrangler/state (drops its D1 tables and KV)")
+    parser.add_argument("--skip-seed", action="store_true", help="Keep the current local D1/KV contents")
+    parser.add_argument("--variants", type=int, default=DEFAULT_VARIANTS, help="Synthetic product_variants rows")
+    parser.add_argument("--history", type=int, default=DEFAULT_HISTORY, help="Price history rows per variant")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Seed for catalog and traffic")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Concurrent clients")
+    parser.add_argument("--duration", type=int, default=DEFAULT_DURATION_S, help="Measured seconds")
+    parser.add_argument("--warmup", type=int, default=DEFAULT_WARMUP_S, help="Unmeasured seconds before")
+    parser.add_argument("--hot-ratio", type=float, default=DEFAULT_HOT_RATIO, help="Share of cache-hot BOMs")
+    parser.add_argument("--user-ratio", type=float, default=DEFAULT_USER_RATIO, help="Share sending X-BOM-User")
+    parser.add_argument("--json", help="Write the run (config + results) to this file")
+    parser.add_argument("--compare", help="Earlier --json run to compare against")
+    args = parser.parse_args()
+
+    if not args.url and not args.skip_seed and is_dev_state(args.state_dir) and not args.reset_dev_state:
+        print(f"❌ Refusing to seed {os.path.relpath(args.state_dir, REPO_DIR)}: it is the wrangler dev state "
+              f"tracked in git. Pass --reset-dev-state to replace it, or use another --state-dir.")
+        sys.exit(1)
+
+    print("=" * 78)
+    print(f"🔥 /api/price load test - {args.concurrency} clients, {args.duration}s "
+          f"(hot {args.hot_ratio:.0%}, X-BOM-User {args.user_ratio:.0%})")
+    print("=" * 78)
+
+    proc = None
+    url = args.url
+    counts = None
+    try:
+        if not url:
+            if not args.skip_seed:
+                path = local_d1_path(args.state_dir)
+                print(f"🏭 Seeding {args.variants:,} variants into {path}")
+                start = time.time()
+                counts = seed_local(path, args.variants, args.history, args.seed)
+                reset_local_kv(args.state_dir)
+                print(f"   Seeded in {time.time() - start:.0f}s: {counts}")
+            proc, log = start_worker(args.port, args.state_dir)
+            url = f"http://localhost:{args.port}"
+            print(f"🚀 wrangler dev on {url} (log: {log})")
+        asyncio.run(wait_ready(url, proc))
+
+        print(f"⏱️  Warm-up {args.warmup}s, measuring {args.duration}s ...")
+        samples = asyncio.run(run_load(url, args.concurrency, args.duration, args.warmup,
+                                       args.seed, args.hot_ratio, args.user_ratio))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    report = summarize(samples, args.duration)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        print(f"\n📊 Compared with {args.compare}")
+    print_report(report, baseline)
+
+    if args.json:
+        config = {k: v for k, v in vars(args).items() if k not in ("json", "compare")}
+        run = {"revision": git_revision(), "time": int(time.time()), "config": config, "seeded": counts, "results": report}
+        os.makedirs(os.path.dirname(os.path.abspath(args.json)), exist_ok=True)
+        with open(args.json, "w") as f:
+            json.dump(run, f, indent=2)
+        print(f"\n💾 Saved run to {args.json}")
+
+    if report.get("all", {}).get("errors"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
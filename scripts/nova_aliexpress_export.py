@@ -5,6 +5,12 @@ Nova Desktop AliExpress Export Helper
 Extracts product data from current AliExpress page in Nova/Playwright browser
 and sends it to your Cloudflare Worker for storage.
 
+Only the fields /api/nova/ingest consumes are uploaded (title, productInfo,
+skuInfo.priceList, price sections), gzip-compressed. Set NOVA_DEBUG_HTML=1
+(or debug_html=True) to also upload the full page HTML and runParams.
+Set NOVA_CAPTURE_DIR to also keep each payload as <item id>-<ms>.json.gz for
+offline bulk parsing (parse_pages.py).
+
 Usage:
     1. Open AliExpress product page in Nova
     2. Solve any verification if needed
@@ -12,9 +18,12 @@ Usage:
 """
 
 import requests
+import gzip
 import json
+import re
 import sys
 import os
+import time
 
 # Configuration - Update these values
 CLOUDFLARE_API = "https://bom-pricer-api.randunun.workers.dev/api/nova/ingest"
@@ -25,19 +34,95 @@ if not API_KEY:
     # Original used fallback in CLI. Let's just set it to None and handle it.
     API_KEY = None
 
+DEBUG_HTML = os.getenv("NOVA_DEBUG_HTML") == "1"
+CAPTURE_DIR = os.getenv("NOVA_CAPTURE_DIR")
+MAX_PRICE_SECTIONS = 10
+MAX_PRICE_SECTION_CHARS = 4000
+
+# Runs in the page: keeps only what parseWithAI() in api/ai_parse.js reads
+TRIM_SCRIPT = """
+    ({ maxSections, maxChars }) => {
+        const rp = window.runParams || window.__INIT_DATA__ || null;
+        const data = rp && rp.data ? rp.data : null;
+        const pi = data && data.productInfo ? data.productInfo : null;
+        const sku = data && data.skuInfo ? data.skuInfo : null;
+
+        const json = pi ? {
+            data: {
+                productInfo: { title: pi.title },
+                skuInfo: {
+                    priceList: ((sku && sku.priceList) || []).map(p => ({
+                        skuAttr: p.skuAttr,
+                        skuId: p.skuId,
+                        skuIdStr: p.skuIdStr,
+                        skuVal: p.skuVal ? {
+                            skuAmount: p.skuVal.skuAmount ? { value: p.skuVal.skuAmount.value } : undefined,
+                            actSkuCalPrice: p.skuVal.actSkuCalPrice,
+                            availQuantity: p.skuVal.availQuantity
+                        } : undefined
+                    }))
+                }
+            }
+        } : null;
+
+        // Price sections for the regex fallback when runParams has no productInfo
+        const sections = [...document.querySelectorAll('[class*="price"], [class*="sku"]')]
+            .filter(el => !el.parentElement || !el.parentElement.closest('[class*="price"], [class*="sku"]'))
+            .slice(0, maxSections)
+            .map(el => el.outerHTML.slice(0, maxChars));
+        const html = `<title>${document.title}</title>\\n` + sections.join("\\n");
+
+        return { json, html };
+    }
+"""
+
+
+def build_payload(page, debug_html=False):
+    """
+    Build the ingest payload for the current page.
+    
+    Trimmed by default; debug_html uploads full page.content() and runParams.
+    """
+    if debug_html:
+        html = page.content()
+        run_params = page.evaluate("""
+            () => window.runParams || window.__INIT_DATA__ || null
+        """)
+        print(f"   HTML: {len(html):,} bytes (debug: full page)")
+        print(f"   JSON: {'Found' if run_params else 'Not found'}")
+        return {"html": html, "json": run_params, "product_url": page.url}
+
+    trimmed = page.evaluate(TRIM_SCRIPT, {"maxSections": MAX_PRICE_SECTIONS, "maxChars": MAX_PRICE_SECTION_CHARS})
+    variants = len(trimmed["json"]["data"]["skuInfo"]["priceList"]) if trimmed["json"] else 0
+    print(f"   JSON: {'productInfo + ' + str(variants) + ' SKU prices' if trimmed['json'] else 'Not found'}")
+    print(f"   HTML: {len(trimmed['html']):,} bytes (title + price sections)")
+    return {"html": trimmed["html"], "json": trimmed["json"], "product_url": page.url, "trimmed": True}
+
+
+def save_capture(payload, capture_dir=CAPTURE_DIR):
+    """Keep the payload as <capture_dir>/<item id>-<ms>.json.gz; returns the path"""
+    item = re.search(r"item/(\d+)", payload.get("product_url") or "")
+    os.makedirs(capture_dir, exist_ok=True)
+    path = os.path.join(capture_dir, f"{item.group(1) if item else 'page'}-{int(time.time() * 1000)}.json.gz")
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        json.dump(payload, f)
+    return path
 
-def export_current_product(page, api_key=None):
+
+def export_current_product(page, api_key=None, debug_html=None):
     """
     Export current AliExpress product from Nova/Playwright page.
     
     Args:
         page: Playwright page object with AliExpress product loaded
         api_key: Optional API key override
+        debug_html: Upload the full page HTML (defaults to NOVA_DEBUG_HTML)
     
     Returns:
-        dict with upload result
+        dict with upload result (plus "upload" size/latency stats)
     """
     key = api_key or API_KEY
+    debug_html = DEBUG_HTML if debug_html is None else debug_html
     
     # Get current URL
     product_url = page.url
@@ -46,38 +131,41 @@ def export_current_product(page, api_key=None):
     if "aliexpress.com/item" not in product_url:
         print("⚠️ Warning: This doesn't look like an AliExpress product page")
     
-    # 1️⃣ Extract HTML
-    html = page.content()
-    print(f"   HTML: {len(html):,} bytes")
-    
-    # 2️⃣ Extract AliExpress embedded JSON (runParams or __INIT_DATA__)
-    run_params = page.evaluate("""
-        () => window.runParams || window.__INIT_DATA__ || null
-    """)
-    print(f"   JSON: {'Found' if run_params else 'Not found'}")
-    
-    # 3️⃣ Build payload
-    payload = {
-        "html": html,
-        "json": run_params,
-        "product_url": product_url
-    }
+    # 1️⃣ Extract fields the worker needs
+    payload = build_payload(page, debug_html)
+    if CAPTURE_DIR:
+        print(f"   💾 Captured: {save_capture(payload)}")
+    
+    # 2️⃣ Compress
+    raw_body = json.dumps(payload).encode("utf-8")
+    body = gzip.compress(raw_body)
     
-    # 4️⃣ Send to Cloudflare
+    # 3️⃣ Send to Cloudflare
     print(f"   Uploading to {CLOUDFLARE_API}...")
     
     try:
+        start = time.perf_counter()
         r = requests.post(
             CLOUDFLARE_API,
             headers={
                 "Authorization": f"Bearer {key}",
-                "Content-Type": "application/json"
+                "Content-Type": "application/json",
+                "Content-Encoding": "gzip"
             },
-            data=json.dumps(payload),
+            data=body,
             timeout=30
         )
+        upload_ms = (time.perf_counter() - start) * 1000
+        print(f"   📊 Sent {len(body):,} bytes (JSON {len(raw_body):,} bytes, "
+              f"{len(body) / max(len(raw_body), 1):.1%}) in {upload_ms:.0f} ms")
         
         result = r.json() if r.headers.get('content-type', '').startswith('application/json') else {"text": r.text}
+        result["upload"] = {
+            "mode": "full_html" if debug_html else "trimmed",
+            "json_bytes": len(raw_body),
+            "bytes_sent": len(body),
+            "upload_ms": round(upload_ms)
+        }
         
         if r.status_code == 200:
             print(f"✅ Success!")
@@ -99,6 +187,27 @@ def export_current_product(page, api_key=None):
         return {"error": str(e)}
 
 
+def compare_upload_modes(page, api_key=None):
+    """
+    Upload the current product once as full HTML (previous behaviour) and once
+    trimmed, then print bytes sent and upload latency side by side.
+    """
+    full = export_current_product(page, api_key, debug_html=True).get("upload", {})
+    trimmed = export_current_product(page, api_key, debug_html=False).get("upload", {})
+    
+    print("\n📊 Upload comparison")
+    print(f"   {'mode':<12}{'JSON bytes':>14}{'bytes sent':>14}{'upload ms':>12}")
+    for stats in (full, trimmed):
+        if stats:
+            print(f"   {stats['mode']:<12}{stats['json_bytes']:>14,}{stats['bytes_sent']:>14,}{stats['upload_ms']:>12,}")
+    if full and trimmed:
+        # Before this exporter trimmed and gzipped, the full JSON went out uncompressed
+        print(f"   Trimmed sends {trimmed['bytes_sent'] / max(full['json_bytes'], 1):.2%} of the "
+              f"previous uncompressed upload ({full['json_bytes']:,} bytes)")
+    
+    return {"full_html": full, "trimmed": trimmed}
+
+
 def export_from_url(browser, url, api_key=None):
     """
     Navigate to URL and export product.
@@ -132,6 +241,7 @@ if __name__ == "__main__":
     print("Example usage in Nova:")
     print("  from nova_aliexpress_export import export_current_product")
     print("  export_current_product(page)")
+    print("  compare_upload_modes(page)   # bytes/latency: full HTML vs trimmed")
     print()
     print(f"API Endpoint: {CLOUDFLARE_API}")
     print(f"API Key configured: {'Yes' if API_KEY != 'YOUR_NOVA_INGEST_KEY' else 'No - update API_KEY in script'}")
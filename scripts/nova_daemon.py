@@ -4,6 +4,19 @@ Nova Daemon - Polls Cloudflare for pending keywords and auto-crawls
 
 Run this in background on your machine to automatically process crawl requests.
 
+Crawls run headless. When one hits a CAPTCHA, scrape_auto.py writes a checkpoint
+and the keyword is queued for a human: a visible browser opens for it (one at a
+time) while the daemon keeps crawling other keywords, and the crawl resumes
+headless once the CAPTCHA is cleared.
+
+When nothing urgent is pending, the daemon crawls one prefetch keyword per poll:
+sibling spec keys of recently crawled keywords (neighbouring amps/KV/cells/capacity
+and parts priced in the same BOMs, see crawler/prefetch.js), so the next BOM asking
+for them prices instantly.
+
+Throughput (crawled / failed / CAPTCHA handoffs) is reported every STATS_INTERVAL
+and shows up on /admin/crawl-health after the next cron snapshot.
+
 Usage:
     source .venv/bin/activate
     python scripts/nova_daemon.py
@@ -15,6 +28,10 @@ import time
 import json
 import sys
 import os
+import re
+import queue
+import threading
+import socket
 import subprocess
 import requests
 
@@ -22,6 +39,29 @@ import requests
 CLOUDFLARE_API = "https://bom-pricer-api.randunun.workers.dev"
 POLL_INTERVAL = 10  # seconds
 MAX_CRAWLS_PER_RUN = 3
+URGENT_PRIORITY = 10  # /api/crawl/request (UI button)
+DEMAND_SCORE_THRESHOLD = 4.0  # Also crawl unrequested keywords this valuable (crawler/priority.js score)
+PREFETCH_WHEN_IDLE = True  # Crawl sibling spec keys (/api/crawl/prefetch) when nothing urgent is pending
+PREFETCH_PER_POLL = 1  # Prefetch crawls per idle poll (urgent keywords are checked again after each)
+STATS_INTERVAL = 60  # seconds between throughput reports (/admin/crawl-health)
+DAEMON_ID = f"{socket.gethostname()}-{os.getpid()}-{int(time.time())}"
+CRAWL_TIMEOUT = 300  # seconds per headless crawl
+BUDGET_MARGIN = 30  # seconds of CRAWL_TIMEOUT kept for browser start/shutdown (scrape_auto.py --budget)
+HANDOFF_EXIT_CODE = 3  # Must match scrape_auto.py
+HANDOFF_TIMEOUT = 300  # Must match scrape_auto.py
+STATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".crawl_state")
+SCRAPER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scrape_auto.py")
+
+# Keywords waiting on (or being solved by) a human
+handoff_queue = queue.Queue()
+in_handoff = set()
+in_handoff_lock = threading.Lock()
+
+# Throughput counters, updated by the main loop and the handoff worker
+stats_lock = threading.Lock()
+
+# Prefetch keywords that failed this run (nothing server-side marks them, so skip them locally)
+prefetch_failed = set()
 
 def get_pending_keywords():
     """Fetch pending keywords from Cloudflare"""
@@ -29,9 +69,9 @@ def get_pending_keywords():
         r = requests.get(f"{CLOUDFLARE_API}/api/crawl/pending", timeout=10)
         if r.status_code == 200:
             data = r.json()
-            # Sort by priority (urgent first)
+            # Highest crawl value first (urgent requests score highest), priority for older workers
             keywords = data.get("keywords", [])
-            keywords.sort(key=lambda x: x.get("priority", 0), reverse=True)
+            keywords.sort(key=lambda x: (x.get("score", x.get("priority", 0)), x.get("priority", 0)), reverse=True)
             return keywords
         return []
     except Exception as e:
@@ -39,6 +79,18 @@ def get_pending_keywords():
         return []
 
 
+def get_prefetch_keywords(limit=20):
+    """Fetch low-priority prefetch keywords (sibling spec keys), best first"""
+    try:
+        r = requests.get(f"{CLOUDFLARE_API}/api/crawl/prefetch", params={"limit": limit}, timeout=10)
+        if r.status_code == 200:
+            return r.json().get("keywords", [])
+        return []
+    except Exception as e:
+        print(f"❌ Error fetching prefetch: {e}")
+        return []
+
+
 def mark_complete(keyword):
     """Mark keyword as crawled"""
     try:
@@ -52,26 +104,116 @@ def mark_complete(keyword):
         return False
 
 
-def run_crawl(keyword):
-    """Run the automated scraper for a keyword"""
-    print(f"\n🤖 Crawling: '{keyword}'")
-    
-    # Use the automated (non-interactive) scraper
-    script_path = os.path.join(os.path.dirname(__file__), "scrape_auto.py")
-    
+def count(stats, key):
+    """Increment a throughput counter under stats_lock, returns the new total"""
+    with stats_lock:
+        stats[key] += 1
+        if key == "handoffs":
+            stats["last_captcha_at"] = int(time.time() * 1000)
+        return stats[key]
+
+
+def report_stats(stats):
+    """Send cumulative throughput counters (snapshotted into crawl_health by the cron)"""
+    with stats_lock:
+        snapshot = dict(stats)
+    try:
+        requests.post(
+            f"{CLOUDFLARE_API}/api/crawl/daemon-stats",
+            json={"daemon_id": DAEMON_ID, **snapshot},
+            timeout=10
+        )
+    except Exception as e:
+        print(f"⚠️ Stats report failed: {e}")
+
+
+def checkpoint_path(keyword):
+    """Per-keyword checkpoint file for CAPTCHA handoffs"""
+    slug = re.sub(r"[^a-z0-9]+", "_", keyword.lower()).strip("_")
+    return os.path.join(STATE_DIR, f"handoff_{slug}.json")
+
+
+def run_scraper(args, timeout):
+    """Run scrape_auto.py, returns its exit code (None on timeout/error)"""
     try:
         result = subprocess.run(
-            [sys.executable, script_path, keyword],
-            timeout=300,  # 5 minute timeout
+            [sys.executable, SCRAPER, *args],
+            timeout=timeout,
             capture_output=False
         )
-        return result.returncode == 0
+        return result.returncode
     except subprocess.TimeoutExpired:
-        print(f"⏰ Timeout for '{keyword}'")
-        return False
+        print(f"⏰ Timeout: scrape_auto.py {' '.join(args)}")
+        return None
     except Exception as e:
         print(f"❌ Error: {e}")
-        return False
+        return None
+
+
+def crawl_budget_args():
+    """Deadline for scrape_auto.py, so it stops (and has uploaded) before CRAWL_TIMEOUT kills it"""
+    return ["--budget", str(CRAWL_TIMEOUT - BUDGET_MARGIN)]
+
+
+def run_crawl(keyword, stats):
+    """
+    Run the automated scraper (headless) for a keyword.
+    
+    Returns "ok", "handoff" (CAPTCHA, queued for a human) or "failed"
+    """
+    print(f"\n🤖 Crawling: '{keyword}'")
+    
+    checkpoint = checkpoint_path(keyword)
+    code = run_scraper([keyword, "--handoff-exit", "--checkpoint", checkpoint, *crawl_budget_args()], CRAWL_TIMEOUT)
+    
+    if code == 0:
+        return "ok"
+    if code == HANDOFF_EXIT_CODE:
+        queue_handoff(keyword, checkpoint, stats)
+        return "handoff"
+    return "failed"
+
+
+def queue_handoff(keyword, checkpoint, stats):
+    """Hand a blocked crawl to the human-in-the-loop worker"""
+    with in_handoff_lock:
+        in_handoff.add(keyword)
+    handoff_queue.put((keyword, checkpoint))
+    count(stats, "handoffs")
+    print(f"🧑 Queued CAPTCHA handoff for '{keyword}' ({handoff_queue.qsize()} waiting)")
+
+
+def handoff_worker(stats):
+    """One visible browser at a time: solve, then resume the crawl headless"""
+    while True:
+        keyword, checkpoint = handoff_queue.get()
+        requeued = False
+        try:
+            print(f"\n🧑 Handoff: '{keyword}' - solve the CAPTCHA in the browser window")
+            if run_scraper(["--solve", checkpoint], HANDOFF_TIMEOUT + 60) != 0:
+                print(f"⚠️ Handoff not solved: '{keyword}' (will be retried on a later poll)")
+                continue
+            
+            code = run_scraper(["--resume", checkpoint, "--handoff-exit", "--checkpoint", checkpoint,
+                                *crawl_budget_args()], CRAWL_TIMEOUT)
+            if code == HANDOFF_EXIT_CODE:
+                # Blocked again further along - back of the queue, progress kept
+                handoff_queue.put((keyword, checkpoint))
+                count(stats, "handoffs")
+                requeued = True
+            elif code == 0:
+                os.remove(checkpoint)
+                mark_complete(keyword)
+                total = count(stats, "crawled")
+                print(f"✅ Completed after handoff: '{keyword}' (total: {total})")
+            else:
+                count(stats, "failed")
+                print(f"⚠️ Failed after handoff: '{keyword}'")
+        finally:
+            if not requeued:
+                with in_handoff_lock:
+                    in_handoff.discard(keyword)
+            handoff_queue.task_done()
 
 
 def daemon_loop():
@@ -83,35 +225,78 @@ def daemon_loop():
     print("=" * 60)
     print("\nPress Ctrl+C to stop\n")
     
-    crawl_count = 0
+    stats = {"crawled": 0, "failed": 0, "handoffs": 0, "last_captcha_at": None,
+             "started_at": int(time.time() * 1000)}
+    last_report = 0
+    threading.Thread(target=handoff_worker, args=(stats,), daemon=True).start()
     
     while True:
         try:
-            # Get pending keywords
+            # Get pending keywords (skip ones waiting on a human)
             keywords = get_pending_keywords()
-            urgent = [k for k in keywords if k.get("priority", 0) >= 10]
+            with in_handoff_lock:
+                urgent = [
+                    k for k in keywords
+                    if (k.get("priority", 0) >= URGENT_PRIORITY or k.get("score", 0) >= DEMAND_SCORE_THRESHOLD)
+                    and k["keyword"] not in in_handoff
+                ]
             
             if urgent:
                 print(f"\n🚨 {len(urgent)} urgent keyword(s) found!")
                 
                 for kw in urgent[:MAX_CRAWLS_PER_RUN]:
                     keyword = kw["keyword"]
-                    success = run_crawl(keyword)
+                    if "score_breakdown" in kw:
+                        b = kw["score_breakdown"]
+                        print(f"   📈 '{keyword}' score {kw['score']} "
+                              f"(demand {b['demand']}, price age {b['price_age_hours']}h, fails {kw.get('fail_count', 0)})")
+                    result = run_crawl(keyword, stats)
                     
-                    if success:
+                    if result == "ok":
                         mark_complete(keyword)
-                        crawl_count += 1
-                        print(f"✅ Completed: '{keyword}' (total: {crawl_count})")
+                        total = count(stats, "crawled")
+                        print(f"✅ Completed: '{keyword}' (total: {total})")
+                    elif result == "handoff":
+                        print(f"⏸️ Waiting on human: '{keyword}' - continuing with other keywords")
                     else:
+                        count(stats, "failed")
                         print(f"⚠️ Failed: '{keyword}'")
             else:
-                # Show status dot
-                print(".", end="", flush=True)
+                # Idle: prefetch sibling spec keys (skip ones waiting on a human)
+                prefetch = get_prefetch_keywords() if PREFETCH_WHEN_IDLE else []
+                with in_handoff_lock:
+                    prefetch = [k for k in prefetch if k["keyword"] not in in_handoff and k["keyword"] not in prefetch_failed]
+                
+                for kw in prefetch[:PREFETCH_PER_POLL]:
+                    keyword = kw["keyword"]
+                    print(f"\n🔭 Idle - prefetching '{keyword}' ({kw.get('spec_key')})")
+                    result = run_crawl(keyword, stats)
+                    
+                    if result == "ok":
+                        mark_complete(keyword)
+                        total = count(stats, "crawled")
+                        print(f"✅ Prefetched: '{keyword}' (total: {total})")
+                    elif result == "failed":
+                        prefetch_failed.add(keyword)
+                        count(stats, "failed")
+                        print(f"⚠️ Prefetch failed: '{keyword}'")
+                
+                if not prefetch:
+                    # Show status dot
+                    print(".", end="", flush=True)
+            
+            if time.time() - last_report >= STATS_INTERVAL:
+                report_stats(stats)
+                last_report = time.time()
             
             time.sleep(POLL_INTERVAL)
             
         except KeyboardInterrupt:
-            print(f"\n\n👋 Daemon stopped. Crawled {crawl_count} keywords.")
+            report_stats(stats)
+            with stats_lock:
+                crawled = stats["crawled"]
+            print(f"\n\n👋 Daemon stopped. Crawled {crawled} keywords "
+                  f"({handoff_queue.qsize()} CAPTCHA handoffs still queued).")
             break
 
 
@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Offline Bulk Parser for Captured Product Pages
+
+Parses saved AliExpress product pages in parallel (process pool) into the
+variant rows /api/nova/ingest would store: title, SKU attributes, price,
+stock, spec key and variant id. Accepted inputs, as a directory tree or a
+.zip / .tar(.gz) archive:
+
+    *.json[.gz]        ingest payloads ({html, json, product_url, trimmed}) saved
+                       by nova_aliexpress_export.py (NOVA_CAPTURE_DIR)
+    *.html[.gz], *.htm full page HTML; runParams is read from the inline script
+
+Only the deterministic paths of parseWithAI() (api/ai_parse.js) run here:
+runParams productInfo/priceList, then the regex price fallback. Pages that
+would need Workers AI are counted and listed, not guessed.
+
+Pages stream through a bounded window of chunks, so memory stays flat for
+archives of any size. Results go to the ingest journal (replay_journal.py),
+to /api/nova/insert (pre-parsed, no AI on the worker), and/or a JSONL file.
+
+Usage:
+    python scripts/parse_pages.py captures/                            # parse and report only
+    python scripts/parse_pages.py captures.tar.gz --journal
+    python scripts/parse_pages.py captures.zip --upload --api http://localhost:8787
+    python scripts/parse_pages.py captures/ --out rows.jsonl --workers 8
+"""
+
+import argparse
+import gzip
+import json
+import multiprocessing
+import os
+import re
+import tarfile
+import threading
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import requests
+
+from ingest_journal import journal_products
+from specs import bom_line_type, extract_variant_specs, generate_spec_key, generate_variant_id
+
+# Configuration
+CLOUDFLARE_API = "https://bom-pricer-api.randunun.workers.dev"
+API_KEY = os.getenv("API_KEY")
+CHUNK_PAGES = 32            # pages per pool task
+CHUNKS_PER_WORKER = 2       # chunks in flight per worker (bounds memory)
+UPLOAD_WORKERS = 4          # concurrent /api/nova/insert requests
+UPLOAD_QUEUE = 64           # parsed products waiting for upload before parsing pauses
+MAX_LISTED = 20             # unparsed pages listed in the report
+SOURCE = "nova_desktop"     # source /api/nova/ingest and /api/nova/insert store
+BLOCKED_PRODUCT = "1005005987654321"  # fake product /api/nova/ingest refuses
+PAGE_SUFFIXES = (".json", ".json.gz", ".html", ".html.gz", ".htm")
+
+# parseWithAI() fallbacks (api/ai_parse.js)
+MIN_FULL_HTML = 1000        # shorter untrimmed HTML is an error/404 page
+MAX_REGEX_VARIANTS = 10
+TITLE_RE = re.compile(r"<title>([^<]+)</title>", re.I)
+H1_RE = re.compile(r"<h1[^>]*>([^<]+)</h1>", re.I)
+PRICE_RE = re.compile(r"(?:US\s*)?\$\s*(\d+\.?\d*)", re.I)
+RUN_PARAMS_RE = re.compile(r"(?:runParams|__INIT_DATA__)\s*=\s*")
+CANONICAL_RE = re.compile(r'<link[^>]+rel="canonical"[^>]+href="([^"]+)"', re.I)
+ITEM_ID = re.compile(r"item/(\d+)")
+
+_zip_files = {}  # per pool process: archive path -> open ZipFile
+
+
+# --- Reading pages ---
+
+def is_page(name):
+    """Captured page file names (by suffix)"""
+    return name.lower().endswith(PAGE_SUFFIXES)
+
+
+def list_pages(source):
+    """Yield page references: ("file", path), ("zip", archive, member) or ("tar", name, bytes)"""
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if is_page(name):
+                    yield ("file", os.path.join(root, name))
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and is_page(info.filename):
+                    yield ("zip", source, info.filename)
+    elif tarfile.is_tarfile(source):
+        # Streamed in order; members are read here and shipped to the pool with their chunk
+        with tarfile.open(source, "r|*") as archive:
+            for member in archive:
+                if member.isfile() and is_page(member.name):
+                    yield ("tar", member.name, archive.extractfile(member).read())
+    elif is_page(source):
+        yield ("file", source)
+
+
+def read_page(ref):
+    """(name, text) of a page reference, gunzipped"""
+    kind = ref[0]
+    if kind == "file":
+        name = ref[1]
+        with open(name, "rb") as f:
+            data = f.read()
+    elif kind == "zip":
+        archive = _zip_files.get(ref[1])
+        if archive is None:
+            archive = _zip_files[ref[1]] = zipfile.ZipFile(ref[1])
+        name = ref[2]
+        data = archive.read(name)
+    else:
+        name, data = ref[1], ref[2]
+    if data[:2] == b"\x1f\x8b":
+        data = gzip.decompress(data)
+    return name, data.decode("utf-8", errors="replace")
+
+
+def load_payload(name, text):
+    """Ingest payload {html, json, product_url, trimmed} of a page file"""
+    if name.lower().endswith((".json", ".json.gz")):
+        payload = json.loads(text)
+        return payload if isinstance(payload, dict) else {}
+
+    # Full page: runParams is assigned in an inline script (JSON in most layouts)
+    run_params = None
+    m = RUN_PARAMS_RE.search(text)
+    if m:
+        try:
+            run_params, _ = json.JSONDecoder().raw_decode(text, m.end())
+        except ValueError:
+            run_params = None
+    canonical = CANONICAL_RE.search(text)
+    return {"html": text, "json": run_params, "product_url": canonical.group(1) if canonical else None}
+
+
+# --- Parsing (parseWithAI without the AI) ---
+
+def js_float(value):
+    """parseFloat() of a number or numeric string (0 when it does not parse)"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    m = re.match(r"\s*([+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)", str(value or ""))
+    return float(m.group(1)) if m else 0.0
+
+
+def sku_attributes(sku_attr, sku_id=None):
+    """skuAttributes() of api/ai_parse.js: "14:200003699#30A;5:361386#Red" -> ["30A", "Red"]"""
+    if sku_attr and not isinstance(sku_attr, str):
+        return sku_attr
+    names = [part.partition("#")[2].strip() for part in (sku_attr or "").split(";")]
+    names = [n for n in names if n]
+    if names:
+        return names
+    return [f"SKU-{sku_id}"] if sku_id else None
+
+
+def js_label(attributes):
+    """Object.values(attributes).join(" ") as /api/nova/ingest builds the variant label"""
+    values = attributes.values() if isinstance(attributes, dict) else attributes if isinstance(attributes, list) else []
+    return " ".join("" if v is None else str(v) for v in values)
+
+
+def parse_payload(payload):
+    """(parser, parsed) like parseWithAI(); parser is "json", "regex", "needs_ai" or "error_page" """
+    data = payload.get("json") or {}
+    data = data.get("data") if isinstance(data, dict) else None
+    product_info = data.get("productInfo") if isinstance(data, dict) else None
+    if isinstance(product_info, dict) and product_info.get("title"):
+        sku_info = data.get("skuInfo") or {}
+        variants = []
+        for p in sku_info.get("priceList") or []:
+            sku_val = p.get("skuVal") or {}
+            amount = (sku_val.get("skuAmount") or {}).get("value")
+            variants.append({
+                "attributes": sku_attributes(p.get("skuAttr"), p.get("skuIdStr") or p.get("skuId")),
+                "sku_attr": p.get("skuAttr"),
+                "sku": p.get("skuId"),
+                "price": js_float(amount or sku_val.get("actSkuCalPrice") or 0),
+                "stock": sku_val.get("availQuantity") or None,
+            })
+        return "json", {"title": product_info["title"], "currency": "USD", "variants": variants}
+
+    html = payload.get("html") or ""
+    if not payload.get("trimmed") and len(html) < MIN_FULL_HTML:
+        return "error_page", None
+
+    m = TITLE_RE.search(html) or H1_RE.search(html)
+    title = m.group(1).strip() if m else "Unknown Product"
+    prices = []
+    for m in PRICE_RE.finditer(html):
+        price = float(m.group(1))
+        if 0 < price < 1000 and price not in prices:
+            prices.append(price)
+    if prices:
+        variants = [{"attributes": {"variant": f"option-{n + 1}"}, "price": price, "stock": None}
+                    for n, price in enumerate(prices[:MAX_REGEX_VARIANTS])]
+        return "regex", {"title": title, "currency": "USD", "variants": variants}
+    return "needs_ai", None
+
+
+def normalize(parsed, product_url):
+    """Product with the variant rows /api/nova/ingest stores for a parse result"""
+    title = parsed.get("title") or ""
+    m = ITEM_ID.search(product_url or "")
+    product_id = m.group(1) if m else None
+    item = bom_line_type(title) or "PRODUCT"
+    variants = []
+    for n, v in enumerate(parsed.get("variants") or []):
+        attributes = v.get("attributes")
+        label = js_label(attributes) if attributes is not None else str(v.get("sku") or f"variant-{n + 1}")
+        specs = extract_variant_specs(title, label)
+        variants.append({
+            "variant_label": label,
+            "sku_attr": v.get("sku_attr"),
+            "sku": v.get("sku"),
+            "price": v.get("price") or 0,
+            "currency": parsed.get("currency") or "USD",
+            "stock": v.get("stock"),
+            "spec_key": generate_spec_key(item, specs),
+            # Without a URL the worker ids the product by upload time (nova://NOVA-<ms>)
+            "variant_id": generate_variant_id(product_url, label, specs["pack_qty"] or 1, SOURCE) if product_url else None,
+        })
+    return {
+        "product_url": product_url,
+        "product_id": product_id,
+        "title": title,
+        "canonical_item": item,
+        "currency": parsed.get("currency") or "USD",
+        "variants": variants,
+    }
+
+
+def parse_chunk(refs):
+    """Pool task: parse a chunk of pages; returns (products, counts, unparsed pages, cpu seconds)"""
+    start = time.process_time()
+    products, unparsed = [], []
+    counts = {"pages": 0, "json": 0, "regex": 0, "needs_ai": 0, "error_page": 0, "blocked": 0, "unreadable": 0}
+    for ref in refs:
+        counts["pages"] += 1
+        try:
+            name, text = read_page(ref)
+            payload = load_payload(name, text)
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+            counts["unreadable"] += 1
+            unparsed.append(f"{ref[2] if ref[0] == 'zip' else ref[1]}: {e}")
+            continue
+        product_url = payload.get("product_url")
+        if product_url and BLOCKED_PRODUCT in product_url:
+            counts["blocked"] += 1
+            continue
+        parser, parsed = parse_payload(payload)
+        counts[parser] += 1
+        if parsed:
+            product = normalize(parsed, product_url)
+            product["parser"] = parser
+            product["page"] = name
+            products.append(product)
+        elif parser == "needs_ai":
+            unparsed.append(f"{name}: needs AI (upload through /api/nova/ingest)")
+    return products, counts, unparsed, time.process_time() - start
+
+
+# --- Sinks ---
+
+class Uploader:
+    """Posts parsed products to /api/nova/insert on a few threads (journaled like scrape_interactive.py)"""
+
+    def __init__(self, api, api_key):
+        self.url = f"{api.rstrip('/')}/api/nova/insert"
+        self.api_key = api_key
+        self.pool = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS)
+        self.slots = threading.BoundedSemaphore(UPLOAD_QUEUE)
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.uploaded = 0
+        self.failed = 0
+
+    def submit(self, product):
+        """Queue one product (blocks while UPLOAD_QUEUE products are waiting)"""
+        self.slots.acquire()
+        self.pool.submit(self._post, product)
+
+    def _post(self, product):
+        try:
+            session = getattr(self.local, "session", None)
+            if session is None:
+                session = self.local.session = requests.Session()
+            payload = {
+                "title": product["title"],
+                "product_url": product["product_url"],
+                "variants": [{"variant_label": v["variant_label"], "price": v["price"]} for v in product["variants"]],
+                "currency": product["currency"],
+            }
+            r = session.post(self.url, headers={"Authorization": f"Bearer {self.api_key}"}, json=payload, timeout=30)
+            ok = r.status_code == 200
+            if ok:
+                journal_products([product], None, via="insert")
+            else:
+                print(f"   ❌ Upload failed ({r.status_code}): {product['page']}")
+        except requests.RequestException as e:
+            ok = False
+            print(f"   ❌ Upload error: {e}")
+        finally:
+            self.slots.release()
+        with self.lock:
+            if ok:
+                self.uploaded += 1
+            else:
+                self.failed += 1
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+
+def chunked(refs, size):
+    """Lists of up to size references"""
+    chunk = []
+    for ref in refs:
+        chunk.append(ref)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run(source, workers, on_product, verbose=True):
+    """Parse every page under source with a pool of workers; returns the totals"""
+    totals = {"pages": 0, "json": 0, "regex": 0, "needs_ai": 0, "error_page": 0, "blocked": 0,
+              "unreadable": 0, "products": 0, "variants": 0, "cpu_s": 0.0}
+    unparsed = []
+    start = time.time()
+    last_report = start
+
+    def collect(future):
+        nonlocal last_report
+        products, counts, names, cpu_s = future.result()
+        for key, n in counts.items():
+            totals[key] += n
+        totals["cpu_s"] += cpu_s
+        unparsed.extend(names[:max(0, MAX_LISTED - len(unparsed))])
+        for product in products:
+            totals["products"] += 1
+            totals["variants"] += len(product["variants"])
+            on_product(product)
+        if verbose and time.time() - last_report >= 5:
+            last_report = time.time()
+            print(f"   📖 {totals['pages']:,} pages ({totals['pages'] / (last_report - start):,.0f} pages/s)")
+
+    # spawn: upload threads may already be running when the pool starts a process
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        in_flight = set()
+        for chunk in chunked(list_pages(source), CHUNK_PAGES):
+            if len(in_flight) >= workers * CHUNKS_PER_WORKER:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future)
+            in_flight.add(pool.submit(parse_chunk, chunk))
+        for future in in_flight:
+            collect(future)
+
+    totals["wall_s"] = time.time() - start
+    return totals, unparsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse captured AliExpress product pages into variant rows")
+    parser.add_argument("source", help="Directory, .zip or .tar(.gz) of captured pages (or a single page)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parser processes")
+    parser.add_argument("--journal", action="store_true", help="Append products to the ingest journal (via=ingest)")
+    parser.add_argument("--upload", action="store_true", help="Upload products to /api/nova/insert")
+    parser.add_argument("--api", default=CLOUDFLARE_API, help="Worker base URL for --upload")
+    parser.add_argument("--out", help="Write one JSON product per line to this file")
+    args = parser.parse_args()
+
+    if args.upload and not API_KEY:
+        print("❌ Error: API_KEY environment variable not set (needed for --upload).")
+        return
+    if not os.path.exists(args.source):
+        print(f"❌ Not found: {args.source}")
+        return
+
+    out = open(args.out, "w", encoding="utf-8") if args.out else None
+    uploader = Uploader(args.api, API_KEY) if args.upload else None
+
+    def on_product(product):
+        if out:
+            out.write(json.dumps(product, ensure_ascii=False) + "\n")
+        if args.journal:
+            journal_products([product], None, via="ingest")
+        if uploader:
+            uploader.submit(product)
+
+    print(f"🧩 Parsing {args.source} with {args.workers} worker(s)")
+    try:
+        totals, unparsed = run(args.source, args.workers, on_product)
+    finally:
+        if uploader:
+            uploader.close()
+        if out:
+            out.close()
+
+    pages, wall = totals["pages"], max(totals["wall_s"], 1e-9)
+    print(f"\n📊 {pages:,} pages in {wall:.1f}s: {pages / wall:,.0f} pages/s, "
+          f"{pages / wall / args.workers:,.0f} pages/s per core "
+          f"({pages / max(totals['cpu_s'], 1e-9):,.0f} per parser CPU second)")
+    print(f"   runParams {totals['json']:,} | regex {totals['regex']:,} | needs AI {totals['needs_ai']:,} | "
+          f"error page {totals['error_page']:,} | blocked {totals['blocked']:,} | unreadable {totals['unreadable']:,}")
+    print(f"   {totals['products']:,} products, {totals['variants']:,} variants")
+    if unparsed:
+        print(f"   Not parsed (first {MAX_LISTED}):")
+        for line in unparsed:
+            print(f"      {line}")
+    if uploader:
+        print(f"   📤 Uploaded {uploader.uploaded:,}, failed {uploader.failed:,}")
+    if args.journal:
+        print("   📝 Journaled (replay with scripts/replay_journal.py)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Bulk BOM Pricing CLI
+
+Prices many BOM files against /api/price. Each BOM is split into chunks of
+MAX_BOM_LINES lines (the worker truncates anything longer), chunks are sent
+concurrently over a pooled HTTP session, and each BOM's priced rows are streamed
+in order into <out-dir>/<bom name>.csv with the same columns as the UI's
+"Download CSV" (toCSV() in api/routes/pricing.js).
+
+BOM files can be plain text (one part per line, e.g. "30A ESC x2") or CSV with a
+description column (Description/Item/Part) and an optional quantity column
+(Quantity/Qty), like sample_bom.csv.
+
+Usage:
+    python scripts/price_bom_batch.py boms/*.txt --out-dir priced/
+    python scripts/price_bom_batch.py sample_bom.csv --concurrency 8 --user acme
+    python scripts/price_bom_batch.py boms/ --api http://localhost:8787 --retries 5
+"""
+
+import argparse
+import csv
+import io
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from bench_price import percentile
+
+# Configuration
+CLOUDFLARE_API = "https://bom-pricer-api.randunun.workers.dev"
+MAX_BOM_LINES = 50  # Must match MAX_BOM_LINES in api/routes/pricing.js
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RETRIES = 4
+BACKOFF_BASE_S = 1.0
+BACKOFF_MAX_S = 30.0
+REQUEST_TIMEOUT_S = 60
+BOM_EXTENSIONS = (".txt", ".csv", ".bom")
+
+DESCRIPTION_COLUMNS = ("description", "item", "part", "part name", "component")
+QUANTITY_COLUMNS = ("quantity", "qty", "count")
+
+
+class RetryableError(Exception):
+    """5xx / 429 / connection failure worth retrying"""
+
+
+def find_bom_files(paths):
+    """Expand directories into BOM files, keep explicit files as given"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(BOM_EXTENSIONS):
+                    files.append(os.path.join(path, name))
+        else:
+            files.append(path)
+    return files
+
+
+def read_bom_lines(path):
+    """Return BOM lines ("<description> x<qty>") from a text or CSV file"""
+    with open(path, encoding="utf-8-sig") as f:
+        text = f.read()
+
+    if path.lower().endswith(".csv"):
+        rows = list(csv.reader(io.StringIO(text)))
+        if not rows:
+            return []
+        header = [h.strip().lower() for h in rows[0]]
+        desc_col = next((header.index(c) for c in DESCRIPTION_COLUMNS if c in header), None)
+        qty_col = next((header.index(c) for c in QUANTITY_COLUMNS if c in header), None)
+        if desc_col is None:
+            # No recognizable header: first column is the part, second the quantity
+            desc_col, qty_col = 0, 1 if len(rows[0]) > 1 else None
+        else:
+            rows = rows[1:]
+
+        lines = []
+        for row in rows:
+            if desc_col >= len(row) or not row[desc_col].strip():
+                continue
+            line = row[desc_col].strip()
+            if qty_col is not None and qty_col < len(row) and row[qty_col].strip().isdigit():
+                line += f" x{row[qty_col].strip()}"
+            lines.append(line)
+        return lines
+
+    return [l.strip() for l in text.splitlines() if l.strip()]
+
+
+def chunk_lines(lines, size=MAX_BOM_LINES):
+    """Split BOM lines into request-sized chunks"""
+    return [lines[i:i + size] for i in range(0, len(lines), size)]
+
+
+def make_session(concurrency):
+    """One keep-alive connection pool shared by all worker threads"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def price_chunk(session, api, lines, headers, retries, latencies, lock):
+    """POST one chunk with ?format=csv, retrying 5xx/429 with exponential backoff"""
+    url = f"{api}/api/price?format=csv"
+    for attempt in range(retries + 1):
+        start = time.perf_counter()
+        retry_after = None
+        try:
+            r = session.post(url, json={"bom": "\n".join(lines)}, headers=headers, timeout=REQUEST_TIMEOUT_S)
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+            if r.status_code >= 500 or r.status_code == 429:
+                retry_after = r.headers.get("Retry-After")
+                raise RetryableError(f"HTTP {r.status_code}")
+            r.raise_for_status()
+            r.encoding = "utf-8"
+            return r.text
+        except (RetryableError, requests.ConnectionError, requests.Timeout) as e:
+            if attempt == retries:
+                raise
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else \
+                min(BACKOFF_MAX_S, BACKOFF_BASE_S * 2 ** attempt) * random.uniform(0.5, 1.0)
+            print(f"   ⚠️  {e} - retry {attempt + 1}/{retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def split_csv(text):
+    """Split a toCSV() response into (header, data rows) without the UTF-8 BOM"""
+    lines = text.lstrip("\ufeff").split("\r\n")
+    return lines[0], [l for l in lines[1:] if l]
+
+
+class BomWriter:
+    """Writes one BOM's chunks to CSV in chunk order as they complete"""
+
+    def __init__(self, path, total_chunks):
+        self.path = path
+        self.total_chunks = total_chunks
+        self.pending = {}
+        self.next_chunk = 0
+        self.rows = 0
+        self.file = None
+
+    def add(self, index, csv_text):
+        """Buffer a finished chunk and flush every chunk that is now in order"""
+        self.pending[index] = csv_text
+        while self.next_chunk in self.pending:
+            header, rows = split_csv(self.pending.pop(self.next_chunk))
+            if self.file is None:
+                # Same UTF-8 BOM + header as the UI download (LibreOffice compatibility)
+                self.file = open(self.path, "w", encoding="utf-8", newline="")
+                self.file.write("\ufeff" + header + "\r\n")
+            for row in rows:
+                self.file.write(row + "\r\n")
+            self.file.flush()
+            self.rows += len(rows)
+            self.next_chunk += 1
+
+    @property
+    def done(self):
+        return self.next_chunk == self.total_chunks
+
+    def close(self):
+        if self.file:
+            self.file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Price many BOM files concurrently into CSV")
+    parser.add_argument("paths", nargs="+", help="BOM files or directories (.txt, .csv, .bom)")
+    parser.add_argument("--api", default=CLOUDFLARE_API, help="Worker base URL")
+    parser.add_argument("--out-dir", default="priced_boms", help="Directory for priced CSVs")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Requests in flight")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help="Retries per chunk on 5xx/429")
+    parser.add_argument("--user", default=None, help="Send X-BOM-User for personalized ranking")
+    parser.add_argument("--test", action="store_true", help="Price against RC test data (X-Test-Mode: rc_hobby)")
+    args = parser.parse_args()
+
+    files = find_bom_files(args.paths)
+    if not files:
+        print("❌ No BOM files found")
+        sys.exit(1)
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    headers = {"Content-Type": "application/json"}
+    if args.user:
+        headers["X-BOM-User"] = args.user
+    if args.test:
+        headers["X-Test-Mode"] = "rc_hobby"
+
+    # Queue every chunk of every BOM up front; writers keep per-BOM order
+    writers, jobs = {}, []
+    for path in files:
+        lines = read_bom_lines(path)
+        if not lines:
+            print(f"   ⏭️  {path}: empty, skipped")
+            continue
+        chunks = chunk_lines(lines)
+        out_name = os.path.splitext(os.path.basename(path))[0] + ".csv"
+        writers[path] = BomWriter(os.path.join(args.out_dir, out_name), len(chunks))
+        jobs.extend((path, i, chunk) for i, chunk in enumerate(chunks))
+
+    print("=" * 60)
+    print(f"🧾 Pricing {len(writers)} BOMs ({len(jobs)} requests, {args.concurrency} in flight)")
+    print(f"   API: {args.api}")
+    print("=" * 60)
+
+    session = make_session(args.concurrency)
+    latencies, lock = [], threading.Lock()
+    failed = set()
+    start = time.time()
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = {
+            pool.submit(price_chunk, session, args.api, chunk, headers, args.retries, latencies, lock): (path, i)
+            for path, i, chunk in jobs
+        }
+        for future in as_completed(futures):
+            path, i = futures[future]
+            if path in failed:
+                continue
+            try:
+                writer = writers[path]
+                writer.add(i, future.result())
+                if writer.done:
+                    writer.close()
+                    print(f"   ✅ {path} -> {writer.path} ({writer.rows} lines)")
+            except Exception as e:
+                failed.add(path)
+                writers[path].close()
+                print(f"   ❌ {path} chunk {i + 1}: {e}")
+
+    elapsed = time.time() - start
+    priced = len(writers) - len(failed)
+
+    print("\n" + "=" * 60)
+    print(f"📊 {priced}/{len(writers)} BOMs priced in {elapsed:.1f}s "
+          f"({priced / elapsed * 60 if elapsed else 0:.1f} BOMs/min)")
+    if latencies:
+        print(f"   Request latency: mean {statistics.mean(latencies):.0f} ms | "
+              f"p50 {percentile(latencies, 50):.0f} ms | p95 {percentile(latencies, 95):.0f} ms | "
+              f"max {max(latencies):.0f} ms ({len(latencies)} requests incl. retries)")
+    print("=" * 60)
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Query Plan Audit
+
+Loads a synthetic catalog (scripts/synthetic_catalog.py) into a local SQLite
+database and prints EXPLAIN QUERY PLAN plus timings for every query
+the worker (api/) sends to D1 - first with the schema from db/ as deployed before
+the index migrations (INDEX_MIGRATIONS), then again after applying them.
+
+Plans containing "USE TEMP B-TREE" sort rows at query time; on the hot paths
+they should disappear once the composite indexes exist.
+
+Usage:
+    python scripts/query_plan_audit.py
+    python scripts/query_plan_audit.py --variants 200000 --runs 50
+    python scripts/query_plan_audit.py --db /tmp/catalog.sqlite --keep
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from synthetic_catalog import (
+    BASE_TIME_MS,
+    DB_DIR,
+    DEFAULT_HISTORY,
+    DEFAULT_VARIANTS,
+    create_schema,
+    load_catalog,
+)
+
+# Configuration
+INDEX_MIGRATIONS = ["schema_query_indexes.sql", "schema_typed_spec_index.sql"]
+DEFAULT_RUNS = 20
+
+# Must match TYPED_SPEC_FILTER in api/routes/pricing.js
+TYPED_SPEC_FILTER = """
+    spec_key = ?1
+    AND (?2 IS NULL OR current_A IS NULL OR current_A = ?2)
+    AND (?3 IS NULL OR kv IS NULL OR kv = ?3)
+    AND (?4 IS NULL OR capacity_mah IS NULL OR capacity_mah = ?4)
+    AND (?5 IS NULL OR voltage_s IS NULL OR voltage_s = ?5)
+"""
+
+# Must match SOURCE_FILTERS in api/shared.js
+SOURCE_FILTERS = {
+    "prod": "('prod', 'auto_crawl', 'browser_crawl', 'nova_desktop', 'rc_test')",
+    "rc_test": "('prod', 'rc_test', 'test_ingest')",
+}
+
+# (name, sql, params key) - one entry per distinct query in api/ (routes/*.js).
+# Params are resolved against sample rows picked from the generated catalog.
+QUERIES = [
+    ("price: candidates", f"""
+        SELECT * FROM product_variants
+        WHERE {TYPED_SPEC_FILTER} AND source IN {SOURCE_FILTERS['prod']}
+        ORDER BY unit_price_usd ASC, rating DESC
+        LIMIT 20
+    """, "typed_spec"),
+    ("price: candidates (rc_test)", f"""
+        SELECT * FROM product_variants
+        WHERE {TYPED_SPEC_FILTER} AND source IN {SOURCE_FILTERS['rc_test']}
+        ORDER BY unit_price_usd ASC, rating DESC
+        LIMIT 20
+    """, "typed_spec"),
+    ("price: recheck rows", f"""
+        SELECT * FROM product_variants
+        WHERE {TYPED_SPEC_FILTER}
+        ORDER BY unit_price_usd ASC, rating DESC
+        LIMIT 5
+    """, "typed_spec"),
+    ("price: history", f"""
+        SELECT unit_price_usd, stock, recorded_at
+        FROM variant_price_history
+        WHERE variant_id = ?
+          AND source IN {SOURCE_FILTERS['prod']}
+        ORDER BY recorded_at DESC
+        LIMIT 10
+    """, "variant_id"),
+    ("price: keyword status", """
+        SELECT keyword, status FROM crawl_keywords WHERE keyword = ?
+    """, "keyword"),
+    ("price: trust scores", """
+        SELECT brand, seller, trust_score, select_count, last_selected
+        FROM user_trust
+        WHERE user_key = ?
+    """, "user_key"),
+    ("ingest: wait for variants", f"""
+        SELECT * FROM product_variants
+        WHERE {TYPED_SPEC_FILTER} AND source IN {SOURCE_FILTERS['prod']}
+        ORDER BY unit_price_usd ASC
+        LIMIT 10
+    """, "typed_spec"),
+    ("ingest: previous state", """
+        SELECT unit_price_usd, stock FROM product_variants WHERE variant_id = ?
+    """, "variant_id"),
+    ("crawl: previous states", """
+        SELECT variant_id, unit_price_usd, stock FROM product_variants
+        WHERE variant_id IN (?)
+    """, "variant_id"),
+    ("crawl: result inbox sweep", """
+        SELECT task_id FROM crawl_result_inbox
+        WHERE status = 'queued' OR (status = 'processing' AND claimed_at < ?)
+        ORDER BY received_at
+        LIMIT 100
+    """, "now"),
+    ("crawl: scored keywords", """
+        WITH candidates AS (
+          SELECT k.keyword, k.canonical_type, k.spec_key, k.priority, k.status, k.fail_count,
+                 k.last_crawled, k.last_updated, k.next_retry,
+                 d.lookups, d.demand, d.last_requested,
+                 (SELECT MAX(v.last_price_update) FROM product_variants v WHERE v.spec_key = k.spec_key) AS last_price_update
+          FROM crawl_keywords k
+          LEFT JOIN spec_demand d ON d.spec_key = k.spec_key
+          WHERE k.keyword != '__GLOBAL_PAUSE__'
+            AND k.status IN ('pending', 'crawling')
+        )
+        SELECT * FROM candidates
+        ORDER BY (1 + log2(1 + COALESCE(demand, 0) / (1.0 + MAX(0, ?1 - COALESCE(last_requested, ?1)) * 1.0 / 604800000)))
+                 * (0.25 + 0.75 * CASE WHEN last_price_update IS NULL THEN 1.0
+                                       ELSE MIN(1.0, MAX(0, ?1 - last_price_update) * 1.0 / 259200000) END)
+                 / (1.0 + COALESCE(fail_count, 0))
+                 + CASE WHEN COALESCE(priority, 0) >= 10 THEN 100 ELSE 0 END DESC,
+                 priority DESC, last_updated ASC
+        LIMIT 50
+    """, "now"),
+    ("prefetch: co-occurring", """
+        SELECT other_key FROM spec_cooccurrence
+        WHERE spec_key = ?
+        ORDER BY weight / (1.0 + (? - last_seen) * 1.0 / 604800000) DESC
+        LIMIT 4
+    """, "spec_key_now"),
+    ("prefetch: known spec keys", """
+        SELECT spec_key FROM product_variants WHERE spec_key IN (?)
+        UNION
+        SELECT spec_key FROM crawl_keywords WHERE spec_key IN (?)
+    """, "spec_key_twice"),
+    ("harvest: priced spec keys", """
+        SELECT keyword, spec_key FROM crawl_keywords
+        WHERE status IN ('pending', 'prefetch', 'soft_fail', 'failed')
+          AND spec_key IN (
+            SELECT DISTINCT spec_key FROM product_variants
+            WHERE spec_key IN (?) AND unit_price_usd > 0
+          )
+    """, "spec_key"),
+    ("admin: pending queue", """
+        SELECT keyword, canonical_type, fail_count, last_updated
+        FROM crawl_keywords
+        WHERE status = 'pending'
+        ORDER BY priority DESC, last_updated ASC
+        LIMIT 20
+    """, None),
+    ("crawl: task source", """
+        SELECT source FROM crawl_tasks WHERE task_id = ?
+    """, "task_id"),
+    ("health: latest snapshot", """
+        SELECT * FROM crawl_health ORDER BY snapshot_time DESC LIMIT 1
+    """, None),
+    ("health: snapshot series", """
+        SELECT * FROM crawl_health WHERE snapshot_time > ? ORDER BY snapshot_time ASC
+    """, "week_ago"),
+    ("cron: keyword counts", """
+        SELECT status, COUNT(*) as count
+        FROM crawl_keywords
+        WHERE keyword != '__GLOBAL_PAUSE__'
+        GROUP BY status
+    """, None),
+    ("cron: tasks since snapshot", """
+        SELECT COUNT(*) as finished,
+               SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) as completed,
+               SUM(CASE WHEN status = 'blocked' THEN 1 ELSE 0 END) as blocked,
+               MAX(CASE WHEN status = 'blocked' THEN completed_at END) as last_blocked
+        FROM crawl_tasks
+        WHERE completed_at > ? AND completed_at <= ?
+    """, "snapshot_window"),
+    ("cron: price freshness", """
+        SELECT AVG((? - last_price_update) / 3600000.0) as avg_hours FROM product_variants
+    """, "now"),
+    ("cron: stale count", """
+        SELECT COUNT(*) as count FROM product_variants WHERE last_seen < ?
+    """, "stale_before"),
+    ("product: snapshot", """
+        SELECT data, data_gz, content_hash, updated_at FROM product_snapshots WHERE product_id = ?
+    """, "product_id"),
+    ("product: variants", """
+        SELECT variant_label, unit_price_usd as price, currency, stock, product_url
+        FROM product_variants
+        WHERE product_id = ?
+        ORDER BY unit_price_usd ASC
+    """, "product_id"),
+    ("resolve: variant", """
+        SELECT variant_id, product_url, variant_url, link_status
+        FROM product_variants
+        WHERE variant_id = ?
+        LIMIT 1
+    """, "variant_id"),
+]
+
+
+def sample_params(conn):
+    """Pick realistic bind values: the hottest spec key and rows inside it"""
+    spec_key = conn.execute("""
+        SELECT spec_key FROM product_variants
+        GROUP BY spec_key ORDER BY COUNT(*) DESC LIMIT 1
+    """).fetchone()[0]
+    variant_id, product_id, current_a, kv, capacity_mah, voltage_s = conn.execute(
+        "SELECT variant_id, product_id, current_A, kv, capacity_mah, voltage_s "
+        "FROM product_variants WHERE spec_key = ? LIMIT 1", (spec_key,)
+    ).fetchone()
+    keyword = conn.execute("SELECT keyword FROM crawl_keywords LIMIT 1").fetchone()[0]
+    task_id = conn.execute("SELECT task_id FROM crawl_tasks LIMIT 1").fetchone()[0]
+    return {
+        "spec_key": (spec_key,),
+        "spec_key_now": (spec_key, BASE_TIME_MS),
+        "spec_key_twice": (spec_key, spec_key),
+        "typed_spec": (spec_key, current_a, kv, capacity_mah, voltage_s),
+        "variant_id": (variant_id,),
+        "product_id": (product_id,),
+        "keyword": (keyword,),
+        "task_id": (task_id,),
+        "user_key": ("audit-user",),
+        "week_ago": (BASE_TIME_MS - 7 * 86_400_000,),
+        "now": (BASE_TIME_MS,),
+        "snapshot_window": (BASE_TIME_MS - 6 * 3_600_000, BASE_TIME_MS),
+        "stale_before": (BASE_TIME_MS - 48 * 3_600_000,),
+    }
+
+
+def explain(conn, sql, params):
+    """EXPLAIN QUERY PLAN detail lines"""
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def time_query(conn, sql, params, runs):
+    """Median wall time in ms over `runs` executions"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def audit(conn, params, runs):
+    """Plan + timing for every query, keyed by query name"""
+    report = {}
+    for name, sql, key in QUERIES:
+        bind = params[key] if key else ()
+        report[name] = {
+            "plan": explain(conn, sql, bind),
+            "ms": time_query(conn, sql, bind, runs),
+        }
+    return report
+
+
+def print_report(title, report):
+    """Print plans and timings, flagging query-time sorts"""
+    print("\n" + "=" * 70)
+    print(f"📋 {title}")
+    print("=" * 70)
+    for name, entry in report.items():
+        sorts = any("TEMP B-TREE" in line for line in entry["plan"])
+        print(f"\n{'⚠️ ' if sorts else '✅'} {name}  ({entry['ms']:.3f} ms)")
+        for line in entry["plan"]:
+            print(f"      {line}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN QUERY PLAN + timings for worker queries")
+    parser.add_argument("--db", default=None, help="SQLite file to build (default: temp file)")
+    parser.add_argument("--variants", type=int, default=DEFAULT_VARIANTS, help="Synthetic product_variants rows")
+    parser.add_argument("--history", type=int, default=DEFAULT_HISTORY, help="Price history rows per variant")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="Timed executions per query")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated database")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.gettempdir(), "bom_pricer_audit.sqlite")
+    if os.path.exists(path):
+        os.remove(path)
+
+    print(f"🏭 Building synthetic catalog ({args.variants:,} variants) at {path}")
+    conn = sqlite3.connect(path)
+    create_schema(conn)
+    load_catalog(conn, args.variants, args.history)
+    params = sample_params(conn)
+    print(f"   Hot spec key: {params['spec_key'][0]} "
+          f"({conn.execute('SELECT COUNT(*) FROM product_variants WHERE spec_key = ?', params['spec_key']).fetchone()[0]:,} rows)")
+
+    before = audit(conn, params, args.runs)
+    print_report("Before: schema from db/ (no composite indexes)", before)
+
+    start = time.time()
+    for migration in INDEX_MIGRATIONS:
+        print(f"\n🔧 Applying db/{migration} ...")
+        with open(os.path.join(DB_DIR, migration)) as f:
+            conn.executescript(f.read())
+    print(f"   Indexes built in {time.time() - start:.1f}s")
+
+    after = audit(conn, params, args.runs)
+    print_report(f"After: {', '.join(INDEX_MIGRATIONS)}", after)
+
+    print("\n" + "=" * 70)
+    print("📊 Median latency (ms)")
+    print("=" * 70)
+    print(f"{'query':<32}{'before':>10}{'after':>10}{'speedup':>10}")
+    for name in before:
+        b, a = before[name]["ms"], after[name]["ms"]
+        print(f"{name:<32}{b:>10.3f}{a:>10.3f}{(b / a if a else 0):>9.1f}x")
+
+    conn.close()
+    if not args.keep:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Replay Ingest Journal into SQLite
+
+Rebuilds product_variants and variant_price_history from the uploader journal
+(ingest_journal.py) in a local SQLite database, e.g. to seed a dev DB or to
+recover D1 after a bad migration.
+
+Every record is normalized exactly like the endpoint that stored it
+(/api/nova/ingest, /api/nova/insert, /api/crawl/result): same spec extraction,
+spec keys, variant ids, FX conversion and ON CONFLICT update rules, and price
+history only where the worker writes it (crawl results whose price or stock
+changed). /api/nova/ingest runs the payload through the AI parser, which cannot
+be replayed; the journal keeps the labels/prices the scraper sent instead.
+
+The load is built for volume: variant state is folded in memory, the target
+tables are emptied and their indexes dropped, rows go in as multi-row INSERTs
+inside a single transaction, and the indexes are recreated at the end.
+
+Usage:
+    python scripts/replay_journal.py --db /tmp/replay.sqlite
+    python scripts/replay_journal.py --db /tmp/replay.sqlite scripts/.journal/ingest-*.jsonl.gz
+"""
+
+import argparse
+import itertools
+import math
+import re
+import sqlite3
+import time
+
+from ingest_journal import JOURNAL_DIR, journal_files, read_journal
+from specs import (bom_line_type, extract_variant_specs, generate_spec_key, generate_variant_id,
+                   keyword_item_type, to_usd)
+from synthetic_catalog import create_schema
+
+# Configuration
+SQLITE_MAX_VARIABLES = 32766   # SQLite >= 3.32 default
+HISTORY_FLUSH_ROWS = 200_000   # history rows buffered before inserting
+NORMALIZE_CACHE_SIZE = 500_000
+BLOCKED_PRODUCT = "1005005987654321"  # fake product /api/nova/ingest refuses
+
+# Grouped so each endpoint's ON CONFLICT(variant_id) DO UPDATE is one contiguous slice
+VARIANT_COLUMNS = [
+    "variant_id", "product_id", "canonical_item", "brand", "model", "variant_label", "pack_qty",
+    "product_url", "image_url", "source", "first_seen",
+    "spec_key", "current_A", "voltage_s", "capacity_mah", "kv", "pack_price_usd", "stock",
+    "unit_price_usd", "currency", "last_seen", "last_price_update",
+    "rating", "review_count", "seller",
+    "link_status",
+]
+HISTORY_COLUMNS = ["variant_id", "source", "unit_price_usd", "pack_price_usd", "stock", "recorded_at"]
+COL = {name: i for i, name in enumerate(VARIANT_COLUMNS)}
+
+# Columns each endpoint overwrites on conflict (ingest also forces link_status = 'resolved',
+# insert also overwrites spec_key)
+UPDATED_ON_CONFLICT = {
+    "ingest": slice(COL["spec_key"], COL["last_price_update"] + 1),
+    "insert": slice(COL["unit_price_usd"], COL["last_price_update"] + 1),
+    "crawl": slice(COL["spec_key"], COL["seller"] + 1),
+}
+
+(I_PRODUCT_ID, I_BRAND, I_IMAGE, I_PACK_QTY, I_SPEC_KEY, I_UNIT_PRICE, I_PACK_PRICE, I_CURRENCY, I_STOCK,
+ I_RATING, I_REVIEWS, I_SELLER, I_FIRST_SEEN, I_LAST_SEEN, I_PRICE_UPDATE, I_LINK_STATUS) = (
+    COL[c] for c in ("product_id", "brand", "image_url", "pack_qty", "spec_key", "unit_price_usd",
+                     "pack_price_usd", "currency", "stock", "rating", "review_count", "seller", "first_seen",
+                     "last_seen", "last_price_update", "link_status"))
+
+ITEM_ID = re.compile(r"item/(\d+)")
+
+
+def product_id_from_url(url, ts):
+    """AliExpress item id, or the NOVA-<ms> placeholder the nova endpoints assign"""
+    m = ITEM_ID.search(url or "")
+    return m.group(1) if m else f"NOVA-{ts}"
+
+
+def variant_row(**values):
+    """product_variants row in VARIANT_COLUMNS order (missing columns NULL)"""
+    return [values.get(c) for c in VARIANT_COLUMNS]
+
+
+class Replayer:
+    """Folds journal records into final product_variants rows plus history rows"""
+
+    def __init__(self):
+        self.variants = {}          # variant_id -> row (VARIANT_COLUMNS order)
+        self.history = []
+        self.templates = {}         # (via, source, url, title, label[, item]) -> row without price/stock/times
+        self.records = 0
+        self.skipped = 0
+
+    def add(self, record):
+        """Apply one journal record the way its endpoint would"""
+        self.records += 1
+        via = record.get("via")
+        handler = getattr(self, f"_apply_{via}", None)
+        if handler is None:
+            self.skipped += 1
+            return
+        handler(record, record.get("ts") or 0, record.get("src") or "prod")
+
+    def _template(self, key, build, *args):
+        """Identity, spec key and static columns of a variant, memoized (snapshots repeat)"""
+        template = self.templates.get(key)
+        if template is None:
+            if len(self.templates) >= NORMALIZE_CACHE_SIZE:
+                self.templates.clear()
+            template = self.templates[key] = build(*args)
+        return template
+
+    def _fold(self, via, row):
+        """INSERT ... ON CONFLICT(variant_id) DO UPDATE of the endpoint"""
+        prev = self.variants.get(row[0])
+        if prev is None:
+            self.variants[row[0]] = row
+            return
+        updated = UPDATED_ON_CONFLICT[via]
+        prev[updated] = row[updated]
+        if via == "ingest":
+            prev[I_LINK_STATUS] = "resolved"
+        elif via == "insert":
+            prev[I_SPEC_KEY] = row[I_SPEC_KEY]
+
+    # /api/nova/ingest
+
+    @staticmethod
+    def _ingest_template(source, url, product_id, title, label):
+        item = bom_line_type(title) or "PRODUCT"
+        specs = extract_variant_specs(title, label)
+        pack_qty = specs["pack_qty"] or 1
+        return variant_row(
+            variant_id=generate_variant_id(url or f"nova://{product_id}", label, pack_qty, source),
+            product_id=product_id, canonical_item=item, spec_key=generate_spec_key(item, specs),
+            brand="", model=title or "Unknown", variant_label=label,
+            current_A=specs["current_A"], voltage_s=specs["voltage_s"],
+            capacity_mah=specs["capacity_mah"], kv=specs["kv"],
+            pack_qty=pack_qty, product_url=url, source=source,
+            link_status="resolved" if url else "search_only",
+        )
+
+    def _apply_ingest(self, record, ts, source):
+        title = record.get("title") or ""
+        url = record.get("url")
+        if url and BLOCKED_PRODUCT in url:
+            return
+        product_id = product_id_from_url(url, ts)
+        currency = record.get("cur") or "USD"
+        for n, v in enumerate(record.get("variants") or ()):
+            label = v.get("label") or f"variant-{n + 1}"
+            # Without a URL the id embeds the record time, nothing to reuse
+            template = (self._template(("ingest", source, url, title, label), self._ingest_template,
+                                       source, url, product_id, title, label)
+                        if url else self._ingest_template(source, url, product_id, title, label))
+            price = v.get("price") or 0
+            unit = to_usd(price, currency) or price or 0
+            row = template.copy()
+            row[I_UNIT_PRICE] = unit
+            row[I_PACK_PRICE] = unit * row[I_PACK_QTY]
+            row[I_CURRENCY] = currency
+            row[I_STOCK] = v.get("stock") or None
+            row[I_FIRST_SEEN] = row[I_LAST_SEEN] = row[I_PRICE_UPDATE] = ts
+            self._fold("ingest", row)
+
+    # /api/nova/insert
+
+    @staticmethod
+    def _insert_template(source, url, product_id, title, label):
+        specs = extract_variant_specs(title, label)
+        return variant_row(
+            variant_id=generate_variant_id(url or f"nova://{product_id}", label, specs["pack_qty"] or 1, source),
+            product_id=product_id, spec_key=generate_spec_key(bom_line_type(title) or "PRODUCT", specs),
+            variant_label=label, pack_qty=1, product_url=url, source=source, link_status="search_only",
+        )
+
+    def _apply_insert(self, record, ts, source):
+        title = record.get("title")
+        url = record.get("url")
+        if not title:
+            return
+        product_id = product_id_from_url(url, ts)
+        currency = record.get("cur")
+        stored = 0
+        for v in record.get("variants") or ():
+            label = v.get("label") or f"variant-{stored + 1}"
+            try:
+                price = float(v.get("price") or 0)
+            except (TypeError, ValueError):
+                price = 0
+            if price <= 0:
+                continue
+            template = (self._template(("insert", source, url, title, label), self._insert_template,
+                                       source, url, product_id, title, label)
+                        if url else self._insert_template(source, url, product_id, title, label))
+            row = template.copy()
+            row[I_UNIT_PRICE] = math.floor(price / 320 * 100 + 0.5) / 100 if currency == "LKR" else price
+            row[I_CURRENCY] = currency or "LKR"
+            row[I_LAST_SEEN] = row[I_PRICE_UPDATE] = ts
+            self._fold("insert", row)
+            stored += 1
+
+    # /api/crawl/result
+
+    @staticmethod
+    def _crawl_template(source, url, item, title, label):
+        specs = extract_variant_specs(title, label)
+        return variant_row(
+            variant_id=generate_variant_id(url, label, specs["pack_qty"], source),
+            canonical_item=item, spec_key=generate_spec_key(item, specs),
+            model=title or "", variant_label=label or "Default",
+            current_A=specs["current_A"], voltage_s=specs["voltage_s"],
+            capacity_mah=specs["capacity_mah"], kv=specs["kv"],
+            pack_qty=specs["pack_qty"], product_url=url, source=source, link_status="search_only",
+        )
+
+    def _apply_crawl(self, record, ts, source):
+        item = keyword_item_type(record.get("kw"))
+        title = record.get("title")
+        url = record.get("url")
+        product = (record.get("product_id") or "UNKNOWN", record.get("brand") or "Unknown",
+                   record.get("rating") or 0, record.get("reviews") or 0, record.get("store_name") or "Unknown")
+        image = record.get("image_url")
+        for v in record.get("variants") or ():
+            label = v.get("label")
+            template = self._template(("crawl", source, url, title, label, item), self._crawl_template,
+                                      source, url, item, title, label)
+            pack_qty = template[I_PACK_QTY]
+            pack_price = to_usd(v.get("price") or 0, v.get("cur")) or 0
+            unit = pack_price / pack_qty if pack_qty > 1 else pack_price
+            stock = record.get("stock") or v.get("stock") or 0
+
+            # History is appended when price or stock moved (checked before the upsert)
+            prev = self.variants.get(template[0])
+            if prev is None or abs((prev[I_UNIT_PRICE] or 0) - unit) > 0.001 or prev[I_STOCK] != stock:
+                self.history.append((template[0], source, unit, pack_price, stock, ts))
+
+            row = template.copy()
+            row[I_PRODUCT_ID], row[I_BRAND], row[I_RATING], row[I_REVIEWS], row[I_SELLER] = product
+            row[I_IMAGE] = v.get("image_token") or image
+            row[I_UNIT_PRICE] = unit
+            row[I_PACK_PRICE] = pack_price
+            row[I_CURRENCY] = v.get("cur") or "USD"
+            row[I_STOCK] = stock
+            row[I_FIRST_SEEN] = row[I_LAST_SEEN] = row[I_PRICE_UPDATE] = ts
+            self._fold("crawl", row)
+
+
+def insert_rows(conn, table, columns, rows):
+    """Multi-row INSERTs, as many rows per statement as SQLite's variable limit allows"""
+    per_statement = SQLITE_MAX_VARIABLES // len(columns)
+    placeholder = "(" + ", ".join("?" * len(columns)) + ")"
+    head = f"INSERT INTO {table} ({', '.join(columns)}) VALUES "
+    full_sql = head + ", ".join([placeholder] * per_statement)
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, per_statement))
+        if not chunk:
+            return
+        sql = full_sql if len(chunk) == per_statement else head + ", ".join([placeholder] * len(chunk))
+        conn.execute(sql, list(itertools.chain.from_iterable(chunk)))
+
+
+def drop_indexes(conn, tables):
+    """Drop the explicit indexes on tables, returning their CREATE statements"""
+    marks = ", ".join("?" * len(tables))
+    indexes = conn.execute(
+        f"SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ({marks})",
+        tables
+    ).fetchall()
+    for name, _ in indexes:
+        conn.execute(f'DROP INDEX "{name}"')
+    return [sql for _, sql in indexes]
+
+
+def replay(conn, paths, verbose=True):
+    """Rebuild product_variants / variant_price_history from journal files; returns counts"""
+    start = time.time()
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA cache_size = -262144")  # 256 MB
+
+    tables = ["product_variants", "variant_price_history"]
+    conn.execute("BEGIN")
+    index_sql = drop_indexes(conn, tables)
+    for table in tables:
+        conn.execute(f"DELETE FROM {table}")
+
+    replayer = Replayer()
+    history_rows = 0
+    for record in read_journal(paths):
+        replayer.add(record)
+        if len(replayer.history) >= HISTORY_FLUSH_ROWS:
+            insert_rows(conn, "variant_price_history", HISTORY_COLUMNS, replayer.history)
+            history_rows += len(replayer.history)
+            replayer.history = []
+        if verbose and replayer.records % 250_000 == 0:
+            print(f"   📖 {replayer.records:,} records ({time.time() - start:.1f}s)")
+    insert_rows(conn, "variant_price_history", HISTORY_COLUMNS, replayer.history)
+    history_rows += len(replayer.history)
+    read_s = time.time() - start
+
+    # Key order turns the variant_id index build into appends
+    insert_rows(conn, "product_variants", VARIANT_COLUMNS, (replayer.variants[k] for k in sorted(replayer.variants)))
+    load_s = time.time() - start - read_s
+
+    for sql in index_sql:
+        conn.execute(sql)
+    conn.execute("COMMIT")
+    index_s = time.time() - start - read_s - load_s
+
+    if verbose:
+        print(f"   ⏱️  read+normalize {read_s:.1f}s | insert {load_s:.1f}s | "
+              f"{len(index_sql)} indexes {index_s:.1f}s")
+    return {
+        "records": replayer.records,
+        "skipped": replayer.skipped,
+        "product_variants": len(replayer.variants),
+        "variant_price_history": history_rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild product_variants/variant_price_history from the ingest journal")
+    parser.add_argument("--db", required=True, help="SQLite file (created if missing; both tables are replaced)")
+    parser.add_argument("files", nargs="*", help=f"Journal files in order (default: all of {JOURNAL_DIR})")
+    args = parser.parse_args()
+
+    paths = args.files or journal_files()
+    if not paths:
+        print(f"❌ No journal files in {JOURNAL_DIR}")
+        return
+
+    print(f"🔁 Replaying {len(paths)} journal file(s) into {args.db}")
+    start = time.time()
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    create_schema(conn)
+    counts = replay(conn, paths)
+    conn.close()
+
+    for name, n in counts.items():
+        print(f"   {name}: {n:,}")
+    print(f"✅ Done in {time.time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
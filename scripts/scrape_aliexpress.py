@@ -26,6 +26,9 @@ import requests
 from playwright.sync_api import sync_playwright
 import os
 
+from ingest_journal import journal_products
+from selector_engine import probe, print_probe_report
+
 # Configuration
 CLOUDFLARE_API = "https://bom-pricer-api.randunun.workers.dev/api/nova/ingest"
 API_KEY = os.getenv("API_KEY")
@@ -34,6 +37,32 @@ if not API_KEY:
     sys.exit(1)
 MAX_PRODUCTS = 5
 HEADLESS = False  # Set to True to run without visible browser
+SEARCH_TIMEOUT_MS = 20000  # Wait for any product selector (raced, see selector_engine.py)
+
+# Candidate selectors per layout (the last winner is tried first)
+PRODUCT_SELECTORS = [
+    "a[href*='/item/'][href*='.html']",
+    "[class*='SearchProductFeed'] a",
+    "[class*='product'] a[href*='item']",
+    ".list--gallery--C2f2tvm a",
+    "[data-widget-cid*='search'] a[href*='item']"
+]
+LINK_SELECTORS = [
+    '.search-item-card-wrapper-gallery a[href*="/item/"]',
+    '[class*="product-card"] a[href*="/item/"]',
+    'a[href*="aliexpress.com/item/"]'
+]
+PRICE_SELECTORS = [
+    '[class*="price--current"] span',
+    '.product-price-value',
+    '[class*="Price_Price"]',
+    '.uniform-banner-box-price'
+]
+SKU_SELECTORS = [
+    '[class*="sku-item"]',
+    '[class*="sku-property-item"]',
+    '.sku-property-text'
+]
 
 
 def random_delay(min_sec=1, max_sec=3):
@@ -56,57 +85,29 @@ def search_aliexpress(page, keyword):
     page.evaluate("window.scrollBy(0, 500)")
     random_delay(2, 3)
     
-    # Wait for any product-related element
-    product_selectors = [
-        "a[href*='/item/'][href*='.html']",
-        "[class*='SearchProductFeed'] a",
-        "[class*='product'] a[href*='item']",
-        ".list--gallery--C2f2tvm a",
-        "[data-widget-cid*='search'] a[href*='item']"
-    ]
-    
-    found = False
-    for selector in product_selectors:
-        try:
-            page.wait_for_selector(selector, timeout=5000)
-            print(f"   Found products with: {selector}")
-            found = True
-            break
-        except:
-            continue
+    # Wait for any product-related element (all candidates raced at once)
+    found = probe(page, "search_products", PRODUCT_SELECTORS, timeout_ms=SEARCH_TIMEOUT_MS)
     
     if not found:
         # Take a screenshot for debugging
         page.screenshot(path="/tmp/aliexpress_debug.png")
         print("   📸 Debug screenshot saved to /tmp/aliexpress_debug.png")
     
-    # Extract product URLs
+    # Extract product URLs (selector for this layout picked by the engine)
+    link_selector = probe(page, "search_links", LINK_SELECTORS, wait=False)
     product_links = page.evaluate("""
-        () => {
+        (selector) => {
             const links = [];
-            // Try multiple selectors for different AliExpress layouts
-            const selectors = [
-                '.search-item-card-wrapper-gallery a[href*="/item/"]',
-                '[class*="product-card"] a[href*="/item/"]',
-                'a[href*="aliexpress.com/item/"]'
-            ];
-            
-            for (const selector of selectors) {
-                const elements = document.querySelectorAll(selector);
-                if (elements.length > 0) {
-                    elements.forEach(el => {
-                        const href = el.href || el.getAttribute('href');
-                        if (href && href.includes('/item/') && !links.includes(href)) {
-                            links.push(href);
-                        }
-                    });
-                    break;
+            if (!selector) return links;
+            document.querySelectorAll(selector).forEach(el => {
+                const href = el.href || el.getAttribute('href');
+                if (href && href.includes('/item/') && !links.includes(href)) {
+                    links.push(href);
                 }
-            }
-            
+            });
             return links.slice(0, 10);  // Get top 10 for deduplication
         }
-    """)
+    """, link_selector)
     
     # Deduplicate by product ID
     seen_ids = set()
@@ -137,9 +138,12 @@ def extract_product_data(page, url, keyword):
     # Wait for page to stabilize
     random_delay(1, 2)
     
+    price_selector = probe(page, "product_price", PRICE_SELECTORS, wait=False)
+    sku_selector = probe(page, "product_sku", SKU_SELECTORS, wait=False)
+    
     # Extract data using AliExpress's embedded JSON
     data = page.evaluate("""
-        (keyword) => {
+        ({ keyword, priceSelector, skuSelector }) => {
             // Try to get runParams or __INIT_DATA__
             const runParams = window.runParams || window.__INIT_DATA__;
             
@@ -149,21 +153,8 @@ def extract_product_data(page, url, keyword):
                 title = document.querySelector('[class*="title"]')?.textContent?.trim() || 'Unknown';
             }
             
-            // Extract price (try multiple formats)
-            let priceText = '';
-            const priceSelectors = [
-                '[class*="price--current"] span',
-                '.product-price-value',
-                '[class*="Price_Price"]',
-                '.uniform-banner-box-price'
-            ];
-            for (const sel of priceSelectors) {
-                const el = document.querySelector(sel);
-                if (el) {
-                    priceText = el.textContent;
-                    break;
-                }
-            }
+            // Extract price (selector probed for this layout)
+            const priceText = priceSelector ? (document.querySelector(priceSelector)?.textContent || '') : '';
             
             // Parse price
             let price = 0;
@@ -178,7 +169,7 @@ def extract_product_data(page, url, keyword):
             
             // Extract variants (SKU options)
             const variants = [];
-            const skuElements = document.querySelectorAll('[class*="sku-item"], [class*="sku-property-item"], .sku-property-text');
+            const skuElements = skuSelector ? document.querySelectorAll(skuSelector) : [];
             
             skuElements.forEach((el, i) => {
                 const label = el.textContent?.trim() || `option-${i}`;
@@ -223,7 +214,7 @@ def extract_product_data(page, url, keyword):
                 has_json: !!runParams
             };
         }
-    """, keyword)
+    """, {"keyword": keyword, "priceSelector": price_selector, "skuSelector": sku_selector})
     
     if data:
         data['product_url'] = url
@@ -279,6 +270,7 @@ def send_to_cloudflare(products, keyword):
                 result = r.json()
                 print(f"  ✅ Stored: {result.get('title', 'Unknown')[:40]}... ({result.get('variants_stored', 0)} variants)")
                 successful += 1
+                journal_products([product], keyword, via="ingest")
             else:
                 print(f"  ❌ Failed ({r.status_code}): {r.text[:100]}")
                 
@@ -343,6 +335,7 @@ def main(keyword):
                 print("\n❌ No products extracted.")
                 
         finally:
+            print_probe_report()
             browser.close()
 
 
@@ -3,133 +3,211 @@
 AliExpress Auto Scraper - Fully automated, no user input required
 
 This script is used by the Nova daemon for automated crawling.
-It does NOT wait for CAPTCHA solving - if blocked, it fails gracefully.
+By default it does NOT wait for CAPTCHA solving - if blocked, it fails gracefully.
+
+Hybrid mode crawls headless and, only when check_for_captcha() fires, hands the
+session (storage state) to a visible browser for a human to clear, then resumes
+headless from the product it stopped at. Cleared sessions are reused by later
+headless crawls.
+
+With --budget the crawl works against a deadline: products are visited in order of
+expected value (search cards matching the most keyword terms first), each one is
+uploaded as soon as it is extracted, and the crawl stops before the next product
+once the time left no longer covers its estimated cost (recent per-page costs,
+.crawl_state/timing.json). A crawl killed at its deadline keeps what it uploaded.
 
 Usage:
     python scripts/scrape_auto.py "30A ESC"
+    python scripts/scrape_auto.py "30A ESC" --hybrid
+    python scripts/scrape_auto.py "30A ESC" --budget 270
+
+    # Daemon handoff: exit 3 with a checkpoint instead of waiting on a human
+    python scripts/scrape_auto.py "30A ESC" --handoff-exit --checkpoint state.json
+    python scripts/scrape_auto.py --solve state.json          # visible, human clears CAPTCHA
+    python scripts/scrape_auto.py --resume state.json --handoff-exit --checkpoint state.json
 """
 
 import sys
 import time
 import json
 import random
+import argparse
 import requests
 from playwright.sync_api import sync_playwright
 import os
 
+from ingest_journal import journal_products
+from selector_engine import probe, print_probe_report
+
 # Configuration
 CLOUDFLARE_API = "https://bom-pricer-api.randunun.workers.dev/api/nova/ingest"
 API_KEY = os.getenv("API_KEY")
-if not API_KEY:
-    print("❌ Error: API_KEY environment variable not set.")
-    sys.exit(1)
 MAX_PRODUCTS = 5
 PAGE_LOAD_WAIT = 8  # seconds to wait for page to load
 
+# Hybrid (headless-first) crawling
+STATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".crawl_state")
+SESSION_STATE = os.path.join(STATE_DIR, "session.json")  # cookies/localStorage shared by all crawls
+HANDOFF_EXIT_CODE = 3      # "blocked, checkpoint written" (see nova_daemon.py)
+HANDOFF_TIMEOUT = 300      # seconds a human gets to clear a CAPTCHA
+MAX_HANDOFFS = 3           # per crawl in --hybrid mode
+# Deadline budgeting (--budget)
+TIMING_FILE = os.path.join(STATE_DIR, "timing.json")  # recent per-page costs, shared by all crawls
+TIMING_ALPHA = 0.3             # weight of the newest observation in the running average
+DEFAULT_COSTS = {"search": PAGE_LOAD_WAIT + 5, "product": PAGE_LOAD_WAIT + 6}  # seconds, before any history
+FINISH_RESERVE = 10            # seconds kept for the final upload and browser shutdown
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/120.0.0.0 Safari/537.36'
+
+# Candidate selectors per layout (raced by selector_engine.probe, last winner first)
+PRICE_SELECTORS = [
+    '.product-price-value',
+    '[class*="Price_Price"]',
+    '[class*="price--current"]',
+    '.uniform-banner-box-price'
+]
+SKU_SELECTORS = [
+    '.sku-property-text',
+    '[class*="sku-item"]',
+    '[class*="skuPropertyValue"]',
+    'button[class*="SkuValue"]'
+]
+
 
 def random_delay(min_sec=1, max_sec=2):
     """Random delay"""
     time.sleep(random.uniform(min_sec, max_sec))
 
 
-def extract_products(page, keyword):
-    """Extract product URLs from search page"""
+def load_timing():
+    """Recent per-page costs in seconds (running averages), defaults before the first crawl"""
+    try:
+        with open(TIMING_FILE) as f:
+            return {**DEFAULT_COSTS, **json.load(f)}
+    except (OSError, ValueError):
+        return dict(DEFAULT_COSTS)
+
+
+def record_timing(timing, kind, seconds):
+    """Fold one observed page cost into the running average"""
+    timing[kind] = round(TIMING_ALPHA * seconds + (1 - TIMING_ALPHA) * timing[kind], 2)
+
+
+def save_timing(timing):
+    """Persist page costs atomically (daemon crawls and handoff resumes run side by side)"""
+    os.makedirs(STATE_DIR, exist_ok=True)
+    tmp = f"{TIMING_FILE}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(timing, f)
+    os.replace(tmp, TIMING_FILE)
+
+
+def time_left(state):
+    """Seconds until the crawl deadline (None without --budget)"""
+    deadline = state.get("deadline")
+    return None if deadline is None else deadline - time.time()
+
+
+def bounded_wait(state, seconds):
+    """Page load wait, shortened when the deadline is closer than that"""
+    left = time_left(state)
+    if left is None:
+        return seconds
+    return max(1, min(seconds, left - FINISH_RESERVE))
+
+
+def rank_by_value(cards, keyword):
+    """Search cards most likely to be the part first: keyword terms found in the card text, then search rank"""
+    terms = keyword.upper().split()
+    def matched(card):
+        text = card[1].upper()
+        return sum(1 for t in terms if t in text)
+    return sorted(cards, key=matched, reverse=True)
+
+
+def extract_products(page, keyword, max_products=MAX_PRODUCTS):
+    """Extract product URLs from search page, best expected value first"""
     print("📦 Extracting product links...")
     
     product_links = page.evaluate("""
         () => {
-            const links = new Set();
+            const links = new Map();
             document.querySelectorAll('a[href*="/item/"]').forEach(a => {
                 const href = a.href;
                 if (href && href.includes('aliexpress.com/item/')) {
-                    links.add(href.split('?')[0]);
+                    const url = href.split('?')[0];
+                    links.set(url, (links.get(url) || '') + ' ' + (a.innerText || a.title || ''));
                 }
             });
-            return Array.from(links);
+            return Array.from(links.entries());
         }
     """)
     
     # Deduplicate
     seen_ids = set()
-    unique_urls = []
-    for url in product_links:
+    cards = []
+    for url, text in product_links:
         if '/item/' in url:
             product_id = url.split('/item/')[-1].split('.')[0]
             if product_id.isdigit() and product_id not in seen_ids:
                 seen_ids.add(product_id)
-                unique_urls.append(url)
-                if len(unique_urls) >= MAX_PRODUCTS:
-                    break
+                cards.append((url, text))
     
-    print(f"   Found {len(unique_urls)} unique products")
+    unique_urls = [url for url, _ in rank_by_value(cards, keyword)[:max_products]]
+    print(f"   Found {len(cards)} unique products, visiting {len(unique_urls)}")
     return unique_urls
 
 
-def extract_product_data(page, url, keyword):
-    """Extract data from product page"""
+def extract_product_data(page, url, keyword, load_wait=PAGE_LOAD_WAIT):
+    """Extract data from product page (waits up to load_wait seconds for the price to render)"""
     print(f"  📥 Loading: {url.split('/item/')[-1][:20]}...")
     
     try:
         page.goto(url, timeout=30000, wait_until="domcontentloaded")
-        time.sleep(PAGE_LOAD_WAIT)  # Wait for dynamic content
     except Exception as e:
         print(f"  ❌ Failed: {e}")
         return None
     
+    # Wait for dynamic content: done as soon as a price renders
+    price_selector = probe(page, "product_price", PRICE_SELECTORS, timeout_ms=int(load_wait * 1000))
+    
     # Scroll to trigger lazy loading
     page.evaluate("window.scrollBy(0, 300)")
     time.sleep(1)
     
+    price_selector = price_selector or probe(page, "product_price", PRICE_SELECTORS, wait=False)
+    sku_selector = probe(page, "product_sku", SKU_SELECTORS, wait=False)
+    
     data = page.evaluate("""
-        (keyword) => {
+        ({ keyword, priceSelector, skuSelector }) => {
             const titleEl = document.querySelector('h1') || document.querySelector('[class*="title"]');
             const title = titleEl?.textContent?.trim() || 'Unknown Product';
             
             let price = 0;
             let currency = 'USD';
-            const priceSelectors = [
-                '.product-price-value',
-                '[class*="Price_Price"]',
-                '[class*="price--current"]',
-                '.uniform-banner-box-price'
-            ];
-            for (const sel of priceSelectors) {
-                const el = document.querySelector(sel);
-                if (el) {
-                    const text = el.textContent;
-                    const match = text.match(/([\\d,.]+)/);
-                    if (match) {
-                        price = parseFloat(match[1].replace(',', ''));
-                        if (text.includes('LKR') || text.includes('රු')) currency = 'LKR';
-                        break;
-                    }
+            const priceEl = priceSelector ? document.querySelector(priceSelector) : null;
+            if (priceEl) {
+                const text = priceEl.textContent;
+                const match = text.match(/([\\d,.]+)/);
+                if (match) {
+                    price = parseFloat(match[1].replace(',', ''));
+                    if (text.includes('LKR') || text.includes('රු')) currency = 'LKR';
                 }
             }
             
             const variants = [];
-            const skuSelectors = [
-                '.sku-property-text',
-                '[class*="sku-item"]',
-                '[class*="skuPropertyValue"]',
-                'button[class*="SkuValue"]'
-            ];
-            
-            for (const sel of skuSelectors) {
-                const elements = document.querySelectorAll(sel);
-                if (elements.length > 0) {
-                    elements.forEach((el) => {
-                        const label = el.textContent?.trim();
-                        if (label && label.length < 80 && label.length > 0) {
-                            variants.push({
-                                variant_label: label,
-                                price: price,
-                                currency: currency,
-                                stock_available: true
-                            });
-                        }
-                    });
-                    break;
-                }
+            if (skuSelector) {
+                document.querySelectorAll(skuSelector).forEach((el) => {
+                    const label = el.textContent?.trim();
+                    if (label && label.length < 80 && label.length > 0) {
+                        variants.push({
+                            variant_label: label,
+                            price: price,
+                            currency: currency,
+                            stock_available: true
+                        });
+                    }
+                });
             }
             
             if (variants.length === 0) {
@@ -143,7 +221,7 @@ def extract_product_data(page, url, keyword):
             
             return { title, price, currency, variants };
         }
-    """, keyword)
+    """, {"keyword": keyword, "priceSelector": price_selector, "skuSelector": sku_selector})
     
     if data:
         data['product_url'] = url
@@ -183,6 +261,7 @@ def send_to_cloudflare(products, keyword):
                 result = r.json()
                 print(f"  ✅ {result.get('title', '?')[:35]}... ({result.get('variants_stored', 0)} variants)")
                 success += 1
+                journal_products([p], keyword, via="ingest")
             else:
                 print(f"  ❌ Failed: {r.status_code}")
         except Exception as e:
@@ -204,79 +283,267 @@ def check_for_captcha(page):
     """)
 
 
-def main(keyword):
-    print("=" * 60)
-    print(f"🤖 AliExpress Auto Scraper - '{keyword}'")
-    print("=" * 60)
+def launch(p, headless):
+    """Launch a browser + context, reusing the shared session state if one was saved"""
+    browser = p.chromium.launch(
+        headless=headless,
+        args=['--disable-blink-features=AutomationControlled']
+    )
     
-    with sync_playwright() as p:
-        browser = p.chromium.launch(
-            headless=False,  # Visible for now, can set True for fully headless
-            args=['--disable-blink-features=AutomationControlled']
-        )
-        
-        context = browser.new_context(
-            viewport={'width': 1400, 'height': 900},
-            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/120.0.0.0 Safari/537.36'
-        )
-        
-        page = context.new_page()
-        page.add_init_script("Object.defineProperty(navigator, 'webdriver', { get: () => undefined });")
-        
-        # Navigate to search
-        url = f"https://www.aliexpress.com/wholesale?SearchText={keyword.replace(' ', '+')}"
-        print(f"\n🌐 Opening: {url}")
-        
-        try:
-            page.goto(url, timeout=30000)
-        except Exception as e:
-            print(f"❌ Failed to load search page: {e}")
-            browser.close()
-            return 1
-        
-        # Wait for page to load
-        print(f"⏳ Waiting {PAGE_LOAD_WAIT}s for page load...")
-        time.sleep(PAGE_LOAD_WAIT)
-        
-        # Check for CAPTCHA
-        if check_for_captcha(page):
-            print("🚫 CAPTCHA detected! Aborting.")
-            browser.close()
-            return 1
-        
-        # Extract products
-        urls = extract_products(page, keyword)
-        
-        if not urls:
-            print("❌ No products found")
-            browser.close()
-            return 1
+    context = browser.new_context(
+        viewport={'width': 1400, 'height': 900},
+        user_agent=USER_AGENT,
+        storage_state=SESSION_STATE if os.path.exists(SESSION_STATE) else None
+    )
+    
+    page = context.new_page()
+    page.add_init_script("Object.defineProperty(navigator, 'webdriver', { get: () => undefined });")
+    return browser, context, page
+
+
+def save_session(context):
+    """Persist cookies/localStorage atomically (daemon may run crawls side by side)"""
+    os.makedirs(STATE_DIR, exist_ok=True)
+    tmp = f"{SESSION_STATE}.{os.getpid()}.tmp"
+    context.storage_state(path=tmp)
+    os.replace(tmp, SESSION_STATE)
+
+
+def new_crawl_state(keyword, max_products=MAX_PRODUCTS, delay=(1, 2)):
+    """Resumable crawl progress (max_products/delay: crawl task constraints, see crawl_service.py)"""
+    return {
+        "keyword": keyword,
+        "max_products": max_products,
+        "delay": list(delay),
+        "stage": "search",       # search -> products
+        "urls": [],
+        "next_index": 0,
+        "products": [],
+        "blocked_url": None,
+        "handoffs": 0,
+        "deadline": None,        # epoch seconds (--budget)
+        "uploaded": 0,           # products[:uploaded] already sent by an incremental upload
+        "stored": 0              # ... of which the API stored this many
+    }
+
+
+def write_checkpoint(path, state):
+    """Save crawl progress so another process can solve/resume it"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(state, f)
+    print(f"💾 Checkpoint written: {path}")
+
+
+def read_checkpoint(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def crawl(p, state, headless, on_product=None):
+    """
+    Crawl from wherever state stopped.
+    
+    on_product(data) is called for each extracted product (incremental upload).
+    Returns "done" (also when the deadline cut the product list short),
+    "captcha" (state.blocked_url set), or "failed"
+    """
+    keyword = state["keyword"]
+    timing = load_timing()
+    browser, context, page = launch(p, headless)
+    
+    try:
+        if state["stage"] == "search":
+            started = time.time()
+            # Navigate to search
+            url = f"https://www.aliexpress.com/wholesale?SearchText={keyword.replace(' ', '+')}"
+            print(f"\n🌐 Opening: {url}")
+            
+            try:
+                page.goto(url, timeout=30000)
+            except Exception as e:
+                print(f"❌ Failed to load search page: {e}")
+                return "failed"
+            
+            # Wait for page to load
+            wait = bounded_wait(state, PAGE_LOAD_WAIT)
+            print(f"⏳ Waiting {wait:.0f}s for page load...")
+            time.sleep(wait)
+            
+            # Check for CAPTCHA
+            if check_for_captcha(page):
+                print("🚫 CAPTCHA detected on search page")
+                state["blocked_url"] = url
+                return "captcha"
+            
+            # Extract products
+            state["urls"] = extract_products(page, keyword, state.get("max_products", MAX_PRODUCTS))
+            if not state["urls"]:
+                print("❌ No products found")
+                return "failed"
+            state["stage"] = "products"
+            record_timing(timing, "search", time.time() - started)
         
-        # Process each product
-        products = []
-        for i, product_url in enumerate(urls, 1):
-            print(f"\n[{i}/{len(urls)}] Extracting...")
-            data = extract_product_data(page, product_url, keyword)
+        # Process each product (resumes at next_index)
+        urls = state["urls"]
+        while state["next_index"] < len(urls):
+            i = state["next_index"]
+            product_url = urls[i]
+            
+            # Stop before a product the deadline cannot cover (one attempt even when late, if nothing yet)
+            left = time_left(state)
+            if left is not None and left < timing["product"] + FINISH_RESERVE and (state["products"] or left <= 0):
+                print(f"\n⏱️ Budget: {left:.0f}s left, a product takes ~{timing['product']:.0f}s - "
+                      f"stopping with {len(state['products'])}/{len(urls)} products")
+                break
+            
+            started = time.time()
+            print(f"\n[{i + 1}/{len(urls)}] Extracting...")
+            data = extract_product_data(page, product_url, keyword, bounded_wait(state, PAGE_LOAD_WAIT))
+            
+            # Only a failed extraction is worth a CAPTCHA check (product text can say "robot")
+            if (not data or data.get("title") == "Unknown Product") and check_for_captcha(page):
+                print("🚫 CAPTCHA detected on product page")
+                state["blocked_url"] = product_url
+                return "captcha"
+            
             if data:
-                products.append(data)
-            random_delay(1, 2)
+                state["products"].append(data)
+                if on_product:
+                    on_product(data)
+            state["next_index"] += 1
+            random_delay(*state.get("delay", (1, 2)))
+            record_timing(timing, "product", time.time() - started)
         
-        # Upload
-        if products:
-            stored = send_to_cloudflare(products, keyword)
-            print(f"\n✅ Done! Stored {stored}/{len(products)} products")
-            browser.close()
-            return 0 if stored > 0 else 1
-        else:
-            print("\n❌ No products extracted")
-            browser.close()
-            return 1
+        save_session(context)
+        return "done"
+    finally:
+        save_timing(timing)
+        browser.close()
+
+
+def solve_in_visible_browser(p, url):
+    """Open url in a visible browser with the saved session and wait until a human clears the CAPTCHA"""
+    print("=" * 60)
+    print(f"🧑 CAPTCHA handoff - solve it in the browser window ({HANDOFF_TIMEOUT}s)")
+    print(f"   {url}")
+    print("=" * 60)
+    
+    browser, context, page = launch(p, headless=False)
+    try:
+        page.goto(url, timeout=30000)
+    except Exception as e:
+        print(f"⚠️ Load issue: {e}")
+    
+    try:
+        deadline = time.time() + HANDOFF_TIMEOUT
+        while time.time() < deadline:
+            time.sleep(2)
+            try:
+                if not check_for_captcha(page):
+                    # Give the page a moment to set post-verification cookies
+                    time.sleep(2)
+                    save_session(context)
+                    print("✅ CAPTCHA cleared, session saved")
+                    return True
+            except Exception:
+                # Page navigating after the challenge
+                continue
+        print("⏰ Handoff timed out")
+        return False
+    finally:
+        browser.close()
+
+
+def upload_incremental(state, data):
+    """on_product hook: upload a product as soon as it is extracted (kept if the crawl is killed)"""
+    state["stored"] = state.get("stored", 0) + send_to_cloudflare([data], state["keyword"])
+    state["uploaded"] = len(state["products"])
+
+
+def finish(state):
+    """Upload collected products not sent incrementally yet"""
+    products = state["products"]
+    if products:
+        pending = products[state.get("uploaded", 0):]
+        stored = state.get("stored", 0) + (send_to_cloudflare(pending, state["keyword"]) if pending else 0)
+        print(f"\n✅ Done! Stored {stored}/{len(products)} products")
+        return 0 if stored > 0 else 1
+    print("\n❌ No products extracted")
+    return 1
+
+
+def main(keyword=None, hybrid=False, handoff_exit=False, checkpoint=None, resume=None, budget=None):
+    state = read_checkpoint(resume) if resume else new_crawl_state(keyword)
+    keyword = state["keyword"]
+    headless = hybrid or handoff_exit
+    # Each process gets its own budget (a resumed handoff starts a fresh daemon timeout)
+    state["deadline"] = time.time() + budget if budget else None
+    
+    print("=" * 60)
+    mode = "hybrid" if hybrid else ("headless, handoff on CAPTCHA" if handoff_exit else "auto")
+    print(f"🤖 AliExpress Auto Scraper - '{keyword}' ({mode})")
+    if resume:
+        print(f"   Resuming at {state['stage']} (product {state['next_index'] + 1}/{len(state['urls']) or '?'})")
+    if budget:
+        print(f"   Budget: {budget:.0f}s")
+    print("=" * 60)
+    
+    with sync_playwright() as p:
+        while True:
+            # Visible unless a headless mode was requested (previous default)
+            result = crawl(p, state, headless, on_product=lambda data: upload_incremental(state, data))
+            
+            if result == "done":
+                break
+            if result == "failed":
+                return 1
+            
+            # CAPTCHA
+            if handoff_exit:
+                write_checkpoint(checkpoint or os.path.join(STATE_DIR, "handoff.json"), state)
+                return HANDOFF_EXIT_CODE
+            if not hybrid or state["handoffs"] >= MAX_HANDOFFS:
+                print("🚫 CAPTCHA detected! Aborting.")
+                return 1
+            
+            state["handoffs"] += 1
+            if not solve_in_visible_browser(p, state["blocked_url"]):
+                return 1
+            print("🔁 Resuming headless crawl...")
+    
+    print_probe_report()
+    return finish(state)
+
+
+def solve(checkpoint):
+    """--solve: visible browser for a queued handoff; exit 0 once cleared"""
+    state = read_checkpoint(checkpoint)
+    with sync_playwright() as p:
+        return 0 if solve_in_visible_browser(p, state["blocked_url"]) else 1
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python scrape_auto.py '<keyword>'")
+    parser = argparse.ArgumentParser(description="Automated AliExpress crawl for one keyword")
+    parser.add_argument("keyword", nargs="?", help="Search keyword, e.g. '30A ESC'")
+    parser.add_argument("--hybrid", action="store_true", help="Headless; hand off to a visible browser on CAPTCHA")
+    parser.add_argument("--handoff-exit", action="store_true",
+                        help=f"Headless; on CAPTCHA write --checkpoint and exit {HANDOFF_EXIT_CODE}")
+    parser.add_argument("--checkpoint", help="Checkpoint file for --handoff-exit")
+    parser.add_argument("--resume", metavar="CHECKPOINT", help="Resume a crawl from a checkpoint")
+    parser.add_argument("--solve", metavar="CHECKPOINT", help="Open the checkpoint's blocked page for a human")
+    parser.add_argument("--budget", type=float, metavar="SECONDS",
+                        help="Time budget: upload as it goes and stop before the deadline")
+    args = parser.parse_args()
+    
+    if args.solve:
+        sys.exit(solve(args.solve))
+    if not API_KEY:
+        print("❌ Error: API_KEY environment variable not set.")
+        sys.exit(1)
+    if not args.keyword and not args.resume:
+        print("Usage: python scrape_auto.py '<keyword>' [--hybrid]")
         sys.exit(1)
     
-    exit_code = main(sys.argv[1])
+    exit_code = main(args.keyword, args.hybrid, args.handoff_exit, args.checkpoint, args.resume, args.budget)
     sys.exit(exit_code)
@@ -23,6 +23,9 @@ from playwright.sync_api import sync_playwright
 
 import os
 
+from ingest_journal import journal_products
+from selector_engine import probe, print_probe_report
+
 # Configuration
 CLOUDFLARE_API = "https://bom-pricer-api.randunun.workers.dev/api/nova/ingest"
 API_KEY = os.getenv("API_KEY")
@@ -32,6 +35,14 @@ if not API_KEY:
     sys.exit(1)
 MAX_PRODUCTS = 5
 
+# Variant button candidates per layout (raced by selector_engine.probe, last winner first)
+VARIANT_SELECTORS = [
+    '[class*="sku-item"]',
+    '[class*="skuPropertyValue"]',
+    'button[class*="SkuValue"]',
+    '.sku-property-text'
+]
+
 
 def random_delay(min_sec=1, max_sec=3):
     """Human-like random delay"""
@@ -170,22 +181,13 @@ def extract_product_data(page, url, keyword):
         return {'price': 0, 'currency': 'LKR', 'foundIn': ''}
     
     # Find variant buttons using Playwright
-    variant_selectors = [
-        '[class*="sku-item"]', 
-        '[class*="skuPropertyValue"]', 
-        'button[class*="SkuValue"]',
-        '.sku-property-text'
-    ]
-    
     variants = []
     variant_buttons = []
     
-    for sel in variant_selectors:
-        buttons = page.query_selector_all(sel)
-        if buttons and len(buttons) > 0:
-            variant_buttons = buttons
-            print(f"    Found {len(buttons)} variant buttons with '{sel}'")
-            break
+    sel = probe(page, "product_sku", VARIANT_SELECTORS, wait=False)
+    if sel:
+        variant_buttons = page.query_selector_all(sel)
+        print(f"    Found {len(variant_buttons)} variant buttons with '{sel}'")
     
     if variant_buttons and len(variant_buttons) > 0:
         for i, btn in enumerate(variant_buttons[:15]):  # Limit to 15 variants
@@ -275,6 +277,7 @@ def send_to_cloudflare(products, keyword):
                     for err in errors[:3]:  # Show first 3 errors
                         print(f"      ⚠️ {err}")
                 success += 1
+                journal_products([p], keyword, via="insert")
             else:
                 err = r.text[:100] if r.text else str(r.status_code)
                 print(f"  ❌ Failed: {r.status_code} - {err}")
@@ -336,6 +339,7 @@ def main(keyword):
             if data:
                 products.append(data)
             random_delay(2, 4)
+        print_probe_report()
         
         # Upload
         if products:
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Selector Engine - concurrent, learned selector probing for the AliExpress scrapers
+
+AliExpress serves several layouts, so every scraper keeps a list of candidate CSS
+selectors per page element ("search_products", "product_price", "product_sku", ...).
+Instead of waiting on the candidates one after another, probe() races all of them in
+a single page.wait_for_function: the page is polled every animation frame until any
+candidate matches, and every candidate matching at that moment is returned at once.
+
+The winning selector per page type and candidate list is kept in a small JSON cache
+(.crawl_state/selectors.json) and tried first next time; scrapers probing the same
+page type with different lists get separate entries. When the cached winner stops
+matching while another candidate does, the layout changed: it is logged and the
+cache moves to the new winner. A race (wait=True) returns the first candidate in
+list order among those matching when it ends, so an early-rendering fallback does
+not displace the scraper's preferred selector.
+
+Time spent probing is printed per probe and summed per page type (print_probe_report()).
+
+Usage (from a scraper):
+    from selector_engine import probe, print_probe_report
+
+    selector = probe(page, "search_products", PRODUCT_SELECTORS, timeout_ms=20000)
+    price_sel = probe(page, "product_price", PRICE_SELECTORS, wait=False)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+# Configuration
+STATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".crawl_state")
+SELECTOR_CACHE = os.path.join(STATE_DIR, "selectors.json")
+DEFAULT_TIMEOUT_MS = 10000
+
+# Every candidate that matches right now (invalid selectors count as misses), null if none
+MATCHING_SELECTORS_JS = """
+    (selectors) => {
+        const hits = selectors.filter(sel => {
+            try { return document.querySelector(sel) !== null; } catch (e) { return false; }
+        });
+        return hits.length > 0 ? hits : null;
+    }
+"""
+
+PROBE_STATS = defaultdict(lambda: {"probes": 0, "ms": 0.0, "misses": 0, "cache_hits": 0, "layout_changes": 0})
+_stats_lock = threading.Lock()
+
+
+class SelectorCache:
+    """Winning selector per page type, persisted as JSON (shared by crawl threads)"""
+
+    def __init__(self, path=SELECTOR_CACHE):
+        self.path = path
+        self.lock = threading.Lock()
+        try:
+            with open(path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def winner(self, page_type):
+        with self.lock:
+            return (self.entries.get(page_type) or {}).get("selector")
+
+    def record(self, page_type, selector):
+        """Remember a new winner, written atomically (several scrapers may share the file)"""
+        with self.lock:
+            self.entries[page_type] = {"selector": selector, "updated_at": int(time.time())}
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.entries, f, indent=2)
+            os.replace(tmp, self.path)
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def default_cache():
+    """Process-wide cache backed by SELECTOR_CACHE"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = SelectorCache()
+        return _default_cache
+
+
+def cache_key(page_type, candidates):
+    """Cache entry for one page type + candidate list, e.g. product_price:3f9a0c1e"""
+    digest = hashlib.sha1("\n".join(candidates).encode()).hexdigest()[:8]
+    return f"{page_type}:{digest}"
+
+
+def probe(page, page_type, candidates, timeout_ms=DEFAULT_TIMEOUT_MS, wait=True, cache=None):
+    """
+    Return the selector to use for page_type (None if no candidate matches).
+
+    wait=True races the candidates until one appears (or timeout_ms passes);
+    wait=False checks the already loaded page once.
+    """
+    cache = cache or default_cache()
+    key = cache_key(page_type, candidates)
+    cached = cache.winner(key)
+    if cached not in candidates:
+        cached = None
+    ordered = ([cached] if cached else []) + [c for c in candidates if c != cached]
+
+    start = time.perf_counter()
+    hits = None
+    try:
+        if wait:
+            handle = page.wait_for_function(MATCHING_SELECTORS_JS, arg=ordered, timeout=timeout_ms, polling="raf")
+            hits = handle.json_value()
+        else:
+            hits = page.evaluate(MATCHING_SELECTORS_JS, ordered)
+    except Exception:
+        # Timeout (nothing matched) or the page navigated away mid-probe
+        hits = None
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    if hits and wait:
+        # Whatever rendered first ended the race; keep the scraper's preference among the matches
+        selector = next(c for c in candidates if c in hits)
+    else:
+        selector = hits[0] if hits else None
+    # Only a cached winner that no longer matches means the layout changed
+    layout_changed = bool(selector and cached and cached not in hits)
+
+    with _stats_lock:
+        stats = PROBE_STATS[page_type]
+        stats["probes"] += 1
+        stats["ms"] += elapsed_ms
+        stats["misses"] += selector is None
+        stats["cache_hits"] += bool(selector and selector == cached)
+        stats["layout_changes"] += layout_changed
+
+    if selector is None:
+        print(f"   🎯 {page_type}: no selector matched ({elapsed_ms:.0f} ms)")
+        return None
+    if layout_changed:
+        print(f"   🔀 {page_type}: layout changed, '{cached}' -> '{selector}'")
+    if selector != cached:
+        cache.record(key, selector)
+    print(f"   🎯 {page_type}: '{selector}' ({elapsed_ms:.0f} ms)")
+    return selector
+
+
+def print_probe_report():
+    """Selector probing time per page type for this run"""
+    with _stats_lock:
+        rows = sorted(PROBE_STATS.items())
+    if not rows:
+        return
+    print("\n⏱️  Selector probing:")
+    for page_type, s in rows:
+        print(f"   {page_type:<18} {s['probes']:>3} probes | {s['ms']:>7.0f} ms total | "
+              f"{s['ms'] / s['probes']:>5.0f} ms avg | cache hits {s['cache_hits']} | "
+              f"misses {s['misses']} | layout changes {s['layout_changes']}")
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Spec Extraction (Python port of utils/specs.js)
+
+Same deterministic rules the worker applies at ingest, so local tools
+(replay_journal.py) derive identical spec keys and variant ids.
+Keep in sync with utils/specs.js and toUsd()/parseBomLine() in api/shared.js.
+
+Usage:
+    from specs import extract_specs, extract_variant_specs, generate_spec_key, generate_variant_id
+"""
+
+import hashlib
+import math
+import re
+
+# Must match FX_RATES in api/shared.js
+FX_RATES = {
+    "LKR": 1 / 320.0,
+    "USD": 1.0,
+}
+
+# Text is uppercased first, so the /i of the JS patterns is not needed
+_PACK_PCS = re.compile(r"(\d+)\s*(PCS|PC|PAIRS|PAIR)", re.A)
+_PACK_X_AFTER = re.compile(r"X\s*(\d+)", re.A)
+_PACK_X_BEFORE = re.compile(r"^(\d+)\s*X", re.A)
+_PACK_TRAILING = re.compile(r"[X\s](\d+)\s*$", re.A)
+_AMPS = re.compile(r"(\d+)\s*A\b", re.A)
+_CELLS = re.compile(r"(\d+(?:-\d+)?)\s*S\b", re.A)
+_VOLTS = re.compile(r"(\d+(?:[.,]\d+)?)\s*V(?:OLT)?\b", re.A)
+_CAPACITY = re.compile(r"(\d+)\s*MAH", re.A)
+_KV = re.compile(r"(\d+)\s*KV", re.A)
+_PROP_SIZE = re.compile(r"\d+X\d+", re.A)
+
+
+def to_usd(value, currency):
+    """toUsd(): None for unknown currencies, rounded to 4 decimals (half up like Math.round)"""
+    rate = FX_RATES.get(currency)
+    if rate is None:
+        return None
+    return math.floor(value * rate * 10000 + 0.5) / 10000
+
+
+def extract_specs(label):
+    """extractSpecs(): current_A, pack_qty, voltage_s, capacity_mah, kv from a listing/variant label"""
+    if not label:
+        return {"current_A": None, "pack_qty": 1, "voltage_s": None, "capacity_mah": None, "kv": None}
+    text = label.upper()
+
+    # Substring checks skip patterns that cannot match (regex search dominates bulk replay)
+    m = None
+    if "PC" in text or "PAIR" in text:
+        m = _PACK_PCS.search(text)
+    if not m and "X" in text:
+        m = _PACK_X_AFTER.search(text) or _PACK_X_BEFORE.search(text)
+    if not m and text.rstrip()[-1:].isdigit():
+        m = _PACK_TRAILING.search(text)
+    pack_qty = int(m.group(1)) if m else 1
+    if pack_qty < 1:
+        pack_qty = 1
+
+    # Values >= 10 are the ESC rating, smaller ones usually a BEC
+    amps = [int(m.group(1)) for m in _AMPS.finditer(text)]
+    large = [a for a in amps if a >= 10]
+    current_a = large[0] if large else (amps[0] if amps else None)
+
+    m = _CELLS.search(text) if "S" in text else None
+    voltage_s = m.group(1) + "S" if m else None
+    if not voltage_s and "V" in text:
+        m = _VOLTS.search(text)
+        if m:
+            v = float(m.group(1).replace(",", "."))
+            for low, high, cells in ((3.6, 4.4, "1S"), (7.2, 8.8, "2S"), (10.8, 13.2, "3S"),
+                                     (14.4, 17.6, "4S"), (21.6, 26.4, "6S")):
+                if low <= v <= high:
+                    voltage_s = cells
+                    break
+
+    m = _CAPACITY.search(text) if "MAH" in text else None
+    capacity_mah = int(m.group(1)) if m else None
+    m = _KV.search(text) if "KV" in text else None
+    kv = int(m.group(1)) if m else None
+
+    return {"current_A": current_a, "pack_qty": pack_qty, "voltage_s": voltage_s,
+            "capacity_mah": capacity_mah, "kv": kv}
+
+
+def extract_variant_specs(title, variant_label):
+    """extractVariantSpecs(): specs of one SKU, values in the variant label win over the title"""
+    combined = extract_specs(f"{title or ''} {variant_label or ''}")
+    own = extract_specs(variant_label)
+    for field in ("voltage_s", "capacity_mah", "kv"):
+        if own[field] is not None:
+            combined[field] = own[field]
+    # A label amp value below 10 is a BEC rating unless the title has no ESC rating either
+    amps = own["current_A"]
+    if amps is not None and (amps >= 10 or (combined["current_A"] or 0) < 10):
+        combined["current_A"] = amps
+    return combined
+
+
+def generate_spec_key(item_type, specs):
+    """generateSpecKey(): "ESC:30A", "MOTOR:2300KV", "BATTERY:3S:1500MAH", ..."""
+    if not item_type:
+        return None
+    t = item_type.upper()
+
+    if t == "ESC":
+        return f"ESC:{specs['current_A']}A" if specs.get("current_A") else "ESC:UNKNOWN"
+
+    if t == "MOTOR":
+        kv = f"{specs['kv']}KV" if specs.get("kv") else None
+        size = specs.get("size")
+        if size and kv:
+            return f"MOTOR:{size}:{kv}"
+        if kv:
+            return f"MOTOR:{kv}"
+        if specs.get("raw"):
+            return "MOTOR:" + re.sub(r"\s+", "_", specs["raw"])[:50]
+        return "MOTOR:UNKNOWN"
+
+    if t in ("BATTERY", "LIPO"):
+        cells = f"{specs['cells']}S" if specs.get("cells") else (specs.get("voltage_s") or None)
+        mah = f"{specs['capacity_mah']}MAH" if specs.get("capacity_mah") else None
+        if cells and mah:
+            return f"BATTERY:{cells}:{mah}"
+        if cells:
+            return f"BATTERY:{cells}"
+        if mah:
+            return f"BATTERY:ANY:{mah}"
+        return "BATTERY:UNKNOWN"
+
+    if t in ("PROP", "PROPELLER"):
+        return f"PROP:{specs['size']}" if specs.get("size") else "PROP:UNKNOWN"
+
+    if t == "SERVO":
+        return f"SERVO:{specs['weight']}" if specs.get("weight") else "SERVO:UNKNOWN"
+
+    return f"{t}:UNKNOWN"
+
+
+def generate_variant_id(product_id, variant_label, pack_qty, source="prod"):
+    """generateVariantId(): sha1("product|label|pack_qty|source")"""
+    key = f"{product_id}|{variant_label or ''}|{pack_qty or 1}|{source}"
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def bom_line_type(line):
+    """Item type parseBomLine() assigns to a BOM line / listing title (None if unknown)"""
+    upper = line.strip().upper()
+    if "ESC" in upper:
+        return "ESC"
+    if "MOTOR" in upper:
+        return "Motor"
+    if "LIPO" in upper or "BATTERY" in upper:
+        return "Battery"
+    if "PROP" in upper or _PROP_SIZE.search(upper):
+        return "Propeller"
+    if "SERVO" in upper:
+        return "Servo"
+    return None
+
+
+def keyword_item_type(keyword):
+    """Canonical item /api/crawl/result infers from the search keyword"""
+    kw = (keyword or "").upper()
+    if "ESC" in kw:
+        return "ESC"
+    if "MOTOR" in kw:
+        return "MOTOR"
+    if "BATTERY" in kw or "LIPO" in kw:
+        return "BATTERY"
+    if "SERVO" in kw:
+        return "SERVO"
+    if "PROP" in kw:
+        return "PROP"
+    return "UNKNOWN"
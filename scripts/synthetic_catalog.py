@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Synthetic Catalog Generator
+
+Builds a local SQLite database with the same tables the worker reads from D1
+(schemas loaded from db/) and fills it with a synthetic AliExpress-like catalog:
+product_variants spread over realistic spec keys (a few hot keys own most rows),
+price history for every variant, crawl keywords and crawl tasks.
+
+Output is deterministic for a given --seed, so timings can be compared
+across schema changes.
+
+Usage:
+    python scripts/synthetic_catalog.py --db /tmp/catalog.sqlite
+    python scripts/synthetic_catalog.py --db /tmp/catalog.sqlite --variants 1000000 --history 3
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import sqlite3
+import time
+
+# Configuration
+DB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "db")
+DEFAULT_VARIANTS = 1_000_000
+DEFAULT_HISTORY = 3  # price points per variant
+DEFAULT_SEED = 42
+BASE_TIME_MS = 1_790_000_000_000  # fixed "now" so runs are reproducible
+DAY_MS = 86_400_000
+INSERT_CHUNK = 50_000
+
+# Tables the worker uses, in the order they must be created
+SCHEMA_FILES = [
+    "schema_variant_catalog.sql",
+    "schema_resolve_migration.sql",
+    "schema_price_history.sql",
+    "schema_crawl_keywords.sql",
+    "schema_tasks.sql",
+    "schema_health_trust.sql",
+    "schema_product_snapshots.sql",
+    "schema_snapshot_compression.sql",
+    "schema_crawl_priority.sql",
+    "schema_crawl_health_snapshots.sql",
+    "schema_spec_prefetch.sql",
+    "schema_crawl_result_inbox.sql",
+]
+
+# Columns that exist in production D1 but were added outside db/
+EXTRA_COLUMNS = [
+    ("product_variants", "source", "TEXT DEFAULT 'prod'"),
+]
+
+# Weighted like production ingest (test rows are rare)
+SOURCES = ["auto_crawl"] * 5 + ["browser_crawl"] * 2 + ["nova_desktop"] * 2 + ["prod", "rc_test", "test_ingest"]
+BRANDS = ["HOBBYWING", "T-MOTOR", "EMAX", "SPEEDYBEE", "LITTLEBEE", "IFLIGHT", "TATTU", "GNB", "RACERSTAR", ""]
+
+
+def spec_catalog():
+    """All spec keys with their canonical item and typed columns"""
+    specs = []
+    for amps in [6, 10, 12, 15, 20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 80, 100, 120]:
+        specs.append(("ESC", f"ESC:{amps}A", {"current_A": amps}))
+    for size in ["1104", "1404", "1507", "2204", "2205", "2207", "2306", "2207.5", "2810", "3115"]:
+        for kv in [1200, 1700, 1750, 1950, 2300, 2450, 2750, 3600, 4600]:
+            specs.append(("MOTOR", f"MOTOR:{size}:{kv}KV", {"kv": kv}))
+    for cells in [1, 2, 3, 4, 6]:
+        for mah in [300, 450, 650, 850, 1100, 1300, 1500, 1800, 2200, 3300, 5000]:
+            specs.append(("BATTERY", f"BATTERY:{cells}S:{mah}MAH", {"voltage_s": f"{cells}S", "capacity_mah": mah}))
+    for prop in ["3020", "4045", "5040", "5045", "5146", "6045", "7035", "1045"]:
+        specs.append(("PROP", f"PROP:{prop}", {}))
+    return specs
+
+
+def zipf_weights(n, s=1.1):
+    """Popularity weights: a handful of hot spec keys own most of the catalog"""
+    return [1 / (rank ** s) for rank in range(1, n + 1)]
+
+
+def create_schema(conn):
+    """Create worker tables from db/ plus columns production added later"""
+    for name in SCHEMA_FILES:
+        with open(os.path.join(DB_DIR, name)) as f:
+            conn.executescript(f.read())
+    for table, column, decl in EXTRA_COLUMNS:
+        cols = [r[1] for r in conn.execute(f"PRAGMA table_info({table})")]
+        if column not in cols:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+    conn.commit()
+
+
+def generate_variants(count, seed=DEFAULT_SEED):
+    """Yield product_variants rows as dicts"""
+    rng = random.Random(seed)
+    specs = spec_catalog()
+    weights = zipf_weights(len(specs))
+    # Shuffle so the hot keys are not all ESCs
+    rng.shuffle(specs)
+
+    product_no = 0
+    produced = 0
+    while produced < count:
+        canonical, spec_key, typed = rng.choices(specs, weights)[0]
+        product_no += 1
+        product_id = str(1005000000000000 + product_no)
+        brand = rng.choice(BRANDS)
+        seller = f"{brand.title() or 'Generic'} Store {rng.randint(1, 400)}"
+        rating = round(rng.uniform(3.8, 5.0), 1)
+        base_price = rng.uniform(2.0, 60.0)
+
+        # 1-6 variants per product listing, all sharing the spec key
+        for v in range(rng.randint(1, 6)):
+            if produced >= count:
+                break
+            pack_qty = rng.choice([1, 1, 1, 2, 4])
+            label = f"{pack_qty}Pcs {spec_key.split(':', 1)[1]} #{v}"
+            unit_price = round(base_price * rng.uniform(0.8, 1.2), 2)
+            seen = BASE_TIME_MS - rng.randint(0, 30) * DAY_MS
+            produced += 1
+            yield {
+                "variant_id": hashlib.sha1(f"{product_id}|{label}|{pack_qty}".encode()).hexdigest(),
+                "product_id": product_id,
+                "canonical_item": canonical,
+                "spec_key": spec_key,
+                "brand": brand,
+                "model": f"{brand} {spec_key}".strip(),
+                "variant_label": label,
+                "current_A": typed.get("current_A"),
+                "voltage_s": typed.get("voltage_s"),
+                "capacity_mah": typed.get("capacity_mah"),
+                "kv": typed.get("kv"),
+                "pack_qty": pack_qty,
+                "unit_price_usd": unit_price,
+                "pack_price_usd": round(unit_price * pack_qty, 2),
+                "currency": "USD",
+                "stock": rng.randint(0, 5000),
+                "rating": rating,
+                "review_count": rng.randint(0, 20000),
+                "seller": seller,
+                "product_url": f"https://www.aliexpress.com/item/{product_id}.html",
+                "first_seen": seen - rng.randint(0, 180) * DAY_MS,
+                "last_seen": seen,
+                "last_price_update": seen,
+                "source": rng.choice(SOURCES),
+            }
+
+
+def _insert_many(conn, table, rows):
+    """Chunked executemany for a list of dicts sharing the same keys"""
+    if not rows:
+        return
+    cols = list(rows[0].keys())
+    sql = f"INSERT OR IGNORE INTO {table} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})"
+    conn.executemany(sql, [tuple(r[c] for c in cols) for r in rows])
+
+
+def load_catalog(conn, variants=DEFAULT_VARIANTS, history=DEFAULT_HISTORY, seed=DEFAULT_SEED, verbose=True):
+    """Fill an empty schema with synthetic rows, returns row counts per table"""
+    rng = random.Random(seed + 1)
+    counts = {"product_variants": 0, "variant_price_history": 0, "crawl_keywords": 0, "crawl_tasks": 0}
+    start = time.time()
+
+    # Bulk load settings: this database is disposable
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+
+    variant_rows, history_rows = [], []
+    for row in generate_variants(variants, seed):
+        variant_rows.append(row)
+        price = row["unit_price_usd"]
+        for h in range(history):
+            history_rows.append({
+                "variant_id": row["variant_id"],
+                "source": row["source"],
+                "unit_price_usd": round(price * rng.uniform(0.9, 1.15), 2),
+                "pack_price_usd": row["pack_price_usd"],
+                "stock": row["stock"],
+                "recorded_at": row["last_price_update"] - h * 7 * DAY_MS,
+            })
+
+        if len(variant_rows) >= INSERT_CHUNK:
+            _insert_many(conn, "product_variants", variant_rows)
+            _insert_many(conn, "variant_price_history", history_rows)
+            counts["product_variants"] += len(variant_rows)
+            counts["variant_price_history"] += len(history_rows)
+            variant_rows, history_rows = [], []
+            conn.commit()
+            if verbose:
+                print(f"   📦 {counts['product_variants']:,} variants ({time.time() - start:.0f}s)")
+
+    _insert_many(conn, "product_variants", variant_rows)
+    _insert_many(conn, "variant_price_history", history_rows)
+    counts["product_variants"] += len(variant_rows)
+    counts["variant_price_history"] += len(history_rows)
+
+    # One crawl keyword per spec key, plus a long tail of pending searches
+    keyword_rows = []
+    statuses = ["done"] * 6 + ["pending"] * 2 + ["crawling", "failed", "blocked"]
+    for canonical, spec_key, _ in spec_catalog():
+        keyword_rows.append({
+            "keyword": spec_key.replace(":", " "),
+            "canonical_type": canonical,
+            "priority": rng.randint(1, 10),
+            "status": rng.choice(statuses),
+            "fail_count": rng.randint(0, 3),
+            "last_updated": BASE_TIME_MS - rng.randint(0, 14) * DAY_MS,
+        })
+    for i in range(20_000):
+        keyword_rows.append({
+            "keyword": f"SEARCH {i}",
+            "canonical_type": rng.choice(["ESC", "MOTOR", "BATTERY", "PROP"]),
+            "priority": rng.randint(1, 10),
+            "status": rng.choice(statuses),
+            "fail_count": rng.randint(0, 3),
+            "last_updated": BASE_TIME_MS - rng.randint(0, 60) * DAY_MS,
+        })
+    _insert_many(conn, "crawl_keywords", keyword_rows)
+    counts["crawl_keywords"] = len(keyword_rows)
+
+    task_rows = []
+    for i in range(100_000):
+        created = BASE_TIME_MS - rng.randint(0, 90 * 24) * 3_600_000
+        task_rows.append({
+            "task_id": f"task-{i}",
+            "keyword": rng.choice(keyword_rows)["keyword"],
+            "status": rng.choice(["completed"] * 8 + ["failed", "blocked", "sent"]),
+            "created_at": created,
+            "completed_at": created + 120_000,
+            "source": "browser_crawl",
+        })
+    _insert_many(conn, "crawl_tasks", task_rows)
+    counts["crawl_tasks"] = len(task_rows)
+
+    conn.commit()
+    if verbose:
+        print(f"   ✅ Catalog loaded in {time.time() - start:.0f}s")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic bom-pricer catalog in SQLite")
+    parser.add_argument("--db", required=True, help="SQLite file to create (overwritten)")
+    parser.add_argument("--variants", type=int, default=DEFAULT_VARIANTS, help="product_variants rows")
+    parser.add_argument("--history", type=int, default=DEFAULT_HISTORY, help="Price history rows per variant")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Random seed")
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        os.remove(args.db)
+
+    print(f"🏭 Generating {args.variants:,} variants into {args.db}")
+    conn = sqlite3.connect(args.db)
+    create_schema(conn)
+    counts = load_catalog(conn, args.variants, args.history, args.seed)
+    conn.close()
+
+    for table, n in counts.items():
+        print(f"   {table}: {n:,} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+// Secure: Do not inject secrets into public HTML
+window.NOVA_INGEST_KEY = "";
+// User key for personalized brand preferences (anonymous, local-only)
+                      function getUserKey() {
+                        let key = localStorage.getItem('bom_user_key');
+                      if (!key) {
+                        key = crypto.randomUUID();
+                      localStorage.setItem('bom_user_key', key);
+  }
+                      return key;
+}
+                      const userKey = getUserKey();
+
+                      // Delta pricing: unchanged lines are sent as hashes of the last result
+                      let lastPriced = null; // { token, hashes }
+                      async function lineHash(line) {
+                        const digest = await crypto.subtle.digest("SHA-256", new TextEncoder().encode(line.trim().toUpperCase()));
+                        return Array.from(new Uint8Array(digest)).map(b => b.toString(16).padStart(2, "0")).join("").slice(0, 16);
+                      }
+                      async function priceRequestBody(bom) {
+                        if (!lastPriced) return { bom };
+                        const rows = bom.split(String.fromCharCode(10)).map(l => l.trim()).filter(l => l.length > 0);
+                        const lines = await Promise.all(rows.map(async text => {
+                          const hash = await lineHash(text);
+                          return lastPriced.hashes.has(hash) ? { hash } : { hash, text };
+                        }));
+                        return { token: lastPriced.token, lines };
+                      }
+                      function postPrice(body) {
+                        return fetch("/api/price", {
+                          method: "POST",
+                          headers: {
+                            "Content-Type": "application/json",
+                            "X-BOM-User": userKey
+                          },
+                          body: JSON.stringify(body)
+                        });
+                      }
+
+                      // Make functions globally accessible
+                      window.price = async function() {
+  const bom = document.getElementById("bom").value;
+                      document.getElementById("loading").style.display = "block";
+                      document.getElementById("results").innerHTML = "";
+                      try {
+    let res = await postPrice(await priceRequestBody(bom));
+                      if (res.status === 409) {
+                        // Result token expired: price the full BOM
+                        lastPriced = null;
+                        res = await postPrice({ bom });
+                      }
+                      const data = await res.json();
+                      lastPriced = data.result_token
+                        ? { token: data.result_token, hashes: new Set((data.items || []).map(i => i.line_hash)) }
+                        : null;
+                      console.log("API Response received:", data.status, "Items:", data.items?.length);
+                      renderTable(data);
+                      
+                      // Auto-poll if there are pending items
+                      if (data.items && data.items.some(i => i.status === "pending")) {
+                          console.log("Pending items found. Retrying in 5s...");
+                          setTimeout(window.price, 5000);
+                      }
+
+  } catch (e) {
+                        console.error("Fetch error:", e);
+                      document.getElementById("results").innerHTML = '<p class="status-error">Error: ' + e.message + '</p>';
+  } finally {
+                        document.getElementById("loading").style.display = "none";
+  }
+};
+                      let bomData = null;
+                      function renderTable(data) {
+                        bomData = data;
+                      if (!data.items?.length) {document.getElementById("results").innerHTML = "<p>No results.</p>"; return; }
+                      let html = '<table><thead><tr><th>Item</th><th>Qty</th><th>Select Supplier</th><th>Unit Price</th><th>Total</th></tr></thead><tbody>';
+                        for (const i of data.items) {
+    if (i.status === "MATCHED" || i.status === "FUZZY_MATCH") {
+      const itemKey = (i.bom.raw || 'item').replace(/s+/g, '_').replace(/[^a-zA-Z0-9_]/g, '');
+                        const itemName = i.bom.raw || (i.bom.current_A ? i.bom.current_A + 'A ESC' : 'Unknown Item');
+      const defaultCand = i.candidates?.find(c => c.default) || i.candidates?.[0];
+                        const hasRealUrl = defaultCand?.product_url && defaultCand.product_url.includes('/item/');
+                        const isEstimate = defaultCand?.is_estimate;
+                        html += '<tr>';
+                          // Only show View link if we have a real product URL (not a search URL) and it's not an AI estimate
+                          let viewBtn = '';
+                          if (!isEstimate && defaultCand?.variant_id && hasRealUrl) {
+                            viewBtn = ' <a href="/api/resolve?variant_id=' + defaultCand.variant_id + '" target="_blank" style="font-size:11px;color:#6d9eeb;text-decoration:none;">[View]</a>';
+      } else if (isEstimate) {
+                            viewBtn = ' <span style="font-size:10px;color:#fbbf24;">[Data pending - crawl needed]</span>';
+      }
+                          html += '<td>' + itemName + (hasRealUrl && !isEstimate ? '<span class="verified">Variant verified</span>' : '') + (i.status === "FUZZY_MATCH" ? '<span class="near-match">Near match - check specs</span>' : '') + viewBtn + '</td>';
+                          html += '<td class="qty" data-item="' + itemKey + '">' + i.bom.qty + '</td>';
+                          html += '<td><div class="candidates" data-item="' + itemKey + '" data-qty="' + i.bom.qty + '">';
+                            if (i.candidates) {
+        for (const c of i.candidates) {
+                              html += '<div class="candidate-row">';
+                            html += '<label>';
+                              html += '<input type="radio" name="cand_' + itemKey + '" value="' + c.id + '" ' + (c.default ? 'checked' : '') + ' data-price-usd="' + c.unit_price_usd + '" data-price-local="' + c.unit_price_local + '" data-currency="' + c.local_currency + '" data-pack-qty="' + (c.pack_qty || 1) + '" data-pack-price-usd="' + (c.pack_price_usd || c.unit_price_usd) + '" data-item-key="' + itemKey + '" data-qty="' + i.bom.qty + '" data-brand="' + c.brand + '" data-supplier="' + (c.remark || '') + '">';
+                              html += '<span class="brand">' + c.brand + '</span> ' + c.model;
+                              // User Trust Badge
+                              if (c.trust?.is_trusted) {
+                                html += '<span class="badge-trusted" title="Based on your past selections">★ Trusted</span>';
+          }
+          // html += '<span class="risk-badge risk-' + c.risk.toLowerCase() + '">' + c.risk + '</span>';
+          // Show unit price with pack breakdown if pack_qty > 1
+          if (c.pack_qty > 1) {
+                                html += '<span class="price">$' + (c.unit_price_usd?.toFixed(2) || '-') + '/unit</span>';
+                              html += '<span class="pack-info">(' + c.pack_qty + 'pcs = $' + (c.pack_price_usd?.toFixed(2) || '-') + ')</span>';
+          } else {
+                                html += '<span class="price">$' + (c.unit_price_usd?.toFixed(2) || '-') + '</span>';
+          }
+                              if (c.is_estimate) {
+                                html += ' <span style="font-size:9px;color:#fbbf24;border:1px solid #fbbf24;padding:0 2px;border-radius:2px;">EST</span>';
+          }
+                              html += '</label>';
+                            // Feedback signals display
+                            html += '<span class="feedback-info">';
+                              if (c.feedback?.rating) {
+                                html += '<span class="rating">★' + (c.feedback.rating?.toFixed(1) || '-') + '</span>';
+          }
+                              if (c.feedback?.reviews) {
+                                html += '<span class="reviews">' + c.feedback.reviews + ' reviews</span>';
+          }
+                              if (c.feedback?.sold) {
+                                html += '<span class="sold">' + c.feedback.sold + ' sold</span>';
+          }
+                              html += '</span>';
+                            html += '<span class="remark">' + c.remark + '</span>';
+                            // Only show View button if: (1) not an AI estimate AND (2) has real product URL (contains /item/)
+                            const candHasRealUrl = c.product_url && c.product_url.includes('/item/');
+                            if (!c.is_estimate && c.variant_id && candHasRealUrl) {
+                              html += ' <a href="/api/resolve?variant_id=' + c.variant_id + '" target="_blank" style="color:#6d9eeb;text-decoration:none;margin-left:6px;font-size:11px;border:1px solid #444;padding:1px 4px;border-radius:4px;">View ↗</a>';
+          } else if (!c.is_estimate && candHasRealUrl) {
+                              html += ' <a href="' + c.product_url + '" target="_blank" style="color:#6d9eeb;text-decoration:none;margin-left:6px;font-size:11px;border:1px solid #444;padding:1px 4px;border-radius:4px;">View ↗</a>';
+          } else {
+                              // Either AI estimate or search URL - show indicator
+                              html += ' <span style="color:#888;font-size:10px;margin-left:6px;">(no direct link)</span>';
+          }
+                            html += '</div>';
+        }
+      }
+                            html += '</div></td>';
+                        const unitPriceUsd = defaultCand?.unit_price_usd || i.unit_price_usd || 0;
+                        const unitPriceLkr = Math.round(unitPriceUsd * 320); // USD to LKR at 1:320
+                        const totalUsd = (unitPriceUsd * i.bom.qty);
+                        const totalLkr = Math.round(totalUsd * 320);
+                        // Always show dual currency: USD primary, LKR secondary
+                        const unitDisplay = '$' + unitPriceUsd.toFixed(2) + '<span class="item-details">≈ LKR ' + unitPriceLkr.toLocaleString() + '</span>';
+                        const totalDisplay = '$' + totalUsd.toFixed(2) + '<span class="item-details">≈ LKR ' + totalLkr.toLocaleString() + '</span>';
+
+                        html += '<td class="price row-unit" data-item="' + itemKey + '" data-usd="' + unitPriceUsd + '" data-lkr="' + unitPriceLkr + '">' + unitDisplay + '</td>';
+                        html += '<td class="price row-total" data-item="' + itemKey + '" data-usd="' + totalUsd + '" data-lkr="' + totalLkr + '">' + totalDisplay + '</td>';
+                        html += '</tr>';
+    } else {
+                          // Non-MATCHED status (SEARCHING, NOT_FOUND, PENDING_CRAWL etc.)
+                          let statusCell = '';
+                          
+                         if (i.status === 'PENDING_CRAWL') {
+                           // Show command + request button
+                           const rawKeyword = (i.crawl_keyword || i.bom?.raw || '');
+                           // Full command with venv activation - use && to chain commands
+                           const cmdText = "export API_KEY='your_api_key_here' && cd ~/bom-pricer && source .venv/bin/activate && python scripts/scrape_interactive.py '" + rawKeyword.replace(/'/g, "\'") + "'";
+                           const htmlSafeCmd = cmdText.replace(/"/g, '&quot;');
+                           statusCell = '<span class="pending-fetch" style="color:#fbbf24;">⏳ No pricing data yet</span>';
+                           statusCell += '<br><code class="crawl-cmd" style="background:#1a1a2e;color:#4ade80;padding:4px 8px;border-radius:4px;font-size:11px;display:inline-block;margin:6px 0;cursor:pointer;word-break:break-all;max-width:100%;" data-cmd="' + htmlSafeCmd + '" title="Click to copy">' + cmdText + '</code>';
+                           statusCell += ' <button class="copy-cmd-btn" data-cmd="' + htmlSafeCmd + '" style="background:#333;color:#fff;border:none;padding:3px 8px;border-radius:4px;cursor:pointer;font-size:10px;">📋 Copy</button>';
+                           statusCell += '<br><small style="color:#888;">Run in terminal. Data uploads automatically (no deploy needed).</small>';
+                         } else {
+                           statusCell = '<span class="status-' + i.status.toLowerCase() + '">' + i.status + '</span>';
+                         }
+
+                        // Keep manual search as fallback for non-pending items
+                        if (i.manual_url && i.status !== 'PENDING_CRAWL') {
+                          statusCell += ' <a href="' + i.manual_url + '" target="_blank" style="color:#6d9eeb;font-size:11px;margin-left:6px;">[Manual Search]</a>';
+      }
+                        if (i.message && i.status !== 'PENDING_CRAWL') {
+                          statusCell += '<br><small style="opacity:0.7">' + i.message + '</small>';
+      }
+                        html += '<tr data-pending-keyword="' + (i.crawl_keyword || '') + '"><td>' + (i.bom?.raw || 'Unknown') + '</td><td>' + (i.bom?.qty || '-') + '</td><td colspan="3" class="' + (i.status === 'PENDING_CRAWL' ? 'status-pending' : 'status-error') + '">' + statusCell + '</td></tr>';
+    }
+  }
+                        html += '<tr class="total-row"><td colspan="3">Total BOM Cost</td><td></td><td class="price" id="bom-total">$' + recalcBomTotal() + '</td></tr></tbody></table>';
+                        html += '<div style="text-align:right; font-size:11px; color:#888; margin-top:8px;">* Prices exclude shipping and import taxes</div>';
+                    document.getElementById("results").innerHTML = html;
+                    recalcBomTotal();
+
+  // Auto-retry only for SEARCHING status (actively being processed)
+  // Don't auto-refresh for PENDING_CRAWL (waiting for manual Nova run)
+  const hasSearching = data.items.some(i => i.status === "SEARCHING");
+  const retryCount = window._pendingRetryCount || 0;
+  
+  if (hasSearching && retryCount < 4) {
+    window._pendingRetryCount = retryCount + 1;
+    let countdown = 15;
+    const countdownEl = document.createElement("p");
+    countdownEl.id = "retry-countdown";
+    countdownEl.style.cssText = "color:#6d9eeb; margin-top:10px; display:flex; align-items:center; gap:8px;";
+    countdownEl.innerHTML = '<span class="spinner" style="width:14px;height:14px;border-width:2px;"></span> Checking for data in ' + countdown + 's... (attempt ' + (retryCount + 1) + '/4)';
+    document.getElementById("results").appendChild(countdownEl);
+    
+    const timer = setInterval(() => {
+      countdown--;
+      if (countdown > 0) {
+        countdownEl.innerHTML = '<span class="spinner" style="width:14px;height:14px;border-width:2px;"></span> Checking for data in ' + countdown + 's...';
+      } else {
+        clearInterval(timer);
+        countdownEl.innerHTML = '<span class="spinner" style="width:14px;height:14px;border-width:2px;"></span> Refreshing...';
+        window.price();
+      }
+    }, 1000);
+  } else if (!hasSearching) {
+    // Reset retry count when all items are resolved
+    window._pendingRetryCount = 0;
+  }
+}
+                    window.onCandidateSelected = function(itemKey, qty) {
+  const selected = document.querySelector('input[name="cand_' + itemKey + '"]:checked');
+                    if (!selected) return;
+                    const unitUsd = parseFloat(selected.dataset.priceUsd);
+
+                    // Record brand preference
+                    const brand = selected.dataset.brand;
+                    const supplier = selected.dataset.supplier;
+                    if (brand) {
+                      fetch('/api/preference', {
+                        method: 'POST',
+                        headers: { 'Content-Type': 'application/json', 'X-BOM-User': userKey },
+                        body: JSON.stringify({ brand, supplier })
+                      }).catch(() => { });
+  }
+
+                    const rowUnit = document.querySelector('.row-unit[data-item="' + itemKey + '"]');
+                    const rowTotal = document.querySelector('.row-total[data-item="' + itemKey + '"]');
+
+                    const unitLkr = Math.round(unitUsd * 320);
+                    const totalUsd = unitUsd * qty;
+                    const totalLkr = Math.round(totalUsd * 320);
+
+                    if (rowUnit) rowUnit.innerHTML = '$' + unitUsd.toFixed(2) + '<span class="item-details">≈ LKR ' + unitLkr.toLocaleString() + '</span>';
+                    if (rowTotal) rowTotal.innerHTML = '$' + totalUsd.toFixed(2) + '<span class="item-details">≈ LKR ' + totalLkr.toLocaleString() + '</span>';
+                    recalcBomTotal();
+};
+
+                    function recalcBomTotal() {
+                      let total = 0;
+  document.querySelectorAll('.candidates').forEach(c => {
+    const itemKey = c.dataset.item;
+                    const qty = parseInt(c.dataset.qty) || 1;
+                    const selected = document.querySelector('input[name="cand_' + itemKey + '"]:checked');
+                    if (selected) total += parseFloat(selected.dataset.priceUsd) * qty;
+  });
+                    const bomTotalEl = document.getElementById('bom-total');
+                    const totalLkr = Math.round(total * 320);
+                    if (bomTotalEl) bomTotalEl.innerHTML = '$' + total.toFixed(2) + '<span style="font-size:12px;display:block;color:#888;font-weight:normal">≈ LKR ' + totalLkr.toLocaleString() + '</span>';
+                    return total.toFixed(2);
+}
+                    window.downloadCSV = async function() {
+  const bom = document.getElementById("bom").value;
+                    if (!bom.trim()) {alert("Please enter a BOM first"); return; }
+                    try {
+    const res = await fetch("/api/price?format=csv", {method: "POST", headers: {"Content-Type": "application/json"}, body: JSON.stringify({bom}) });
+                    if (!res.ok) {alert("Error fetching CSV"); return; }
+                    const blob = await res.blob();
+                    const url = URL.createObjectURL(blob);
+                    const a = document.createElement("a");
+                    a.href = url;
+                    a.download = "bom_pricing_" + new Date().toISOString().slice(0,10) + ".csv";
+                    document.body.appendChild(a);
+                    a.click();
+                    document.body.removeChild(a);
+                    URL.revokeObjectURL(url);
+  } catch (e) {alert("Download failed: " + e.message); }
+};
+
+                    // 🤖 Auto-crawl trigger function
+                    window.triggerCrawl = async function(keyword, btn) {
+  const originalText = btn.textContent;
+                    btn.disabled = true;
+                    btn.textContent = "⏳ Crawling...";
+                    btn.style.opacity = "0.7";
+
+                    console.log("[Crawl] Triggering for:", keyword);
+                    try {
+    const res = await fetch("/api/crawl/trigger", {
+                      method: "POST",
+                    headers: {"Content-Type": "application/json" },
+                    body: JSON.stringify({keyword: keyword })
+    });
+
+                    const data = await res.json();
+                    console.log("[Crawl] Response:", res.status, data);
+
+                    if (res.ok && data.status === "ok") {
+                      btn.textContent = "✅ Done! Refreshing...";
+                    btn.style.background = "#10b981";
+      
+      setTimeout(() => {
+                      window.price();
+      }, 1500);
+    } else {
+      let errMsg = data.error || data.message || "Failed";
+      let shortMsg = errMsg.length > 20 ? "Error" : errMsg;
+      if (res.status === 429) shortMsg = "Blocked";
+      
+      btn.textContent = "❌ " + shortMsg;
+                    btn.style.background = "#ef4444";
+                    console.error("[Crawl] Failed:", errMsg);
+      
+      setTimeout(() => {
+                      btn.textContent = originalText;
+                    btn.disabled = false;
+                    btn.style.opacity = "1";
+                    btn.style.background = "linear-gradient(135deg,#667eea,#764ba2)";
+      }, 4000);
+    }
+  } catch (e) {
+                      btn.textContent = "❌ Error";
+                    btn.style.background = "#ef4444";
+                    console.error("[Crawl] Request error:", e);
+    
+    setTimeout(() => {
+                      btn.textContent = originalText;
+                    btn.disabled = false;
+                    btn.style.opacity = "1";
+                    btn.style.background = "linear-gradient(135deg,#667eea,#764ba2)";
+    }, 3000);
+  }
+};
+
+                    // Attach event listeners (DOM already loaded since script is at end of body)
+                    document.getElementById('btn-price').addEventListener('click', window.price);
+                    document.getElementById('btn-csv').addEventListener('click', window.downloadCSV);
+
+                    // Currency selector - update all prices when changed
+                    // Currency selector removed - prices always show both currencies
+                    // Currency selector removed
+
+
+                    // Event delegation for candidate radio buttons (dynamically added)
+                    document.getElementById('results').addEventListener('change', function(e) {
+  if (e.target.type === 'radio' && e.target.dataset.itemKey) {
+    const itemKey = e.target.dataset.itemKey;
+                    const qty = parseInt(e.target.dataset.qty) || 1;
+                    window.onCandidateSelected(itemKey, qty);
+  }
+});
+
+                    // Crawl button removed - Nova agents handle crawling in background
+
+                    // Event delegation for copy command buttons
+                    document.getElementById('results').addEventListener('click', function(e) {
+  // Handle copy button click
+  if (e.target.classList.contains('copy-cmd-btn') || e.target.classList.contains('crawl-cmd')) {
+    const cmd = e.target.dataset.cmd;
+    if (cmd) {
+      navigator.clipboard.writeText(cmd).then(() => {
+        const originalText = e.target.textContent;
+        e.target.textContent = '✅ Copied!';
+        e.target.style.background = '#10b981';
+        e.target.style.color = '#fff';
+        setTimeout(() => {
+          e.target.textContent = originalText;
+          if (e.target.classList.contains('copy-cmd-btn')) {
+            e.target.style.background = '#333';
+          } else {
+            e.target.style.background = '#1a1a2e';
+            e.target.style.color = '#4ade80';
+          }
+        }, 2000);
+      }).catch(() => {
+        prompt('Copy this command:', cmd);
+      });
+    }
+  }
+});
@@ -0,0 +1,128 @@
+
+/**
+ * Two-tier read-through cache for the Worker
+ * Tier 1: isolate-level LRU (per isolate, lost on eviction, never shared)
+ * Tier 2: KV namespace (env.CACHE, shared across isolates/colos, eventually consistent)
+ *
+ * Isolate LRU entries use a short TTL: after a KV invalidation, other isolates
+ * may serve their local copy until it expires.
+ */
+
+// Small LRU with per-entry TTL (Map keeps insertion order)
+export function createLru(maxEntries, ttlMs) {
+    const entries = new Map();
+
+    return {
+        get(key) {
+            const entry = entries.get(key);
+            if (!entry) return undefined;
+            if (entry.expires < Date.now()) {
+                entries.delete(key);
+                return undefined;
+            }
+            // Refresh recency
+            entries.delete(key);
+            entries.set(key, entry);
+            return entry.value;
+        },
+        set(key, value) {
+            entries.delete(key);
+            entries.set(key, { value, expires: Date.now() + ttlMs });
+            if (entries.size > maxEntries) {
+                entries.delete(entries.keys().next().value);
+            }
+        },
+        delete(key) {
+            entries.delete(key);
+        },
+        get size() {
+            return entries.size;
+        }
+    };
+}
+
+// Hit/miss counters for one cache
+export function createCacheStats() {
+    return { lru_hits: 0, kv_hits: 0, misses: 0 };
+}
+
+// Hit ratio (0-1) of a stats object, null when nothing was looked up yet
+export function hitRatio(stats) {
+    const total = (stats.lru_hits || 0) + (stats.kv_hits || 0) + (stats.misses || 0);
+    if (total === 0) return null;
+    return ((stats.lru_hits || 0) + (stats.kv_hits || 0)) / total;
+}
+
+/**
+ * Resolve many keys through LRU -> KV -> loader
+ * - keys: cache keys (already namespaced)
+ * - load(missingKeys): returns Map key -> value for keys not found in either tier
+ * - Empty arrays/nulls are only kept in the LRU unless cacheEmpty is set, so a
+ *   missed invalidation can never pin an empty result in KV for the full TTL.
+ * Returns Map key -> value
+ */
+export async function readThrough(env, ctx, { lru, stats, keys, ttlSeconds, load, cacheEmpty = false }) {
+    const values = new Map();
+    let pending = [];
+
+    for (const key of new Set(keys)) {
+        const hit = lru.get(key);
+        if (hit !== undefined) {
+            values.set(key, hit);
+            stats.lru_hits++;
+        } else {
+            pending.push(key);
+        }
+    }
+
+    if (pending.length > 0 && env.CACHE) {
+        const kvValues = await Promise.all(pending.map(k => env.CACHE.get(k, { type: "json" }).catch(() => null)));
+        const stillMissing = [];
+        pending.forEach((key, i) => {
+            if (kvValues[i] != null) {
+                values.set(key, kvValues[i]);
+                lru.set(key, kvValues[i]);
+                stats.kv_hits++;
+            } else {
+                stillMissing.push(key);
+            }
+        });
+        pending = stillMissing;
+    }
+
+    if (pending.length === 0) return values;
+
+    stats.misses += pending.length;
+    const loaded = await load(pending);
+    const writes = [];
+
+    for (const key of pending) {
+        const value = loaded.get(key);
+        if (value === undefined) continue;
+        values.set(key, value);
+        lru.set(key, value);
+
+        const isEmpty = value == null || (Array.isArray(value) && value.length === 0);
+        if (env.CACHE && (cacheEmpty || !isEmpty)) {
+            writes.push(env.CACHE.put(key, JSON.stringify(value), { expirationTtl: ttlSeconds }));
+        }
+    }
+
+    if (writes.length > 0) {
+        const done = Promise.all(writes).catch(e => console.error("[Cache] KV write failed:", e.message));
+        if (ctx?.waitUntil) ctx.waitUntil(done);
+        else await done;
+    }
+
+    return values;
+}
+
+// Drop keys from the local LRU and KV (other isolates expire via LRU TTL)
+export async function invalidateKeys(env, lru, keys) {
+    const unique = [...new Set(keys)];
+    for (const key of unique) lru.delete(key);
+    if (!env.CACHE || unique.length === 0) return;
+    await Promise.all(unique.map(k => env.CACHE.delete(k).catch(e => {
+        console.error(`[Cache] KV delete failed for ${k}:`, e.message);
+    })));
+}
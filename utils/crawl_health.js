@@ -0,0 +1,138 @@
+
+/**
+ * Crawl Health Snapshots
+ * The cron materializes the dashboard aggregates into crawl_health once per run;
+ * /admin/crawl-health only reads the latest row and a short series (primary key range).
+ *
+ * Task counts are incremental: each snapshot counts the tasks that finished since the
+ * previous one, and the 7d success rate is the sum over the snapshots of the last 7 days.
+ */
+
+export const HEALTH_WINDOW_MS = 7 * 24 * 60 * 60 * 1000;        // success rate / series window
+export const HEALTH_RETENTION_MS = 90 * 24 * 60 * 60 * 1000;    // snapshots kept
+export const STALE_VARIANT_MS = 48 * 60 * 60 * 1000;            // "Stale Variants (>48h)"
+export const DAEMON_ACTIVE_MS = 15 * 60 * 1000;                 // daemon counts as running if it reported since
+const DAEMON_RETENTION_MS = 30 * 24 * 60 * 60 * 1000;
+
+// Latest snapshot row (or null)
+export async function latestHealthSnapshot(db) {
+    return await db.prepare(
+        "SELECT * FROM crawl_health ORDER BY snapshot_time DESC LIMIT 1"
+    ).first();
+}
+
+/**
+ * Compute and store one snapshot (cron)
+ * Returns the inserted row
+ */
+export async function snapshotCrawlHealth(db, now = Date.now()) {
+    const prev = await latestHealthSnapshot(db);
+    const since = prev?.snapshot_time ?? now - HEALTH_WINDOW_MS;
+
+    const [keywords, tasks, freshness, stale, daemons] = await db.batch([
+        db.prepare(`
+            SELECT status, COUNT(*) as count
+            FROM crawl_keywords
+            WHERE keyword != '__GLOBAL_PAUSE__'
+            GROUP BY status
+        `),
+        db.prepare(`
+            SELECT COUNT(*) as finished,
+                   SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) as completed,
+                   SUM(CASE WHEN status = 'blocked' THEN 1 ELSE 0 END) as blocked,
+                   MAX(CASE WHEN status = 'blocked' THEN completed_at END) as last_blocked
+            FROM crawl_tasks
+            WHERE completed_at > ? AND completed_at <= ?
+        `).bind(since, now),
+        db.prepare(`
+            SELECT COUNT(*) as variants, AVG((? - last_price_update) / 3600000.0) as avg_hours
+            FROM product_variants
+        `).bind(now),
+        db.prepare(
+            "SELECT COUNT(*) as count FROM product_variants WHERE last_seen < ?"
+        ).bind(now - STALE_VARIANT_MS),
+        db.prepare(`
+            SELECT SUM(crawled) as crawled, SUM(failed) as failed, SUM(handoffs) as handoffs,
+                   SUM(CASE WHEN reported_at > ? THEN 1 ELSE 0 END) as active,
+                   MAX(last_captcha_at) as last_captcha
+            FROM crawl_daemons
+        `).bind(now - DAEMON_ACTIVE_MS)
+    ]);
+
+    const byStatus = Object.fromEntries((keywords.results || []).map(r => [r.status, r.count]));
+    const t = tasks.results?.[0] || {};
+    const f = freshness.results?.[0] || {};
+    const d = daemons.results?.[0] || {};
+
+    const row = {
+        snapshot_time: now,
+        total_keywords: Object.values(byStatus).reduce((a, b) => a + b, 0),
+        pending_keywords: byStatus.pending || 0,
+        blocked_keywords: byStatus.blocked || 0,
+        done_keywords: byStatus.done || 0,
+        avg_price_age_hours: f.avg_hours ?? null,
+        last_captcha_time: Math.max(prev?.last_captcha_time || 0, t.last_blocked || 0, d.last_captcha || 0) || null,
+        tasks_finished: t.finished || 0,
+        tasks_completed: t.completed || 0,
+        tasks_blocked: t.blocked || 0,
+        variant_count: f.variants || 0,
+        stale_variants: stale.results?.[0]?.count || 0,
+        daemons_active: d.active || 0,
+        daemon_crawled: d.crawled || 0,
+        daemon_failed: d.failed || 0,
+        daemon_handoffs: d.handoffs || 0
+    };
+
+    const columns = Object.keys(row);
+    await db.batch([
+        db.prepare(`
+            INSERT OR REPLACE INTO crawl_health (${columns.join(", ")})
+            VALUES (${columns.map(() => "?").join(", ")})
+        `).bind(...Object.values(row)),
+        db.prepare("DELETE FROM crawl_health WHERE snapshot_time < ?").bind(now - HEALTH_RETENTION_MS),
+        db.prepare("DELETE FROM crawl_daemons WHERE reported_at < ?").bind(now - DAEMON_RETENTION_MS)
+    ]);
+    return row;
+}
+
+/**
+ * Dashboard view: latest snapshot, the last 7 days of snapshots (oldest first),
+ * 7d task totals and daemon throughput between consecutive snapshots
+ */
+export async function readCrawlHealth(db, now = Date.now()) {
+    const [series, daemons] = await db.batch([
+        db.prepare(
+            "SELECT * FROM crawl_health WHERE snapshot_time > ? ORDER BY snapshot_time ASC"
+        ).bind(now - HEALTH_WINDOW_MS),
+        db.prepare(
+            "SELECT * FROM crawl_daemons WHERE reported_at > ? ORDER BY reported_at DESC"
+        ).bind(now - DAEMON_ACTIVE_MS)
+    ]);
+
+    let rows = series.results || [];
+    let latest = rows[rows.length - 1] || await latestHealthSnapshot(db);
+    if (!latest) {
+        // Fresh deploy: take the first snapshot now instead of waiting for the cron
+        latest = await snapshotCrawlHealth(db, now);
+        rows = [latest];
+    }
+
+    const tasks = { total: 0, success: 0, blocked: 0 };
+    const points = rows.map((r, i) => {
+        tasks.total += r.tasks_finished || 0;
+        tasks.success += r.tasks_completed || 0;
+        tasks.blocked += r.tasks_blocked || 0;
+        const p = rows[i - 1];
+        const hours = p ? (r.snapshot_time - p.snapshot_time) / 3600000 : 0;
+        const crawled = p ? Math.max(0, (r.daemon_crawled || 0) - (p.daemon_crawled || 0)) : null;
+        return { ...r, daemon_crawls_per_hour: hours > 0 ? Math.round(crawled / hours * 10) / 10 : null };
+    });
+
+    return {
+        latest,
+        snapshot_age_ms: now - latest.snapshot_time,
+        tasks_7d: tasks,
+        series: points,
+        daemons: daemons.results || []
+    };
+}
@@ -0,0 +1,65 @@
+
+/**
+ * Fuzzy BOM Line Matching
+ * For BOM lines whose spec_key is not precise (e.g. "SERVO:UNKNOWN", "MOTOR:<raw text>")
+ * an exact spec_key lookup finds nothing. These helpers build an FTS5 query against the
+ * trigram index over variant brand/model/label (db/schema_variant_fts.sql) and score
+ * the returned rows by trigram similarity to the BOM line.
+ */
+
+export const FUZZY_MIN_SIMILARITY = 0.5;  // Share of the line's trigrams found in the listing
+export const FUZZY_MAX_MATCHES = 10;      // Candidates kept per line
+
+const MIN_TERM_LENGTH = 3;                // Trigram tokenizer cannot match shorter terms
+const MAX_TERMS = 8;
+const REQUIRED_TERMS = 2;                 // Longest (most selective) terms every match must contain
+
+// Spec keys built from real specs (see generateSpecKey); "<TYPE>:UNKNOWN" and the
+// raw-text MOTOR keys of DC/coreless motors fall back to fuzzy search
+export function isPreciseSpecKey(specKey) {
+    if (!specKey || specKey.endsWith(":UNKNOWN")) return false;
+    if (specKey.startsWith("MOTOR:")) return /^MOTOR:([^:]+:)?\d+KV$/.test(specKey);
+    return true;
+}
+
+// Uppercase, alphanumerics only, single spaces
+export function normalizeForMatch(text) {
+    return (text || "").toUpperCase().replace(/[^A-Z0-9.]+/g, " ").trim();
+}
+
+// Search terms of a BOM line (quantity suffix dropped, longest first)
+export function matchTerms(line) {
+    const words = normalizeForMatch(line.replace(/\bx\d+$/i, "")).split(" ");
+    return [...new Set(words.filter(w => w.length >= MIN_TERM_LENGTH))]
+        .sort((a, b) => b.length - a.length)
+        .slice(0, MAX_TERMS);
+}
+
+// FTS5 MATCH expression: the longest terms as quoted substrings (trigram tokenizer), all
+// required - an OR of every term matched any listing sharing a common word ("MOTOR").
+// The remaining terms only count in trigramSimilarity. null if no term is usable
+export function buildFtsQuery(line) {
+    const terms = matchTerms(line).slice(0, REQUIRED_TERMS);
+    if (terms.length === 0) return null;
+    return terms.map(t => `"${t.replace(/"/g, '""')}"`).join(" AND ");
+}
+
+function trigrams(text) {
+    const s = ` ${normalizeForMatch(text)} `;
+    const grams = new Set();
+    for (let i = 0; i + 3 <= s.length; i++) grams.add(s.slice(i, i + 3));
+    return grams;
+}
+
+/**
+ * Similarity (0-1) of a listing to a BOM line: share of the line's trigrams that occur
+ * in the listing text, so long marketplace titles are not penalized for extra words
+ */
+export function trigramSimilarity(line, listing) {
+    const wanted = trigrams(line.replace(/\bx\d+$/i, ""));
+    if (wanted.size === 0) return 0;
+    const have = trigrams(listing);
+    let shared = 0;
+    for (const g of wanted) if (have.has(g)) shared++;
+    return Math.round((shared / wanted.size) * 1000) / 1000;
+}
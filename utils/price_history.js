@@ -0,0 +1,134 @@
+
+/**
+ * Price History Compaction
+ * Keeps variant_price_history bounded per variant:
+ * - raw points for the last RAW_WINDOW_DAYS
+ * - daily buckets (min/max/last) up to DAILY_WINDOW_DAYS
+ * - weekly buckets (min/max/last) up to WEEKLY_RETENTION_WEEKS, older buckets dropped
+ *
+ * The SQL is shared with scripts/compact_price_history.py (local SQLite mirror),
+ * keep both in sync.
+ */
+
+export const DAY_MS = 86400000;
+export const WEEK_MS = 7 * DAY_MS;
+export const RAW_WINDOW_DAYS = 14;
+export const DAILY_WINDOW_DAYS = 90;
+export const WEEKLY_RETENTION_WEEKS = 104;
+export const COMPACT_MAX_DAYS = 7;  // Max days of raw points rolled up per run (bounds first catch-up)
+
+// Raw points -> daily buckets, ?1 = exclusive upper bound (day aligned)
+const ROLLUP_DAYS_SQL = `
+    INSERT INTO variant_price_rollup(
+        variant_id, source, bucket, bucket_start,
+        min_price, max_price, last_price, last_stock, last_recorded_at, points
+    )
+    SELECT variant_id, source, 'day', bucket_start,
+        MIN(unit_price_usd), MAX(unit_price_usd), MAX(last_price), MAX(last_stock), MAX(recorded_at), COUNT(*)
+    FROM (
+        SELECT variant_id, source, unit_price_usd, recorded_at,
+            CAST(recorded_at / ${DAY_MS} AS INTEGER) * ${DAY_MS} AS bucket_start,
+            FIRST_VALUE(unit_price_usd) OVER w AS last_price,
+            FIRST_VALUE(stock) OVER w AS last_stock
+        FROM variant_price_history
+        WHERE recorded_at < ?1
+        WINDOW w AS (PARTITION BY variant_id, source, CAST(recorded_at / ${DAY_MS} AS INTEGER) ORDER BY recorded_at DESC)
+    )
+    WHERE true
+    GROUP BY variant_id, source, bucket_start
+    ON CONFLICT(variant_id, source, bucket, bucket_start) DO UPDATE SET
+        min_price = MIN(min_price, excluded.min_price),
+        max_price = MAX(max_price, excluded.max_price),
+        last_price = CASE WHEN excluded.last_recorded_at >= last_recorded_at THEN excluded.last_price ELSE last_price END,
+        last_stock = CASE WHEN excluded.last_recorded_at >= last_recorded_at THEN excluded.last_stock ELSE last_stock END,
+        last_recorded_at = MAX(last_recorded_at, excluded.last_recorded_at),
+        points = points + excluded.points
+`;
+
+const DELETE_RAW_SQL = `DELETE FROM variant_price_history WHERE recorded_at < ?1`;
+
+// Daily buckets -> weekly buckets (weeks start on Monday), ?1 = exclusive upper bound (week aligned)
+const ROLLUP_WEEKS_SQL = `
+    INSERT INTO variant_price_rollup(
+        variant_id, source, bucket, bucket_start,
+        min_price, max_price, last_price, last_stock, last_recorded_at, points
+    )
+    SELECT variant_id, source, 'week', week_start,
+        MIN(min_price), MAX(max_price), MAX(week_last_price), MAX(week_last_stock), MAX(last_recorded_at), SUM(points)
+    FROM (
+        SELECT variant_id, source, min_price, max_price, last_recorded_at, points,
+            CAST((bucket_start + ${3 * DAY_MS}) / ${WEEK_MS} AS INTEGER) * ${WEEK_MS} - ${3 * DAY_MS} AS week_start,
+            FIRST_VALUE(last_price) OVER w AS week_last_price,
+            FIRST_VALUE(last_stock) OVER w AS week_last_stock
+        FROM variant_price_rollup
+        WHERE bucket = 'day' AND bucket_start < ?1
+        WINDOW w AS (
+            PARTITION BY variant_id, source, CAST((bucket_start + ${3 * DAY_MS}) / ${WEEK_MS} AS INTEGER)
+            ORDER BY last_recorded_at DESC
+        )
+    )
+    WHERE true
+    GROUP BY variant_id, source, week_start
+    ON CONFLICT(variant_id, source, bucket, bucket_start) DO UPDATE SET
+        min_price = MIN(min_price, excluded.min_price),
+        max_price = MAX(max_price, excluded.max_price),
+        last_price = CASE WHEN excluded.last_recorded_at >= last_recorded_at THEN excluded.last_price ELSE last_price END,
+        last_stock = CASE WHEN excluded.last_recorded_at >= last_recorded_at THEN excluded.last_stock ELSE last_stock END,
+        last_recorded_at = MAX(last_recorded_at, excluded.last_recorded_at),
+        points = points + excluded.points
+`;
+
+const DELETE_DAYS_SQL = `DELETE FROM variant_price_rollup WHERE bucket = 'day' AND bucket_start < ?1`;
+
+const DELETE_EXPIRED_WEEKS_SQL = `DELETE FROM variant_price_rollup WHERE bucket = 'week' AND bucket_start < ?1`;
+
+// Start of the UTC day containing ts
+export function dayStart(ts) {
+    return Math.floor(ts / DAY_MS) * DAY_MS;
+}
+
+// Start of the (Monday-based) week containing ts
+export function weekStart(ts) {
+    return Math.floor((ts + 3 * DAY_MS) / WEEK_MS) * WEEK_MS - 3 * DAY_MS;
+}
+
+/**
+ * Run one compaction pass (cron)
+ * Each rollup and the delete of its source rows run in one D1 batch (transaction),
+ * so a failed run never loses or double counts points.
+ * Returns counts of rows touched
+ */
+export async function compactPriceHistory(db, now = Date.now()) {
+    const stats = { raw_rolled: 0, days_rolled: 0, weeks_expired: 0, raw_cutoff: null };
+
+    // 1. Raw -> daily, oldest first and at most COMPACT_MAX_DAYS per run
+    const rawCutoff = dayStart(now - RAW_WINDOW_DAYS * DAY_MS);
+    const oldest = await db.prepare(
+        "SELECT MIN(recorded_at) as oldest FROM variant_price_history"
+    ).first();
+
+    if (oldest?.oldest != null && oldest.oldest < rawCutoff) {
+        const upTo = Math.min(rawCutoff, dayStart(oldest.oldest) + COMPACT_MAX_DAYS * DAY_MS);
+        const [, deleted] = await db.batch([
+            db.prepare(ROLLUP_DAYS_SQL).bind(upTo),
+            db.prepare(DELETE_RAW_SQL).bind(upTo)
+        ]);
+        stats.raw_rolled = deleted.meta?.changes || 0;
+        stats.raw_cutoff = upTo;
+    }
+
+    // 2. Daily -> weekly
+    const dayCutoff = weekStart(now - DAILY_WINDOW_DAYS * DAY_MS);
+    const [, deletedDays] = await db.batch([
+        db.prepare(ROLLUP_WEEKS_SQL).bind(dayCutoff),
+        db.prepare(DELETE_DAYS_SQL).bind(dayCutoff)
+    ]);
+    stats.days_rolled = deletedDays.meta?.changes || 0;
+
+    // 3. Retention cap
+    const expired = await db.prepare(DELETE_EXPIRED_WEEKS_SQL)
+        .bind(now - WEEKLY_RETENTION_WEEKS * WEEK_MS).run();
+    stats.weeks_expired = expired.meta?.changes || 0;
+
+    return stats;
+}
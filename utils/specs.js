@@ -66,6 +66,30 @@ export function generateSpecKey(type, specs) {
     return `${t}:UNKNOWN`;
 }
 
+// Typed column values encoded in a spec key (inverse of generateSpecKey)
+// "ESC:30A" -> { current_A: 30 }, "BATTERY:3S:1500MAH" -> { voltage_s: "3S", capacity_mah: 1500 }
+// Fields the key does not pin down are null
+export function parseSpecKey(specKey) {
+    const typed = { current_A: null, voltage_s: null, capacity_mah: null, kv: null };
+    if (!specKey) return typed;
+    const [type, ...parts] = specKey.split(":");
+
+    if (type === "ESC") {
+        const m = parts[0]?.match(/^(\d+)A$/);
+        if (m) typed.current_A = parseInt(m[1]);
+    } else if (type === "MOTOR") {
+        const m = parts[parts.length - 1]?.match(/^(\d+)KV$/);
+        if (m) typed.kv = parseInt(m[1]);
+    } else if (type === "BATTERY") {
+        for (const part of parts) {
+            if (/^\d+S$/.test(part)) typed.voltage_s = part;
+            const mah = part.match(/^(\d+)MAH$/);
+            if (mah) typed.capacity_mah = parseInt(mah[1]);
+        }
+    }
+    return typed;
+}
+
 // Stable Variant ID
 // sha1(product_id + variant_label + pack_qty + source) - includes source to avoid RC test conflicts
 export async function generateVariantId(productId, variantLabel, packQty, source = 'prod') {
@@ -145,6 +169,23 @@ export function extractSpecs(variantLabel) {
     };
 }
 
+// Specs of one SKU of a listing: values in the variant label win over the title, so a
+// "30A 40A 50A ESC" listing keys its "40A" SKU as ESC:40A (the title alone would give 30A).
+// Pack quantity still reads title + label (it is part of the variant id), and a label amp value
+// below 10 (a BEC rating, as in extractSpecs) does not replace the title's ESC rating.
+export function extractVariantSpecs(title, variantLabel) {
+    const combined = extractSpecs((title || "") + " " + (variantLabel || ""));
+    const own = extractSpecs(variantLabel);
+    const ownAmps = own.current_A !== null && (own.current_A >= 10 || !(combined.current_A >= 10));
+    return {
+        ...combined,
+        current_A: ownAmps ? own.current_A : combined.current_A,
+        voltage_s: own.voltage_s ?? combined.voltage_s,
+        capacity_mah: own.capacity_mah ?? combined.capacity_mah,
+        kv: own.kv ?? combined.kv
+    };
+}
+
 // Helper to normalize specs from raw crawl data or BOM line
 // Returns standardized object: { current_A, kv, cells, capacity_mah, size, ... }
 export function normalizeSpecs(type, rawData) {